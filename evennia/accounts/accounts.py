@@ -12,10 +12,12 @@ instead for most things).
 """
 import re
 import time
+from collections import Counter
 from django.conf import settings
 from django.contrib.auth import authenticate, password_validation
 from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.utils import timezone
+from twisted.internet import defer
 from django.utils.module_loading import import_string
 from evennia.typeclasses.models import TypeclassBase
 from evennia.accounts.manager import AccountManager
@@ -25,6 +27,7 @@ from evennia.comms.models import ChannelDB
 from evennia.commands import cmdhandler
 from evennia.server.models import ServerConfig
 from evennia.server.throttle import Throttle
+from evennia.server.hashing import HASHING_POOL, HashingPoolFull
 from evennia.utils import class_from_module, create, logger
 from evennia.utils.utils import lazy_property, to_str, make_iter, is_iter, variable_from_module
 from evennia.server.signals import (
@@ -49,6 +52,7 @@ _MULTISESSION_MODE = settings.MULTISESSION_MODE
 _MAX_NR_CHARACTERS = settings.MAX_NR_CHARACTERS
 _CMDSET_ACCOUNT = settings.CMDSET_ACCOUNT
 _MUDINFO_CHANNEL = None
+_AUTH_BACKEND = "evennia.web.utils.backends.CaseInsensitiveModelBackend"
 
 # Create throttles for too many account-creations and login attempts
 CREATION_THROTTLE = Throttle(
@@ -57,6 +61,8 @@ CREATION_THROTTLE = Throttle(
 LOGIN_THROTTLE = Throttle(
     limit=settings.LOGIN_THROTTLE_LIMIT, timeout=settings.LOGIN_THROTTLE_TIMEOUT
 )
+# number of logins per IP with their password still being hashed
+_HASHING_LOGINS = Counter()
 
 
 class AccountSessionHandler(object):
@@ -490,9 +496,104 @@ class DefaultAccount(AccountDB, metaclass=TypeclassBase):
             errors (list): Error messages of any failures.
 
         """
-        errors = []
         if ip:
             ip = str(ip)
+        errors = cls._get_login_errors(username, ip)
+        if errors:
+            return None, errors
+
+        # Authenticate and get Account object
+        account = authenticate(username=username, password=password)
+        return cls._at_authenticated(account, username, ip, **kwargs)
+
+    @classmethod
+    def authenticate_async(cls, username, password, ip="", **kwargs):
+        """
+        Works like `authenticate`, but the slow password hashing is done in
+        a worker thread so as to not block the server meanwhile.
+
+        Args:
+            username (str): Username of account
+            password (str): Password of account
+            ip (str, optional): IP address of client
+
+        Keyword Args:
+            session (Session, optional): Session requesting authentication
+
+        Returns:
+            deferred (Deferred): Fires with a tuple `(account, errors)`, same
+                as what is returned by `authenticate`.
+
+        Notes:
+            Only the default authentication backend is handled off-thread.
+            With custom `settings.AUTHENTICATION_BACKENDS`, this calls
+            `authenticate` directly.
+
+            Logins still being hashed count against the login throttle of
+            their IP, so many logins sent at once can't get past it. If the
+            `HASHING_POOL` is full, the login is refused as the server being
+            busy.
+
+        """
+        if list(settings.AUTHENTICATION_BACKENDS) != [_AUTH_BACKEND]:
+            return defer.succeed(cls.authenticate(username, password, ip=ip, **kwargs))
+
+        if ip:
+            ip = str(ip)
+        errors = cls._get_login_errors(username, ip)
+        if not errors and ip:
+            # each login being hashed may yet fail
+            if len(LOGIN_THROTTLE.get(ip)) + _HASHING_LOGINS[ip] >= LOGIN_THROTTLE.limit:
+                errors.append(_("Too many login failures; please try again in a few minutes."))
+        if not errors and HASHING_POOL.full:
+            logger.log_sec(f"Authentication Refused (Server Busy): {username} (IP: {ip}).")
+            errors.append(_("The server is busy; please try again in a moment."))
+        if errors:
+            return defer.succeed((None, errors))
+
+        account = AccountDB.objects.filter(username__iexact=username).first()
+        if account:
+            deferred = account.check_password_async(password)
+        else:
+            # hash anyway, so the response time doesn't reveal if the account exists
+            deferred = HASHING_POOL.make_password(password).addCallback(lambda _: False)
+
+        def _hashed(result):
+            _HASHING_LOGINS[ip] -= 1
+            if _HASHING_LOGINS[ip] <= 0:
+                del _HASHING_LOGINS[ip]
+            return result
+
+        def _checked(valid):
+            if valid:
+                account.backend = _AUTH_BACKEND
+                return cls._at_authenticated(account, username, ip, **kwargs)
+            return cls._at_authenticated(None, username, ip, **kwargs)
+
+        def _busy(failure):
+            failure.trap(HashingPoolFull)
+            return None, [_("The server is busy; please try again in a moment.")]
+
+        if ip:
+            # count the login against the IP until its password is hashed
+            _HASHING_LOGINS[ip] += 1
+            deferred.addBoth(_hashed)
+        return deferred.addCallback(_checked).addErrback(_busy)
+
+    @classmethod
+    def _get_login_errors(cls, username, ip):
+        """
+        Check if a login is allowed at all, because of throttling or bans.
+
+        Args:
+            username (str): Username trying to log in.
+            ip (str): IP address of client.
+
+        Returns:
+            errors (list): Error messages, empty if login may proceed.
+
+        """
+        errors = []
 
         # See if authentication is currently being throttled
         if ip and LOGIN_THROTTLE.check(ip):
@@ -501,7 +602,7 @@ class DefaultAccount(AccountDB, metaclass=TypeclassBase):
             # With throttle active, do not log continued hits-- it is a
             # waste of storage and can be abused to make your logs harder to
             # read and/or fill up your disk.
-            return None, errors
+            return errors
 
         # Check IP and/or name bans
         banned = cls.is_banned(username=username, ip=ip)
@@ -515,10 +616,28 @@ class DefaultAccount(AccountDB, metaclass=TypeclassBase):
             )
             logger.log_sec(f"Authentication Denied (Banned): {username} (IP: {ip}).")
             LOGIN_THROTTLE.update(ip, "Too many sightings of banned artifact.")
-            return None, errors
+        return errors
 
-        # Authenticate and get Account object
-        account = authenticate(username=username, password=password)
+    @classmethod
+    def _at_authenticated(cls, account, username, ip, **kwargs):
+        """
+        Log and throttle the result of checking the credentials.
+
+        Args:
+            account (DefaultAccount or None): The account, if the credentials
+                were correct.
+            username (str): Username trying to log in.
+            ip (str): IP address of client.
+
+        Keyword Args:
+            session (Session, optional): Session requesting authentication
+
+        Returns:
+            account (DefaultAccount, None): The account, if authenticated.
+            errors (list): Error messages of any failures.
+
+        """
+        errors = []
         if not account:
             # User-facing message
             errors.append(_("Username and/or password is incorrect."))
@@ -651,6 +770,53 @@ class DefaultAccount(AccountDB, metaclass=TypeclassBase):
         logger.log_sec(f"Password successfully changed for {self}.")
         self.at_password_change()
 
+    def set_password_async(self, password, **kwargs):
+        """
+        Works like `set_password`, but hashes the password in a worker thread
+        so as to not block the server meanwhile. The account is saved once the
+        new password is set.
+
+        Args:
+            password (str): Password to set.
+
+        Returns:
+            deferred (Deferred): Fires (with None) when the password is set.
+
+        """
+
+        def _hashed(encoded):
+            # this is what Django's set_password does, minus the hashing
+            self.password = encoded
+            self._password = password
+            logger.log_sec(f"Password successfully changed for {self}.")
+            self.at_password_change()
+            self.save()
+
+        return HASHING_POOL.make_password(password).addCallback(_hashed)
+
+    def check_password_async(self, password):
+        """
+        Works like `check_password`, but hashes the password in a worker
+        thread so as to not block the server meanwhile. If the stored hash is
+        outdated, it is upgraded, same as with `check_password`.
+
+        Args:
+            password (str): Password to check.
+
+        Returns:
+            deferred (Deferred): Fires with True if the password was correct.
+
+        """
+
+        def _checked(result):
+            valid, new_encoded = result
+            if valid and new_encoded:
+                self.password = new_encoded
+                self.save(update_fields=["password"])
+            return valid
+
+        return HASHING_POOL.check_password(password, self.password).addCallback(_checked)
+
     def create_character(self, *args, **kwargs):
         """
         Create a character linked to this account.
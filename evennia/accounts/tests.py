@@ -140,6 +140,79 @@ class TestDefaultAccountAuth(EvenniaTest):
         obj, errors = DefaultAccount.authenticate(self.account.name, "xyzzy")
         self.assertFalse(obj, "Account authenticated using invalid credentials.")
 
+    def test_authentication_async(self):
+        "Confirm the off-thread authentication gives the same results."
+        from evennia.server.hashing import HASHING_POOL
+
+        results = []
+        ncalls = HASHING_POOL.ncalls
+        for name, password in (
+            (self.account.name, self.password),
+            (self.account.name.upper(), self.password),
+            (self.account.name, "xyzzy"),
+            ("NoSuchAccount", "xyzzy"),
+        ):
+            DefaultAccount.authenticate_async(name, password, ip="12.24.36.49").addCallback(
+                results.append
+            )
+        self.assertEqual([account for account, errors in results], [self.account] * 2 + [None] * 2)
+        self.assertEqual(HASHING_POOL.ncalls, ncalls + 4)
+        self.assertEqual(HASHING_POOL.nwaiting, 0)
+        # failures count towards the login throttle
+        for x in range(5):
+            DefaultAccount.authenticate_async(
+                self.account.name, "xyzzy", ip="12.24.36.49"
+            ).addCallback(results.append)
+        self.assertIn("too many login failures", results[-1][1][0].lower())
+        self.assertEqual(HASHING_POOL.ncalls, ncalls + 7)
+
+    def test_authentication_async_flood(self):
+        "Logins being hashed count towards the throttle, and a full pool refuses logins"
+        from twisted.internet import defer
+        from evennia.accounts.accounts import LOGIN_THROTTLE
+        from evennia.server.hashing import HASHING_POOL, HashingPool, HashingPoolFull
+
+        pending, results, ip = [], [], "12.24.36.50"
+
+        def _hash(*args):
+            pending.append(defer.Deferred())
+            return pending[-1]
+
+        with patch.object(HASHING_POOL, "check_password", _hash):
+            for x in range(7):
+                DefaultAccount.authenticate_async(self.account.name, "xyzzy", ip=ip).addCallback(
+                    results.append
+                )
+        self.assertEqual(len(pending), settings.LOGIN_THROTTLE_LIMIT)
+        self.assertEqual(len(results), 2)
+        self.assertIn("too many login failures", results[0][1][0].lower())
+        for deferred in pending:
+            deferred.callback((False, None))
+        self.assertEqual(len(results), 7)
+        self.assertTrue(LOGIN_THROTTLE.check(ip))
+        del LOGIN_THROTTLE.storage[ip]
+
+        with patch.object(HASHING_POOL, "nwaiting", HASHING_POOL.maxqueue):
+            DefaultAccount.authenticate_async(self.account.name, self.password).addCallback(
+                results.append
+            )
+        self.assertEqual(results[-1][0], None)
+        self.assertIn("busy", results[-1][1][0])
+        pool = HashingPool(maxqueue=1)
+        pool.nwaiting = 1
+        pool.make_password("xyzzy").addErrback(lambda failure: results.append(failure.type))
+        self.assertEqual(results[-1], HashingPoolFull)
+        self.assertEqual(pool.get_stats()["rejected"], 1)
+
+    def test_password_change_async(self):
+        "Check password setting and checking off-thread"
+        results = []
+        self.account.set_password_async("Mxyzptlk").addCallback(results.append)
+        self.account.check_password_async("Mxyzptlk").addCallback(results.append)
+        self.account.check_password_async(self.password).addCallback(results.append)
+        self.assertEqual(results, [None, True, False])
+        self.assertTrue(self.account.check_password("Mxyzptlk"))
+
     def test_create(self):
         "Confirm Account creation is working as expected."
         # Create a normal account
@@ -38,15 +38,17 @@ from weakref import WeakValueDictionary
 from traceback import format_exc
 from itertools import chain
 from copy import copy
+from functools import wraps
 import types
 from twisted.internet import reactor
 from twisted.internet.task import deferLater
 from twisted.internet.defer import inlineCallbacks, returnValue
 from django.conf import settings
 from evennia.commands.command import InterruptCommand
+from evennia.commands.cmdstats import CMD_STATS
 from evennia.comms.channelhandler import CHANNELHANDLER
+from evennia.locks.lockhandler import LockCache
 from evennia.utils import logger, utils
-from evennia.utils.utils import string_suggestions
 
 from django.utils.translation import gettext as _
 
@@ -511,6 +513,24 @@ def get_and_merge_cmdsets(caller, session, account, obj, callertype, raw_string)
 # Main command-handler function
 
 
+def _lock_cached(func):
+    """
+    Decorator running each command with its own `LockCache`. For the
+    `inlineCallbacks` cmdhandler, this covers the command until it first
+    waits for a Deferred; lock checks after that aren't cached, since other
+    code may have run and changed things in the meantime.
+
+    """
+
+    @wraps(func)
+    def _wrapper(*args, **kwargs):
+        with LockCache():
+            return func(*args, **kwargs)
+
+    return _wrapper
+
+
+@_lock_cached
 @inlineCallbacks
 def cmdhandler(
     called_by,
@@ -621,6 +641,10 @@ def cmdhandler(
             for key, val in kwargs.items():
                 setattr(cmd, key, val)
 
+            if timer:
+                timer.key = cmd.key
+                timer.lap("parse")
+
             _COMMAND_NESTING[called_by] += 1
             if _COMMAND_NESTING[called_by] > _COMMAND_RECURSION_LIMIT:
                 err = _ERROR_RECURSION_LIMIT.format(
@@ -632,12 +656,16 @@ def cmdhandler(
 
             # pre-command hook
             abort = yield cmd.at_pre_cmd()
+            if timer:
+                timer.lap("at_pre_cmd")
             if abort:
                 # abort sequence
                 returnValue(abort)
 
             # Parse and execute
             yield cmd.parse()
+            if timer:
+                timer.lap("parse")
 
             # main command code
             # (return value is normally None)
@@ -646,6 +674,8 @@ def cmdhandler(
                 # cmd.func() is a generator, execute progressively
                 _progressive_cmd_run(cmd, ret)
                 ret = yield ret
+                if timer:
+                    timer.lap("func")
                 # note that the _progressive_cmd_run will itself run
                 # the at_post_cmd etc as it finishes; this is a bit of
                 # code duplication but there seems to be no way to
@@ -653,6 +683,8 @@ def cmdhandler(
                 # frame since this is in a deferred chain)
             else:
                 ret = yield ret
+                if timer:
+                    timer.lap("func")
                 # post-command hook
                 yield cmd.at_post_cmd()
 
@@ -662,6 +694,8 @@ def cmdhandler(
                     caller.ndb.last_cmd = yield copy(cmd)
                 else:
                     caller.ndb.last_cmd = None
+                if timer:
+                    timer.lap("at_post_cmd")
 
             # return result to the deferred
             returnValue(ret)
@@ -694,6 +728,8 @@ def cmdhandler(
     # The error_to is the default recipient for errors. Tries to make sure an account
     # does not get spammed for errors while preserving character mirroring.
     error_to = obj or session or account
+    # time the command for the command statistics
+    timer = None if _testing else CMD_STATS.start()
 
     try:  # catch bugs in cmdhandler itself
         try:  # catch special-type commands
@@ -713,6 +749,8 @@ def cmdhandler(
                 cmdset = yield get_and_merge_cmdsets(
                     caller, session, account, obj, callertype, raw_string
                 )
+                if timer:
+                    timer.lap("merge")
                 if not cmdset:
                     # this is bad and shouldn't happen.
                     raise NoCmdSets
@@ -763,11 +801,8 @@ def cmdhandler(
                         sysarg = _("Command '{command}' is not available.").format(
                             command=raw_string
                         )
-                        suggestions = string_suggestions(
-                            raw_string,
-                            cmdset.get_all_cmd_keys_and_aliases(caller),
-                            cutoff=0.7,
-                            maxnum=3,
+                        suggestions = cmdset.get_cmd_suggestions(
+                            raw_string, caller, cutoff=0.7, maxnum=3
                         )
                         if suggestions:
                             sysarg += _(" Maybe you meant {command}?").format(
@@ -825,3 +860,7 @@ def cmdhandler(
     except Exception:
         # This catches exceptions in cmdhandler exceptions themselves
         _msg_err(error_to, _ERROR_CMDHANDLER)
+
+    finally:
+        if timer:
+            timer.finish(caller)
@@ -26,9 +26,10 @@ Set theory.
     to affect the low-priority cmdset.  Ex: A1,A3 + B1,B2,B4,B5 = B2,B4,B5
 
 """
+from collections import defaultdict
 from weakref import WeakKeyDictionary
 from django.utils.translation import gettext as _
-from evennia.utils.utils import inherits_from, is_iter
+from evennia.utils.utils import inherits_from, is_iter, StringSuggester
 
 __all__ = ("CmdSet",)
 
@@ -668,6 +669,44 @@ class CmdSet(object, metaclass=_CmdSetMeta):
             [names.extend(cmd._keyaliases) for cmd in self.commands]
         return names
 
+    def get_cmd_suggestions(self, string, caller=None, cutoff=0.6, maxnum=3):
+        """
+        Suggest command keys/aliases similar to a string, such as for a
+        mistyped command.
+
+        Args:
+            string (str): The string to find similar command names to.
+            caller (Object, optional): If set, only names of commands to
+                which `caller` passes the `call` locktype check are suggested.
+            cutoff (float, optional): How similar (0..1) a name must be to
+                be suggested.
+            maxnum (int, optional): Max number of suggestions.
+
+        Returns:
+            suggestions (list): Command keys/aliases, most similar first.
+
+        Notes:
+            The string-similarity data for the commands is computed once
+            and reused until the commands of the cmdset change.
+
+        """
+        names = tuple(self.get_all_cmd_keys_and_aliases())
+        cached = getattr(self, "_suggester", None)
+        if not cached or cached[0] != names:
+            cmds_by_name = defaultdict(list)
+            for cmd in self.commands:
+                for name in cmd._keyaliases:
+                    cmds_by_name[name].append(cmd)
+            cached = self._suggester = (names, StringSuggester(names), cmds_by_name)
+        _, suggester, cmds_by_name = cached
+        suggestions = []
+        for _, name in suggester.rank(string, cutoff=cutoff):
+            if len(suggestions) >= maxnum:
+                break
+            if not caller or any(cmd.access(caller) for cmd in cmds_by_name[name]):
+                suggestions.append(name)
+        return suggestions
+
     def at_cmdset_creation(self):
         """
         Hook method - this should be overloaded in the inheriting
@@ -0,0 +1,372 @@
+"""
+Command statistics
+
+The cmdhandler records how long every command takes to run and how many
+database queries it makes, so slow commands can be found on a running
+server without attaching a profiler. The time of each command is split
+into phases:
+
+- `merge` - getting and merging the cmdsets of the caller.
+- `parse` - matching the input to a command, setting up the command and
+  running its `parse` method.
+- `at_pre_cmd`, `func` and `at_post_cmd` - the command's hooks. For
+  commands that `yield`, `func` only covers the code up to the first
+  `yield`. The rest runs later, after the delay or input asked for, and is
+  not timed.
+
+The statistics are kept in memory per command key. The total and database
+time of each command are kept as streaming histograms, so percentiles can
+be estimated without storing every call.
+
+Database queries are counted by a Django execute wrapper and are credited
+to the command that ran most recently. A command that waits for a Deferred
+can have queries run in the meantime by other code credited to it, so the
+query counts are a good guide, not an exact count.
+
+Settings:
+
+- `COMMAND_STATS` - turn the recording on/off.
+- `COMMAND_STATS_SLOW_THRESHOLD`/`COMMAND_STATS_SLOW_LOG` - commands taking
+  longer than the threshold (in seconds) are logged to this log file. Only
+  the command key and the caller are logged, never the input, since that
+  may contain passwords.
+- `COMMAND_STATS_EXPORT_HOOK`/`COMMAND_STATS_EXPORT_INTERVAL` - a callable
+  called with the output of `CMD_STATS.export()` at this interval.
+
+The statistics are viewed in-game with `server/cmdstats`.
+
+"""
+
+import math
+import time
+from django.conf import settings
+from django.db import connection
+from twisted.internet import task
+from evennia.utils import logger
+from evennia.utils.utils import variable_from_module
+
+_ENABLED = settings.COMMAND_STATS
+_SLOW_THRESHOLD = settings.COMMAND_STATS_SLOW_THRESHOLD
+_SLOW_LOG = settings.COMMAND_STATS_SLOW_LOG
+_EXPORT_HOOK = settings.COMMAND_STATS_EXPORT_HOOK
+_EXPORT_INTERVAL = settings.COMMAND_STATS_EXPORT_INTERVAL
+
+PHASES = ("merge", "parse", "at_pre_cmd", "func", "at_post_cmd")
+
+# histogram buckets grow by 2**0.25 (~19%) from 10 microseconds upwards
+_HIST_MIN = 1e-5
+_HIST_SCALE = 4 / math.log(2)
+_HIST_MAX_BUCKET = 120
+
+
+class StreamingHistogram(object):
+    """
+    A fixed-size histogram of durations. Values are counted in buckets
+    of exponentially increasing size, so percentiles can be estimated
+    within ~19% without storing the values.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = {}
+
+    def add(self, value):
+        """
+        Add a value to the histogram.
+
+        Args:
+            value (float): A duration, in seconds.
+
+        """
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if value <= _HIST_MIN:
+            ibucket = 0
+        else:
+            ibucket = min(
+                _HIST_MAX_BUCKET, int(math.ceil(math.log(value / _HIST_MIN) * _HIST_SCALE))
+            )
+        self.buckets[ibucket] = self.buckets.get(ibucket, 0) + 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """
+        Estimate a percentile of the values.
+
+        Args:
+            percent (float): The percentile, between 0 and 100.
+
+        Returns:
+            value (float): The upper bound of the bucket holding the
+                percentile (but never more than the max value).
+
+        """
+        if not self.count:
+            return 0.0
+        limit = self.count * percent / 100.0
+        nvalues = 0
+        for ibucket in sorted(self.buckets):
+            nvalues += self.buckets[ibucket]
+            if nvalues >= limit:
+                break
+        return min(self.max, _HIST_MIN * 2 ** (ibucket / 4))
+
+
+class CommandRecord(object):
+    """
+    The statistics of one command key.
+
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.time = StreamingHistogram()
+        self.db_time = StreamingHistogram()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.nqueries = 0
+        self.max_queries = 0
+
+    def export(self):
+        """
+        Get the statistics as a dict.
+
+        Returns:
+            stats (dict): With keys `calls`, `time` (total seconds),
+                `time_avg`, `time_p50`, `time_p95`, `time_p99`, `time_max`,
+                `queries` (total), `queries_max`, `db_time` (total seconds),
+                `db_time_max` and `phases` (a dict of the total seconds spent
+                in each phase).
+
+        """
+        hist = self.time
+        return {
+            "calls": hist.count,
+            "time": hist.total,
+            "time_avg": hist.mean,
+            "time_p50": hist.percentile(50),
+            "time_p95": hist.percentile(95),
+            "time_p99": hist.percentile(99),
+            "time_max": hist.max,
+            "queries": self.nqueries,
+            "queries_max": self.max_queries,
+            "db_time": self.db_time.total,
+            "db_time_max": self.db_time.max,
+            "phases": dict(self.phases),
+        }
+
+
+class CommandTimer(object):
+    """
+    Times the phases of one run of the cmdhandler.
+
+    """
+
+    __slots__ = (
+        "stats",
+        "previous",
+        "last",
+        "start",
+        "phases",
+        "nqueries",
+        "db_time",
+        "key",
+        "finished",
+    )
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.previous = stats.current
+        self.start = self.last = time.perf_counter()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.nqueries = 0
+        self.db_time = 0.0
+        # set once a command has been found
+        self.key = None
+        self.finished = False
+        stats.current = self
+
+    def lap(self, phase):
+        """
+        Add the time since the last lap to a phase. This also makes this
+        timer the one database queries are credited to, since the
+        cmdhandler may have waited for other code since the last lap.
+
+        Args:
+            phase (str): One of `PHASES`.
+
+        """
+        now = time.perf_counter()
+        self.phases[phase] += now - self.last
+        self.last = now
+        self.stats.current = self
+
+    def finish(self, caller=None):
+        """
+        Record the timings, if a command was run.
+
+        Args:
+            caller (Object, Account or Session, optional): Who ran the command,
+                for the slow-command log.
+
+        """
+        self.finished = True
+        if self.stats.current is self:
+            # queries now go back to the command that called this one, if any,
+            # skipping those that have finished in the meantime
+            previous = self.previous
+            while previous is not None and previous.finished:
+                previous = previous.previous
+            self.stats.current = previous
+        if self.key is not None:
+            self.stats.record(self, time.perf_counter() - self.start, caller)
+
+
+class CommandStats(object):
+    """
+    Collects the statistics of all commands.
+
+    """
+
+    def __init__(self, enabled=_ENABLED, slow_threshold=_SLOW_THRESHOLD):
+        """
+        Args:
+            enabled (bool, optional): If recording statistics at all.
+            slow_threshold (float, optional): Log commands taking longer
+                than this many seconds. None to not log.
+
+        """
+        self.enabled = enabled
+        self.slow_threshold = slow_threshold
+        self.records = {}
+        # the timer database queries are credited to
+        self.current = None
+        self.started = time.time()
+        self.export_task = None
+
+    def reset(self):
+        """
+        Clear all statistics.
+
+        """
+        self.records = {}
+        self.started = time.time()
+
+    def start(self):
+        """
+        Start timing a run of the cmdhandler.
+
+        Returns:
+            timer (CommandTimer or None): The timer, or None if statistics
+                are turned off.
+
+        """
+        if not self.enabled:
+            return None
+        if self._execute_wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self._execute_wrapper)
+        return CommandTimer(self)
+
+    def _execute_wrapper(self, execute, sql, params, many, context):
+        """
+        Django execute wrapper counting queries for the current command.
+
+        """
+        timer = self.current
+        if timer is None:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timer.nqueries += 1
+            timer.db_time += time.perf_counter() - started
+
+    def record(self, timer, elapsed, caller=None):
+        """
+        Add the timings of a finished command.
+
+        Args:
+            timer (CommandTimer): The finished timer.
+            elapsed (float): Total seconds from start to finish.
+            caller (any, optional): Who ran the command.
+
+        """
+        key = timer.key
+        try:
+            record = self.records[key]
+        except KeyError:
+            record = self.records[key] = CommandRecord(key)
+        record.time.add(elapsed)
+        record.db_time.add(timer.db_time)
+        phases = record.phases
+        for phase, duration in timer.phases.items():
+            phases[phase] += duration
+        record.nqueries += timer.nqueries
+        if timer.nqueries > record.max_queries:
+            record.max_queries = timer.nqueries
+
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            logger.log_file(
+                "Slow command '%s' by %s: %.3fs (%s; %i queries in %.3fs)"
+                % (
+                    key,
+                    caller,
+                    elapsed,
+                    ", ".join(
+                        "%s %.3fs" % (phase, timer.phases[phase])
+                        for phase in PHASES
+                        if timer.phases[phase]
+                    ),
+                    timer.nqueries,
+                    timer.db_time,
+                ),
+                filename=_SLOW_LOG,
+            )
+
+    def export(self):
+        """
+        Get all statistics.
+
+        Returns:
+            stats (dict): Mapping each command key to the dict returned by
+                `CommandRecord.export`.
+
+        """
+        return {key: record.export() for key, record in self.records.items()}
+
+    def start_export(self, hook=_EXPORT_HOOK, interval=_EXPORT_INTERVAL):
+        """
+        Start calling the export hook at regular intervals.
+
+        Args:
+            hook (callable or str, optional): Called as `hook(stats)` with
+                the output of `export`. May be given as a python path.
+            interval (int, optional): Seconds between calls.
+
+        """
+        if not hook:
+            return
+        if isinstance(hook, str):
+            hook = variable_from_module(*hook.rsplit(".", 1))
+        if self.export_task and self.export_task.running:
+            self.export_task.stop()
+
+        def _export():
+            try:
+                hook(self.export())
+            except Exception:
+                logger.log_trace("Error in COMMAND_STATS_EXPORT_HOOK.")
+
+        self.export_task = task.LoopingCall(_export)
+        self.export_task.start(interval, now=False)
+
+
+CMD_STATS = CommandStats()
@@ -22,6 +22,7 @@ import time
 from codecs import lookup as codecs_lookup
 from django.conf import settings
 from evennia.server.sessionhandler import SESSIONS
+from evennia.server.hashing import HashingPoolFull
 from evennia.utils import utils, create, logger, search
 
 COMMAND_DEFAULT_CLASS = utils.class_from_module(settings.COMMAND_DEFAULT_CLASS)
@@ -751,21 +752,30 @@ class CmdPassword(COMMAND_DEFAULT_CLASS):
         # Validate password
         validated, error = account.validate_password(newpass)
 
-        if not account.check_password(oldpass):
-            self.msg("The specified old password isn't correct.")
-        elif not validated:
-            errors = [e for suberror in error.messages for e in error.messages]
-            string = "\n".join(errors)
-            self.msg(string)
-        else:
-            account.set_password(newpass)
-            account.save()
+        def _changed(_):
             self.msg("Password changed.")
             logger.log_sec(
                 "Password Changed: %s (Caller: %s, IP: %s)."
                 % (account, account, self.session.address)
             )
 
+        def _checked(valid):
+            if not valid:
+                self.msg("The specified old password isn't correct.")
+            elif not validated:
+                errors = [e for suberror in error.messages for e in error.messages]
+                string = "\n".join(errors)
+                self.msg(string)
+            else:
+                return account.set_password_async(newpass).addCallback(_changed)
+
+        def _busy(failure):
+            failure.trap(HashingPoolFull)
+            self.msg("The server is busy; please try again in a moment.")
+
+        # password hashing is slow, so it's done off the main thread
+        return account.check_password_async(oldpass).addCallback(_checked).addErrback(_busy)
+
 
 class CmdQuit(COMMAND_DEFAULT_CLASS):
     """
@@ -11,6 +11,7 @@ from collections import defaultdict
 from evennia.utils.utils import fill, dedent
 from evennia.commands.command import Command
 from evennia.help.models import HelpEntry
+from evennia.help.helpindex import HELP_INDEX
 from evennia.utils import create, evmore
 from evennia.utils.eveditor import EvEditor
 from evennia.utils.utils import string_suggestions, class_from_module
@@ -203,9 +204,7 @@ class CmdHelp(Command):
 
         # retrieve all available commands and database topics
         all_cmds = [cmd for cmd in cmdset if self.check_show_help(cmd, caller)]
-        all_topics = [
-            topic for topic in HelpEntry.objects.all() if topic.access(caller, "view", default=True)
-        ]
+        all_topics = HELP_INDEX.get_visible(caller)
         all_categories = list(
             set(
                 [cmd.help_category.lower() for cmd in all_cmds]
@@ -280,7 +279,7 @@ class CmdHelp(Command):
             return
 
         # try an exact database help entry match
-        match = list(HelpEntry.objects.find_topicmatch(query, exact=True))
+        match = HELP_INDEX.find(query, caller)
         if len(match) == 1:
             formatted = self.format_help_entry(
                 match[0].key,
@@ -444,6 +443,7 @@ class CmdSetHelp(COMMAND_DEFAULT_CLASS):
             else:
                 old_entry.entrytext += "\n%s" % self.rhs
             old_entry.aliases.add(aliases)
+            HELP_INDEX.update(old_entry)
             self.msg("Entry updated:\n%s%s" % (old_entry.entrytext, aliastxt))
             return
         if "delete" in switches or "del" in switches:
@@ -18,6 +18,8 @@ import time
 from django.conf import settings
 from django.core.paginator import Paginator
 from evennia.server.sessionhandler import SESSIONS
+from evennia.server.watchdog import REACTOR_WATCHDOG
+from evennia.locks.lockhandler import get_lock_cache_stats
 from evennia.scripts.models import ScriptDB
 from evennia.objects.models import ObjectDB
 from evennia.accounts.models import AccountDB
@@ -973,10 +975,14 @@ class CmdServerLoad(COMMAND_DEFAULT_CLASS):
 
     Usage:
        server[/mem]
+       server/cmdstats [<command key> || reset]
 
     Switches:
         mem - return only a string of the current memory usage
         flushmem - flush the idmapper cache
+        cmdstats - show time and database use per command, or the
+                   details of one command. With 'reset', clear the
+                   command statistics.
 
     This command shows server load statistics and dynamic memory
     usage. It also allows to flush the cache of accessed database
@@ -1002,11 +1008,27 @@ class CmdServerLoad(COMMAND_DEFAULT_CLASS):
     caches may not show you a lower Residual/Virtual memory footprint,
     the released memory will instead be re-used by the program.
 
+    The |wReactor lag|n is how late the server is in doing timed tasks,
+    as it's busy running other code. All code runs one thing at a time, so
+    stalls (high lag) are felt by all players as delays. The stack of
+    each stall is logged in the log file settings.REACTOR_STALL_LOG.
+
+    The |wLock cache|n shows how many lock checks were answered from the
+    results remembered while running commands, and how often the cache
+    was emptied by database changes (see settings.LOCK_CACHE).
+
+    The |wcmdstats|n switch lists the commands run since the last reload
+    (or reset), with how often they were called, their average, 95th
+    percentile and max time (in milliseconds), the share of all command
+    time spent on them, and their average number of database queries and
+    time. Commands slower than settings.COMMAND_STATS_SLOW_THRESHOLD
+    are also logged in the log file settings.COMMAND_STATS_SLOW_LOG.
+
     """
 
     key = "server"
     aliases = ["serverload", "serverprocess"]
-    switch_options = ("mem", "flushmem")
+    switch_options = ("mem", "flushmem", "cmdstats")
     locks = "cmd:perm(list) or perm(Developer)"
     help_category = "System"
 
@@ -1029,6 +1051,10 @@ class CmdServerLoad(COMMAND_DEFAULT_CLASS):
             self.caller.msg(string.format(idmapper=(prev - now), gc=nflushed))
             return
 
+        if "cmdstats" in self.switches:
+            self.show_cmdstats()
+            return
+
         # display active processes
 
         os_windows = os.name == "nt"
@@ -1123,6 +1149,39 @@ class CmdServerLoad(COMMAND_DEFAULT_CLASS):
 
         string = "|wServer CPU and Memory load:|n\n%s" % loadtable
 
+        if REACTOR_WATCHDOG.running:
+            lagstats = REACTOR_WATCHDOG.get_stats()
+            string += (
+                "\n|wReactor lag|n (ms) 50%%: %.1f, 95%%: %.1f, 99%%: %.1f, max: %.1f. "
+                "|w%i|n stalls over %gs."
+                % (
+                    lagstats["lag_p50"] * 1000,
+                    lagstats["lag_p95"] * 1000,
+                    lagstats["lag_p99"] * 1000,
+                    lagstats["lag_max"] * 1000,
+                    lagstats["stalls"],
+                    REACTOR_WATCHDOG.threshold,
+                )
+            )
+            for timestamp, lag, context in lagstats["last_stalls"][-5:]:
+                string += "\n  %s stalled %.2fs in %s" % (
+                    logger.timeformat(timestamp),
+                    lag,
+                    context,
+                )
+
+        if settings.LOCK_CACHE:
+            lockstats = get_lock_cache_stats()
+            string += (
+                "\n|wLock cache|n: %i hits, %i misses (%.1f%% hit rate), emptied %i times."
+                % (
+                    lockstats["hits"],
+                    lockstats["misses"],
+                    lockstats["hit_rate"] * 100,
+                    lockstats["clears"],
+                )
+            )
+
         # object cache count (note that sys.getsiseof is not called so this works for pypy too.
         total_num, cachedict = _IDMAPPER.cache_size()
         sorted_cache = sorted(
@@ -1139,6 +1198,87 @@ class CmdServerLoad(COMMAND_DEFAULT_CLASS):
         # return to caller
         self.caller.msg(string)
 
+    def show_cmdstats(self):
+        """
+        Show the command statistics.
+
+        """
+        from evennia.commands.cmdstats import CMD_STATS, PHASES
+
+        caller = self.caller
+        if not CMD_STATS.enabled:
+            caller.msg("Command statistics are turned off (settings.COMMAND_STATS).")
+            return
+        args = self.args.strip()
+        if args == "reset":
+            CMD_STATS.reset()
+            caller.msg("Command statistics were reset.")
+            return
+
+        stats = CMD_STATS.export()
+        since = utils.time_format(time.time() - CMD_STATS.started, 2)
+        if args:
+            if args not in stats:
+                caller.msg("No statistics for a command '%s'." % args)
+                return
+            cmdstats = stats[args]
+            ncalls = cmdstats["calls"]
+            table = self.styled_table("property", "value", align="l")
+            table.add_row("Calls", ncalls)
+            for label, key in (
+                ("Time avg", "time_avg"),
+                ("Time 50%", "time_p50"),
+                ("Time 95%", "time_p95"),
+                ("Time 99%", "time_p99"),
+                ("Time max", "time_max"),
+            ):
+                table.add_row(label, "%.2f ms" % (cmdstats[key] * 1000))
+            for phase in PHASES:
+                table.add_row(
+                    "  %s avg" % phase, "%.2f ms" % (cmdstats["phases"][phase] / ncalls * 1000)
+                )
+            table.add_row(
+                "DB queries avg/max",
+                "%.1f / %i" % (cmdstats["queries"] / ncalls, cmdstats["queries_max"]),
+            )
+            table.add_row(
+                "DB time avg/max",
+                "%.2f / %.2f ms"
+                % (cmdstats["db_time"] / ncalls * 1000, cmdstats["db_time_max"] * 1000),
+            )
+            caller.msg("|wStatistics of command '%s' (last %s):|n\n%s" % (args, since, table))
+            return
+
+        if not stats:
+            caller.msg("No commands have been run since the statistics were started.")
+            return
+        total = sum(cmdstats["time"] for cmdstats in stats.values()) or 1.0
+        table = self.styled_table(
+            "|wcommand",
+            "|wcalls",
+            "|wavg ms",
+            "|w95% ms",
+            "|wmax ms",
+            "|w% time",
+            "|wqueries",
+            "|wdb ms",
+            align="r",
+        )
+        for key, cmdstats in sorted(stats.items(), key=lambda tup: tup[1]["time"], reverse=True):
+            ncalls = cmdstats["calls"]
+            table.add_row(
+                key,
+                ncalls,
+                "%.2f" % (cmdstats["time_avg"] * 1000),
+                "%.2f" % (cmdstats["time_p95"] * 1000),
+                "%.2f" % (cmdstats["time_max"] * 1000),
+                "%.1f" % (cmdstats["time"] / total * 100),
+                "%.1f" % (cmdstats["queries"] / ncalls),
+                "%.2f" % (cmdstats["db_time"] / ncalls * 1000),
+            )
+        table.reformat_column(0, align="l")
+        caller.msg("|wCommand statistics (last %s):|n\n%s" % (since, table))
+
 
 class CmdTickers(COMMAND_DEFAULT_CLASS):
     """
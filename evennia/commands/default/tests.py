@@ -17,7 +17,7 @@ import datetime
 from anything import Anything
 
 from django.conf import settings
-from unittest.mock import patch, Mock, MagicMock
+from unittest.mock import patch, Mock, MagicMock, PropertyMock
 
 from evennia import DefaultRoom, DefaultExit, ObjectDB
 from evennia.commands.default.cmdset_character import CharacterCmdSet
@@ -39,7 +39,7 @@ from evennia.commands.default.muxcommand import MuxCommand
 from evennia.commands.command import Command, InterruptCommand
 from evennia.commands import cmdparser
 from evennia.commands.cmdset import CmdSet
-from evennia.utils import ansi, utils, gametime
+from evennia.utils import ansi, utils, gametime, create
 from evennia.server.sessionhandler import SESSIONS
 from evennia import search_object
 from evennia import DefaultObject, DefaultCharacter
@@ -273,9 +273,25 @@ class TestGeneral(CommandTest):
 
 
 class TestHelp(CommandTest):
+    def setUp(self):
+        super().setUp()
+        # the index may hold entries of earlier tests
+        help.HELP_INDEX.clear()
+
     def test_help(self):
         self.call(help.CmdHelp(), "", "Command help entries", cmdset=CharacterCmdSet())
 
+    def test_help_locked_topic(self):
+        create.create_help_entry("staffrules", "Be courteous.", locks="view:perm(Admin)")
+        self.call(help.CmdHelp(), "staffrules", "Help for staffrules", cmdset=CharacterCmdSet())
+        self.call(
+            help.CmdHelp(),
+            "staffrules",
+            "No help entry found for 'staffrules'",
+            cmdset=CharacterCmdSet(),
+            caller=self.char2,
+        )
+
     def test_set_help(self):
         self.call(
             help.CmdSetHelp(),
@@ -303,6 +319,11 @@ class TestSystem(CommandTest):
 
     def test_server_load(self):
         self.call(system.CmdServerLoad(), "", "Server CPU and Memory load:")
+        with patch.object(
+            type(system.REACTOR_WATCHDOG), "running", new_callable=PropertyMock, return_value=True
+        ):
+            ret = self.call(system.CmdServerLoad(), "", "Server CPU and Memory load:")
+            self.assertIn("Reactor lag (ms) 50%: 0.0", ret)
 
 
 class TestAdmin(CommandTest):
@@ -141,13 +141,21 @@ class CmdUnconnectedConnect(COMMAND_DEFAULT_CLASS):
         Account = class_from_module(settings.BASE_ACCOUNT_TYPECLASS)
 
         name, password = parts
-        account, errors = Account.authenticate(
+
+        def _authenticated(result):
+            account, errors = result
+            if session.logged_in or session.sessid not in session.sessionhandler:
+                # logged in by another connect, or disconnected while we waited
+                return
+            if account:
+                session.sessionhandler.login(session, account)
+            else:
+                session.msg("|R%s|n" % "\n".join(errors))
+
+        # the password check is slow, so it's done off the main thread
+        return Account.authenticate_async(
             username=name, password=password, ip=address, session=session
-        )
-        if account:
-            session.sessionhandler.login(session, account)
-        else:
-            session.msg("|R%s|n" % "\n".join(errors))
+        ).addCallback(_authenticated)
 
 
 class CmdUnconnectedCreate(COMMAND_DEFAULT_CLASS):
@@ -3,6 +3,7 @@ Unit testing for the Command system itself.
 
 """
 
+from unittest.mock import patch
 from django.test import override_settings
 from evennia.utils.test_resources import EvenniaTest, TestCase
 from evennia.commands.cmdset import CmdSet
@@ -1199,3 +1200,83 @@ class TestCmdParser(TestCase):
             cmdparser.cmdparser("test1hello", a_cmdset, None),
             [("test1", "hello", bcmd, 5, 0.5, "test1")],
         )
+
+
+class TestCmdSuggestions(TestCase):
+    def test_get_cmd_suggestions(self):
+        cmdset = _CmdSetTest()
+        cmdset.add(_CmdTest4)
+        self.assertEqual(cmdset.get_cmd_suggestions("tset1"), ["test1", "test2"])
+        self.assertEqual(cmdset.get_cmd_suggestions("tset1", maxnum=1), ["test1"])
+        suggester = cmdset._suggester[1]
+        # no access to test1
+        with patch.object(_CmdTest1, "access", return_value=False):
+            self.assertEqual(cmdset.get_cmd_suggestions("tset1", caller=object()), ["test2"])
+        self.assertIs(cmdset._suggester[1], suggester)
+        # the suggester is rebuilt when the cmdset changes
+        cmdset.remove(_CmdTest4)
+        self.assertEqual(cmdset.get_cmd_suggestions("tset1"), ["test1"])
+
+
+from evennia.commands import cmdstats
+
+
+class TestCommandStats(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.stats = cmdstats.CommandStats(enabled=True, slow_threshold=None)
+
+    def test_histogram(self):
+        hist = cmdstats.StreamingHistogram()
+        for _ in range(90):
+            hist.add(0.001)
+        for _ in range(10):
+            hist.add(0.1)
+        self.assertEqual(hist.count, 100)
+        self.assertAlmostEqual(hist.mean, 0.0109)
+        self.assertTrue(0.001 <= hist.percentile(50) < 0.0012)
+        self.assertEqual(hist.percentile(95), 0.1)
+        self.assertEqual(cmdstats.StreamingHistogram().percentile(50), 0.0)
+
+    def test_cmdhandler(self):
+        with patch.object(cmdhandler, "CMD_STATS", self.stats):
+            self.char1.execute_cmd("look")
+            self.char1.execute_cmd("look here")
+            self.char1.execute_cmd("nonexistingcommand")
+        self.assertEqual(list(self.stats.records), ["look"])
+        stats = self.stats.export()["look"]
+        self.assertEqual(stats["calls"], 2)
+        self.assertTrue(all(stats["phases"][phase] > 0 for phase in cmdstats.PHASES))
+        self.assertAlmostEqual(sum(stats["phases"].values()), stats["time"], places=3)
+        self.assertIsNone(self.stats.current)
+
+    def test_queries(self):
+        timer = self.stats.start()
+        list(self.char1.__class__.objects.all())
+        timer.key = "test"
+        timer.finish()
+        self.assertIsNone(self.stats.current)
+        list(self.char1.__class__.objects.all())
+        stats = self.stats.export()["test"]
+        self.assertEqual((stats["queries"], stats["queries_max"]), (1, 1))
+        self.assertGreater(stats["db_time"], 0)
+
+    def test_overlapping_timers(self):
+        outer = self.stats.start()
+        first = self.stats.start()
+        second = self.stats.start()
+        first.finish()
+        self.assertIs(self.stats.current, second)
+        second.finish()
+        self.assertIs(self.stats.current, outer)
+        outer.finish()
+        self.assertIsNone(self.stats.current)
+
+    def test_slow_log(self):
+        self.stats.slow_threshold = 0
+        with patch.object(cmdhandler, "CMD_STATS", self.stats), patch.object(
+            cmdstats.logger, "log_file"
+        ) as log_file:
+            self.char1.execute_cmd("look")
+        self.assertTrue(log_file.call_args[0][0].startswith("Slow command 'look' by Char: "))
+        self.assertEqual(log_file.call_args[1], {"filename": "slow_commands.log"})
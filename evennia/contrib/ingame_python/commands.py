@@ -28,6 +28,7 @@ BASIC_USAGES = [
     "@call/edit <object name> = <callback name> [callback number]",
     "@call/del <object name> = <callback name> [callback number]",
     "@call/tasks [object name [= <callback name>]]",
+    "@call/stats [object name [= <callback name>]]",
 ]
 
 BASIC_SWITCHES = [
@@ -35,6 +36,7 @@ BASIC_SWITCHES = [
     "edit   - edit an existing callback",
     "del    - delete an existing callback",
     "tasks  - show the list of differed tasks",
+    "stats  - show how long callbacks took to run",
 ]
 
 VALIDATOR_USAGES = ["@call/accept [object name = <callback name> [callback number]]"]
@@ -53,7 +55,9 @@ You can also add a number after the callback name to see details on one callback
   @call here = say 2
 You can also add, edit or remove callbacks using the add, edit or del switches.
 Additionally, you can see the list of differed tasks created by callbacks
-(chained events to be called) using the /tasks switch.
+(chained events to be called) using the /tasks switch, and find slow
+callbacks with the /stats switch, which shows the callbacks that ran since
+the server started, the slowest first.
 """
 
 VALIDATOR_TEXT = """
@@ -163,6 +167,8 @@ class CmdCallback(COMMAND_DEFAULT_CLASS):
             self.accept_callback()
         elif switch in ["tasks", "task"]:
             self.list_tasks()
+        elif switch == "stats":
+            self.list_timings()
         else:
             caller.msg("Mutually exclusive or invalid switches were " "used, cannot proceed.")
 
@@ -534,6 +540,34 @@ class CmdCallback(COMMAND_DEFAULT_CLASS):
 
         self.msg(str(table))
 
+    def list_timings(self):
+        """List the execution times of callbacks."""
+        callback_name = self.callback_name
+        timings = [
+            (total, obj, name, number, calls, slowest)
+            for (obj, name, number), (calls, total, slowest) in self.handler.get_timings(
+                self.obj
+            ).items()
+            if obj and (not callback_name or name == callback_name)
+        ]
+        if not timings:
+            self.msg("No callback has run yet.")
+            return
+
+        timings.sort(key=lambda timing: timing[0], reverse=True)
+        table = EvTable("Object", "Callback", "Number", "Calls", "Avg (ms)", "Max (ms)", width=78)
+        for total, obj, name, number, calls, slowest in timings:
+            table.add_row(
+                obj.get_display_name(self.caller),
+                name,
+                number + 1,
+                calls,
+                "{:.2f}".format(total / calls * 1000),
+                "{:.2f}".format(slowest * 1000),
+            )
+
+        self.msg(str(table))
+
 
 # Private functions to handle editing
 
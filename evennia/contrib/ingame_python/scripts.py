@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 from queue import Queue
 import re
 import sys
+import time
 import traceback
 
 from django.conf import settings
@@ -20,6 +21,9 @@ from evennia.contrib.ingame_python.utils import get_next_wait, EVENTS, Interrupt
 
 # Constants
 RE_LINE_ERROR = re.compile(r'^  File "\<string\>", line (\d+)')
+CALLBACKS_ATTRIBUTE = "callbacks"
+CALLBACKS_CATEGORY = "ingame_python"
+SLOW_CALLBACK = getattr(settings, "EVENTS_SLOW_CALLBACK", 0.1)
 
 
 class EventHandler(DefaultScript):
@@ -28,8 +32,9 @@ class EventHandler(DefaultScript):
     The event handler that contains all events in a global script.
 
     This script shouldn't be created more than once.  It contains
-    event (in a non-persistent attribute) and callbacks (in a
-    persistent attribute).  The script method would help adding,
+    event (in a non-persistent attribute).  Callbacks are stored in a
+    persistent attribute on the object they're connected to, and kept
+    compiled in memory once called.  The script method would help adding,
     editing and deleting these events and callbacks.
 
     """
@@ -40,7 +45,8 @@ class EventHandler(DefaultScript):
         self.desc = "Global event handler"
         self.persistent = True
 
-        # Permanent data to be stored
+        # Permanent data to be stored (callbacks were kept here by older
+        # versions, they are moved to their objects at start)
         self.db.callbacks = {}
         self.db.to_valid = []
         self.db.locked = []
@@ -56,6 +62,8 @@ class EventHandler(DefaultScript):
         tasks:
 
         -   Create temporarily stored events.
+        -   Move callbacks stored in the handler by older versions
+            to their objects.
         -   Generate locals (individual events' namespace).
         -   Load eventfuncs, including user-defined ones.
         -   Re-schedule tasks that aren't set to fire anymore.
@@ -66,6 +74,19 @@ class EventHandler(DefaultScript):
         for typeclass, name, variables, help_text, custom_call, custom_add in EVENTS:
             self.add_event(typeclass, name, variables, help_text, custom_call, custom_add)
 
+        # Move callbacks stored in the handler to their objects
+        if self.db.callbacks:
+            for obj, obj_callbacks in self.db.callbacks.items():
+                if obj:
+                    obj.attributes.add(
+                        CALLBACKS_ATTRIBUTE, obj_callbacks, category=CALLBACKS_CATEGORY
+                    )
+            self.db.callbacks = {}
+
+        # Compiled callbacks and execution times, filled when called
+        self.ndb.index = {}
+        self.ndb.timings = {}
+
         # Generate locals
         self.ndb.current_locals = {}
         self.ndb.fresh_locals = {}
@@ -188,7 +209,7 @@ class EventHandler(DefaultScript):
             when several objects would share callbacks.
 
         """
-        obj_callbacks = self.db.callbacks.get(obj, {})
+        obj_callbacks = self.get_stored_callbacks(obj) or {}
         callbacks = {}
         for callback_name, callback_list in obj_callbacks.items():
             new_list = []
@@ -204,6 +225,103 @@ class EventHandler(DefaultScript):
 
         return callbacks
 
+    def get_stored_callbacks(self, obj, create=False):
+        """
+        Return the callbacks stored on an object.
+
+        Args:
+            obj (Object): the connected object.
+            create (bool, optional): create the storage if the object
+                    has no callbacks yet.
+
+        Returns:
+            The stored callbacks as `{callback_name: [callback, ...]}`,
+            or None if the object has no callbacks and `create` is unset.
+
+        Note:
+            Changes to the returned dictionary are saved to the object.
+
+        """
+        stored = obj.attributes.get(CALLBACKS_ATTRIBUTE, category=CALLBACKS_CATEGORY)
+        if stored is None and create:
+            obj.attributes.add(CALLBACKS_ATTRIBUTE, {}, category=CALLBACKS_CATEGORY)
+            stored = obj.attributes.get(CALLBACKS_ATTRIBUTE, category=CALLBACKS_CATEGORY)
+        return stored
+
+    def get_compiled_callbacks(self, obj):
+        """
+        Return the object's callbacks with their compiled code.
+
+        Args:
+            obj (Object): the connected object.
+
+        Returns:
+            A dictionary `{callback_name: [(callback, code), ...]}`, where
+            `callback` is as returned by `get_callbacks` and `code` its
+            compiled code, or None if it doesn't compile.
+
+        Note:
+            The result is kept in memory until the object's callbacks
+            change, so it must not be modified.
+
+        """
+        stored = self.get_stored_callbacks(obj)
+        entry = self.ndb.index.get(obj.id)
+        if entry is None or entry[0] is not stored:
+            compiled = {}
+            for callback_name, callbacks in self.get_callbacks(obj).items():
+                compiled[callback_name] = []
+                for callback in callbacks:
+                    try:
+                        code = compile(callback["code"], "<string>", "exec")
+                    except Exception:
+                        # the error is reported when the callback is called
+                        code = None
+                    compiled[callback_name].append((callback, code))
+
+            entry = self.ndb.index[obj.id] = (stored, compiled)
+
+        return entry[1]
+
+    def get_timings(self, obj=None):
+        """
+        Return the execution times of callbacks since the server started.
+
+        Args:
+            obj (Object, optional): only return the times of this object's
+                    callbacks.
+
+        Returns:
+            A dictionary `{(obj, callback_name, number): (calls, total, slowest)}`,
+            with the times in seconds.
+
+        """
+        return {
+            key: tuple(timing)
+            for key, timing in self.ndb.timings.items()
+            if obj is None or key[0] == obj
+        }
+
+    def _uncache_callbacks(self, obj, callback_name=None, number=None):
+        """
+        Forget the compiled callbacks of an object after they changed.
+
+        Args:
+            obj (Object): the connected object.
+            callback_name (str, optional): also forget the execution
+                    times of the callbacks of this name.
+            number (int, optional): only forget the execution time of
+                    this callback number.
+
+        """
+        self.ndb.index.pop(obj.id, None)
+        if callback_name is None:
+            return
+
+        for key in list(self.ndb.timings):
+            if key[:2] == (obj, callback_name) and number in (None, key[2]):
+                del self.ndb.timings[key]
+
     def add_callback(self, obj, callback_name, code, author=None, valid=False, parameters=""):
         """
         Add the specified callback.
@@ -220,11 +338,7 @@ class EventHandler(DefaultScript):
             This method doesn't check that the callback type exists.
 
         """
-        obj_callbacks = self.db.callbacks.get(obj, {})
-        if not obj_callbacks:
-            self.db.callbacks[obj] = {}
-            obj_callbacks = self.db.callbacks[obj]
-
+        obj_callbacks = self.get_stored_callbacks(obj, create=True)
         callbacks = obj_callbacks.get(callback_name, [])
         if not callbacks:
             obj_callbacks[callback_name] = []
@@ -240,6 +354,7 @@ class EventHandler(DefaultScript):
                 "parameters": parameters,
             }
         )
+        self._uncache_callbacks(obj)
 
         # If not valid, set it in 'to_valid'
         if not valid:
@@ -276,11 +391,7 @@ class EventHandler(DefaultScript):
             This method doesn't check that the callback type exists.
 
         """
-        obj_callbacks = self.db.callbacks.get(obj, {})
-        if not obj_callbacks:
-            self.db.callbacks[obj] = {}
-            obj_callbacks = self.db.callbacks[obj]
-
+        obj_callbacks = self.get_stored_callbacks(obj, create=True)
         callbacks = obj_callbacks.get(callback_name, [])
         if not callbacks:
             obj_callbacks[callback_name] = []
@@ -294,6 +405,7 @@ class EventHandler(DefaultScript):
         callbacks[number].update(
             {"updated_on": datetime.now(), "updated_by": author, "valid": valid, "code": code}
         )
+        self._uncache_callbacks(obj, callback_name, number)
 
         # If not valid, set it in 'to_valid'
         if not valid and (obj, callback_name, number) not in self.db.to_valid:
@@ -321,7 +433,7 @@ class EventHandler(DefaultScript):
             RuntimeError if the callback is locked.
 
         """
-        obj_callbacks = self.db.callbacks.get(obj, {})
+        obj_callbacks = self.get_stored_callbacks(obj) or {}
         callbacks = obj_callbacks.get(callback_name, [])
 
         # If locked, don't edit it
@@ -338,6 +450,7 @@ class EventHandler(DefaultScript):
                 "Deleting callback {} {} of {}:\n{}".format(callback_name, number, obj, code)
             )
             del callbacks[number]
+            self._uncache_callbacks(obj, callback_name)
 
         # Change IDs of callbacks to be validated
         i = 0
@@ -380,11 +493,12 @@ class EventHandler(DefaultScript):
             number (int): the number of the callback.
 
         """
-        obj_callbacks = self.db.callbacks.get(obj, {})
+        obj_callbacks = self.get_stored_callbacks(obj) or {}
         callbacks = obj_callbacks.get(callback_name, [])
 
         # Accept and connect the callback
         callbacks[number].update({"valid": True})
+        self._uncache_callbacks(obj)
         if (obj, callback_name, number) in self.db.to_valid:
             self.db.to_valid.remove((obj, callback_name, number))
 
@@ -442,7 +556,9 @@ class EventHandler(DefaultScript):
         else:
             locals = {key: value for key, value in locals.items()}
 
-        callbacks = self.get_callbacks(obj).get(callback_name, [])
+        compiled = self.get_compiled_callbacks(obj).get(callback_name, [])
+        codes = {id(callback): code for callback, code in compiled}
+        callbacks = [callback for callback, code in compiled]
         if event:
             custom_call = event[2]
             if custom_call:
@@ -457,17 +573,49 @@ class EventHandler(DefaultScript):
             if number is not None and callback["number"] != number:
                 continue
 
+            code = codes.get(id(callback)) or callback["code"]
+            started = time.perf_counter()
             try:
-                exec(callback["code"], locals, locals)
+                exec(code, locals, locals)
             except InterruptEvent:
                 return False
             except Exception:
                 etype, evalue, tb = sys.exc_info()
                 trace = traceback.format_exception(etype, evalue, tb)
                 self.handle_error(callback, trace)
+            finally:
+                self._record_timing(callback, time.perf_counter() - started)
 
         return True
 
+    def _record_timing(self, callback, elapsed):
+        """
+        Record the execution time of a callback.
+
+        Args:
+            callback (dict): the callback representation.
+            elapsed (float): the time it took to run, in seconds.
+
+        """
+        key = (callback["obj"], callback["name"], callback["number"])
+        timing = self.ndb.timings.get(key)
+        if timing is None:
+            timing = self.ndb.timings[key] = [0, 0.0, 0.0]
+        timing[0] += 1
+        timing[1] += elapsed
+        timing[2] = max(timing[2], elapsed)
+
+        if SLOW_CALLBACK is not None and elapsed > SLOW_CALLBACK:
+            logger.log_warn(
+                "The callback {} of {} (#{}), number {} took {:.3f}s".format(
+                    callback["name"],
+                    callback["obj"],
+                    callback["obj"].id,
+                    callback["number"] + 1,
+                    elapsed,
+                )
+            )
+
     def handle_error(self, callback, trace):
         """
         Handle an error in a callback.
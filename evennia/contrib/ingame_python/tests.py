@@ -245,6 +245,48 @@ class TestEventHandler(EvenniaTest):
         self.room1.callbacks.remove("dummy", 0)
         self.assertEqual(self.room1.callbacks.all(), {})
 
+    def test_compiled_callbacks(self):
+        """Test that callbacks are stored on objects and kept compiled."""
+        self.handler.add_callback(
+            self.room1, "dummy", "character.db.strength = 12", author=self.char1, valid=True
+        )
+        stored = self.room1.attributes.get("callbacks", category="ingame_python")
+        self.assertEqual(stored["dummy"][0]["code"], "character.db.strength = 12")
+
+        # The compiled code is kept until the callback changes
+        locals = {"character": self.char1}
+        self.assertTrue(self.handler.call(self.room1, "dummy", locals=locals))
+        compiled = self.handler.get_compiled_callbacks(self.room1)
+        self.assertIs(self.handler.get_compiled_callbacks(self.room1), compiled)
+        self.assertEqual(self.char1.db.strength, 12)
+        self.handler.edit_callback(
+            self.room1, "dummy", 0, "character.db.strength = 13", author=self.char1, valid=True
+        )
+        self.assertIsNot(self.handler.get_compiled_callbacks(self.room1), compiled)
+        self.assertTrue(self.handler.call(self.room1, "dummy", locals=locals))
+        self.assertTrue(self.handler.call(self.room1, "dummy", locals=locals))
+        self.assertEqual(self.char1.db.strength, 13)
+
+        # Execution times are recorded per callback
+        timings = self.handler.get_timings(self.room1)
+        self.assertEqual(list(timings), [(self.room1, "dummy", 0)])
+        calls, total, slowest = timings[(self.room1, "dummy", 0)]
+        self.assertEqual(calls, 2)
+        self.assertTrue(0 < slowest <= total)
+        self.assertEqual(self.handler.get_timings(self.room2), {})
+
+    def test_stored_in_handler(self):
+        """Test moving callbacks stored in the handler to their objects."""
+        self.handler.db.callbacks = {
+            self.room1: {"dummy": [{"author": self.char1, "valid": True, "code": "pass"}]}
+        }
+        self.handler.at_start()
+        self.assertEqual(self.handler.db.callbacks, {})
+        callbacks = self.handler.get_callbacks(self.room1)
+        self.assertEqual(callbacks["dummy"][0]["code"], "pass")
+        self.assertEqual(callbacks["dummy"][0]["author"], self.char1)
+        self.assertTrue(self.handler.call(self.room1, "dummy", locals={}))
+
 
 class TestCmdCallback(CommandTest):
 
@@ -318,6 +360,18 @@ class TestCmdCallback(CommandTest):
         details = self.call(CmdCallback(), "out = traverse 1")
         self.assertEqual(details.splitlines()[-1], "pass")
 
+    def test_stats(self):
+        """Test listing the execution times of callbacks."""
+        self.call(CmdCallback(), "/stats", "No callback has run yet.")
+        self.handler.add_callback(self.exit, "traverse", "pass", author=self.char1, valid=True)
+        self.handler.call(self.exit, "traverse", locals={})
+        table = self.call(CmdCallback(), "/stats out = traverse")
+        lines = table.splitlines()[3:-1]
+        self.assertEqual(len(lines), 1)
+        cols = lines[0].split("|")
+        self.assertEqual(cols[2].strip(), "traverse")
+        self.assertEqual(cols[4].strip(), "1")
+
     def test_add(self):
         """Test to add an callback."""
         self.call(CmdCallback(), "/add out = traverse")
@@ -96,7 +96,7 @@ Verbose Installation Instructions:
 """
 import re
 from re import escape as re_escape
-import itertools
+from collections import OrderedDict
 from django.conf import settings
 from evennia import DefaultObject, DefaultCharacter, ObjectDB
 from evennia import Command, CmdSet
@@ -151,6 +151,9 @@ _RE_SELF_REF = re.compile(r"/me|@", _RE_FLAGS)
 # regex for non-alphanumberic end of a string
 _RE_CHAREND = re.compile(r"\W+$", _RE_FLAGS)
 
+# a single non-alphanumeric character (may end a referenced word)
+_RE_NONWORD = re.compile(r"\W", _RE_FLAGS)
+
 # reference markers for language
 _RE_REF_LANG = re.compile(r"\{+\##([0-9]+)\}+")
 # language says in the emote are on the form "..." or langname"..." (no spaces).
@@ -188,6 +191,27 @@ def _dummy_process(text, *args, **kwargs):
 # emoting mechanisms
 
 
+def _sdesc_words(sentence):
+    """
+    Split a sdesc/recog/key into the words used for matching references
+    to it, removing any emote markup first.
+
+    Args:
+        sentence (str): The sentence to split.
+
+    Returns:
+        words (list): The words of the sentence, in order.
+
+    """
+    # escape {#nnn} markers from sentence, replace with nnn
+    sentence = _RE_REF.sub(r"\1", sentence)
+    # escape {##nnn} markers, replace with nnn
+    sentence = _RE_REF_LANG.sub(r"\1", sentence)
+    # escape self-ref marker from sentence
+    sentence = _RE_SELF_REF.sub(r"", sentence)
+    return sentence.split()
+
+
 def ordered_permutation_regex(sentence):
     """
     Builds a regex that matches 'ordered permutations' of a sentence's
@@ -210,29 +234,22 @@ def ordered_permutation_regex(sentence):
          We also add regex to make sure it also accepts num-specifiers,
          like /2-tall.
 
-    """
-    # escape {#nnn} markers from sentence, replace with nnn
-    sentence = _RE_REF.sub(r"\1", sentence)
-    # escape {##nnn} markers, replace with nnn
-    sentence = _RE_REF_LANG.sub(r"\1", sentence)
-    # escape self-ref marker from sentence
-    sentence = _RE_SELF_REF.sub(r"", sentence)
+    Notes:
+        The emote parser itself no longer uses these regexes (see
+        `SdescMatcher`); this is kept for custom code relying on the
+        regex tuples of the sdesc/recog handlers.
 
-    # ordered permutation algorithm
-    words = sentence.split()
-    combinations = itertools.product((True, False), repeat=len(words))
+    """
+    # the ordered permutations are all contiguous runs of words
+    words = _sdesc_words(sentence)
+    nwords = len(words)
     solution = []
-    for combination in combinations:
-        comb = []
-        for iword, word in enumerate(words):
-            if combination[iword]:
-                comb.append(word)
-            elif comb:
-                break
-        if comb:
+    for istart in range(nwords):
+        for iend in range(istart + 1, nwords + 1):
             solution.append(
                 _PREFIX
-                + r"[0-9]*%s*%s(?=\W|$)+" % (_NUM_SEP, re_escape(" ".join(comb)).rstrip("\\"))
+                + r"[0-9]*%s*%s(?=\W|$)+"
+                % (_NUM_SEP, re_escape(" ".join(words[istart:iend])).rstrip("\\"))
             )
 
     # combine into a match regex, first matching the longest down to the shortest components
@@ -264,6 +281,156 @@ def regex_tuple_from_key_alias(obj):
     )
 
 
+class _TrieNode(object):
+    """
+    One word-step in the `SdescMatcher` trie.
+
+    """
+
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children = {}
+        self.entries = {}
+
+
+class SdescMatcher(object):
+    """
+    A word-prefix trie over the sdescs, recogs and keys of a set of
+    objects. Every contiguous run of words ('ordered permutation') of
+    every added text is a path from the root, so resolving a reference
+    in an emote is a single walk over the words following the reference
+    marker, independent of how many candidates there are or of how many
+    words their sdescs have.
+
+    Each entry is stored with an `order` (a sortable tuple) so that
+    multi-matches come out in a stable order (this is what the
+    `1-tall`, `2-tall` multimatch-separation relies on).
+
+    """
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def add(self, text, obj, order, display=None):
+        """
+        Add a text to match against.
+
+        Args:
+            text (str): The sdesc, recog or key/alias string. ANSI markup
+                is stripped before matching.
+            obj (Object): The object this text refers to.
+            order (tuple): Sort order of this entry among multi-matches.
+            display (str, optional): What to report in multimatch errors,
+                if not `text`.
+
+        """
+        display = text if display is None else display
+        words = [word.lower() for word in _sdesc_words(ansi.strip_ansi(text))]
+        for istart in range(len(words)):
+            node = self.root
+            for word in words[istart:]:
+                node = node.children.setdefault(word, _TrieNode())
+                node.entries[order] = (obj, display)
+
+    def match(self, lstring, istart):
+        """
+        Find all texts referenced at a given position.
+
+        Args:
+            lstring (str): The (lower-case) string to match in.
+            istart (int): The position in `lstring` where the reference
+                starts, after the prefix and any numerical identifier.
+
+        Returns:
+            matches (list): A list of `(iend, entries)`, where `iend` is
+                the end index of the match in `lstring` and `entries` is a
+                dict `{order: (obj, text)}` of everything matching up to there.
+
+        Notes:
+            This reproduces the ordered-permutation regex semantics; the
+            last word of a match may be followed by any non-word
+            character (or the end of the string) while words within a
+            match must be separated by a single space.
+
+        """
+        matches = []
+        node = self.root
+        pos = istart
+        strlen = len(lstring)
+        while node.children:
+            iend = lstring.find(" ", pos)
+            iend = strlen if iend == -1 else iend
+            token = lstring[pos:iend]
+            # words ending at a non-word character inside the token
+            for nonword_match in _RE_NONWORD.finditer(token, 1):
+                child = node.children.get(token[: nonword_match.start()])
+                if child:
+                    matches.append((pos + nonword_match.start(), child.entries))
+            # words ending at the token boundary may continue with the next word
+            node = node.children.get(token)
+            if not node:
+                break
+            matches.append((iend, node.entries))
+            if iend >= strlen:
+                break
+            pos = iend + 1
+        return matches
+
+
+# cache of candidate matchers, keyed on the sdesc/key data they were built from
+_SDESC_MATCHER_CACHE = OrderedDict()
+_SDESC_MATCHER_CACHE_SIZE = 200
+
+
+def _get_candidate_matcher(candidates):
+    """
+    Get a matcher for the sdescs and keys/aliases of a set of candidates.
+
+    Args:
+        candidates (iterable): The objects that may be referenced.
+
+    Returns:
+        matcher (SdescMatcher): A matcher over the candidates' sdescs (or
+            keys+aliases for objects without sdescs). Orders are tuples
+            `(group, icandidate)`.
+
+    Notes:
+        The matcher is cached, keyed on the identity, order and current
+        sdesc/key text of every candidate. A changed sdesc, key or alias
+        or a change in the room's contents thus makes a new key, so the
+        cache never needs explicit invalidation; old matchers drop out of
+        the fixed-size cache over time.
+
+    """
+    signature = []
+    for obj in candidates:
+        if hasattr(obj, "sdesc"):
+            signature.append((2, obj.id, obj.sdesc.get()))
+        if not (hasattr(obj, "recog") and hasattr(obj, "sdesc")):
+            # handle objects without sdescs
+            signature.append((3, obj.id, " ".join([obj.key] + obj.aliases.all())))
+    signature = tuple(signature)
+
+    matcher = _SDESC_MATCHER_CACHE.get(signature)
+    if matcher:
+        _SDESC_MATCHER_CACHE.move_to_end(signature)
+        return matcher
+
+    matcher = SdescMatcher()
+    for icandidate, obj in enumerate(candidates):
+        if hasattr(obj, "sdesc"):
+            matcher.add(obj.sdesc.get(), obj, (2, icandidate))
+        if not (hasattr(obj, "recog") and hasattr(obj, "sdesc")):
+            matcher.add(
+                " ".join([obj.key] + obj.aliases.all()), obj, (3, icandidate), display=obj.key
+            )
+    _SDESC_MATCHER_CACHE[signature] = matcher
+    if len(_SDESC_MATCHER_CACHE) > _SDESC_MATCHER_CACHE_SIZE:
+        _SDESC_MATCHER_CACHE.popitem(last=False)
+    return matcher
+
+
 def parse_language(speaker, emote):
     """
     Parse the emote for language. This is
@@ -358,24 +525,13 @@ def parse_sdescs_and_recogs(sender, candidates, string, search_mode=False):
         - says, "..." are
 
     """
-    # Load all candidate regex tuples [(regex, obj, sdesc/recog),...]
-    candidate_regexes = (
-        ([(_RE_SELF_REF, sender, sender.sdesc.get())] if hasattr(sender, "sdesc") else [])
-        + (
-            [sender.recog.get_regex_tuple(obj) for obj in candidates]
-            if hasattr(sender, "recog")
-            else []
-        )
-        + [obj.sdesc.get_regex_tuple() for obj in candidates if hasattr(obj, "sdesc")]
-        + [
-            regex_tuple_from_key_alias(obj)  # handle objects without sdescs
-            for obj in candidates
-            if not (hasattr(obj, "recog") and hasattr(obj, "sdesc"))
-        ]
-    )
-
-    # filter out non-found data
-    candidate_regexes = [tup for tup in candidate_regexes if tup]
+    candidates = list(candidates)
+    candidate_matcher = _get_candidate_matcher(candidates)
+    recog_matcher = sender.recog.get_matcher() if hasattr(sender, "recog") else None
+    candidate_index = {}
+    for icandidate, obj in enumerate(candidates):
+        candidate_index.setdefault(obj, icandidate)
+    self_sdesc = sender.sdesc.get() if hasattr(sender, "sdesc") else None
 
     # escape mapping syntax on the form {#id} if it exists already in emote,
     # if so it is replaced with just "id".
@@ -389,6 +545,10 @@ def parse_sdescs_and_recogs(sender, candidates, string, search_mode=False):
     errors = []
     obj = None
     nmatches = 0
+    lstring = string.lower()
+    if len(lstring) != len(string):
+        # some unicode chars change length when lowered; keep indices aligned
+        lstring = "".join(char.lower() if len(char.lower()) == 1 else char for char in string)
     for marker_match in reversed(list(_RE_OBJ_REF_START.finditer(string))):
         # we scan backwards so we can replace in-situ without messing
         # up later occurrences. Given a marker match, query from
@@ -399,15 +559,44 @@ def parse_sdescs_and_recogs(sender, candidates, string, search_mode=False):
         istart0 = marker_match.start()
         istart = istart0
 
-        # loop over all candidate regexes and match against the string following the match
-        matches = ((reg.match(string[istart:]), obj, text) for reg, obj, text in candidate_regexes)
+        # all places the referenced text could start, allowing for any
+        # number of [0-9]*-* before it, like the old sdesc regexes did
+        ipos = istart + len(_PREFIX)
+        while ipos < len(lstring) and lstring[ipos] in "0123456789":
+            ipos += 1
+        starts = list(range(istart + len(_PREFIX), ipos))
+        while ipos < len(lstring) and lstring[ipos] == _NUM_SEP:
+            starts.append(ipos)
+            ipos += 1
+        starts.append(ipos)
+
+        # collect (end, {order: (obj, text)}) for all matches
+        matches = []
+        self_match = _RE_SELF_REF.match(string, istart) if self_sdesc is not None else None
+        if self_match:
+            matches.append((self_match.end(), {(0,): (sender, self_sdesc)}))
+        for ipos in starts:
+            matches.extend(candidate_matcher.match(lstring, ipos))
+            if recog_matcher:
+                for iend, entries in recog_matcher.match(lstring, ipos):
+                    # recogs are only valid for candidates not hiding their identity
+                    entries = {
+                        (1, candidate_index[obj]): (obj, text)
+                        for (obj, text) in entries.values()
+                        if obj in candidate_index
+                        and obj.access(sender, "enable_recog", default=True)
+                    }
+                    matches.append((iend, entries))
 
         # score matches by how long part of the string was matched
-        matches = [(match.end() if match else -1, obj, text) for match, obj, text in matches]
-        maxscore = max(score for score, obj, text in matches)
+        maxscore = max([iend - istart for iend, entries in matches if entries] or [-1])
 
         # we have a valid maxscore, extract all matches with this value
-        bestmatches = [(obj, text) for score, obj, text in matches if maxscore == score != -1]
+        bestmatches = {}
+        for iend, entries in matches:
+            if iend - istart == maxscore:
+                bestmatches.update(entries)
+        bestmatches = [bestmatches[order] for order in sorted(bestmatches)]
         nmatches = len(bestmatches)
 
         if not nmatches:
@@ -443,6 +632,7 @@ def parse_sdescs_and_recogs(sender, candidates, string, search_mode=False):
         elif nmatches == 1:
             key = "#%i" % obj.id
             string = string[:istart0] + "{%s}" % key + string[istart + maxscore :]
+            lstring = lstring[:istart0] + "{%s}" % key + lstring[istart + maxscore :]
             mapping[key] = obj
         else:
             refname = marker_match.group()
@@ -480,6 +670,114 @@ def parse_sdescs_and_recogs(sender, candidates, string, search_mode=False):
     return string, mapping
 
 
+def _render_emote(receiver, sender, emote, obj_mapping, language_mapping):
+    """
+    Render the parsed emote as seen by one receiver.
+
+    Args:
+        receiver (Object): The one to see the emote.
+        sender (Object): The one sending the emote.
+        emote (str): The emote with {##num} language markers and
+            escaped {{#dbref}} object markers.
+        obj_mapping (dict): Mapping `{"#dbref": obj}`.
+        language_mapping (dict): Mapping `{"##num": (langname, saytext)}`.
+
+    Returns:
+        text (str): The emote as `receiver` should see it.
+
+    """
+    # first handle the language mapping, which always produce different keys ##nn
+    receiver_lang_mapping = {}
+    try:
+        process_language = receiver.process_language
+    except AttributeError:
+        process_language = _dummy_process
+    for key, (langname, saytext) in language_mapping.items():
+        # color says
+        receiver_lang_mapping[key] = process_language(saytext, sender, langname)
+    # map the language {##num} markers. This will convert the escaped sdesc markers on
+    # the form {{#num}} to {#num} markers ready to sdescmat in the next step.
+    sendemote = emote.format(**receiver_lang_mapping)
+
+    # handle sdesc mappings. we make a temporary copy that we can modify
+    try:
+        process_sdesc = receiver.process_sdesc
+    except AttributeError:
+        process_sdesc = _dummy_process
+
+    try:
+        process_recog = receiver.process_recog
+    except AttributeError:
+        process_recog = _dummy_process
+
+    try:
+        recog_get = receiver.recog.get
+        receiver_sdesc_mapping = dict(
+            (ref, process_recog(recog_get(obj), obj)) for ref, obj in obj_mapping.items()
+        )
+    except AttributeError:
+        receiver_sdesc_mapping = dict(
+            (
+                ref,
+                process_sdesc(obj.sdesc.get(), obj)
+                if hasattr(obj, "sdesc")
+                else process_sdesc(obj.key, obj),
+            )
+            for ref, obj in obj_mapping.items()
+        )
+    # make sure receiver always sees their real name
+    rkey = "#%i" % receiver.id
+    if rkey in receiver_sdesc_mapping:
+        receiver_sdesc_mapping[rkey] = process_sdesc(receiver.key, receiver)
+
+    # do the template replacement of the sdesc/recog {#num} markers
+    return sendemote.format(**receiver_sdesc_mapping)
+
+
+def _emote_view_key(receiver, sender, obj_mapping, languages):
+    """
+    Get a key identifying how a receiver sees an emote. Receivers with
+    the same key see the same text.
+
+    Args:
+        receiver (Object): The one to see the emote.
+        sender (Object): The one sending the emote.
+        obj_mapping (dict): Mapping `{"#dbref": obj}`.
+        languages (tuple): The languages of all says in the emote.
+
+    Returns:
+        key (tuple or None): The view key, or `None` if this receiver's
+            view must be rendered separately.
+
+    """
+    if "#%i" % receiver.id in obj_mapping:
+        # receiver always sees their real name
+        return None
+    try:
+        obj2recog = receiver.recog.obj2recog
+    except AttributeError:
+        has_recog = False
+    else:
+        has_recog = True
+        if obj2recog and any(obj in obj2recog for obj in obj_mapping.values()):
+            # recog overrides present
+            return None
+    try:
+        view_key = receiver.get_emote_view_key(sender, languages)
+    except AttributeError:
+        view_key = True
+    if view_key is None:
+        return None
+    cls = type(receiver)
+    return (
+        has_recog,
+        getattr(cls, "process_language", None),
+        getattr(cls, "process_sdesc", None),
+        getattr(cls, "process_recog", None),
+        view_key,
+    )
+
+
 def send_emote(sender, receivers, emote, anonymous_add="first"):
     """
     Main access function for distribute an emote.
@@ -519,54 +817,19 @@ def send_emote(sender, receivers, emote, anonymous_add="first"):
         else:
             emote = "%s [%s]" % (emote, "{{%s}}" % key)
 
-    # broadcast emote to everyone
+    # broadcast emote to everyone, rendering each distinct view only once
+    languages = tuple(sorted(set(lang for lang, _ in language_mapping.values()), key=str))
+    rendered = {}
     for receiver in receivers:
-        # first handle the language mapping, which always produce different keys ##nn
-        receiver_lang_mapping = {}
-        try:
-            process_language = receiver.process_language
-        except AttributeError:
-            process_language = _dummy_process
-        for key, (langname, saytext) in language_mapping.items():
-            # color says
-            receiver_lang_mapping[key] = process_language(saytext, sender, langname)
-        # map the language {##num} markers. This will convert the escaped sdesc markers on
-        # the form {{#num}} to {#num} markers ready to sdescmat in the next step.
-        sendemote = emote.format(**receiver_lang_mapping)
-
-        # handle sdesc mappings. we make a temporary copy that we can modify
-        try:
-            process_sdesc = receiver.process_sdesc
-        except AttributeError:
-            process_sdesc = _dummy_process
-
-        try:
-            process_recog = receiver.process_recog
-        except AttributeError:
-            process_recog = _dummy_process
-
-        try:
-            recog_get = receiver.recog.get
-            receiver_sdesc_mapping = dict(
-                (ref, process_recog(recog_get(obj), obj)) for ref, obj in obj_mapping.items()
-            )
-        except AttributeError:
-            receiver_sdesc_mapping = dict(
-                (
-                    ref,
-                    process_sdesc(obj.sdesc.get(), obj)
-                    if hasattr(obj, "sdesc")
-                    else process_sdesc(obj.key, obj),
-                )
-                for ref, obj in obj_mapping.items()
-            )
-        # make sure receiver always sees their real name
-        rkey = "#%i" % receiver.id
-        if rkey in receiver_sdesc_mapping:
-            receiver_sdesc_mapping[rkey] = process_sdesc(receiver.key, receiver)
-
-        # do the template replacement of the sdesc/recog {#num} markers
-        receiver.msg(sendemote.format(**receiver_sdesc_mapping))
+        view_key = _emote_view_key(receiver, sender, obj_mapping, languages)
+        if view_key is None:
+            text = _render_emote(receiver, sender, emote, obj_mapping, language_mapping)
+        elif view_key in rendered:
+            text = rendered[view_key]
+        else:
+            text = _render_emote(receiver, sender, emote, obj_mapping, language_mapping)
+            rendered[view_key] = text
+        receiver.msg(text)
 
 
 # ------------------------------------------------------------
@@ -704,6 +967,7 @@ class RecogHandler(object):
         self.ref2recog = {}
         self.obj2regex = {}
         self.obj2recog = {}
+        self._matcher = None
         self._cache()
 
     def _cache(self):
@@ -717,6 +981,7 @@ class RecogHandler(object):
             (obj, re.compile(regex, _RE_FLAGS)) for obj, regex in obj2regex.items() if obj
         )
         self.obj2recog = dict((obj, recog) for obj, recog in obj2recog.items() if obj)
+        self._matcher = None
 
     def add(self, obj, recog, max_length=60):
         """
@@ -772,6 +1037,7 @@ class RecogHandler(object):
         self.ref2recog[key] = recog
         self.obj2recog[obj] = recog
         self.obj2regex[obj] = re.compile(regex, _RE_FLAGS)
+        self._matcher = None
         return recog
 
     def get(self, obj):
@@ -821,6 +1087,23 @@ class RecogHandler(object):
             del self.obj.db._recog_ref2recog["#%i" % obj.id]
         self._cache()
 
+    def get_matcher(self):
+        """
+        Get a matcher for all recogs in this handler. It is rebuilt
+        only when recogs are added or removed.
+
+        Returns:
+            matcher (SdescMatcher): Matcher over all recogs. Note that
+                it does not check the `enable_recog` lock.
+
+        """
+        if self._matcher is None:
+            matcher = SdescMatcher()
+            for obj, recog in self.obj2recog.items():
+                matcher.add(recog, obj, (obj.id,))
+            self._matcher = matcher
+        return self._matcher
+
     def get_regex_tuple(self, obj):
         """
         Returns:
@@ -1622,3 +1905,38 @@ class ContribRPCharacter(DefaultCharacter, ContribRPObject):
 
         """
         return "%s|w%s|n" % ("|W(%s)" % language if language else "", text)
+
+    def get_emote_view_key(self, sender, languages, **kwargs):
+        """
+        Describe how this character perceives an emote, apart from
+        recogs. Receivers of the same emote returning the same key are
+        sent the same text, which is then only rendered once.
+
+        Args:
+            sender (Object): The one sending the emote.
+            languages (tuple): The languages of the says in the
+                emote, as passed to `process_language`.
+
+        Returns:
+            key (hashable or None): A key describing this character's
+                view of the emote. If `None`, the emote is always
+                rendered separately for this character.
+
+        Notes:
+            The default `process_sdesc`, `process_recog` and
+            `process_language` hooks don't depend on who is looking,
+            so all characters using them share the same key. If you
+            override those hooks (such as to obfuscate says based on
+            the listener's language skill), this returns `None` until
+            you override it too - for example to return the listener's
+            comprehension level for each of `languages`.
+
+        """
+        cls = type(self)
+        if (
+            cls.process_sdesc is not ContribRPCharacter.process_sdesc
+            or cls.process_recog is not ContribRPCharacter.process_recog
+            or cls.process_language is not ContribRPCharacter.process_language
+        ):
+            return None
+        return True
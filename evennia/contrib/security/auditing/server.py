@@ -3,12 +3,20 @@ Auditable Server Sessions:
 Extension of the stock ServerSession that yields objects representing
 user inputs and system outputs.
 
+Messages are only captured when sent or received. They are queued in a
+bounded buffer and masked, formatted and passed to the callback in
+batches shortly after, so auditing adds little to the cost of each
+message. If the buffer fills up faster than it is processed, the oldest
+messages are dropped and this is logged.
+
 Evennia contribution - Johnny 2017
 """
 import os
 import re
 import socket
+from collections import deque
 
+from twisted.internet import reactor
 from django.utils import timezone
 from django.conf import settings as ev_settings
 from evennia.utils import utils, logger, mod_import, get_evennia_version
@@ -31,6 +39,54 @@ AUDIT_MASKS = [
     {"userpassword": r"^.* has changed your password to '(?P<secret>[^']+)'\."},
     {"password": r"^[@\s]*[password]{6,9}\s+(?P<secret>.*)"},
 ] + getattr(ev_settings, "AUDIT_MASKS", [])
+AUDIT_BUFFER_SIZE = getattr(ev_settings, "AUDIT_BUFFER_SIZE", 10000)
+AUDIT_BATCH_SIZE = getattr(ev_settings, "AUDIT_BATCH_SIZE", 500)
+AUDIT_INTERVAL = getattr(ev_settings, "AUDIT_INTERVAL", 0.5)
+
+_HOSTNAME = socket.getfqdn()
+_VERSION = get_evennia_version()
+_RE_EMBEDDED = re.compile(".*Command.*'(.+)'.*is not available.*", flags=re.IGNORECASE)
+
+
+def _compile_masks(masks):
+    """
+    Combine the mask regexes into a single regex.
+
+    Args:
+        masks (list): List of `{command: regex}` dicts, see `AUDIT_MASKS`.
+
+    Returns:
+        regex (Pattern): The combined regex. Each mask is in a group named
+            `mask<N>`, with its `secret` group renamed to `secret<N>`. As
+            the alternatives are tried in order, the first mask matching a
+            message is the one that matches.
+        commands (list): The command of each mask, by N.
+
+    """
+    parts = []
+    commands = []
+    for mask in masks:
+        for command, regex in mask.items():
+            index = len(commands)
+            part = "(?P<mask%i>%s)" % (
+                index,
+                regex.replace("(?P<secret>", "(?P<secret%i>" % index).replace(
+                    "(?P=secret)", "(?P=secret%i)" % index
+                ),
+            )
+            try:
+                re.compile(part, flags=re.IGNORECASE)
+            except Exception as e:
+                logger.log_err(regex)
+                logger.log_err(e)
+                continue
+            parts.append(part)
+            commands.append(command)
+
+    return re.compile("|".join(parts), flags=re.IGNORECASE), commands
+
+
+_RE_MASKS, _MASK_COMMANDS = _compile_masks(AUDIT_MASKS)
 
 
 if AUDIT_CALLBACK:
@@ -47,6 +103,114 @@ if AUDIT_CALLBACK:
         )
     except Exception as e:
         logger.log_err("Failed to activate Auditing module. %s" % e)
+        AUDIT_CALLBACK = None
+
+
+class AuditBuffer(object):
+    """
+    Bounded buffer of captured messages, processed in batches.
+
+    The messages are formatted by their session and passed to the callback
+    in batches, started a moment after the first message is queued. When
+    the buffer is full, the oldest message is dropped for every new one.
+
+    """
+
+    def __init__(self, callback, maxsize=AUDIT_BUFFER_SIZE, batch_size=AUDIT_BATCH_SIZE):
+        """
+        Args:
+            callback (callable): Called with the log dict of every message.
+            maxsize (int, optional): Most messages to keep queued.
+            batch_size (int, optional): Most messages to process before
+                letting the server do other work.
+
+        """
+        self.callback = callback
+        self.buffer = deque(maxlen=maxsize)
+        self.batch_size = batch_size
+        self.processed = 0
+        self.dropped = 0
+        self.reported_dropped = 0
+        self.max_backlog = 0
+        self._call = None
+        self._shutdown_trigger = None
+
+    def put(self, session, event):
+        """
+        Queue a captured message.
+
+        Args:
+            session (AuditedServerSession): The session of the message.
+            event (dict): The message, as returned by `session.capture`.
+
+        """
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append((session, event))
+        self.max_backlog = max(self.max_backlog, len(self.buffer))
+        if self._call is None and reactor.running:
+            self._call = reactor.callLater(AUDIT_INTERVAL, self._process)
+            if self._shutdown_trigger is None:
+                self._shutdown_trigger = reactor.addSystemEventTrigger(
+                    "before", "shutdown", self.flush
+                )
+
+    def _process(self):
+        """
+        Process a batch, and schedule the next one if messages remain.
+
+        """
+        self._call = None
+        self.flush(self.batch_size)
+        if self.buffer:
+            self._call = reactor.callLater(0, self._process)
+
+    def flush(self, number=None):
+        """
+        Format queued messages and pass them to the callback.
+
+        Args:
+            number (int, optional): Most messages to process. If not
+                given, process all of them.
+
+        """
+        buffer = self.buffer
+        number = len(buffer) if number is None else min(number, len(buffer))
+        for _ in range(number):
+            session, event = buffer.popleft()
+            try:
+                log = session.format_audit(event)
+                if log:
+                    self.callback(log)
+            except Exception as e:
+                logger.log_err(e)
+        self.processed += number
+
+        if self.dropped > self.reported_dropped:
+            logger.log_sec(
+                "Audit buffer full: dropped %i messages (%i in total)."
+                % (self.dropped - self.reported_dropped, self.dropped)
+            )
+            self.reported_dropped = self.dropped
+
+    def stats(self):
+        """
+        Get the buffer counters.
+
+        Returns:
+            stats (dict): With keys `backlog` (messages queued now),
+                `max_backlog`, `processed` and `dropped`.
+
+        """
+        return {
+            "backlog": len(self.buffer),
+            "max_backlog": self.max_backlog,
+            "processed": self.processed,
+            "dropped": self.dropped,
+        }
+
+
+AUDIT_BUFFER = AuditBuffer(AUDIT_CALLBACK) if AUDIT_CALLBACK else None
 
 
 class AuditedServerSession(ServerSession):
@@ -80,38 +244,77 @@ class AuditedServerSession(ServerSession):
                 related to this message.
 
         """
-        # Get time at start of processing
-        time_obj = timezone.now()
-        time_str = str(time_obj)
+        event = self.capture(**kwargs)
+        return self.format_audit(event) if event else {}
 
-        session = self
+    def capture(self, **kwargs):
+        """
+        Captures a message and the session state upon message send or receive,
+        to be formatted later. This is done for every message, so should be
+        kept cheap.
+
+        Keyword Args:
+            src (str): Source of data; 'client' or 'server'. Indicates direction.
+            kwargs (any): The message data.
+
+        Returns:
+            event (dict or None): The captured message, or None for an empty
+                message.
+
+        """
         src = kwargs.pop("src", "?")
-        bytecount = 0
 
         # Do not log empty lines
         if not kwargs:
-            return {}
+            return None
+
+        char = self.get_puppet()
+        return {
+            "time": timezone.now(),
+            "src": src,
+            "account": self.get_account(),
+            "character": char,
+            "room": char.location if char else None,
+            "kwargs": kwargs,
+        }
+
+    def format_audit(self, event):
+        """
+        Masks and formats a captured message.
+
+        Args:
+            event (dict): The message, as returned by `capture`.
+
+        Returns:
+            log (dict): Dictionary object containing parsed system and user data
+                related to this message.
+
+        """
+        time_obj = event["time"]
+        time_str = str(time_obj)
+        src = event["src"]
+        kwargs = dict(event["kwargs"])
+        bytecount = 0
 
         # Get current session's IP address
-        client_ip = session.address
+        client_ip = self.address
 
         # Capture Account name and dbref together
-        account = session.get_account()
+        account = event["account"]
         account_token = ""
         if account:
             account_token = "%s%s" % (account.key, account.dbref)
 
         # Capture Character name and dbref together
-        char = session.get_puppet()
+        char = event["character"]
         char_token = ""
         if char:
             char_token = "%s%s" % (char.key, char.dbref)
 
         # Capture Room name and dbref together
-        room = None
+        room = event["room"]
         room_token = ""
-        if char:
-            room = char.location
+        if room:
             room_token = "%s%s" % (room.key, room.dbref)
 
         # Try to compile an input/output string
@@ -136,9 +339,9 @@ class AuditedServerSession(ServerSession):
         # Compile the IP, Account, Character, Room, and the message.
         log = {
             "time": time_str,
-            "hostname": socket.getfqdn(),
+            "hostname": _HOSTNAME,
             "application": "%s" % ev_settings.SERVERNAME,
-            "version": get_evennia_version(),
+            "version": _VERSION,
             "pid": os.getpid(),
             "direction": "SND" if src == "server" else "RCV",
             "protocol": self.protocol_key,
@@ -182,33 +385,27 @@ class AuditedServerSession(ServerSession):
         # Check to see if the command is embedded within server output
         _msg = msg
         is_embedded = False
-        match = re.match(".*Command.*'(.+)'.*is not available.*", msg, flags=re.IGNORECASE)
+        match = _RE_EMBEDDED.match(msg)
         if match:
             msg = match.group(1).replace("\\", "")
             submsg = msg
             is_embedded = True
 
-        for mask in AUDIT_MASKS:
-            for command, regex in mask.items():
-                try:
-                    match = re.match(regex, msg, flags=re.IGNORECASE)
-                except Exception as e:
-                    logger.log_err(regex)
-                    logger.log_err(e)
-                    continue
-
-                if match:
-                    term = match.group("secret")
-                    masked = re.sub(term, "*" * len(term.zfill(8)), msg)
-
-                    if is_embedded:
-                        msg = re.sub(
-                            submsg, "%s <Masked: %s>" % (masked, command), _msg, flags=re.IGNORECASE
-                        )
-                    else:
-                        msg = masked
+        match = _RE_MASKS.match(msg)
+        if match:
+            index = int(match.lastgroup[4:])
+            command = _MASK_COMMANDS[index]
+            term = match.group("secret%i" % index)
+            masked = re.sub(term, "*" * len(term.zfill(8)), msg)
+
+            if is_embedded:
+                msg = re.sub(
+                    submsg, "%s <Masked: %s>" % (masked, command), _msg, flags=re.IGNORECASE
+                )
+            else:
+                msg = masked
 
-                    return msg
+            return msg
 
         return _msg
 
@@ -220,11 +417,11 @@ class AuditedServerSession(ServerSession):
             kwargs (any): Other data to the protocol.
 
         """
-        if AUDIT_CALLBACK and AUDIT_OUT:
+        if AUDIT_BUFFER and AUDIT_OUT:
             try:
-                log = self.audit(src="server", **kwargs)
-                if log:
-                    AUDIT_CALLBACK(log)
+                event = self.capture(src="server", **kwargs)
+                if event:
+                    AUDIT_BUFFER.put(self, event)
             except Exception as e:
                 logger.log_err(e)
 
@@ -238,11 +435,11 @@ class AuditedServerSession(ServerSession):
             kwargs (any): Other data from the protocol.
 
         """
-        if AUDIT_CALLBACK and AUDIT_IN:
+        if AUDIT_BUFFER and AUDIT_IN:
             try:
-                log = self.audit(src="client", **kwargs)
-                if log:
-                    AUDIT_CALLBACK(log)
+                event = self.capture(src="client", **kwargs)
+                if event:
+                    AUDIT_BUFFER.put(self, event)
             except Exception as e:
                 logger.log_err(e)
 
@@ -112,3 +112,28 @@ class AuditingTest(EvenniaTest):
         self.assertEqual(log["text"], "connect johnny ***********")
         self.assertEqual(log["data"]["prompt"], "hp=20|st=10|ma=15")
         self.assertEqual(log["data"]["pane"], 2)
+
+    def test_buffer(self):
+        """
+        Make sure captured messages are queued, dropped when the buffer is
+        full and formatted when flushed.
+        """
+        from evennia.contrib.security.auditing.server import AuditBuffer
+
+        logs = []
+        buffer = AuditBuffer(logs.append, maxsize=2, batch_size=1)
+        for text in ("look", "connect johnny password123", "say hello"):
+            buffer.put(self.session, self.session.capture(src="client", text=text))
+        self.assertEqual(logs, [])
+        self.assertEqual(
+            buffer.stats(), {"backlog": 2, "max_backlog": 2, "processed": 0, "dropped": 1}
+        )
+
+        buffer.flush(1)
+        self.assertEqual([log["text"] for log in logs], ["connect johnny ***********"])
+        buffer.flush()
+        self.assertEqual(logs[-1]["text"], "say hello")
+        self.assertEqual(logs[-1]["direction"], "RCV")
+        self.assertEqual(
+            buffer.stats(), {"backlog": 0, "max_backlog": 2, "processed": 2, "dropped": 1}
+        )
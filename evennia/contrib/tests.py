@@ -226,6 +226,90 @@ class TestRPSystem(EvenniaTest):
             'receiver of emotes.|n and |bReceiver2|n. She says |w"This is a test."|n',
         )
 
+    def test_parse_sdescs_long_sdesc(self):
+        speaker = self.speaker
+        speaker.sdesc.add(sdesc0)
+        # 2**26 permutations with the old regex approach
+        self.receiver1.sdesc.add("a b c d e f g h i j k l m n o p q r s t u v w x y z")
+        self.receiver2.sdesc.add(sdesc2)
+        candidates = (self.receiver1, self.receiver2)
+        self.assertEqual(
+            rpsystem.parse_sdescs_and_recogs(speaker, candidates, "/l m n waves at /colliding."),
+            (
+                "{#%i} waves at {#%i}." % (self.receiver1.id, self.receiver2.id),
+                {
+                    "#%i" % self.receiver1.id: self.receiver1,
+                    "#%i" % self.receiver2.id: self.receiver2,
+                },
+            ),
+        )
+
+    def test_parse_sdescs_matcher_update(self):
+        speaker = self.speaker
+        self.receiver1.sdesc.add("A tall man")
+        self.receiver2.sdesc.add("A short man")
+        candidates = (self.receiver1, self.receiver2)
+        with self.assertRaises(rpsystem.EmoteError):
+            rpsystem.parse_sdescs_and_recogs(speaker, candidates, "/man")
+        self.assertEqual(
+            rpsystem.parse_sdescs_and_recogs(speaker, candidates, "/2-man", search_mode=True),
+            [self.receiver2],
+        )
+        # changing sdesc and recogs must be picked up
+        self.receiver2.sdesc.add("A short woman")
+        self.assertEqual(
+            rpsystem.parse_sdescs_and_recogs(speaker, candidates, "/man", search_mode=True),
+            [self.receiver1],
+        )
+        speaker.recog.add(self.receiver2, "Sue")
+        self.assertEqual(
+            rpsystem.parse_sdescs_and_recogs(speaker, candidates, "/sue", search_mode=True),
+            [self.receiver2],
+        )
+        speaker.recog.remove(self.receiver2)
+        self.assertEqual(
+            rpsystem.parse_sdescs_and_recogs(speaker, candidates, "/sue", search_mode=True), []
+        )
+
+    def test_send_emote_shared_views(self):
+        speaker = self.speaker
+        speaker.sdesc.add(sdesc0)
+        self.receiver1.sdesc.add(sdesc1)
+        self.receiver2.sdesc.add(sdesc2)
+        receiver3 = create_object(rpsystem.ContribRPCharacter, key="Receiver3", location=self.room)
+        receivers = [speaker, self.receiver1, self.receiver2, receiver3]
+        for receiver in receivers:
+            receiver.msg = Mock()
+        self.receiver1.recog.add(speaker, recog10)
+
+        with patch(
+            "evennia.contrib.rpsystem._render_emote", wraps=rpsystem._render_emote
+        ) as render:
+            rpsystem.send_emote(speaker, receivers, "/me waves.")
+            # receiver2 and receiver3 share the same view
+            self.assertEqual(render.call_count, 3)
+        self.receiver1.msg.assert_called_with("|bMr Sender|n waves.")
+        self.receiver2.msg.assert_called_with("|bA nice sender of emotes|n waves.")
+        receiver3.msg.assert_called_with("|bA nice sender of emotes|n waves.")
+        speaker.msg.assert_called_with("|bSender|n waves.")
+
+    def test_emote_view_key(self):
+        self.assertTrue(self.receiver1.get_emote_view_key(self.speaker, ()))
+
+        class _Listener(object):
+            process_sdesc = rpsystem.ContribRPCharacter.process_sdesc
+            process_recog = rpsystem.ContribRPCharacter.process_recog
+
+            def process_language(self, text, speaker, language, **kwargs):
+                return text
+
+        listener = _Listener()
+        self.assertIsNone(
+            rpsystem.ContribRPCharacter.get_emote_view_key(listener, self.speaker, ())
+        )
+        self.receiver1.get_emote_view_key = Mock(return_value=None)
+        self.assertIsNone(rpsystem._emote_view_key(self.receiver1, self.speaker, {}, ()))
+
     def test_rpsearch(self):
         self.speaker.sdesc.add(sdesc0)
         self.receiver1.sdesc.add(sdesc1)
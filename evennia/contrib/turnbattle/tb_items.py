@@ -461,7 +461,7 @@ def condition_tickdown(character, turnchar):
         30 seconds by default.
     """
 
-    for key in character.db.conditions:
+    for key in list(character.db.conditions):
         # The first value is the remaining turns - the second value is whose turn to count down on.
         condition_duration = character.db.conditions[key][0]
         condition_turnchar = character.db.conditions[key][1]
@@ -1232,7 +1232,7 @@ def itemfunc_cure_condition(item, user, target, **kwargs):
 
     item_msg = "%s uses %s! " % (user, item)
 
-    for key in target.db.conditions:
+    for key in list(target.db.conditions):
         if key in to_cure:
             # If condition specified in to_cure, remove it.
             item_msg += "%s no longer has the '%s' condition. " % (str(target), str(key))
@@ -0,0 +1,325 @@
+"""
+Help index
+
+The `help` command needs to know which database help entries a caller may
+see. Checking the `view` lock of every `HelpEntry` on every `help` call
+gets slow for games with many entries. The `HelpIndex` keeps an in-memory
+index of all entries instead:
+
+- Entry keys and aliases are mapped to their entries, for exact lookups.
+- An inverted index maps each word of an entry's key, aliases, category
+  and text to the entries containing it, for full-text searching.
+- Visibility is cached as a bitmap of entries per permission group. A
+  permission group is all callers with the same permissions (and, for
+  puppeted objects, the same account permissions and quell-state). Since
+  `view` locks using only permission-based lock functions give the same
+  result for everyone in a group, the locks are checked once per group
+  instead of once per call. Entries with other locks (such as `attr()`)
+  are still checked for every caller.
+
+The index is built on first use (or at server start) and kept up to date
+by the `post_save` and `post_delete` signals of `HelpEntry`. Changing the
+aliases of an entry does not save it, so call `HELP_INDEX.update(entry)`
+after doing so.
+
+"""
+
+import re
+from django.db.models.signals import post_save, post_delete
+from evennia.help.models import HelpEntry
+from evennia.utils.ansi import strip_ansi
+from evennia.utils.utils import inherits_from
+
+# lock functions whose result only depends on the permission group of the caller
+_GROUP_LOCKFUNCS = (
+    "true",
+    "all",
+    "false",
+    "none",
+    "superuser",
+    "perm",
+    "perm_above",
+    "pperm",
+    "pperm_above",
+)
+# max number of permission groups to cache visibility for
+_MAX_GROUPS = 1000
+_RE_WORD = re.compile(r"\w+")
+
+
+def _tokenize(text):
+    """
+    Split a text into a set of lowercase words, ignoring color markup.
+
+    """
+    return set(_RE_WORD.findall(strip_ansi(text).lower())) if text else set()
+
+
+class HelpIndex(object):
+    """
+    In-memory index of the database help entries.
+
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """
+        Empty the index. It will be rebuilt on next use.
+
+        """
+        self.built = False
+        # positions in the bitmaps, mapped to entries
+        self.entries = []
+        self.positions = {}
+        # name (key or alias) -> bitmap
+        self.names = {}
+        # word -> bitmap
+        self.words = {}
+        # the words/names of each position, so they can be removed again
+        self.entry_words = {}
+        self.entry_names = {}
+        # entries whose view-lock can be cached per group, and those that can't
+        self.group_mask = 0
+        self.caller_mask = 0
+        # group key -> bitmap of visible entries
+        self.visibility = {}
+
+    def build(self):
+        """
+        (Re)build the index from all help entries in the database.
+
+        """
+        self.clear()
+        for entry in HelpEntry.objects.all():
+            self._add(entry)
+        self.built = True
+
+    def _add(self, entry):
+        """
+        Add an entry at a new position.
+
+        """
+        pos = len(self.entries)
+        bit = 1 << pos
+        self.entries.append(entry)
+        self.positions[entry.id] = pos
+
+        key = entry.db_key.lower()
+        names = set([key] + [alias.lower() for alias in entry.aliases.all()])
+        for name in names:
+            self.names[name] = self.names.get(name, 0) | bit
+        words = _tokenize(
+            " ".join([key, " ".join(names), entry.db_help_category, entry.db_entrytext])
+        )
+        for word in words:
+            self.words[word] = self.words.get(word, 0) | bit
+        self.entry_names[pos] = names
+        self.entry_words[pos] = words
+
+        lock = entry.locks.locks.get("view")
+        if not lock or all(tup[0].__name__ in _GROUP_LOCKFUNCS for tup in lock[1]):
+            self.group_mask |= bit
+        else:
+            self.caller_mask |= bit
+
+    def _remove(self, entry):
+        """
+        Remove an entry from the index. Its position is left empty.
+
+        """
+        pos = self.positions.pop(entry.id, None)
+        if pos is None:
+            return
+        mask = ~(1 << pos)
+        self.entries[pos] = None
+        for name in self.entry_names.pop(pos):
+            self.names[name] &= mask
+            if not self.names[name]:
+                del self.names[name]
+        for word in self.entry_words.pop(pos):
+            self.words[word] &= mask
+            if not self.words[word]:
+                del self.words[word]
+        self.group_mask &= mask
+        self.caller_mask &= mask
+
+    def update(self, entry):
+        """
+        Add a new or changed help entry to the index.
+
+        Args:
+            entry (HelpEntry): The entry to (re)index.
+
+        """
+        if not self.built:
+            return
+        self._remove(entry)
+        if len(self.entries) > 2 * len(self.positions) + 100:
+            # too many empty positions, start over
+            self.build()
+        else:
+            self._add(entry)
+        self.visibility = {}
+
+    def remove(self, entry):
+        """
+        Remove a deleted help entry from the index.
+
+        Args:
+            entry (HelpEntry): The entry to remove.
+
+        """
+        if self.built:
+            self._remove(entry)
+            self.visibility = {}
+
+    def get_group_key(self, caller):
+        """
+        Get the permission group of a caller.
+
+        Args:
+            caller (Object or Account): The one looking for help.
+
+        Returns:
+            group_key (tuple or None): A hashable key. Callers with the
+                same key pass the same permission-based locks. None if the
+                caller can't be grouped.
+
+        """
+        try:
+            if caller.locks.lock_bypass:
+                return ("bypass",)
+            perms = tuple(sorted(caller.permissions.all()))
+        except AttributeError:
+            return None
+        is_object = inherits_from(caller, "evennia.objects.objects.DefaultObject")
+        account = is_object and caller.account
+        if account:
+            return (
+                "puppet",
+                perms,
+                tuple(sorted(account.permissions.all())),
+                bool(account.attributes.get("_quell")),
+            )
+        return ("object" if is_object else "account", perms)
+
+    def _visible(self, caller):
+        """
+        Get the bitmap of all entries visible to caller.
+
+        """
+        if not self.built:
+            self.build()
+        group_key = self.get_group_key(caller)
+        if group_key == ("bypass",):
+            return self.group_mask | self.caller_mask
+        visible = self.visibility.get(group_key) if group_key else None
+        if visible is None:
+            mask = self.group_mask if group_key else self.group_mask | self.caller_mask
+            visible = self._check(caller, mask)
+            if group_key:
+                if len(self.visibility) >= _MAX_GROUPS:
+                    self.visibility = {}
+                self.visibility[group_key] = visible
+        if group_key and self.caller_mask:
+            visible |= self._check(caller, self.caller_mask)
+        return visible
+
+    def _check(self, caller, mask):
+        """
+        Check the view-lock of the entries in mask.
+
+        """
+        visible = 0
+        for pos in self._iter_bits(mask):
+            if self.entries[pos].access(caller, "view", default=True):
+                visible |= 1 << pos
+        return visible
+
+    @staticmethod
+    def _iter_bits(bitmap):
+        """
+        Get the positions set in a bitmap, in order.
+
+        """
+        return [pos for pos, bit in enumerate(bin(bitmap)[:1:-1]) if bit == "1"]
+
+    def _get_entries(self, bitmap):
+        return [self.entries[pos] for pos in self._iter_bits(bitmap)]
+
+    def get_visible(self, caller):
+        """
+        Get all help entries caller may view.
+
+        Args:
+            caller (Object or Account): The one looking for help.
+
+        Returns:
+            entries (list): The visible `HelpEntry`s.
+
+        """
+        return self._get_entries(self._visible(caller))
+
+    def find(self, name, caller):
+        """
+        Find visible help entries by exact key or alias (not case-sensitive).
+
+        Args:
+            name (str): The key or alias to look for.
+            caller (Object or Account): The one looking for help.
+
+        Returns:
+            entries (list): The matching `HelpEntry`s. If any entry has
+                name as its key, only those are returned.
+
+        """
+        if not self.built:
+            self.build()
+        name = name.strip().lower()
+        matches = self.names.get(name, 0)
+        if not matches:
+            return []
+        entries = self._get_entries(matches & self._visible(caller))
+        return [entry for entry in entries if entry.db_key.lower() == name] or entries
+
+    def search(self, text, caller):
+        """
+        Find visible help entries containing all the words of a text, in
+        their key, aliases, category or help text.
+
+        Args:
+            text (str): The words to look for.
+            caller (Object or Account): The one looking for help.
+
+        Returns:
+            entries (list): The matching `HelpEntry`s.
+
+        """
+        if not self.built:
+            self.build()
+        words = _tokenize(text)
+        if not words:
+            return []
+        matches = -1
+        for word in words:
+            matches &= self.words.get(word, 0)
+            if not matches:
+                return []
+        return self._get_entries(matches & self._visible(caller))
+
+
+HELP_INDEX = HelpIndex()
+
+
+def _update_index(sender, instance, **kwargs):
+    HELP_INDEX.update(instance)
+
+
+def _remove_from_index(sender, instance, **kwargs):
+    HELP_INDEX.remove(instance)
+
+
+post_save.connect(_update_index, sender=HelpEntry, dispatch_uid="help_index_update")
+post_delete.connect(_remove_from_index, sender=HelpEntry, dispatch_uid="help_index_remove")
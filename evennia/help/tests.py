@@ -0,0 +1,66 @@
+"""
+Tests for the help system.
+
+"""
+
+import mock
+from evennia.utils import create
+from evennia.utils.test_resources import EvenniaTest
+from evennia.help import helpindex
+
+
+class TestHelpIndex(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.index = helpindex.HelpIndex()
+        self.public = create.create_help_entry(
+            "Combat", "How to fight with |wswords|n.", category="Rules", aliases=["fight"]
+        )
+        self.staff = create.create_help_entry(
+            "Building", "Making rooms and exits.", locks="view:perm(Builder)"
+        )
+        self.attr = create.create_help_entry("Secret", "Only for heroes.", locks="view:attr(hero)")
+
+    def _keys(self, entries):
+        return sorted(entry.key for entry in entries)
+
+    def test_visibility(self):
+        self.assertEqual(self._keys(self.index.get_visible(self.char1)), ["Building", "Combat"])
+        self.assertEqual(self._keys(self.index.get_visible(self.char2)), ["Combat"])
+        self.char2.db.hero = True
+        self.assertEqual(self._keys(self.index.get_visible(self.char2)), ["Combat", "Secret"])
+
+    def test_visibility_cached_per_group(self):
+        self.index.get_visible(self.char2)
+        with mock.patch.object(type(self.public), "access", return_value=True) as access:
+            self.assertEqual(self._keys(self.index.get_visible(self.char2)), ["Combat", "Secret"])
+            # only the attr()-locked entry is checked again
+            self.assertEqual(access.call_count, 1)
+        # changing permissions changes the group
+        self.account2.permissions.add("Builder")
+        self.assertEqual(self._keys(self.index.get_visible(self.char2)), ["Building", "Combat"])
+
+    def test_find_and_search(self):
+        self.assertEqual(self.index.find("FIGHT", self.char2), [self.public])
+        self.assertEqual(self.index.find("building", self.char2), [])
+        self.assertEqual(self.index.find("building", self.char1), [self.staff])
+        self.assertEqual(self.index.search("swords rules", self.char2), [self.public])
+        self.assertEqual(self.index.search("exits", self.char2), [])
+        self.assertEqual(self.index.search("rooms exits", self.char1), [self.staff])
+
+    def test_update(self):
+        self.index.build()
+        self.index.get_visible(self.char2)
+        # the signals update the global index
+        with mock.patch.object(helpindex, "HELP_INDEX", self.index):
+            self.staff.locks.add("view:all()")
+            self.staff.entrytext = "Making rooms with dig."
+            self.assertEqual(self._keys(self.index.get_visible(self.char2)), ["Building", "Combat"])
+            self.assertEqual(self.index.search("dig", self.char2), [self.staff])
+            self.assertEqual(self.index.search("exits", self.char2), [])
+            self.public.aliases.add("battle")
+            self.index.update(self.public)
+            self.assertEqual(self.index.find("battle", self.char2), [self.public])
+            self.public.delete()
+            self.assertEqual(self.index.find("fight", self.char2), [])
+            self.assertEqual(self._keys(self.index.get_visible(self.char2)), ["Building"])
@@ -11,6 +11,11 @@ Note that `accessing_obj` and `accessed_obj` can be any object type
 with a lock variable/field, so be careful to not expect
 a certain object type.
 
+The results of lock checks are cached while a command runs, until
+something is saved to the database (see `settings.LOCK_CACHE`). A lock
+function depending on anything else, such as sessions or the time, should
+opt out by setting `lock_cache = False` on the function, like `has_account`.
+
 
 **Appendix: MUX locks**
 
@@ -671,6 +676,10 @@ def has_account(accessing_obj, accessed_obj, *args, **kwargs):
     return hasattr(accessing_obj, "has_account") and accessing_obj.has_account
 
 
+# sessions connect without saving anything, so this can't be cached
+has_account.lock_cache = False
+
+
 def serversetting(accessing_obj, accessed_obj, *args, **kwargs):
     """
     Only returns true if the Evennia settings exists, alternatively has
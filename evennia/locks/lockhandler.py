@@ -106,6 +106,7 @@ to any other identifier you can use.
 
 import re
 from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from evennia.utils import logger, utils
 from django.utils.translation import gettext as _
 
@@ -113,6 +114,7 @@ __all__ = ("LockHandler", "LockException")
 
 WARNING_LOG = settings.LOCKWARNING_LOG_FILE
 _LOCK_HANDLER = None
+_USE_LOCK_CACHE = settings.LOCK_CACHE
 
 
 #
@@ -156,6 +158,101 @@ _RE_SEPS = re.compile(r"(?<=[ )])AND(?=\s)|(?<=[ )])OR(?=\s)|(?<=[ )])NOT(?=\s)"
 _RE_OK = re.compile(r"%s|and|or|not")
 
 
+#
+# Command lock cache
+#
+# While a command runs, the results of `LockHandler.check` are remembered
+# per (accessing_obj, lockhandler, access_type), since commands (like `look`
+# or `get`) often check the same locks many times. Any database change
+# (such as to locks, permissions, Attributes or locations) empties the cache.
+# Lock functions depending on things not stored in the database can opt out
+# by setting `lock_cache = False` on the function.
+#
+
+# the LockCaches in use, the last one being checked against
+_LOCK_CACHES = []
+_LOCK_CACHE_STATS = {"hits": 0, "misses": 0, "clears": 0}
+
+
+class LockCache(object):
+    """
+    The lock check results of one command. The cmdhandler uses this as a
+    context manager around running a command, so the cache is only used
+    until the command first waits for a Deferred; code running after that,
+    or by other commands meanwhile, doesn't use it.
+
+    """
+
+    def __init__(self):
+        # (id(accessing_obj), id(lockhandler), access_type) -> (result,
+        # lockdef, accessing_obj, lockhandler). Keeping the objects stops
+        # their ids from being reused.
+        self.results = {}
+
+    def __enter__(self):
+        _LOCK_CACHES.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _LOCK_CACHES.remove(self)
+        self.results.clear()
+
+    def clear(self):
+        """
+        Empty the cache.
+
+        """
+        if self.results:
+            self.results.clear()
+            _LOCK_CACHE_STATS["clears"] += 1
+
+
+def clear_lock_cache():
+    """
+    Empty the lock caches in use. Call this after changing something lock
+    functions depend on without saving to the database.
+
+    """
+    for cache in _LOCK_CACHES:
+        cache.clear()
+
+
+def get_lock_cache_stats(reset=False):
+    """
+    Get the statistics of the lock cache.
+
+    Args:
+        reset (bool, optional): Zero the statistics after reading them.
+
+    Returns:
+        stats (dict): The number of `hits` and `misses` of cached lock
+            checks, the `hit_rate` (0..1) and how often a cache was emptied
+            by changes (`clears`).
+
+    """
+    stats = dict(_LOCK_CACHE_STATS)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    if reset:
+        _LOCK_CACHE_STATS.update(hits=0, misses=0, clears=0)
+    return stats
+
+
+def _clear_lock_cache(sender, **kwargs):
+    """
+    Empty the lock caches on database changes. This is connected to the
+    `post_save`, `post_delete` and `m2m_changed` signals of all models.
+
+    """
+    if _LOCK_CACHES:
+        clear_lock_cache()
+
+
+post_save.connect(_clear_lock_cache, dispatch_uid="lock_cache_save")
+post_delete.connect(_clear_lock_cache, dispatch_uid="lock_cache_delete")
+m2m_changed.connect(_clear_lock_cache, dispatch_uid="lock_cache_m2m")
+
+
 #
 #
 # Lock handler
@@ -559,14 +656,26 @@ class LockHandler(object):
         # no superuser or bypass -> normal lock operation
         if access_type in self.locks:
             # we have a lock, test it.
-            evalstring, func_tup, raw_string = self.locks[access_type]
+            lockdef = self.locks[access_type]
+            evalstring, func_tup, raw_string = lockdef
+            cache = _LOCK_CACHES[-1].results if _LOCK_CACHES and _USE_LOCK_CACHE else None
+            if cache is not None:
+                cachekey = (id(accessing_obj), id(self), access_type)
+                cached = cache.get(cachekey)
+                if cached and cached[1] is lockdef:
+                    _LOCK_CACHE_STATS["hits"] += 1
+                    return cached[0]
+                _LOCK_CACHE_STATS["misses"] += 1
             # execute all lock funcs in the correct order, producing a tuple of True/False results.
             true_false = tuple(
                 bool(tup[0](accessing_obj, self.obj, *tup[1], **tup[2])) for tup in func_tup
             )
             # the True/False tuple goes into evalstring, which combines them
             # with AND/OR/NOT in order to get the final result.
-            return eval(evalstring % true_false)
+            result = eval(evalstring % true_false)
+            if cache is not None and all(getattr(tup[0], "lock_cache", True) for tup in func_tup):
+                cache[cachekey] = (result, lockdef, accessing_obj, self)
+            return result
         else:
             return default
 
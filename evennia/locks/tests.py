@@ -7,6 +7,7 @@ the stability and integrity of the codebase during updates.
 This module tests the lock functionality of Evennia.
 
 """
+from twisted.internet.defer import Deferred
 from evennia.utils.test_resources import EvenniaTest
 
 try:
@@ -16,7 +17,9 @@ except ImportError:
     from django.test import TestCase, override_settings
 
 from evennia import settings_default
-from evennia.locks import lockfuncs
+from evennia.commands.cmdhandler import cmdhandler
+from evennia.commands.command import Command
+from evennia.locks import lockfuncs, lockhandler
 from evennia.utils.create import create_object
 
 # ------------------------------------------------------------
@@ -42,6 +45,75 @@ class TestLockCheck(EvenniaTest):
         self.assertEqual(True, self.obj1.locks.check(self.obj2, "not_exist", default=True))
 
 
+class TestLockCache(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        lockhandler.get_lock_cache_stats(reset=True)
+        self.cache = lockhandler.LockCache()
+        self.cache.__enter__()
+
+    def tearDown(self):
+        if self.cache in lockhandler._LOCK_CACHES:
+            self.cache.__exit__(None, None, None)
+        super().tearDown()
+
+    def test_cache(self):
+        self.obj1.locks.add("edit:perm(Builder)")
+        self.room1.locks.add("enter:inside()")
+        self.assertFalse(self.obj1.locks.check(self.obj2, "edit"))
+        self.assertFalse(self.obj1.locks.check(self.obj2, "edit"))
+        self.assertEqual(lockhandler.get_lock_cache_stats()["hits"], 1)
+        # changing permissions, locks or locations empties the cache
+        self.obj2.permissions.add("Builder")
+        self.assertTrue(self.obj1.locks.check(self.obj2, "edit"))
+        self.obj1.locks.add("edit:false()")
+        self.assertFalse(self.obj1.locks.check(self.obj2, "edit"))
+        self.assertTrue(self.room1.locks.check(self.obj2, "enter"))
+        self.obj2.location = self.room2
+        self.assertFalse(self.room1.locks.check(self.obj2, "enter"))
+        stats = lockhandler.get_lock_cache_stats(reset=True)
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 5))
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 6)
+        self.assertGreaterEqual(stats["clears"], 3)
+        # a nested command has its own cache
+        self.assertTrue(self.cache.results)
+        with lockhandler.LockCache() as cache:
+            self.assertFalse(self.room1.locks.check(self.obj2, "enter"))
+            self.assertEqual(len(cache.results), 1)
+        self.assertEqual(lockhandler.get_lock_cache_stats()["hits"], 0)
+        # nothing is cached outside of commands
+        self.cache.__exit__(None, None, None)
+        self.assertFalse(self.cache.results)
+        self.assertFalse(self.room1.locks.check(self.obj2, "enter"))
+        self.assertFalse(lockhandler._LOCK_CACHES)
+
+    def test_opt_out(self):
+        self.obj1.locks.add("traverse:has_account()")
+        self.assertTrue(self.obj1.locks.check(self.char1, "traverse"))
+        self.assertTrue(self.obj1.locks.check(self.char1, "traverse"))
+        self.assertEqual(lockhandler.get_lock_cache_stats()["hits"], 0)
+        self.assertFalse(self.cache.results)
+
+    def test_cmdhandler(self):
+        waiting = Deferred()
+        caches = []
+
+        class CmdWait(Command):
+            key = "wait"
+
+            def func(self):
+                caches.append(list(lockhandler._LOCK_CACHES))
+                return waiting.addCallback(lambda _: caches.append(list(lockhandler._LOCK_CACHES)))
+
+        self.cache.__exit__(None, None, None)
+        cmdhandler(self.char1, "wait", callertype="object", cmdobj=CmdWait(), cmdobj_key="wait")
+        # the command had a cache until it waited for the Deferred
+        self.assertEqual(len(caches[0]), 1)
+        self.assertFalse(lockhandler._LOCK_CACHES)
+        waiting.callback(None)
+        self.assertEqual(caches[1], [])
+
+
 class TestLockfuncs(EvenniaTest):
     def setUp(self):
         super(TestLockfuncs, self).setUp()
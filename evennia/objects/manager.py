@@ -7,11 +7,14 @@ from django.db.models import Q
 from django.conf import settings
 from django.db.models.fields import exceptions
 from evennia.typeclasses.managers import TypedObjectManager, TypeclassManager
+from evennia.typeclasses.attributes import Attribute
 from evennia.utils.utils import is_iter, make_iter, string_partial_matching
 
 __all__ = ("ObjectManager",)
 _GA = object.__getattribute__
 
+_ATTR_VALUE_FIELD = Attribute._meta.get_field("db_value")
+
 # delayed import
 _ATTR = None
 
@@ -175,11 +178,18 @@ class ObjectDBManager(TypedObjectManager):
         )
         type_restriction = typeclasses and Q(db_typeclass_path__in=make_iter(typeclasses)) or Q()
 
+        if attribute_value is None:
+            value_restriction = Q(db_attributes__db_value=None)
+        else:
+            value_restriction = Q(
+                db_attributes__db_value__in=_ATTR_VALUE_FIELD.get_lookup_values(attribute_value)
+            )
+
         results = self.filter(
             cand_restriction
             & type_restriction
             & Q(db_attributes__db_key=attribute_name)
-            & Q(db_attributes__db_value=attribute_value)
+            & value_restriction
         ).order_by("id")
         return results
 
@@ -183,10 +183,13 @@ class ScriptDBManager(TypedObjectManager):
                 # special mode when server starts or object logs in.
                 # This deletes all non-persistent scripts from database
                 nr_stopped += self.remove_non_persistent(obj=obj)
-            # turn off the activity flag for all remaining scripts
-            scripts = self.get_all_scripts()
+            # turn off the activity flag for all remaining scripts, in one query
+            scripts = list(self.get_all_scripts())
+            self.get_all_scripts().update(db_is_active=False)
             for script in scripts:
-                script.is_active = False
+                script.db_is_active = False
+            # load the Attributes and Tags of all scripts in bulk
+            self.prefetch_handlers(scripts)
 
         elif not scripts:
             # normal operation
@@ -7,15 +7,19 @@ ability to run timers.
 
 from twisted.internet.defer import Deferred, maybeDeferred
 from twisted.internet.task import LoopingCall
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils.translation import gettext as _
 from evennia.typeclasses.models import TypeclassBase
 from evennia.scripts.models import ScriptDB
 from evennia.scripts.manager import ScriptManager
+from evennia.scripts.timerwheel import WheelTask
 from evennia.utils import create, logger
 
 __all__ = ["DefaultScript", "DoNothing", "Store"]
 
+_TIMER_RESOLUTION = settings.SCRIPT_TIMER_RESOLUTION
+
 
 FLUSHING_INSTANCES = False  # whether we're in the process of flushing scripts from the cache
 SCRIPT_FLUSH_TIMERS = {}  # stores timers for scripts that are currently being flushed
@@ -157,13 +161,24 @@ class ScriptBase(ScriptDB, metaclass=TypeclassBase):
     def __repr__(self):
         return str(self)
 
+    def _create_task(self):
+        """
+        Create the task runner. This is a `WheelTask` on the shared timer
+        wheel, or an `ExtendedLoopingCall` if `settings.SCRIPT_TIMER_RESOLUTION`
+        is 0.
+
+        """
+        if _TIMER_RESOLUTION > 0:
+            return WheelTask(self._step_task)
+        return ExtendedLoopingCall(self._step_task)
+
     def _start_task(self):
         """
         Start task runner.
 
         """
         if not self.ndb._task:
-            self.ndb._task = ExtendedLoopingCall(self._step_task)
+            self.ndb._task = self._create_task()
 
         if self.db._paused_time:
             # the script was paused; restarting
@@ -438,7 +453,7 @@ class DefaultScript(ScriptBase):
             # The script is already running, but make sure we have a _task if
             # this is after a cache flush
             if not self.ndb._task and self.db_interval > 0:
-                self.ndb._task = ExtendedLoopingCall(self._step_task)
+                self.ndb._task = self._create_task()
                 try:
                     start_delay, callcount = SCRIPT_FLUSH_TIMERS[self.id]
                     del SCRIPT_FLUSH_TIMERS[self.id]
@@ -1,10 +1,14 @@
 # this is an optimized version only available in later Django versions
+import mock
 from unittest import TestCase
+from twisted.internet.defer import Deferred, fail
+from twisted.internet.task import Clock
 from evennia import DefaultScript
 from evennia.scripts.models import ScriptDB, ObjectDoesNotExist
 from evennia.utils.create import create_script
 from evennia.utils.test_resources import EvenniaTest
 from evennia.scripts.scripts import DoNothing
+from evennia.scripts import timerwheel
 
 
 class TestScript(EvenniaTest):
@@ -51,3 +55,111 @@ class TestScriptDB(TestCase):
         "Can deleted scripts be said to be valid?"
         self.scr.delete()
         self.assertFalse(self.scr.is_valid())  # assertRaises? See issue #509
+
+
+class TestTimerWheel(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.wheel = timerwheel.TimerWheel(resolution=0.1, clock=self.clock)
+        self.calls = []
+
+    def _task(self, func=None):
+        task = timerwheel.WheelTask(func or (lambda: self.calls.append(self.clock.seconds())))
+        task.wheel = self.wheel
+        return task
+
+    def test_repeat(self):
+        task = self._task()
+        task.start(1.0, now=False)
+        self.clock.pump([0.5] * 7)
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(task.callcount, 3)
+        # one reactor timer, for the next slot with a task
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        self.assertAlmostEqual(task.next_call_time(), 0.5)
+        self.assertEqual(len(self.wheel), 1)
+        task.stop()
+        self.assertEqual(len(self.wheel), 0)
+        self.assertFalse(self.clock.getDelayedCalls())
+        self.clock.pump([0.5] * 4)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_start_delay_and_force_repeat(self):
+        task = self._task()
+        task.start(2.0, now=False, start_delay=0.5, count_start=4)
+        self.assertAlmostEqual(task.next_call_time(), 0.5)
+        self.clock.advance(0.5)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(task.callcount, 5)
+        self.assertAlmostEqual(task.next_call_time(), 2.0)
+        self.clock.advance(1.0)
+        task.force_repeat()
+        self.assertEqual(len(self.calls), 2)
+        # the timer restarts from the forced call
+        self.clock.advance(1.5)
+        self.assertEqual(len(self.calls), 2)
+        self.clock.advance(0.5)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_many_tasks(self):
+        tasks = [self._task() for _ in range(100)]
+        for itask, task in enumerate(tasks):
+            task.start(1.0 + itask % 10, now=True)
+        self.assertEqual(len(self.calls), 100)
+        self.clock.pump([0.1] * 101)
+        self.assertEqual(len(self.calls), 100 + sum(10 // (1 + itask % 10) for itask in range(100)))
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+
+    def test_deferred_and_error(self):
+        deferred = Deferred()
+        task = self._task(lambda: deferred)
+        task.start(1.0, now=True)
+        # waits for the deferred before scheduling the next call
+        self.clock.advance(5)
+        self.assertEqual(task.callcount, 1)
+        deferred.callback(None)
+        self.clock.advance(1)
+        self.assertEqual(task.callcount, 2)
+
+        errors = []
+        task = self._task(lambda: 1 / 0)
+        task.start(1.0, now=False).addErrback(errors.append)
+        self.clock.advance(1)
+        self.assertFalse(task.running)
+        self.assertEqual(len(errors), 1)
+
+    def test_deferred_error(self):
+        # a Deferred failing later, or already failed, stops the task
+        for deferred in (Deferred(), fail(ZeroDivisionError())):
+            errors = []
+            task = self._task(lambda: deferred)
+            task.start(1.0, now=True).addErrback(errors.append)
+            if not deferred.called:
+                self.assertTrue(task.running)
+                deferred.errback(ZeroDivisionError())
+            self.assertFalse(task.running)
+            self.assertEqual(len(self.wheel), 0)
+            self.assertEqual(len(errors), 1)
+            self.assertTrue(errors[0].check(ZeroDivisionError))
+
+
+class TestScriptTimer(EvenniaTest):
+    def test_script_repeats(self):
+        clock = Clock()
+        with mock.patch.object(timerwheel, "TIMER_WHEEL", timerwheel.TimerWheel(0.1, clock)):
+            script = create_script(
+                DefaultScript, key="timed", interval=10, repeats=3, start_delay=True
+            )
+            script.at_repeat = mock.Mock()
+            self.assertIsInstance(script.ndb._task, timerwheel.WheelTask)
+            self.assertEqual(script.time_until_next_repeat(), 10)
+            clock.advance(10)
+            self.assertEqual(script.at_repeat.call_count, 1)
+            script.pause()
+            self.assertEqual(script.db._paused_time, 10)
+            clock.advance(5)
+            script.unpause()
+            self.assertEqual(script.time_until_next_repeat(), 10)
+            clock.pump([5] * 4)
+            self.assertEqual(script.at_repeat.call_count, 3)
+            self.assertFalse(script.id)
@@ -0,0 +1,311 @@
+"""
+Timer wheel
+
+A Script with an interval needs to be called every `interval` seconds.
+Giving every Script its own `LoopingCall` means one reactor timer per
+Script, and each timer has to be re-sorted into the reactor's timer heap
+every time it fires. With tens of thousands of Scripts, this overhead
+dominates the server's idle CPU use.
+
+The `TimerWheel` multiplexes all Script timers onto a single reactor
+timer. Time is cut into slots of `resolution` seconds (by default
+`settings.SCRIPT_TIMER_RESOLUTION`), and each timer is put in the bucket of
+the slot it is due in. The wheel only wakes up for slots with timers in
+them and calls all of those timers in one go. A timer is never called
+before it's due, but may be called up to `resolution` seconds late.
+
+`WheelTask` is a drop-in replacement for `ExtendedLoopingCall` that uses
+the wheel; `DefaultScript` uses it unless the resolution is set to 0.
+
+"""
+
+import heapq
+import math
+from django.conf import settings
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.python import failure
+from evennia.utils import logger
+
+_RESOLUTION = settings.SCRIPT_TIMER_RESOLUTION
+
+
+class TimerWheel(object):
+    """
+    Calls many timers from a single reactor timer.
+
+    """
+
+    def __init__(self, resolution=_RESOLUTION, clock=reactor):
+        """
+        Args:
+            resolution (float, optional): Length of a time slot, in seconds.
+            clock (IReactorTime, optional): Provides `seconds` and
+                `callLater`. Mainly here for testing.
+
+        """
+        self.resolution = resolution
+        self.clock = clock
+        # slot -> [task, ...], and a heap of the slots with a bucket
+        self.buckets = {}
+        self.slots = []
+        # the reactor timer for the earliest slot
+        self.call = None
+        self.call_slot = None
+        self.ticking = False
+        self.nscheduled = 0
+
+    def __len__(self):
+        """
+        Number of timers waiting in the wheel.
+
+        """
+        return self.nscheduled
+
+    def schedule(self, task, when):
+        """
+        Schedule a task to be called at a given time.
+
+        Args:
+            task (WheelTask): The task to call. It must not be scheduled already.
+            when (float): The time to call it, as given by `clock.seconds()`.
+
+        Returns:
+            slot (int): The slot the task was put in. The task is only
+                called if its `_slot` property is still this slot when the
+                slot comes up; this is how tasks are cancelled.
+
+        """
+        # rounding avoids float errors putting a task in the slot after its due time
+        slot = int(math.ceil(round(when / self.resolution, 6)))
+        self.nscheduled += 1
+        try:
+            self.buckets[slot].append(task)
+        except KeyError:
+            self.buckets[slot] = [task]
+            heapq.heappush(self.slots, slot)
+            if not self.ticking and (self.call_slot is None or slot < self.call_slot):
+                self._set_call(slot)
+        return slot
+
+    def cancel(self, task):
+        """
+        Unschedule a task. It's left in its bucket, but won't be called.
+
+        Args:
+            task (WheelTask): A scheduled task.
+
+        """
+        task._slot = None
+        self.nscheduled -= 1
+        if not self.nscheduled:
+            # nothing left to call; don't leave a reactor timer behind
+            self.buckets, self.slots = {}, []
+            if self.call and self.call.active():
+                self.call.cancel()
+            self.call, self.call_slot = None, None
+
+    def _set_call(self, slot):
+        """
+        Make sure the reactor timer fires for slot.
+
+        """
+        delay = max(0, slot * self.resolution - self.clock.seconds())
+        if self.call and self.call.active():
+            self.call.reset(delay)
+        else:
+            self.call = self.clock.callLater(delay, self._tick)
+        self.call_slot = slot
+
+    def _tick(self):
+        """
+        Called by the reactor; call all timers that are due.
+
+        """
+        self.call, self.call_slot = None, None
+        now_slot = int(math.floor(round(self.clock.seconds() / self.resolution, 6)))
+        self.ticking = True
+        try:
+            while self.slots and self.slots[0] <= now_slot:
+                slot = heapq.heappop(self.slots)
+                for task in self.buckets.pop(slot):
+                    if task._slot == slot:
+                        task._slot = None
+                        self.nscheduled -= 1
+                        try:
+                            task()
+                        except Exception:
+                            logger.log_trace()
+        finally:
+            self.ticking = False
+        if self.slots:
+            self._set_call(self.slots[0])
+
+
+TIMER_WHEEL = TimerWheel()
+
+
+class WheelTask(object):
+    """
+    A repeating call run by a `TimerWheel`. It has the same API as
+    `ExtendedLoopingCall` (`start`, `stop`, `force_repeat`, `next_call_time`
+    and the `running`, `interval`, `callcount` and `start_delay`
+    properties).
+
+    """
+
+    def __init__(self, f, *args, **kwargs):
+        """
+        Args:
+            f (callable): What to call every interval. If it returns a
+                Deferred, the next call is scheduled when that has fired.
+            *args, **kwargs: Passed to `f`.
+
+        """
+        self.f = f
+        self.args = args
+        self.kwargs = kwargs
+        self.wheel = TIMER_WHEEL
+        self.running = False
+        self.interval = None
+        self.starttime = None
+        self.start_delay = None
+        self.callcount = 0
+        self._deferred = None
+        self._slot = None
+
+    @property
+    def clock(self):
+        return self.wheel.clock
+
+    def start(self, interval, now=True, start_delay=None, count_start=0):
+        """
+        Start running the function every interval seconds.
+
+        Args:
+            interval (int): Repeat interval in seconds.
+            now (bool, optional): Whether to start immediately or after
+                `start_delay` seconds.
+            start_delay (int): The number of seconds before starting.
+                If None, wait interval seconds. Only valid if `now` is `False`.
+            count_start (int): Number of repeats to start at.
+
+        Returns:
+            deferred (Deferred): Fires with this task when it is stopped.
+
+        Raises:
+            AssertError: if trying to start a task which is already running.
+            ValueError: If interval is set to an invalid value < 0.
+
+        """
+        assert not self.running, "Tried to start an already running WheelTask."
+        if interval < 0:
+            raise ValueError("interval must be >= 0")
+        self.running = True
+        deferred = self._deferred = Deferred()
+        self.starttime = self.clock.seconds()
+        self.interval = interval
+        self.callcount = max(0, count_start)
+        self.start_delay = start_delay if start_delay is None else max(0, start_delay)
+
+        if now:
+            self()
+        elif start_delay is not None and start_delay >= 0:
+            self._schedule(self.starttime + self.start_delay)
+        else:
+            self._schedule(self.starttime + interval)
+        return deferred
+
+    def stop(self):
+        """
+        Stop the task.
+
+        """
+        assert self.running, "Tried to stop a WheelTask that was not running."
+        self.running = False
+        self._unschedule()
+        deferred, self._deferred = self._deferred, None
+        deferred.callback(self)
+
+    def __call__(self):
+        """
+        Tick one step and schedule the next one.
+
+        """
+        self.callcount += 1
+        if self.start_delay:
+            self.start_delay = None
+            self.starttime = self.clock.seconds()
+        try:
+            result = self.f(*self.args, **self.kwargs)
+        except Exception:
+            self._failed(failure.Failure())
+            return
+        if isinstance(result, Deferred):
+            result.addCallbacks(lambda _: self._schedule_next(), self._failed)
+        else:
+            self._schedule_next()
+
+    def _failed(self, reason):
+        """
+        Stop the task when the function fails, passing the failure on to the
+        Deferred returned by `start` (the same way as `LoopingCall`).
+
+        """
+        self.running = False
+        self._unschedule()
+        deferred, self._deferred = self._deferred, None
+        if deferred is not None:
+            deferred.errback(reason)
+
+    def _schedule(self, when):
+        self._slot = self.wheel.schedule(self, when)
+
+    def _unschedule(self):
+        if self._slot is not None:
+            self.wheel.cancel(self)
+
+    def _schedule_next(self):
+        """
+        Schedule the next call, skipping any intervals already passed (the
+        same way as `LoopingCall`).
+
+        """
+        if not self.running or self._slot is not None:
+            # stopped or restarted by the call
+            return
+        now = self.clock.seconds()
+        if self.interval:
+            self._schedule(now + self.interval - ((now - self.starttime) % self.interval))
+        else:
+            self._schedule(now + self.wheel.resolution)
+
+    def force_repeat(self):
+        """
+        Force-fire the callback.
+
+        Raises:
+            AssertionError: When trying to force a task that is not
+                running.
+
+        """
+        assert self.running, "Tried to fire a WheelTask that was not running."
+        self._unschedule()
+        self.starttime = self.clock.seconds()
+        self()
+
+    def next_call_time(self):
+        """
+        Get the next call time. This also takes the eventual effect
+        of start_delay into account.
+
+        Returns:
+            next (int or None): The time in seconds until the next call. This
+                takes `start_delay` into account. Returns `None` if
+                the task is not running.
+
+        """
+        if self.running and self.interval > 0:
+            total_runtime = self.clock.seconds() - self.starttime
+            interval = self.start_delay or self.interval
+            return interval - (total_runtime % self.interval)
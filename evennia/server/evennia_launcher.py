@@ -1835,12 +1835,14 @@ def init_game_directory(path, check_db=True, need_gamedir=True):
             print(INFO_WINDOWS_BATFILE.format(twistd_path=twistd_path))
 
 
-def run_dummyrunner(number_of_dummies):
+def run_dummyrunner(number_of_dummies, options=None):
     """
     Start an instance of the dummyrunner
 
     Args:
         number_of_dummies (int): The number of dummy accounts to start.
+        options (list, optional): Extra command-line options to pass to
+            the dummyrunner, such as `["--scenario", "login_storm"]`.
 
     Notes:
         The dummy accounts' behavior can be customized by adding a
@@ -1853,6 +1855,7 @@ def run_dummyrunner(number_of_dummies):
     config_file = os.path.join(SETTINGS_PATH, "dummyrunner_settings.py")
     if os.path.exists(config_file):
         cmdstr.extend(["--config", config_file])
+    cmdstr.extend(options or [])
     try:
         call(cmdstr, env=getenv())
     except KeyboardInterrupt:
@@ -2178,7 +2181,7 @@ def main():
     if args.dummyrunner:
         # launch the dummy runner
         init_game_directory(CURRENT_DIR, check_db=True)
-        run_dummyrunner(args.dummyrunner[0])
+        run_dummyrunner(args.dummyrunner[0], unknown_args)
     elif args.listsetting:
         # display all current server settings
         init_game_directory(CURRENT_DIR, check_db=False)
@@ -2259,7 +2262,7 @@ def main():
         if option in ("makemessages", "compilemessages"):
             # some commands don't require the presence of a game directory to work
             need_gamedir = False
-        if option in ("shell", "check", "makemigrations", "createsuperuser"):
+        if option in ("shell", "check", "makemigrations", "createsuperuser", "convert_attributes"):
             # some django commands requires the database to exist,
             # or evennia._init to have run before they work right.
             check_db = True
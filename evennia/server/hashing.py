@@ -0,0 +1,217 @@
+"""
+Password hashing off the reactor thread.
+
+Django's password hashers are deliberately slow (PBKDF2 with many
+thousands of iterations). Evennia runs all game logic in the Twisted
+reactor thread, so hashing a password there freezes every session for the
+duration. The `HashingPool` runs the hashing in a small pool of worker
+threads instead. Python's `hashlib` releases the GIL while hashing, so
+the reactor keeps running meanwhile.
+
+The pool is used by `DefaultAccount.authenticate_async` and
+`DefaultAccount.set_password_async`. Its size is set by
+`settings.PASSWORD_HASHING_THREADS`. At most
+`settings.PASSWORD_HASHING_QUEUE_SIZE` hashings may be queued or running at
+the same time; more are rejected with `HashingPoolFull`, so a flood of
+logins can't pile up unlimited work.
+
+"""
+
+import time
+from django.conf import settings
+from django.contrib.auth import hashers
+from twisted.internet import defer, reactor, threads
+from twisted.python import threadpool
+
+_NTHREADS = max(1, settings.PASSWORD_HASHING_THREADS)
+_MAX_QUEUE = settings.PASSWORD_HASHING_QUEUE_SIZE
+
+
+class HashingPoolFull(Exception):
+    """
+    Raised (through the Deferred) when too many hashings are already queued.
+
+    """
+
+    pass
+
+
+class HashingPool(object):
+    """
+    A bounded pool of threads for password hashing, with statistics.
+
+    If the reactor is not running (such as in `evennia shell` or in unit
+    tests), hashing is done directly instead, but the result is still
+    returned as a Deferred.
+
+    """
+
+    def __init__(self, maxthreads=_NTHREADS, maxqueue=_MAX_QUEUE):
+        """
+        Args:
+            maxthreads (int, optional): Max number of hashing threads.
+            maxqueue (int, optional): Max number of hashings queued or
+                running at the same time. 0 or None means no limit.
+
+        """
+        self.maxthreads = maxthreads
+        self.maxqueue = maxqueue
+        self.pool = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Reset the hashing statistics.
+
+        """
+        self.ncalls = 0
+        self.nwaiting = 0
+        self.nrejected = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.hash_time = 0.0
+        self.max_hash_time = 0.0
+
+    def get_stats(self):
+        """
+        Get hashing statistics.
+
+        Returns:
+            stats (dict): With keys `calls` (finished hashings), `waiting`
+                (hashings currently queued or running), `rejected` (hashings
+                refused because the queue was full), `wait_avg` and
+                `wait_max` (seconds spent queued before a thread was free) and
+                `hash_avg` and `hash_max` (seconds spent hashing).
+
+        """
+        ncalls = self.ncalls or 1
+        return {
+            "calls": self.ncalls,
+            "waiting": self.nwaiting,
+            "rejected": self.nrejected,
+            "wait_avg": self.wait_time / ncalls,
+            "wait_max": self.max_wait_time,
+            "hash_avg": self.hash_time / ncalls,
+            "hash_max": self.max_hash_time,
+        }
+
+    @property
+    def full(self):
+        """
+        If no more hashings may be queued right now.
+
+        """
+        return bool(self.maxqueue) and self.nwaiting >= self.maxqueue
+
+    def _start(self):
+        """
+        Start the thread pool and make sure it's stopped with the reactor.
+
+        """
+        self.pool = threadpool.ThreadPool(minthreads=0, maxthreads=self.maxthreads, name="hashing")
+        self.pool.start()
+        reactor.addSystemEventTrigger("during", "shutdown", self._stop)
+
+    def _stop(self):
+        """
+        Stop the thread pool.
+
+        """
+        if self.pool:
+            self.pool.stop()
+            self.pool = None
+
+    def _timed_call(self, func, *args):
+        """
+        Run in the worker thread; call func and time it.
+
+        """
+        started = time.time()
+        return func(*args), started, time.time()
+
+    def _record(self, result, queued):
+        """
+        Back in the reactor thread; update the statistics.
+
+        """
+        result, started, finished = result
+        wait_time, hash_time = started - queued, finished - started
+        self.ncalls += 1
+        self.wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self.hash_time += hash_time
+        self.max_hash_time = max(self.max_hash_time, hash_time)
+        return result
+
+    def _done(self, result):
+        self.nwaiting -= 1
+        return result
+
+    def run(self, func, *args):
+        """
+        Run a hashing function in the pool.
+
+        Args:
+            func (callable): The function to call.
+            *args: Arguments to `func`.
+
+        Returns:
+            deferred (Deferred): Fires with the return of `func` in the
+                reactor thread, or fails with `HashingPoolFull` if too many
+                hashings are already queued.
+
+        """
+        if self.full:
+            self.nrejected += 1
+            return defer.fail(HashingPoolFull("Too many password hashings are queued."))
+        self.nwaiting += 1
+        queued = time.time()
+        if reactor.running:
+            if not self.pool:
+                self._start()
+            deferred = threads.deferToThreadPool(reactor, self.pool, self._timed_call, func, *args)
+        else:
+            deferred = defer.maybeDeferred(self._timed_call, func, *args)
+        return deferred.addCallback(self._record, queued).addBoth(self._done)
+
+    def check_password(self, password, encoded):
+        """
+        Check a password against its stored hash. If the hash uses an
+        outdated algorithm or iteration count, a new hash is made at the
+        same time.
+
+        Args:
+            password (str): The raw password to check.
+            encoded (str): The stored password hash.
+
+        Returns:
+            deferred (Deferred): Fires with a tuple `(valid, new_encoded)`
+                where `new_encoded` is None unless the stored hash should
+                be replaced with it.
+
+        """
+
+        def _check():
+            rehashed = []
+            valid = hashers.check_password(
+                password, encoded, setter=lambda raw: rehashed.append(hashers.make_password(raw))
+            )
+            return valid, rehashed[0] if rehashed else None
+
+        return self.run(_check)
+
+    def make_password(self, password):
+        """
+        Hash a password for storage.
+
+        Args:
+            password (str): The raw password.
+
+        Returns:
+            deferred (Deferred): Fires with the encoded hash.
+
+        """
+        return self.run(hashers.make_password, password)
+
+
+HASHING_POOL = HashingPool()
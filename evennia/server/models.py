@@ -133,3 +133,7 @@ class ServerConfig(WeakSharedMemoryModel):
         """
         self.key = key
         self.value = value
+
+
+# delete the reload snapshot when its rows change, in any process using the database
+from evennia.server import snapshot  # noqa
@@ -69,6 +69,7 @@ class Mxp(object):
 
         """
         self.protocol.protocol_flags["MXP"] = False
+        self.protocol.reset_render_profile()
         self.protocol.handshake_done()
 
     def do_mxp(self, option):
@@ -80,5 +81,6 @@ class Mxp(object):
 
         """
         self.protocol.protocol_flags["MXP"] = True
+        self.protocol.reset_render_profile()
         self.protocol.requestNegotiation(MXP, b"")
         self.protocol.handshake_done()
@@ -82,3 +82,4 @@ class Naws(object):
             self.protocol.protocol_flags["SCREENWIDTH"][0] = int(codecs_encode(width, "hex"), 16)
             height = options[2] + options[3]
             self.protocol.protocol_flags["SCREENHEIGHT"][0] = int(codecs_encode(height, "hex"), 16)
+            self.protocol.reset_render_profile()
@@ -52,6 +52,7 @@ class SuppressGA(object):
 
         """
         self.protocol.protocol_flags["NOGOAHEAD"] = False
+        self.protocol.reset_render_profile()
         self.protocol.handshake_done()
 
     def will_suppress_ga(self, option):
@@ -63,4 +64,5 @@ class SuppressGA(object):
 
         """
         self.protocol.protocol_flags["NOGOAHEAD"] = True
+        self.protocol.reset_render_profile()
         self.protocol.handshake_done()
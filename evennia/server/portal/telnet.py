@@ -8,7 +8,7 @@ sessions etc.
 """
 
 import re
-from twisted.internet import protocol
+from twisted.internet import protocol, reactor
 from twisted.internet.task import LoopingCall
 from twisted.conch.telnet import Telnet, StatefulTelnetProtocol
 from twisted.conch.telnet import (
@@ -40,6 +40,9 @@ _RE_SCREENREADER_REGEX = re.compile(
 )
 _IDLE_COMMAND = str.encode(settings.IDLE_COMMAND + "\n")
 
+# send-options that override the session's render profile for a single message
+_RENDER_OPTIONS = ("xterm256", "ansi", "raw", "nocolor", "mxp", "screenreader")
+
 # identify HTTP indata
 _HTTP_REGEX = re.compile(
     b"(GET|HEAD|POST|PUT|DELETE|TRACE|OPTIONS|CONNECT|PATCH) (.*? HTTP/[0-9]\.[0-9])", re.I
@@ -73,6 +76,9 @@ class TelnetProtocol(Telnet, StatefulTelnetProtocol, Session):
 
     def __init__(self, *args, **kwargs):
         self.protocol_key = "telnet"
+        self._render_profile = None
+        self.output_buffer = []
+        self._flush_task = None
         super().__init__(*args, **kwargs)
 
     def dataReceived(self, data):
@@ -275,6 +281,10 @@ class TelnetProtocol(Telnet, StatefulTelnetProtocol, Session):
             reason (str): Motivation for losing connection.
 
         """
+        if self._flush_task and self._flush_task.active():
+            self._flush_task.cancel()
+        self._flush_task = None
+        self.output_buffer = []
         self.sessionhandler.disconnect(self)
         self.transport.loseConnection()
 
@@ -321,9 +331,99 @@ class TelnetProtocol(Telnet, StatefulTelnetProtocol, Session):
 
     def _write(self, data):
         """hook overloading the one used in plain telnet"""
+        # negotiations must go out at once, but not ahead of queued output
+        self.flush_output()
         data = data.replace(b"\n", b"\r\n").replace(b"\r\r\n", b"\r\n")
         super()._write(mccp_compress(self, data))
 
+    def write_output(self, data):
+        """
+        Queue in-band data for sending to the client. Everything queued
+        during the same reactor tick is sent as one write (and compressed
+        in one go if MCCP is active).
+
+        Args:
+            data (bytes): Data to send, already telnet-escaped.
+
+        """
+        self.output_buffer.append(data)
+        if not self._flush_task:
+            self._flush_task = reactor.callLater(0, self.flush_output)
+
+    def flush_output(self):
+        """
+        Send all queued output to the client.
+
+        """
+        if self._flush_task and self._flush_task.active():
+            self._flush_task.cancel()
+        self._flush_task = None
+        if not self.output_buffer:
+            return
+        data, self.output_buffer = b"".join(self.output_buffer), []
+        self.transport.write(mccp_compress(self, data))
+
+    def reset_render_profile(self):
+        """
+        Forget the cached render profile. This must be called whenever
+        a protocol flag affecting text output changes, such as after
+        TTYPE, NAWS or MXP negotiation.
+
+        """
+        self._render_profile = None
+
+    def get_render_profile(self, options=None):
+        """
+        Get how text should be rendered for this session. The profile is
+        calculated from the `protocol_flags` only once and then cached until
+        `reset_render_profile` is called.
+
+        Args:
+            options (dict, optional): Send-options of a single message. If
+                any of these override the profile, a modified copy is returned.
+
+        Returns:
+            profile (dict): Render settings `xterm256`, `ansi`, `raw`, `nocolor`,
+                `mxp`, `screenreader`, `forcedendline` and `nogoahead`.
+
+        """
+        profile = self._render_profile
+        if profile is None:
+            flags = self.protocol_flags
+            ttype = flags.get("TTYPE", False)
+            xterm256 = flags.get("XTERM256", False) if ttype else True
+            useansi = flags.get("ANSI", False) if ttype else True
+            profile = self._render_profile = {
+                "xterm256": xterm256,
+                "ansi": useansi,
+                "raw": flags.get("RAW", False),
+                "nocolor": flags.get("NOCOLOR") or not (xterm256 or useansi),
+                "mxp": flags.get("MXP", False),
+                "screenreader": flags.get("SCREENREADER", False),
+                "forcedendline": flags.get("FORCEDENDLINE", True),
+                "nogoahead": flags.get("NOGOAHEAD", True),
+            }
+        if options and any(key in options for key in _RENDER_OPTIONS):
+            profile = dict(profile)
+            profile.update((key, options[key]) for key in _RENDER_OPTIONS if key in options)
+            if "nocolor" not in options:
+                profile["nocolor"] = self.protocol_flags.get("NOCOLOR") or not (
+                    profile["xterm256"] or profile["ansi"]
+                )
+        return profile
+
+    def load_sync_data(self, sessdata):
+        """
+        Load session data synced from the Server. Since this may change the
+        protocol flags, the render profile is reset.
+
+        Args:
+            sessdata (dict): Session data dictionary.
+
+        """
+        super().load_sync_data(sessdata)
+        self.reset_render_profile()
+
     def sendLine(self, line):
         """
         Hook overloading the one used by linereceiver.
@@ -333,14 +433,15 @@ class TelnetProtocol(Telnet, StatefulTelnetProtocol, Session):
 
         """
         line = to_bytes(line, self)
+        profile = self.get_render_profile()
         # escape IAC in line mode, and correctly add \r\n (the TELNET end-of-line)
         line = line.replace(IAC, IAC + IAC)
         line = line.replace(b"\n", b"\r\n")
-        if not line.endswith(b"\r\n") and self.protocol_flags.get("FORCEDENDLINE", True):
+        if not line.endswith(b"\r\n") and profile["forcedendline"]:
             line += b"\r\n"
-        if not self.protocol_flags.get("NOGOAHEAD", True):
+        if not profile["nogoahead"]:
             line += IAC + GA
-        return self.transport.write(mccp_compress(self, line))
+        self.write_output(line)
 
     # Session hooks
 
@@ -354,6 +455,7 @@ class TelnetProtocol(Telnet, StatefulTelnetProtocol, Session):
 
         """
         self.data_out(text=((reason,), {}))
+        self.flush_output()
         self.connectionLost(reason)
 
     def data_in(self, **kwargs):
@@ -409,18 +511,13 @@ class TelnetProtocol(Telnet, StatefulTelnetProtocol, Session):
 
         # handle arguments
         options = kwargs.get("options", {})
-        flags = self.protocol_flags
-        xterm256 = options.get(
-            "xterm256", flags.get("XTERM256", False) if flags.get("TTYPE", False) else True
-        )
-        useansi = options.get(
-            "ansi", flags.get("ANSI", False) if flags.get("TTYPE", False) else True
-        )
-        raw = options.get("raw", flags.get("RAW", False))
-        nocolor = options.get("nocolor", flags.get("NOCOLOR") or not (xterm256 or useansi))
+        profile = self.get_render_profile(options)
+        xterm256 = profile["xterm256"]
+        raw = profile["raw"]
+        nocolor = profile["nocolor"]
         echo = options.get("echo", None)
-        mxp = options.get("mxp", flags.get("MXP", False))
-        screenreader = options.get("screenreader", flags.get("SCREENREADER", False))
+        mxp = profile["mxp"]
+        screenreader = profile["screenreader"]
 
         if screenreader:
             # screenreader mode cleans up output
@@ -442,7 +539,7 @@ class TelnetProtocol(Telnet, StatefulTelnetProtocol, Session):
             prompt = to_bytes(prompt, self)
             prompt = prompt.replace(IAC, IAC + IAC).replace(b"\n", b"\r\n")
             prompt += IAC + GA
-            self.transport.write(mccp_compress(self, prompt))
+            self.write_output(prompt)
         else:
             if echo is not None:
                 # turn on/off echo. Note that this is a bit turned around since we use
@@ -452,11 +549,11 @@ class TelnetProtocol(Telnet, StatefulTelnetProtocol, Session):
                     # by telling the client that WE WON'T echo, the client knows
                     # that IT should echo. This is the expected behavior from
                     # our perspective.
-                    self.transport.write(mccp_compress(self, IAC + WONT + ECHO))
+                    self.write_output(IAC + WONT + ECHO)
                 else:
                     # by telling the client that WE WILL echo, the client can
                     # safely turn OFF its OWN echo.
-                    self.transport.write(mccp_compress(self, IAC + WILL + ECHO))
+                    self.write_output(IAC + WILL + ECHO)
             if raw:
                 # no processing
                 self.sendLine(text)
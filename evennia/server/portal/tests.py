@@ -18,7 +18,7 @@ from mock import Mock, MagicMock
 from evennia.server.portal import irc
 from evennia.utils.test_resources import EvenniaTest
 
-from twisted.conch.telnet import IAC, WILL, DONT, SB, SE, NAWS, DO
+from twisted.conch.telnet import IAC, WILL, DONT, SB, SE, NAWS, DO, GA
 from twisted.test import proto_helpers
 from twisted.trial.unittest import TestCase as TwistedTestCase
 from twisted.internet.base import DelayedCall
@@ -37,6 +37,7 @@ from .amp import AMPMultiConnectionProtocol, MsgServer2Portal, MsgPortal2Server,
 from .amp_server import AMPServerFactory
 
 from autobahn.twisted.websocket import WebSocketServerFactory
+from . import webclient, webclient_ajax
 from .webclient import WebSocketClient
 
 
@@ -279,6 +280,63 @@ class TestTelnet(TwistedTestCase):
         self.proto._handshake_delay.cancel()
         return d
 
+    @mock.patch("evennia.server.portal.portalsessionhandler.reactor", new=MagicMock())
+    def test_render_profile(self):
+        self.transport.client = ["localhost"]
+        self.transport.setTcpKeepAlive = Mock()
+        d = self.proto.makeConnection(self.transport)
+        profile = self.proto.get_render_profile()
+        self.assertIs(profile, self.proto.get_render_profile())
+        self.assertTrue(profile["xterm256"])
+        # ttype negotiation resets the profile
+        self.proto.dataReceived(IAC + WILL + TTYPE)
+        self.proto.dataReceived(b"".join([IAC, SB, TTYPE, IS, b"ZMUD", IAC, SE]))
+        self.proto.dataReceived(b"".join([IAC, SB, TTYPE, IS, b"ANSI", IAC, SE]))
+        self.proto.dataReceived(b"".join([IAC, SB, TTYPE, IS, b"MTTS 1", IAC, SE]))
+        profile = self.proto.get_render_profile()
+        self.assertFalse(profile["xterm256"])
+        self.assertFalse(profile["nocolor"])
+        # send-options override the profile without changing it
+        override = self.proto.get_render_profile({"ansi": False, "xterm256": False})
+        self.assertTrue(override["nocolor"])
+        self.assertIs(profile, self.proto.get_render_profile({"echo": True}))
+        # clean up to prevent Unclean reactor
+        self.proto.nop_keep_alive.stop()
+        self.proto._handshake_delay.cancel()
+        return d
+
+    @mock.patch("evennia.server.portal.portalsessionhandler.reactor", new=MagicMock())
+    def test_coalesced_output(self):
+        import zlib
+
+        self.transport.client = ["localhost"]
+        self.transport.setTcpKeepAlive = Mock()
+        d = self.proto.makeConnection(self.transport)
+        self.proto.protocol_flags["NOCOLOR"] = True
+        self.proto.reset_render_profile()
+        self.transport.clear()
+        self.proto.send_text("Line one.", options={})
+        self.proto.send_text("Line two.", options={})
+        self.assertEqual(self.transport.value(), b"")
+        self.proto.flush_output()
+        self.assertEqual(self.transport.value(), b"Line one.\r\nLine two.\r\n")
+        # with mccp, a tick of output is compressed and flushed once
+        self.transport.clear()
+        self.proto.zlib = zlib.compressobj(9)
+        with mock.patch.object(self.transport, "write", wraps=self.transport.write) as write:
+            self.proto.send_text("Line three.", options={})
+            self.proto.send_prompt("Prompt>", options={})
+            self.proto.flush_output()
+            write.assert_called_once()
+        self.assertEqual(
+            zlib.decompressobj().decompress(self.transport.value()),
+            b"Line three.\r\nPrompt>" + IAC + GA,
+        )
+        # clean up to prevent Unclean reactor
+        self.proto.nop_keep_alive.stop()
+        self.proto._handshake_delay.cancel()
+        return d
+
 
 class TestWebSocket(EvenniaTest):
     def setUp(self):
@@ -318,3 +376,64 @@ class TestWebSocket(EvenniaTest):
         msg = json.dumps(["logged_in", (), {}])
         self.proto.sessionhandler.data_out(self.proto, text=[["Excepting Alice"], {}])
         self.proto.sendLine.assert_called_with(json.dumps(["text", ["Excepting Alice"], {}]))
+
+    @mock.patch("evennia.server.portal.portalsessionhandler.reactor", new=MagicMock())
+    @mock.patch("evennia.server.portal.webclient.reactor", new=MagicMock())
+    def test_batched_data_out(self):
+        self.proto.onOpen()
+        self.proto.sendLine = MagicMock()
+        self.proto.sessionhandler.data_in = MagicMock()
+        msg = json.dumps(["websocket_options", [], {"batch": True}]).encode()
+        self.proto.onMessage(msg, isBinary=False)
+        self.proto.sessionhandler.data_in.assert_not_called()
+        self.assertTrue(self.proto.batch_output)
+
+        self.proto.sessionhandler.data_out(self.proto, text=[["Excepting Alice"], {}])
+        self.proto.sessionhandler.data_out(self.proto, text=[["Alice's Restaurant"], {}])
+        self.proto.sendLine.assert_not_called()
+        self.proto.flush_output()
+        self.proto.sendLine.assert_called_once_with(
+            json.dumps([["text", ["Excepting Alice"], {}], ["text", ["Alice's Restaurant"], {}]])
+        )
+
+    @unittest.skipIf(webclient.msgpack is None, "msgpack is not installed")
+    @mock.patch("evennia.server.portal.portalsessionhandler.reactor", new=MagicMock())
+    def test_msgpack_data_out(self):
+        self.proto.onOpen()
+        self.proto.send_payload = MagicMock()
+        self.proto.set_output_options(encoding="msgpack")
+        self.proto.sessionhandler.data_out(self.proto, text=[["Excepting Alice"], {}])
+        payload = self.proto.send_payload.call_args[0][0]
+        self.assertEqual(
+            webclient.msgpack.unpackb(payload, raw=False), ["text", ["Excepting Alice"], {}]
+        )
+
+
+class TestAjaxWebClient(TestCase):
+    def setUp(self):
+        self.client = webclient_ajax.AjaxWebClient()
+        self.csessid = "csessid"
+
+    def _receive(self, batch=False):
+        request = Mock()
+        request.args = {b"csessid": [b"csessid"]}
+        if batch:
+            request.args[b"batch"] = [b"1"]
+        return self.client.mode_receive(request)
+
+    @mock.patch("evennia.server.portal.webclient_ajax._BUFFER_SIZE", new=3)
+    def test_buffer(self):
+        for inum in range(5):
+            self.client.lineSend(self.csessid, ["text", ["line %i" % inum], {}])
+        self.client.lineSend(self.csessid, ["prompt", ["HP: 9"], {}])
+        self.client.lineSend(self.csessid, ["prompt", ["HP: 10"], {}])
+        self.assertEqual(
+            self.client.get_buffer_stats(),
+            {"sessions": 1, "buffered": 3, "max_depth": 3, "dropped": 3},
+        )
+        self.assertEqual(json.loads(self._receive()), ["text", ["line 3"], {}])
+        self.assertEqual(
+            json.loads(self._receive(batch=True)),
+            [["text", ["line 4"], {}], ["prompt", ["HP: 10"], {}]],
+        )
+        self.assertEqual(self.client.get_buffer_stats()["buffered"], 0)
@@ -71,6 +71,7 @@ class Ttype(object):
 
         """
         self.protocol.protocol_flags["TTYPE"] = False
+        self.protocol.reset_render_profile()
         self.protocol.handshake_done()
 
     def will_ttype(self, option):
@@ -184,3 +185,4 @@ class Ttype(object):
             # we must sync ttype once it'd done
             self.protocol.handshake_done()
         self.ttype_step += 1
+        self.protocol.reset_render_profile()
@@ -13,10 +13,20 @@ which represents an "inputfunc" to be called on the Evennia side with *args, **k
 The most common inputfunc is "text", which takes just the text input
 from the command line and interprets it as an Evennia Command: `["text", ["look"], {}]`
 
+Output to the client is on the same form. A client may however send the
+special `["websocket_options", [], {"batch": True, "encoding": "msgpack"}]`
+to opt into
+
+- batching: All outputs queued within the same reactor tick are sent as
+  one websocket message holding a list of `[cmdname, args, kwargs]` arrays.
+- encoding: Send output as binary msgpack frames instead of JSON text.
+  This requires the `msgpack` python package to be installed.
+
 """
 import re
 import json
 import html
+from twisted.internet import reactor
 from twisted.internet.protocol import Protocol
 from django.conf import settings
 from evennia.server.session import Session
@@ -24,13 +34,20 @@ from evennia.utils.utils import to_str, mod_import
 from evennia.utils.ansi import parse_ansi
 from evennia.utils.text2html import parse_html
 from autobahn.twisted.websocket import WebSocketServerProtocol
+from autobahn.websocket.compress import PerMessageDeflateOffer, PerMessageDeflateOfferAccept
 from autobahn.exception import Disconnected
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 _RE_SCREENREADER_REGEX = re.compile(
     r"%s" % settings.SCREENREADER_REGEX_STRIP, re.DOTALL + re.MULTILINE
 )
 _CLIENT_SESSIONS = mod_import(settings.SESSION_ENGINE).SessionStore
 _UPSTREAM_IPS = settings.UPSTREAM_IPS
+_BATCHING = settings.WEBSOCKET_CLIENT_BATCHING
 
 # Status Code 1000: Normal Closure
 #   called when the connection was closed through JavaScript
@@ -43,6 +60,25 @@ GOING_AWAY = WebSocketServerProtocol.CLOSE_STATUS_CODE_GOING_AWAY
 STATE_CLOSING = WebSocketServerProtocol.STATE_CLOSING
 
 
+def accept_permessage_deflate(offers):
+    """
+    Websocket factory callback for accepting the permessage-deflate
+    compression offered by the client (all modern browsers offer it).
+    This is used when `settings.WEBSOCKET_CLIENT_COMPRESSION` is set.
+
+    Args:
+        offers (list): The compression offers from the client.
+
+    Returns:
+        accept (PerMessageDeflateOfferAccept or None): The accepted offer,
+            or `None` to not use compression.
+
+    """
+    for offer in offers:
+        if isinstance(offer, PerMessageDeflateOffer):
+            return PerMessageDeflateOfferAccept(offer)
+
+
 class WebSocketClient(WebSocketServerProtocol, Session):
     """
     Implements the server-side of the Websocket connection.
@@ -55,6 +91,11 @@ class WebSocketClient(WebSocketServerProtocol, Session):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.protocol_key = "webclient/websocket"
+        # output options, set by the client with the websocket_options inputfunc
+        self.batch_output = False
+        self.output_encoding = "json"
+        self.output_buffer = []
+        self._flush_task = None
 
     def get_client_session(self):
         """
@@ -137,6 +178,8 @@ class WebSocketClient(WebSocketServerProtocol, Session):
             reason (str or None): Motivation for the disconnection.
 
         """
+        # send any output still waiting in the batch buffer
+        self.flush_output()
         csession = self.get_client_session()
 
         if csession:
@@ -175,6 +218,11 @@ class WebSocketClient(WebSocketServerProtocol, Session):
             self.disconnect(reason)
         else:
             self.websocket_close_code = code
+            # the link is gone, drop any batched output
+            if self._flush_task and self._flush_task.active():
+                self._flush_task.cancel()
+            self._flush_task = None
+            self.output_buffer = []
 
     def onMessage(self, payload, isBinary):
         """
@@ -186,7 +234,10 @@ class WebSocketClient(WebSocketServerProtocol, Session):
                              UTF-8 encoded text.
 
         """
-        cmdarray = json.loads(str(payload, "utf-8"))
+        if isBinary and msgpack:
+            cmdarray = msgpack.unpackb(payload, raw=False)
+        else:
+            cmdarray = json.loads(str(payload, "utf-8"))
         if cmdarray:
             self.data_in(**{cmdarray[0]: [cmdarray[1], cmdarray[2]]})
 
@@ -197,14 +248,77 @@ class WebSocketClient(WebSocketServerProtocol, Session):
         Args:
             line (str): Text to send.
 
+        """
+        return self.send_payload(line.encode())
+
+    def send_payload(self, payload, is_binary=False):
+        """
+        Send one websocket message to the client.
+
+        Args:
+            payload (bytes): Encoded data to send.
+            is_binary (bool, optional): If this is a binary message
+                rather than UTF-8 encoded text.
+
         """
         try:
-            return self.sendMessage(line.encode())
+            return self.sendMessage(payload, isBinary=is_binary)
         except Disconnected:
             # this can happen on an unclean close of certain browsers.
             # it means this link is actually already closed.
             self.disconnect(reason="Browser already closed.")
 
+    def set_output_options(self, batch=False, encoding="json", **kwargs):
+        """
+        Set how output is delivered to the client. This is called when
+        the client sends the `websocket_options` inputfunc.
+
+        Keyword Args:
+            batch (bool): Combine all output queued within a reactor tick
+                into one message. Only used if `settings.WEBSOCKET_CLIENT_BATCHING`
+                is set.
+            encoding (str): One of "json" or "msgpack". Falls back to
+                "json" if msgpack is not installed.
+
+        """
+        self.flush_output()
+        self.batch_output = bool(batch) and _BATCHING
+        self.output_encoding = "msgpack" if encoding == "msgpack" and msgpack else "json"
+
+    def send_cmdarray(self, cmdarray):
+        """
+        Send, or queue for sending, an outputfunc call to the client.
+
+        Args:
+            cmdarray (list): Data on the form `[cmdname, args, kwargs]`.
+
+        """
+        if not self.batch_output:
+            if self.output_encoding == "msgpack":
+                self.send_payload(msgpack.packb(cmdarray, use_bin_type=True), is_binary=True)
+            else:
+                self.sendLine(json.dumps(cmdarray))
+            return
+        self.output_buffer.append(cmdarray)
+        if not self._flush_task:
+            self._flush_task = reactor.callLater(0, self.flush_output)
+
+    def flush_output(self):
+        """
+        Send all queued output to the client as one message.
+
+        """
+        if self._flush_task and self._flush_task.active():
+            self._flush_task.cancel()
+        self._flush_task = None
+        batch, self.output_buffer = self.output_buffer, []
+        if not batch:
+            return
+        if self.output_encoding == "msgpack":
+            self.send_payload(msgpack.packb(batch, use_bin_type=True), is_binary=True)
+        else:
+            self.sendLine(json.dumps(batch))
+
     def at_login(self):
         csession = self.get_client_session()
         if csession:
@@ -236,6 +350,12 @@ class WebSocketClient(WebSocketServerProtocol, Session):
             self.disconnect()
             return
 
+        if "websocket_options" in kwargs:
+            _, options = kwargs.pop("websocket_options")
+            self.set_output_options(**options)
+            if not kwargs:
+                return
+
         self.sessionhandler.data_in(self, **kwargs)
 
     def send_text(self, *args, **kwargs):
@@ -287,7 +407,7 @@ class WebSocketClient(WebSocketServerProtocol, Session):
             args[0] = parse_html(text, strip_ansi=nocolor)
 
         # send to client on required form [cmdname, args, kwargs]
-        self.sendLine(json.dumps([cmd, args, kwargs]))
+        self.send_cmdarray([cmd, args, kwargs])
 
     def send_prompt(self, *args, **kwargs):
         kwargs["options"].update({"send_prompt": True})
@@ -308,4 +428,4 @@ class WebSocketClient(WebSocketServerProtocol, Session):
 
         """
         if not cmdname == "options":
-            self.sendLine(json.dumps([cmdname, args, kwargs]))
+            self.send_cmdarray([cmdname, args, kwargs])
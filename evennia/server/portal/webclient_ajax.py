@@ -15,11 +15,18 @@ http://localhost:4001/webclient.)
                  The WebClient resource in this module will
                  handle these requests and act as a gateway
                  to sessions connected over the webclient.
+
+Output for a client is buffered until the client polls for it. The
+buffer of each client is capped at `settings.WEBCLIENT_AJAX_BUFFER_SIZE`
+entries, after which the oldest entries are dropped. A client sending
+`batch=1` with its receive-request gets all buffered entries at once, as
+a JSON list of `[cmdname, args, kwargs]` arrays.
 """
 import json
 import re
 import time
 import html
+from collections import deque
 
 from twisted.web import server, resource
 from twisted.internet.task import LoopingCall
@@ -37,6 +44,9 @@ _RE_SCREENREADER_REGEX = re.compile(
 )
 _SERVERNAME = settings.SERVERNAME
 _KEEPALIVE = 30  # how often to check keepalive
+_BUFFER_SIZE = settings.WEBCLIENT_AJAX_BUFFER_SIZE
+# outputs for which only the latest one waiting in the buffer matters
+_COALESCE_CMDS = ("prompt", "ajax_keepalive")
 
 
 # defining a simple json encoder for returning
@@ -74,6 +84,9 @@ class AjaxWebClient(resource.Resource):
     def __init__(self):
         self.requests = {}
         self.databuffer = {}
+        # buffer statistics across all sessions
+        self.nbuffered = 0
+        self.ndropped = 0
 
         self.last_alive = {}
         self.keep_alive = None
@@ -152,9 +165,56 @@ class AjaxWebClient(resource.Resource):
             del self.requests[csessid]
         else:
             # no waiting request. Store data in buffer
-            dataentries = self.databuffer.get(csessid, [])
-            dataentries.append(jsonify(data))
-            self.databuffer[csessid] = dataentries
+            self.buffer_data(csessid, data[0], jsonify(data))
+
+    def buffer_data(self, csessid, cmdname, entry):
+        """
+        Store data in the session's output buffer until the client
+        asks for it.
+
+        Args:
+            csessid (int): Session id.
+            cmdname (str): The name of the outputfunc.
+            entry (bytes): The json-encoded send structure.
+
+        Notes:
+            Only the latest of outputs in `_COALESCE_CMDS` (like prompts)
+            is kept. If the buffer is full, the oldest entry is dropped.
+
+        """
+        dataentries = self.databuffer.get(csessid)
+        if dataentries is None:
+            dataentries = self.databuffer[csessid] = deque()
+        if cmdname in _COALESCE_CMDS:
+            stale = [item for item in dataentries if item[0] == cmdname]
+            for item in stale:
+                dataentries.remove(item)
+            self.nbuffered -= len(stale)
+        if len(dataentries) >= _BUFFER_SIZE:
+            dataentries.popleft()
+            self.nbuffered -= 1
+            self.ndropped += 1
+        dataentries.append((cmdname, entry))
+        self.nbuffered += 1
+
+    def get_buffer_stats(self):
+        """
+        Get statistics about the output buffers of all sessions.
+
+        Returns:
+            stats (dict): With keys `sessions` (number of sessions with
+                data waiting), `buffered` (total buffered entries),
+                `max_depth` (entries in the fullest buffer) and `dropped`
+                (entries dropped due to full buffers since startup).
+
+        """
+        depths = [len(dataentries) for dataentries in self.databuffer.values() if dataentries]
+        return {
+            "sessions": len(depths),
+            "buffered": self.nbuffered,
+            "max_depth": max(depths) if depths else 0,
+            "dropped": self.ndropped,
+        }
 
     def client_disconnect(self, csessid):
         """
@@ -168,7 +228,7 @@ class AjaxWebClient(resource.Resource):
             self.requests[csessid].finish()
             del self.requests[csessid]
         if csessid in self.databuffer:
-            del self.databuffer[csessid]
+            self.nbuffered -= len(self.databuffer.pop(csessid))
 
     def mode_init(self, request):
         """
@@ -266,7 +326,14 @@ class AjaxWebClient(resource.Resource):
         if dataentries:
             # we have data that could not be sent earlier (because client was not
             # ready to receive it). Return this buffered data immediately
-            return dataentries.pop(0)
+            if request.args.get(b"batch", [b""])[0] in (b"1", b"true"):
+                # the client can receive all buffered data in one go
+                entries = [entry for _, entry in dataentries]
+                dataentries.clear()
+                self.nbuffered -= len(entries)
+                return b"[" + b",".join(entries) + b"]"
+            self.nbuffered -= 1
+            return dataentries.popleft()[1]
         else:
             # we have no data to send. End the old request and start
             # a new long-polling one
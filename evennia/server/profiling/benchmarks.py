@@ -0,0 +1,951 @@
+"""
+Micro-benchmarks for performance-sensitive parts of Evennia.
+
+These run inside a fully set-up Evennia environment, for example from
+`evennia shell`:
+
+```python
+from evennia.server.profiling import benchmarks
+benchmarks.bench_emote()
+```
+
+Each benchmark creates whatever temporary entities it needs and cleans
+them up again afterwards. It returns its results as a dict and also
+prints a small report (use `report=False` to turn that off).
+
+"""
+
+import time
+import timeit
+
+
+def timed(func, number=100, repeat=3):
+    """
+    Time a callable.
+
+    Args:
+        func (callable): Callable to time. Called without arguments.
+        number (int, optional): How many times to call `func` per run.
+        repeat (int, optional): How many runs to do. The fastest is used,
+            since slower runs are usually caused by other load.
+
+    Returns:
+        time (float): The time per call, in seconds.
+
+    """
+    return min(timeit.Timer(func).repeat(repeat=repeat, number=number)) / number
+
+
+def print_report(title, header, rows):
+    """
+    Print a benchmark result table.
+
+    Args:
+        title (str): Name of the benchmark.
+        header (tuple): Column titles.
+        rows (list): List of tuples, one per row, same length as `header`.
+
+    """
+    rows = [tuple(str(col) for col in row) for row in rows]
+    widths = [max(len(str(col)) for col in column) for column in zip(header, *rows)]
+    print("\n%s" % title)
+    print("  ".join(str(col).rjust(width) for col, width in zip(header, widths)))
+    for row in rows:
+        print("  ".join(col.rjust(width) for col, width in zip(row, widths)))
+
+
+def bench_emote(observers=(10, 50, 200), number=20, report=True):
+    """
+    Measure the latency of `rpsystem.send_emote` in rooms of different
+    sizes. One in ten observers has a recog of the emoter, so their view
+    of the emote is rendered individually.
+
+    Args:
+        observers (tuple, optional): Number of characters in the room
+            for each run.
+        number (int, optional): Emotes to send per timing run.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{nobservers: seconds_per_emote}`.
+
+    """
+    from evennia.utils import create
+    from evennia.contrib import rpsystem
+
+    emote = '/me looks at /tall and says "Hello everyone!" before pointing at /2-short.'
+    result = {}
+    for nobservers in observers:
+        room = create.create_object(rpsystem.ContribRPRoom, key="emote_bench_room")
+        chars = []
+        try:
+            for ichar in range(nobservers):
+                char = create.create_object(
+                    rpsystem.ContribRPCharacter, key="emote_bench_%i" % ichar, location=room
+                )
+                char.sdesc.add("a %s person number %i" % ("tall" if ichar == 1 else "short", ichar))
+                # don't measure the session output
+                char.msg = lambda *args, **kwargs: None
+                chars.append(char)
+            sender = chars[0]
+            for char in chars[2::10]:
+                char.recog.add(sender, "Bob")
+            receivers = room.contents
+            result[nobservers] = timed(
+                lambda: rpsystem.send_emote(sender, receivers, emote), number=number
+            )
+        finally:
+            for char in chars:
+                char.delete()
+            room.delete()
+
+    if report:
+        print_report(
+            "rpsystem.send_emote",
+            ("observers", "ms/emote"),
+            [(nobservers, "%.3f" % (secs * 1000)) for nobservers, secs in result.items()],
+        )
+    return result
+
+
+def bench_websocket_output(
+    messages_per_tick=(1, 10, 50), number=200, encodings=("json", "msgpack"), report=True
+):
+    """
+    Measure the portal-side cost of sending text output to a websocket
+    client: html-conversion, encoding and websocket framing, with and
+    without batching and permessage-deflate compression. The network
+    itself is not involved.
+
+    Args:
+        messages_per_tick (tuple, optional): How many outputs are sent to
+            the client per server tick, for each run.
+        number (int, optional): Number of ticks to time per run.
+        encodings (tuple, optional): Output encodings to compare. The
+            "msgpack" encoding is skipped if msgpack is not installed.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(nmessages, mode): (seconds_per_tick, bytes_per_tick)}`
+            where mode is a string like "json+batch+deflate".
+
+    """
+    from twisted.test import proto_helpers
+    from autobahn.twisted.websocket import WebSocketServerFactory
+    from autobahn.websocket.compress import PerMessageDeflate
+    from evennia.server.portal import webclient
+
+    text = "|rThe orc|n hits you with a |wrusty axe|n for |y%i|n damage!"
+    result = {}
+    for encoding in encodings:
+        if encoding == "msgpack" and not webclient.msgpack:
+            continue
+        for batch in (False, True):
+            for deflate in (False, True):
+                mode = "+".join(
+                    [encoding] + (["batch"] if batch else []) + (["deflate"] if deflate else [])
+                )
+                for nmessages in messages_per_tick:
+                    factory = WebSocketServerFactory()
+                    # no handshake happens, so don't leave a timeout running for it
+                    factory.setProtocolOptions(openHandshakeTimeout=0)
+                    factory.protocol = webclient.WebSocketClient
+                    proto = factory.buildProtocol(("127.0.0.1", 0))
+                    transport = proto_helpers.StringTransport()
+                    proto.makeConnection(transport)
+                    proto.init_session("websocket", "127.0.0.1", None)
+                    proto.state = proto.STATE_OPEN
+                    proto.websocket_version = 18
+                    proto._perMessageCompress = (
+                        PerMessageDeflate(True, False, False, 15, 15, 8) if deflate else None
+                    )
+                    proto.batch_output = batch
+                    proto.output_encoding = encoding
+
+                    def _tick():
+                        transport.clear()
+                        for imsg in range(nmessages):
+                            proto.send_text(text % imsg, options={})
+                        proto.flush_output()
+
+                    secs = timed(_tick, number=number)
+                    result[(nmessages, mode)] = (secs, len(transport.value()))
+
+    if report:
+        print_report(
+            "webclient websocket output",
+            ("msgs/tick", "mode", "us/tick", "us/msg", "bytes/tick"),
+            [
+                (nmsg, mode, "%.1f" % (secs * 1e6), "%.1f" % (secs * 1e6 / nmsg), nbytes)
+                for (nmsg, mode), (secs, nbytes) in sorted(result.items())
+            ],
+        )
+    return result
+
+
+def bench_telnet_output(messages_per_tick=(1, 10, 50), number=200, report=True):
+    """
+    Measure the portal-side cost of sending text output to a telnet client:
+    ansi-parsing, telnet escaping and MCCP compression. Each tick is sent
+    either as one coalesced write or flushed after every message (which is
+    how output was written before coalescing), with and without MCCP. The
+    network itself is not involved; use the dummyrunner against a running
+    server to measure end-to-end telnet throughput.
+
+    Args:
+        messages_per_tick (tuple, optional): How many outputs are sent to
+            the client per server tick, for each run.
+        number (int, optional): Number of ticks to time per run.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(nmessages, mode): (seconds_per_tick, bytes_per_tick)}`
+            where mode is a string like "coalesced+mccp".
+
+    """
+    import zlib
+    from twisted.test import proto_helpers
+    from evennia.server.portal import telnet
+
+    text = "|rThe orc|n hits you with a |wrusty axe|n for |y%i|n damage!"
+    result = {}
+    for coalesce in (False, True):
+        for use_mccp in (False, True):
+            mode = "+".join(
+                ["coalesced" if coalesce else "per-message"] + (["mccp"] if use_mccp else [])
+            )
+            for nmessages in messages_per_tick:
+                proto = telnet.TelnetProtocol()
+                transport = proto_helpers.StringTransport()
+                proto.transport = transport
+                proto.init_session("telnet", "127.0.0.1", None)
+                proto.protocol_flags.update({"TTYPE": True, "ANSI": True, "XTERM256": True})
+                if use_mccp:
+                    proto.zlib = zlib.compressobj(9)
+
+                def _tick():
+                    transport.clear()
+                    for imsg in range(nmessages):
+                        proto.send_text(text % imsg, options={})
+                        if not coalesce:
+                            proto.flush_output()
+                    proto.flush_output()
+
+                secs = timed(_tick, number=number)
+                result[(nmessages, mode)] = (secs, len(transport.value()))
+
+    if report:
+        print_report(
+            "telnet output",
+            ("msgs/tick", "mode", "us/tick", "us/msg", "bytes/tick"),
+            [
+                (nmsg, mode, "%.1f" % (secs * 1e6), "%.1f" % (secs * 1e6 / nmsg), nbytes)
+                for (nmsg, mode), (secs, nbytes) in sorted(result.items())
+            ],
+        )
+    return result
+
+
+def bench_help_topics(entries=(100, 900), number=20, report=True):
+    """
+    Measure finding the database help entries a caller may view, by
+    checking the view-lock of every entry versus using the help index.
+
+    Args:
+        entries (tuple, optional): Number of help entries for each run.
+            One in ten entries is locked to Builders.
+        number (int, optional): Lookups to time per run.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(nentries, mode): seconds_per_lookup}` where
+            mode is "locks" or "index".
+
+    """
+    from evennia.utils import create
+    from evennia.help.models import HelpEntry
+    from evennia.help.helpindex import HelpIndex
+    from evennia.objects.objects import DefaultCharacter
+
+    result = {}
+    caller = create.create_object(DefaultCharacter, key="help_bench_char", nohome=True)
+    try:
+        for nentries in entries:
+            topics = []
+            try:
+                for ientry in range(nentries):
+                    topics.append(
+                        create.create_help_entry(
+                            "help_bench_%i" % ientry,
+                            "Help text number %i." % ientry,
+                            locks="view:perm(Builder)" if ientry % 10 == 0 else "view:all()",
+                        )
+                    )
+                index = HelpIndex()
+                index.get_visible(caller)
+                result[(nentries, "locks")] = timed(
+                    lambda: [
+                        topic
+                        for topic in HelpEntry.objects.all()
+                        if topic.access(caller, "view", default=True)
+                    ],
+                    number=number,
+                )
+                result[(nentries, "index")] = timed(
+                    lambda: index.get_visible(caller), number=number
+                )
+            finally:
+                for topic in topics:
+                    topic.delete()
+    finally:
+        caller.delete()
+
+    if report:
+        print_report(
+            "visible help entries",
+            ("entries", "mode", "ms/lookup"),
+            [(nent, mode, "%.3f" % (secs * 1000)) for (nent, mode), secs in sorted(result.items())],
+        )
+    return result
+
+
+def bench_string_suggestions(vocabulary_sizes=(1000, 10000), number=20, report=True):
+    """
+    Measure the cost of suggesting alternatives to a mistyped command
+    name, as done for unmatched commands and help topics.
+
+    Args:
+        vocabulary_sizes (tuple, optional): Number of command names for each run.
+        number (int, optional): Suggestions to time per run.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(nwords, mode): seconds_per_suggestion}`.
+            Mode is "plain" (a plain vocabulary, histograms computed for
+            every comparison) or "suggester" (a prebuilt `StringSuggester`).
+
+    """
+    import random
+    import string
+    from evennia.utils import utils
+
+    rand = random.Random(1)
+    result = {}
+    for nwords in vocabulary_sizes:
+        vocabulary = [
+            "".join(rand.choice(string.ascii_lowercase) for _ in range(rand.randint(3, 10)))
+            for _ in range(nwords)
+        ]
+        typo = vocabulary[0][1:] + "x"
+
+        suggester = utils.StringSuggester(vocabulary)
+        result[(nwords, "plain")] = timed(
+            lambda: utils.string_suggestions(typo, vocabulary, cutoff=0.7), number=number
+        )
+        result[(nwords, "suggester")] = timed(
+            lambda: utils.string_suggestions(typo, suggester, cutoff=0.7), number=number
+        )
+
+    if report:
+        print_report(
+            "string suggestions",
+            ("words", "mode", "ms/suggestion"),
+            [(nw, mode, "%.3f" % (secs * 1000)) for (nw, mode), secs in sorted(result.items())],
+        )
+    return result
+
+
+class _HeapClock(object):
+    """
+    A simulated clock scheduling its timers on a heap, the same way as the
+    reactor does. Twisted's own `task.Clock` re-sorts all its timers on
+    every call, which would not give realistic results for many timers.
+
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.calls = []
+        self.ncalls = 0
+
+    def seconds(self):
+        return self.now
+
+    def callLater(self, delay, func, *args, **kwargs):
+        from twisted.internet.base import DelayedCall
+
+        call = DelayedCall(
+            self.now + delay, func, args, kwargs, lambda call: None, self._push, self.seconds
+        )
+        self._push(call)
+        return call
+
+    def _push(self, call):
+        import heapq
+
+        self.ncalls += 1
+        heapq.heappush(self.calls, (call.time, self.ncalls, call))
+
+    def advance(self, amount):
+        import heapq
+
+        self.now += amount
+        while self.calls and self.calls[0][0] <= self.now:
+            when, _, call = heapq.heappop(self.calls)
+            if call.cancelled or call.called or when != call.time:
+                continue
+            if call.delayed_time:
+                call.time += call.delayed_time
+                call.delayed_time = 0
+                self._push(call)
+                continue
+            call.called = 1
+            call.func(*call.args, **call.kw)
+
+
+def bench_script_timers(nscripts=(10000, 50000), seconds=10, report=True):
+    """
+    Measure the CPU used for just running Script timers, with one
+    `ExtendedLoopingCall` per Script versus the shared `TimerWheel`.
+    Scripts have intervals of 1-10 seconds and do nothing when called
+    (apart from the `maybeDeferred` wrapping `at_repeat` in a Script).
+    Time is simulated, with the clock advancing in steps of 10 ms.
+
+    Args:
+        nscripts (tuple, optional): Number of Scripts for each run.
+        seconds (int, optional): Simulated seconds to run for.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(nscripts, mode): cpu_fraction}` where
+            mode is "loopingcall" or "wheel" and `cpu_fraction` is the CPU
+            time used per simulated second.
+
+    """
+    import random
+    import time
+    from twisted.internet.defer import maybeDeferred
+    from evennia.scripts.scripts import ExtendedLoopingCall
+    from evennia.scripts.timerwheel import TimerWheel, WheelTask
+
+    def _step():
+        return maybeDeferred(lambda: None)
+
+    rand = random.Random(1)
+    result = {}
+    for num in nscripts:
+        intervals = [rand.randint(1, 10) for _ in range(num)]
+        delays = [rand.random() * interval for interval in intervals]
+        for mode in ("loopingcall", "wheel"):
+            clock = _HeapClock()
+            wheel = TimerWheel(clock=clock)
+            tasks = []
+            for interval, delay in zip(intervals, delays):
+                if mode == "wheel":
+                    task = WheelTask(_step)
+                    task.wheel = wheel
+                else:
+                    task = ExtendedLoopingCall(_step)
+                    task.clock = clock
+                task.start(interval, now=False, start_delay=delay)
+                tasks.append(task)
+            started = time.process_time()
+            for _ in range(seconds * 100):
+                clock.advance(0.01)
+            result[(num, mode)] = (time.process_time() - started) / seconds
+            for task in tasks:
+                task.stop()
+
+    if report:
+        print_report(
+            "script timers",
+            ("scripts", "mode", "cpu %"),
+            [(num, mode, "%.1f" % (cpu * 100)) for (num, mode), cpu in sorted(result.items())],
+        )
+    return result
+
+
+def bench_attribute_reads(number=1000, report=True):
+    """
+    Measure reading an Attribute with `obj.db.<key>` over and over, with
+    the value decoded on every read (as before the value cache) versus
+    using the cached decoded value.
+
+    Args:
+        number (int, optional): Reads to time per run.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(value, mode): seconds_per_read}`. The value
+            is "flat" (a number), "dict" (a flat dict of 20 numbers),
+            "nested" (a dict of dicts of lists) or "objects" (a list of 20
+            database objects). Mode is "decode" or "cached".
+
+    """
+    from evennia.utils import create
+    from evennia.objects.objects import DefaultObject
+
+    objs = [
+        create.create_object(DefaultObject, key="attr_bench_%i" % iobj, nohome=True)
+        for iobj in range(21)
+    ]
+    obj = objs[0]
+    values = {
+        "flat": 100,
+        "dict": {"stat%i" % istat: istat for istat in range(20)},
+        "nested": {
+            "skill%i" % iskill: {"level": iskill, "history": list(range(10))}
+            for iskill in range(10)
+        },
+        "objects": objs[1:],
+    }
+    result = {}
+    try:
+        for name, value in values.items():
+            obj.attributes.add(name, value)
+            attr = obj.attributes.get(name, return_obj=True)
+
+            def _decode():
+                attr._uncache_value()
+                return getattr(obj.db, name)
+
+            result[(name, "decode")] = timed(_decode, number=number)
+            result[(name, "cached")] = timed(lambda: getattr(obj.db, name), number=number)
+    finally:
+        for obj in objs:
+            obj.delete()
+
+    if report:
+        print_report(
+            "attribute reads",
+            ("value", "mode", "us/read"),
+            [(name, mode, "%.1f" % (secs * 1e6)) for (name, mode), secs in sorted(result.items())],
+        )
+    return result
+
+
+def bench_attribute_storage(number=200, report=True):
+    """
+    Compare the legacy (base64 text) and binary Attribute storage formats:
+    the size of the stored value and the time to encode it for saving and
+    to decode it when loading.
+
+    Args:
+        number (int, optional): Encodes/decodes to time per run.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(value, format): (bytes, encode_secs, decode_secs)}`.
+            The value is "dict" (a flat dict of 20 numbers), "nested" (a dict
+            of dicts of lists) or "text" (a 4.5kB string). Format is "legacy"
+            or "binary".
+
+    """
+    from evennia.utils import picklefield
+
+    values = {
+        "dict": {"stat%i" % istat: istat for istat in range(20)},
+        "nested": {
+            "skill%i" % iskill: {"level": iskill, "history": list(range(10))}
+            for iskill in range(10)
+        },
+        "text": "The quick brown fox jumps over the lazy dog. " * 100,
+    }
+    formats = {
+        "legacy": (picklefield.dbsafe_encode, picklefield.dbsafe_decode),
+        "binary": (picklefield.dbsafe_encode_binary, picklefield.dbsafe_decode_binary),
+    }
+    result = {}
+    for name, value in values.items():
+        for fmt, (encode, decode) in formats.items():
+            encoded = encode(value)
+            result[(name, fmt)] = (
+                len(encoded),
+                timed(lambda: encode(value), number=number),
+                timed(lambda: decode(encoded), number=number),
+            )
+
+    if report:
+        print_report(
+            "attribute storage",
+            ("value", "format", "bytes", "us/encode", "us/decode"),
+            [
+                (name, fmt, size, "%.1f" % (enc * 1e6), "%.1f" % (dec * 1e6))
+                for (name, fmt), (size, enc, dec) in sorted(result.items())
+            ],
+        )
+    return result
+
+
+def bench_object_preload(nobjects=(1000,), report=True):
+    """
+    Measure loading objects that are not in the cache and reading an
+    Attribute, a missing Attribute and the Tags of each, loading them one
+    at a time as they are used versus preloading them in chunks first.
+
+    Args:
+        nobjects (tuple, optional): Numbers of objects to load.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(nobjects, mode): seconds}` with mode
+            "lazy" or "preload".
+
+    """
+    from evennia.utils import create
+    from evennia.objects.models import ObjectDB
+    from evennia.objects.objects import DefaultObject
+    from evennia.server.startup import preload_chunks
+
+    result = {}
+    for nobj in nobjects:
+        objs = [
+            create.create_object(
+                DefaultObject,
+                key="preload_bench_%i" % iobj,
+                nohome=True,
+                attributes=[("weight", iobj)],
+                tags=["bench"],
+            )
+            for iobj in range(nobj)
+        ]
+        ids = [obj.id for obj in objs]
+        try:
+            for mode in ("lazy", "preload"):
+                for obj in objs:
+                    obj.flush_from_cache(force=True)
+                started = time.perf_counter()
+                if mode == "preload":
+                    list(preload_chunks(ObjectDB, number=None))
+                for dbid in ids:
+                    obj = ObjectDB.objects.get(id=dbid)
+                    obj.db.weight, obj.db.missing, obj.tags.all()
+                result[(nobj, mode)] = time.perf_counter() - started
+        finally:
+            for dbid in ids:
+                ObjectDB.objects.get(id=dbid).delete()
+
+    if report:
+        print_report(
+            "object preload",
+            ("objects", "mode", "ms"),
+            [(nobj, mode, "%.1f" % (secs * 1e3)) for (nobj, mode), secs in sorted(result.items())],
+        )
+    return result
+
+
+def bench_queryset_handlers(nobjects=(1000,), report=True):
+    """
+    Measure iterating over a queryset of objects and reading an Attribute
+    and the Tags of each: with the objects not in the cache, either loading
+    their Attributes and Tags per object or for all of them at once with
+    `with_handlers()`, and with all of them cached already.
+
+    Args:
+        nobjects (tuple, optional): Numbers of objects in the queryset.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(nobjects, mode): seconds}` with mode
+            "lazy", "with_handlers" or "cached".
+
+    """
+    from evennia.utils import create
+    from evennia.objects.models import ObjectDB
+    from evennia.objects.objects import DefaultObject
+
+    result = {}
+    for nobj in nobjects:
+        objs = [
+            create.create_object(
+                DefaultObject,
+                key="queryset_bench_%i" % iobj,
+                nohome=True,
+                attributes=[("weight", iobj)],
+                tags=["bench"],
+            )
+            for iobj in range(nobj)
+        ]
+        ids = [obj.id for obj in objs]
+        try:
+            for mode in ("lazy", "with_handlers", "cached"):
+                if mode != "cached":
+                    for obj in objs:
+                        obj.flush_from_cache(force=True)
+                started = time.perf_counter()
+                queryset = ObjectDB.objects.filter(id__in=ids)
+                if mode == "with_handlers":
+                    queryset = queryset.with_handlers()
+                for obj in queryset:
+                    obj.db.weight, obj.tags.all()
+                result[(nobj, mode)] = time.perf_counter() - started
+        finally:
+            for dbid in ids:
+                ObjectDB.objects.get(id=dbid).delete()
+
+    if report:
+        print_report(
+            "queryset handlers",
+            ("objects", "mode", "ms"),
+            [(nobj, mode, "%.1f" % (secs * 1e3)) for (nobj, mode), secs in sorted(result.items())],
+        )
+    return result
+
+
+def bench_attribute_bulk(nobjects=(1000,), report=True):
+    """
+    Measure reading an Attribute of many objects, creating and updating an
+    Attribute on them and tagging them, all with cold handler caches: once
+    calling the handlers of each object in a loop and once with the
+    cross-object `get_many`, `set_many` and `add_many`.
+
+    Args:
+        nobjects (tuple, optional): Numbers of objects to work on.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(nobjects, operation, mode): seconds}` with
+            operation "get", "create", "update" or "tag" and mode "loop" or
+            "bulk".
+
+    """
+    from evennia.utils import create
+    from evennia.objects.models import ObjectDB
+    from evennia.objects.objects import DefaultObject
+    from evennia.typeclasses.attributes import AttributeHandler
+    from evennia.typeclasses.tags import TagHandler
+
+    def _loop(objs, operation):
+        if operation == "get":
+            return sum(obj.attributes.get("weight") for obj in objs)
+        for iobj, obj in enumerate(objs):
+            if operation == "tag":
+                obj.tags.add("bench_loop")
+            else:
+                obj.attributes.add("loop_%s" % operation, iobj)
+
+    def _bulk(objs, operation):
+        if operation == "get":
+            return sum(AttributeHandler.get_many(objs, "weight"))
+        if operation == "tag":
+            TagHandler.add_many(objs, "bench_bulk")
+        else:
+            AttributeHandler.set_many(
+                {obj: iobj for iobj, obj in enumerate(objs)}, "bulk_%s" % operation
+            )
+
+    result = {}
+    for nobj in nobjects:
+        objs = [
+            create.create_object(
+                DefaultObject,
+                key="bulk_bench_%i" % iobj,
+                nohome=True,
+                attributes=[("weight", iobj), ("loop_update", 0), ("bulk_update", 0)],
+            )
+            for iobj in range(nobj)
+        ]
+        try:
+            for operation in ("get", "create", "update", "tag"):
+                for mode, func in (("loop", _loop), ("bulk", _bulk)):
+                    for obj in objs:
+                        obj.attributes.reset_cache()
+                        obj.tags.reset_cache()
+                    started = time.perf_counter()
+                    func(objs, operation)
+                    result[(nobj, operation, mode)] = time.perf_counter() - started
+        finally:
+            for obj in objs:
+                ObjectDB.objects.get(id=obj.id).delete()
+
+    if report:
+        print_report(
+            "attribute bulk operations",
+            ("objects", "operation", "mode", "ms"),
+            [
+                (nobj, operation, mode, "%.1f" % (result[(nobj, operation, mode)] * 1e3))
+                for nobj in nobjects
+                for operation in ("get", "create", "update", "tag")
+                for mode in ("loop", "bulk")
+            ],
+        )
+    return result
+
+
+def bench_tag_search(nobjects=(100000,), number=20, report=True):
+    """
+    Measure `get_by_tag` on many tagged objects: with the case-insensitive
+    (`iexact`) lookups used before Tags were stored in lowercase, with exact
+    lookups and with the in-memory Tag index (`settings.TAG_INDEX`). The
+    objects are spread over zones of 100 objects, each tagged with its zone,
+    and every tenth object is also tagged as an npc.
+
+    Args:
+        nobjects (tuple, optional): Numbers of tagged objects.
+        number (int, optional): Searches to time per run.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(nobjects, search, mode): seconds}` with
+            search "one" (one zone), "all" (the npcs of one zone), "any" (two
+            zones) or "load" (loading the index) and mode "iexact",
+            "exact" or "index".
+
+    """
+    from unittest.mock import patch
+    from django.db.models import Count, Q
+    from evennia.objects.models import ObjectDB
+    from evennia.typeclasses.tagindex import TAG_INDEX
+    from evennia.typeclasses.tags import Tag
+
+    through = ObjectDB.db_tags.through
+    searches = {
+        "one": (["zone_7"], ["zone"], "all"),
+        "all": (["zone_7", "npc"], ["zone", "role"], "all"),
+        "any": (["zone_7", "zone_8"], ["zone", "zone"], "any"),
+    }
+
+    def _iexact(keys, categories, match):
+        clauses = Q()
+        for key, category in zip(keys, categories):
+            clauses |= Q(db_key__iexact=key, db_category__iexact=category)
+        tags = Tag.objects.filter(clauses)
+        query = (
+            ObjectDB.objects.filter(
+                db_tags__db_tagtype__iexact=None, db_tags__db_model__iexact="objectdb"
+            )
+            .distinct()
+            .order_by("id")
+            .filter(db_tags__in=tags)
+            .annotate(matches=Count("db_tags__pk", filter=Q(db_tags__in=tags), distinct=True))
+        )
+        if match == "any":
+            return query.order_by("-matches")
+        return query.filter(matches__gte=len(keys))
+
+    result = {}
+    for nobj in nobjects:
+        nzones = max(1, nobj // 100)
+        ObjectDB.objects.bulk_create(
+            [
+                ObjectDB(
+                    db_key="tag_bench_%i" % iobj,
+                    db_typeclass_path="evennia.objects.objects.DefaultObject",
+                )
+                for iobj in range(nobj)
+            ],
+            batch_size=500,
+        )
+        ids = sorted(
+            ObjectDB.objects.filter(db_key__startswith="tag_bench_").values_list("id", flat=True)
+        )
+        zones = [
+            ObjectDB.objects.create_tag(key="zone_%i" % izone, category="zone")
+            for izone in range(nzones)
+        ]
+        npc = ObjectDB.objects.create_tag(key="npc", category="role")
+        through.objects.bulk_create(
+            [
+                through(objectdb_id=dbid, tag_id=zones[iobj // 100 % nzones].id)
+                for iobj, dbid in enumerate(ids)
+            ]
+            + [through(objectdb_id=dbid, tag_id=npc.id) for dbid in ids[::10]],
+            batch_size=500,
+        )
+        try:
+            TAG_INDEX.clear()
+            started = time.perf_counter()
+            TAG_INDEX.get_index(ObjectDB)
+            result[(nobj, "load", "index")] = time.perf_counter() - started
+            for search, (keys, categories, match) in searches.items():
+                result[(nobj, search, "iexact")] = timed(
+                    lambda: list(_iexact(keys, categories, match)), number=number
+                )
+                for mode, enabled in (("exact", False), ("index", True)):
+                    with patch("evennia.typeclasses.managers._TAG_INDEX", enabled):
+                        result[(nobj, search, mode)] = timed(
+                            lambda: list(
+                                ObjectDB.objects.get_by_tag(keys, categories, match=match)
+                            ),
+                            number=number,
+                        )
+        finally:
+            TAG_INDEX.clear()
+            for ichunk in range(0, len(ids), 500):
+                through.objects.filter(objectdb_id__in=ids[ichunk : ichunk + 500]).delete()
+                ObjectDB.objects.filter(id__in=ids[ichunk : ichunk + 500]).delete()
+            Tag.objects.filter(id__in=[tag.id for tag in zones + [npc]]).delete()
+
+    if report:
+        print_report(
+            "tag search",
+            ("objects", "search", "mode", "ms"),
+            [
+                (nobj, search, mode, "%.2f" % (secs * 1e3))
+                for (nobj, search, mode), secs in sorted(result.items())
+            ],
+        )
+    return result
+
+
+def bench_lock_checks(nobjects=(10, 100), checks=3, number=20, report=True):
+    """
+    Measure the lock checks of a command looking at a crowded room, with
+    and without the command lock cache. Each object's `view` and `get`
+    locks are checked `checks` times, as when a command searches the room,
+    then describes it.
+
+    Args:
+        nobjects (tuple, optional): Numbers of objects in the room.
+        checks (int, optional): Times each lock is checked per command.
+        number (int, optional): Commands to time per run.
+        report (bool, optional): Print the results.
+
+    Returns:
+        result (dict): Mapping `{(nobjects, mode): seconds_per_command}`
+            with mode "nocache" or "cache".
+
+    """
+    from evennia.locks import lockhandler
+    from evennia.utils import create
+    from evennia.objects.objects import DefaultObject
+
+    room = create.create_object(DefaultObject, key="lock_bench_room", nohome=True)
+    looker = create.create_object(
+        DefaultObject, key="lock_bench_looker", location=room, nohome=True
+    )
+    looker.permissions.add("Player")
+    objs = []
+    result = {}
+    try:
+        for nobj in nobjects:
+            while len(objs) < nobj:
+                obj = create.create_object(
+                    DefaultObject, key="lock_bench_%i" % len(objs), location=room, nohome=True
+                )
+                obj.locks.add("view:not tag(hidden, flags);get:perm(Builder) or holds()")
+                objs.append(obj)
+
+            def _command():
+                for _ in range(checks):
+                    for obj in objs:
+                        obj.access(looker, "view")
+                        obj.access(looker, "get")
+
+            def _cached_command():
+                with lockhandler.LockCache():
+                    _command()
+
+            result[(nobj, "nocache")] = timed(_command, number=number)
+            result[(nobj, "cache")] = timed(_cached_command, number=number)
+    finally:
+        for obj in objs + [looker, room]:
+            obj.delete()
+
+    if report:
+        print_report(
+            "lock checks",
+            ("objects", "mode", "ms/command"),
+            [(nobj, mode, "%.2f" % (secs * 1e3)) for (nobj, mode), secs in sorted(result.items())],
+        )
+    return result
@@ -29,18 +29,36 @@ change which actions by adding a path to
 in your settings. See utils.dummyrunner_actions.py
 for instructions on how to define this module.
 
+The runner measures the latency of every command the clients send: the
+time from sending it until the first reply arrives (or until a reply
+containing a given text arrives, for commands whose output others may
+also see). The clients can be ramped up in stages, each stage adding
+clients and running for a given time. When a stage ends, the 50th, 95th
+and 99th percentile latency of each type of action is printed. Use
+`--output` to also save the results as JSON or CSV, to compare the
+results of different versions of the game or of Evennia.
+
 """
 
 
 import sys
+import csv
+import json
+import math
 import time
 import random
 from argparse import ArgumentParser
 from twisted.conch import telnet
 from twisted.internet import reactor, protocol
 from twisted.internet.task import LoopingCall
+from autobahn.twisted.websocket import (
+    WebSocketClientProtocol,
+    WebSocketClientFactory,
+    connectWS,
+)
 
 from django.conf import settings
+import evennia
 from evennia.utils import mod_import, time_format
 
 # Load the dummyrunner settings module
@@ -54,33 +72,16 @@ if not DUMMYRUNNER_SETTINGS:
 
 DATESTRING = "%Y%m%d%H%M%S"
 
-# Settings
-
-# number of clients to launch if no input is given on command line
-NCLIENTS = 1
-# time between each 'tick', in seconds, if not set on command
-# line. All launched clients will be called upon to possibly do an
-# action with this frequency.
-TIMESTEP = DUMMYRUNNER_SETTINGS.TIMESTEP
-# chance of a client performing an action, per timestep. This helps to
-# spread out usage randomly, like it would be in reality.
-CHANCE_OF_ACTION = DUMMYRUNNER_SETTINGS.CHANCE_OF_ACTION
-# spread out the login action separately, having many accounts create accounts
-# and connect simultaneously is generally unlikely.
-CHANCE_OF_LOGIN = DUMMYRUNNER_SETTINGS.CHANCE_OF_LOGIN
-# Port to use, if not specified on command line
-TELNET_PORT = DUMMYRUNNER_SETTINGS.TELNET_PORT or settings.TELNET_PORTS[0]
-#
-NLOGGED_IN = 0
-
+# commands that give no reply, so their latency can't be measured
+NOREPLY_COMMANDS = (settings.IDLE_COMMAND,)
 
 # Messages
 
 
 INFO_STARTING = """
-    Dummyrunner starting using {N} dummy account(s). If you don't see
-    any connection messages, make sure that the Evennia server is
-    running.
+    Dummyrunner starting scenario '{scenario}' over {protocol} in stage(s)
+    {stages}. If you don't see any connection messages, make sure that
+    the Evennia server is running.
 
     Use Ctrl-C to stop/disconnect clients.
     """
@@ -117,13 +118,13 @@ ERROR_FEW_ACTIONS = """
 HELPTEXT = """
 DO NOT RUN THIS ON A PRODUCTION SERVER! USE A CLEAN/TESTING DATABASE!
 
-This stand-alone program launches dummy telnet clients against a
-running Evennia server. The idea is to mimic real accounts logging in
-and repeatedly doing resource-heavy commands so as to stress test the
-game. It uses the default command set to log in and issue commands, so
-if that was customized, some of the functionality will not be tested
-(it will not fail, the commands will just not be recognized).  The
-running clients will create new objects and rooms all over the place
+This stand-alone program launches dummy telnet or websocket clients
+against a running Evennia server. The idea is to mimic real accounts
+logging in and repeatedly doing resource-heavy commands so as to stress
+test the game. It uses the default command set to log in and issue
+commands, so if that was customized, some of the functionality will not
+be tested (it will not fail, the commands will just not be recognized).
+The running clients will create new objects and rooms all over the place
 as part of their running, so using a clean/testing database is
 strongly recommended.
 
@@ -142,7 +143,12 @@ Setup:
   3) Start Evennia like normal, optionally with profiling (--profile)
   4) Run this dummy runner via the evennia launcher:
 
-        evennia --dummyrunner <nr_of_clients>
+        evennia --dummyrunner <nr_of_clients> [options]
+
+     where the options are those of this program, such as
+
+        evennia --dummyrunner 10 --scenario crowded_room --stages 10:60,50:60,100:60
+            --output results.json
 
   5) Log on and determine if game remains responsive despite the
      heavier load. Note that if you activated profiling, there is a
@@ -155,6 +161,24 @@ Setup:
      server/logs/server.prof/portal.prof (see Python's manual on
      cProfiler).
 
+Scenarios:
+
+The scenarios are set in the SCENARIOS dict of the dummyrunner settings.
+The default ones are 'default' (looking, reading help and moving),
+'login_storm' (all clients creating accounts and logging in at once),
+'crowded_room' (everyone talking and emoting in the same room),
+'channel_spam' (everyone talking on the Public channel), 'movement'
+(walking between rooms) and 'building' (digging rooms and creating
+objects).
+
+Stages:
+
+'--stages 10:60,50:60,100' first runs 10 clients for 60 seconds, then
+adds clients up to 50 for another 60 seconds, then up to 100 until
+stopped with Ctrl-C. The latencies of each stage are reported
+separately. Without --stages, the -N clients run for --duration seconds
+(or until Ctrl-C).
+
 Notes:
 
 The dummyrunner tends to create a lot of accounts all at once, which is
@@ -215,7 +239,107 @@ def makeiter(obj):
     Returns:
         iterable (iterable): An iterable object.
     """
-    return obj if hasattr(obj, "__iter__") else [obj]
+    return obj if hasattr(obj, "__iter__") and not isinstance(obj, str) else [obj]
+
+
+def percentile(values, percent):
+    """
+    Get a percentile of a sorted list, by the nearest-rank method.
+
+    Args:
+        values (list): Sorted values.
+        percent (float): The percentile, 0-100.
+
+    Returns:
+        value (float or None): The percentile, None if there are no values.
+
+    """
+    if not values:
+        return None
+    return values[max(0, int(math.ceil(percent / 100.0 * len(values))) - 1)]
+
+
+def parse_stages(stagestring):
+    """
+    Parse a stage definition.
+
+    Args:
+        stagestring (str): On the form `N:seconds,N:seconds,...`. The
+            seconds of the last stage may be left out to run it until
+            stopped.
+
+    Returns:
+        stages (list): A list of `(nclients, duration)`, where duration
+            is None for the last stage if no seconds were given.
+
+    Raises:
+        ValueError: If the string is malformed.
+
+    """
+    stages = []
+    parts = [part.strip() for part in stagestring.split(",") if part.strip()]
+    for istage, part in enumerate(parts):
+        nclients, _, duration = part.partition(":")
+        if not duration and istage < len(parts) - 1:
+            raise ValueError("Only the last stage may be without a duration: '%s'." % part)
+        stages.append((int(nclients), float(duration) if duration else None))
+    if not stages:
+        raise ValueError("No stages given.")
+    return stages
+
+
+def build_actions(actions):
+    """
+    Turn an ACTIONS tuple into one with cumulative probabilities.
+
+    Args:
+        actions (tuple): `(login_func, logout_func, (prob, func), ...)`.
+
+    Returns:
+        actions (tuple): Same form, but with the probabilities normalized and
+            made cumulative, so an action can be picked with one random number.
+
+    Raises:
+        ValueError: If there are no login- and logout functions.
+
+    """
+    if len(actions) < 2:
+        raise ValueError(ERROR_FEW_ACTIONS)
+    if len(actions) == 2:
+        return tuple(actions)
+    # make sure the probabilities add up to 1
+    pratio = 1.0 / sum(tup[0] for tup in actions[2:])
+    flogin, flogout, probs, cfuncs = (
+        actions[0],
+        actions[1],
+        [tup[0] * pratio for tup in actions[2:]],
+        [tup[1] for tup in actions[2:]],
+    )
+    # create cumulative probabilies for the random actions
+    cprobs = [sum(v for i, v in enumerate(probs) if i <= k) for k in range(len(probs))]
+    # make sure rounding can't make us miss the last action
+    cprobs[-1] = 1.0
+    # rebuild a new, optimized action structure
+    return (flogin, flogout) + tuple(zip(cprobs, cfuncs))
+
+
+def action_label(func):
+    """
+    Get the name to report the latency of an action function under.
+
+    """
+    name = getattr(func, "__name__", str(func))
+    return name[2:] if name.startswith("c_") else name
+
+
+class ExpectReply(str):
+    """
+    A command string that is only considered replied to when a reply
+    containing a given text arrives. Made by `client.expect`.
+
+    """
+
+    reply = None
 
 
 # ------------------------------------------------------------
@@ -223,19 +347,21 @@ def makeiter(obj):
 # ------------------------------------------------------------
 
 
-class DummyClient(telnet.StatefulTelnetProtocol):
+class DummyClientMixin(object):
     """
-    Handles connection to a running Evennia server,
-    mimicking a real account by sending commands on
-    a timer.
+    The behavior shared by the telnet and websocket dummy clients. The
+    protocol classes must call `setup_dummy` when connected,
+    `text_received` with incoming text and `lost_connection` when the
+    connection is lost, and implement `send`.
 
     """
 
-    def connectionMade(self):
+    def setup_dummy(self):
         """
-        Called when connection is first established.
+        Set up the client once connected.
 
         """
+        self.runner = self.factory.runner
         # public properties
         self.cid = idcounter()
         self.key = "Dummy-%s" % self.cid
@@ -247,34 +373,54 @@ class DummyClient(telnet.StatefulTelnetProtocol):
         self._connected = False
         self._loggedin = False
         self._logging_out = False
-        self._report = ""
+        self._task = None
         self._cmdlist = []  # already stepping in a cmd definition
-        self._login = self.factory.actions[0]
-        self._logout = self.factory.actions[1]
-        self._actions = self.factory.actions[2:]
+        # (label, time sent, reply text) of the command waiting for a reply
+        self._pending = None
+        self._received = ""
+        self._login = self.runner.actions[0]
+        self._logout = self.runner.actions[1]
+        self._actions = self.runner.actions[2:]
+        self.runner.clients.append(self)
+
+    def send(self, cmdstring):
+        """
+        Send a command to the server.
 
-        reactor.addSystemEventTrigger("before", "shutdown", self.logout)
+        Args:
+            cmdstring (str): The command.
 
-    def dataReceived(self, data):
         """
-        Called when data comes in over the protocol. We wait to start
-        stepping until the server actually responds
+        raise NotImplementedError
+
+    def text_received(self, text):
+        """
+        Called with text coming from the server. We wait to start
+        stepping until the server actually responds.
 
         Args:
-            data (str): Incoming data.
+            text (str): Incoming text.
 
         """
-        if not self._connected and not data.startswith(chr(255)):
-            # wait until we actually get text back (not just telnet
-            # negotiation)
+        if not self._connected:
             self._connected = True
-            # start client tick
-            d = LoopingCall(self.step)
-            # dissipate exact step by up to +/- 0.5 second
-            timestep = TIMESTEP + (-0.5 + (random.random() * 1.0))
-            d.start(timestep, now=True).addErrback(self.error)
+            # start client tick, spreading out the clients' steps
+            self._task = LoopingCall(self.step)
+            timestep = self.runner.timestep * (0.75 + random.random() * 0.5)
+            self._task.start(timestep, now=True).addErrback(self.error)
+            return
+        if self._pending:
+            label, sent, reply = self._pending
+            if reply:
+                # the reply may be split over several chunks
+                self._received = (self._received + text)[-10000:]
+                if reply not in self._received:
+                    return
+            self.runner.record(label, time.perf_counter() - sent)
+            self._pending = None
+            self._received = ""
 
-    def connectionLost(self, reason):
+    def lost_connection(self, reason):
         """
         Called when loosing the connection.
 
@@ -282,6 +428,8 @@ class DummyClient(telnet.StatefulTelnetProtocol):
             reason (str): Reason for loosing connection.
 
         """
+        if self._task and self._task.running:
+            self._task.stop()
         if not self._logging_out:
             print("client %s(%s) lost connection (%s)" % (self.key, self.cid, reason))
 
@@ -304,15 +452,54 @@ class DummyClient(telnet.StatefulTelnetProtocol):
         """
         return gidcounter()
 
+    def expect(self, cmdstring, reply):
+        """
+        Mark a command as only replied to by output containing a given
+        text. Use for commands whose output is also seen by other clients
+        (like `say`), with a unique text.
+
+        Args:
+            cmdstring (str): The command to send.
+            reply (str): Text that must be in the reply.
+
+        Returns:
+            command (ExpectReply): The command string, to return from
+                an action function.
+
+        """
+        cmdstring = ExpectReply(cmdstring)
+        cmdstring.reply = reply
+        return cmdstring
+
     def logout(self):
         """
         Causes the client to log out of the server. Triggered by ctrl-c signal.
 
         """
+        if self._logging_out or not self._connected:
+            return
         self._logging_out = True
+        if self._task and self._task.running:
+            self._task.stop()
         cmd = self._logout(self)
         print("client %s(%s) logout (%s actions)" % (self.key, self.cid, self.istep))
-        self.sendLine(cmd)
+        self.send(str(cmd))
+
+    def send_command(self, label, cmdstring):
+        """
+        Send a command and start timing its reply.
+
+        Args:
+            label (str): What to report the latency under.
+            cmdstring (str or ExpectReply): The command.
+
+        """
+        if cmdstring.strip() not in NOREPLY_COMMANDS:
+            self._pending = (label, time.perf_counter(), getattr(cmdstring, "reply", None))
+            self._received = ""
+        self.runner.nsent += 1
+        self.send(str(cmdstring))
+        self.istep += 1
 
     def step(self):
         """
@@ -321,7 +508,14 @@ class DummyClient(telnet.StatefulTelnetProtocol):
         all "intelligence" of the dummy client.
 
         """
-        global NLOGGED_IN
+        runner = self.runner
+        if self._pending:
+            label, sent, _ = self._pending
+            if time.perf_counter() - sent < runner.reply_timeout:
+                # still waiting for the last command
+                return
+            runner.record(label, None)
+            self._pending = None
 
         rand = random.random()
 
@@ -329,34 +523,450 @@ class DummyClient(telnet.StatefulTelnetProtocol):
             # no commands ready. Load some.
 
             if not self._loggedin:
-                if rand < CHANCE_OF_LOGIN:
+                if rand < runner.chance_of_login:
                     # get the login commands
-                    self._cmdlist = list(makeiter(self._login(self)))
-                    NLOGGED_IN += 1  # this is for book-keeping
-                    print("connecting client %s (%i/%i)..." % (self.key, NLOGGED_IN, NCLIENTS))
+                    self._cmdlist = [("login", cmd) for cmd in makeiter(self._login(self))]
+                    runner.nlogged_in += 1  # this is for book-keeping
+                    print(
+                        "connecting client %s (%i/%i)..."
+                        % (self.key, runner.nlogged_in, runner.nclients)
+                    )
                     self._loggedin = True
                 else:
                     # no login yet, so cmdlist not yet set
                     return
-            else:
+            elif self._actions:
                 # we always pick a cumulatively random function
                 crand = random.random()
                 cfunc = [func for (cprob, func) in self._actions if cprob >= crand][0]
-                self._cmdlist = list(makeiter(cfunc(self)))
+                label = action_label(cfunc)
+                self._cmdlist = [(label, cmd) for cmd in makeiter(cfunc(self))]
+            else:
+                return
 
         # at this point we always have a list of commands
-        if rand < CHANCE_OF_ACTION:
+        if rand < runner.chance_of_action:
             # send to the game
-            self.sendLine(str(self._cmdlist.pop(0)))
-            self.istep += 1
+            self.send_command(*self._cmdlist.pop(0))
 
 
-class DummyFactory(protocol.ClientFactory):
-    protocol = DummyClient
+class DummyClient(DummyClientMixin, telnet.StatefulTelnetProtocol):
+    """
+    Handles connection to a running Evennia server,
+    mimicking a real account by sending commands on
+    a timer. This runs inside a `TelnetTransport`, which declines
+    all the telnet options the server offers.
+
+    """
+
+    def connectionMade(self):
+        """
+        Called when connection is first established.
+
+        """
+        self.setup_dummy()
+
+    def dataReceived(self, data):
+        """
+        Called when data comes in over the protocol.
+
+        Args:
+            data (bytes): Incoming data, without telnet negotiation.
+
+        """
+        self.text_received(data.decode("utf-8", errors="replace"))
+
+    def connectionLost(self, reason):
+        """
+        Called when loosing the connection.
+
+        Args:
+            reason (str): Reason for loosing connection.
+
+        """
+        self.lost_connection(reason.getErrorMessage())
+
+    def send(self, cmdstring):
+        self.sendLine(cmdstring.encode("utf-8"))
+
+
+class WebsocketDummyClient(DummyClientMixin, WebSocketClientProtocol):
+    """
+    A dummy client connecting like the webclient does.
 
-    def __init__(self, actions):
+    """
+
+    def onOpen(self):
+        """
+        Called when connection is first established.
+
+        """
+        self.setup_dummy()
+
+    def onMessage(self, payload, isBinary):
+        """
+        Called with each message from the server, on the form
+        `[cmdname, args, kwargs]`.
+
+        """
+        cmdarray = json.loads(str(payload, "utf-8"))
+        if cmdarray and cmdarray[0] in ("text", "prompt"):
+            self.text_received(cmdarray[1][0] if cmdarray[1] else "")
+
+    def onClose(self, wasClean, code, reason):
+        """
+        Called when loosing the connection.
+
+        """
+        if hasattr(self, "runner"):
+            self.lost_connection(reason)
+
+    def send(self, cmdstring):
+        self.sendMessage(json.dumps(["text", [cmdstring], {}]).encode("utf-8"))
+
+
+class DummyFactory(protocol.ClientFactory):
+    def __init__(self, runner):
         "Setup the factory base (shared by all clients)"
-        self.actions = actions
+        self.runner = runner
+
+    def buildProtocol(self, addr):
+        transport = telnet.TelnetTransport(DummyClient)
+        transport.factory = self
+        return transport
+
+    def clientConnectionFailed(self, connector, reason):
+        print("client could not connect (%s)" % reason.getErrorMessage())
+
+
+# ------------------------------------------------------------
+# The runner
+# ------------------------------------------------------------
+
+
+class DummyRunner(object):
+    """
+    Connects the dummy clients in stages and collects the latencies of
+    their commands.
+
+    """
+
+    def __init__(self, dummy_settings, stages, scenario="default", protocol="telnet", output=None):
+        """
+        Args:
+            dummy_settings (module): The dummyrunner settings.
+            stages (list): `(nclients, duration)` of each stage, as returned
+                by `parse_stages`.
+            scenario (str, optional): A key in the `SCENARIOS` of the
+                settings. 'default' uses `ACTIONS` if there are no scenarios.
+            protocol (str, optional): 'telnet' or 'websocket'.
+            output (str, optional): Path of a file to save the results in.
+                Saved as CSV if it ends with '.csv', otherwise as JSON.
+
+        Raises:
+            ValueError: For an unknown scenario or protocol.
+
+        """
+        scenarios = getattr(dummy_settings, "SCENARIOS", {})
+        if scenario in scenarios:
+            config = scenarios[scenario]
+        elif scenario == "default":
+            config = {"actions": dummy_settings.ACTIONS}
+        else:
+            raise ValueError(
+                "Unknown scenario '%s'. Choose from %s." % (scenario, ", ".join(scenarios))
+            )
+        if protocol not in ("telnet", "websocket"):
+            raise ValueError("Unknown protocol '%s'." % protocol)
+
+        self.scenario = scenario
+        self.protocol = protocol
+        self.output = output
+        self.stages = stages
+        self.actions = build_actions(config["actions"])
+        self.timestep = config.get("timestep", dummy_settings.TIMESTEP)
+        self.chance_of_action = config.get("chance_of_action", dummy_settings.CHANCE_OF_ACTION)
+        self.chance_of_login = config.get("chance_of_login", dummy_settings.CHANCE_OF_LOGIN)
+        self.reply_timeout = getattr(dummy_settings, "REPLY_TIMEOUT", 10)
+        if protocol == "telnet":
+            self.port = dummy_settings.TELNET_PORT or settings.TELNET_PORTS[0]
+        else:
+            self.port = (
+                getattr(dummy_settings, "WEBSOCKET_PORT", None) or settings.WEBSOCKET_CLIENT_PORT
+            )
+
+        self.clients = []
+        self.nclients = 0
+        self.nlogged_in = 0
+        self.nsent = 0
+        self.istage = -1
+        self.stage_start = None
+        self.stage_call = None
+        self.started = time.time()
+        # one dict per stage
+        self.results = []
+        self.finished = False
+        self._factory = None
+
+    def run(self):
+        """
+        Start the reactor and run all stages.
+
+        """
+        reactor.callWhenRunning(self.next_stage)
+        reactor.addSystemEventTrigger("before", "shutdown", self.finish)
+        reactor.run()
+
+    def connect(self):
+        """
+        Connect a new client.
+
+        """
+        if self.protocol == "websocket":
+            if not self._factory:
+                self._factory = WebSocketClientFactory("ws://localhost:%s" % self.port)
+                self._factory.protocol = WebsocketDummyClient
+                self._factory.runner = self
+            connectWS(self._factory)
+        else:
+            if not self._factory:
+                self._factory = DummyFactory(self)
+            reactor.connectTCP("localhost", self.port, self._factory)
+        self.nclients += 1
+
+    def next_stage(self):
+        """
+        End the current stage and start the next one.
+
+        """
+        self.end_stage()
+        self.istage += 1
+        if self.istage >= len(self.stages):
+            self.stop()
+            return
+        nclients, duration = self.stages[self.istage]
+        print(
+            "\nStage %i: %i clients%s"
+            % (self.istage + 1, nclients, " for %gs" % duration if duration else "")
+        )
+        self.stage_start = time.perf_counter()
+        self.results.append(
+            {"stage": self.istage + 1, "clients": nclients, "duration": None, "actions": {}}
+        )
+        for _ in range(nclients - self.nclients):
+            self.connect()
+        if duration:
+            self.stage_call = reactor.callLater(duration, self.next_stage)
+
+    def end_stage(self):
+        """
+        Finish the results of the current stage and print them.
+
+        """
+        if not self.results or self.results[-1]["duration"] is not None:
+            return
+        result = self.results[-1]
+        result["duration"] = time.perf_counter() - self.stage_start
+        print(format_results([result]))
+
+    def record(self, label, latency):
+        """
+        Record the latency of a command.
+
+        Args:
+            label (str): The type of action.
+            latency (float or None): Seconds until the reply, or None if
+                there was no reply in time.
+
+        """
+        if not self.results:
+            return
+        actions = self.results[-1]["actions"]
+        try:
+            stats = actions[label]
+        except KeyError:
+            stats = actions[label] = {"latencies": [], "timeouts": 0}
+        if latency is None:
+            stats["timeouts"] += 1
+        else:
+            stats["latencies"].append(latency)
+
+    def get_report(self):
+        """
+        Get the results of all stages.
+
+        Returns:
+            report (dict): With the scenario setup and a list `stages` of
+                dicts with `stage`, `clients`, `duration` and `actions`,
+                mapping each action to its `replies` and `timeouts`
+                counts and `mean`, `p50`, `p95`, `p99` and `max` latency
+                (in milliseconds).
+
+        """
+        stages = []
+        for result in self.results:
+            stages.append(
+                {
+                    "stage": result["stage"],
+                    "clients": result["clients"],
+                    "duration": result["duration"],
+                    "actions": summarize(result["actions"]),
+                }
+            )
+        return {
+            "evennia": evennia.__version__,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "scenario": self.scenario,
+            "protocol": self.protocol,
+            "timestep": self.timestep,
+            "commands_sent": self.nsent,
+            "stages": stages,
+        }
+
+    def save(self, path):
+        """
+        Save the results to a file.
+
+        Args:
+            path (str): The file to write. Saved as CSV if this ends with
+                '.csv', otherwise as JSON.
+
+        """
+        report = self.get_report()
+        with open(path, "w", newline="") as fil:
+            if path.endswith(".csv"):
+                fields = ("replies", "timeouts", "mean", "p50", "p95", "p99", "max")
+                writer = csv.writer(fil)
+                writer.writerow(
+                    ("scenario", "protocol", "stage", "clients", "action")
+                    + tuple(
+                        field if field in ("replies", "timeouts") else field + "_ms"
+                        for field in fields
+                    )
+                )
+                for stage in report["stages"]:
+                    for label, stats in sorted(stage["actions"].items()):
+                        writer.writerow(
+                            (
+                                report["scenario"],
+                                report["protocol"],
+                                stage["stage"],
+                                stage["clients"],
+                                label,
+                            )
+                            + tuple(stats[field] for field in fields)
+                        )
+            else:
+                json.dump(report, fil, indent=2)
+        print("Results saved to %s." % path)
+
+    def finish(self):
+        """
+        End the run, save the results and log out all clients.
+
+        """
+        if self.finished:
+            return
+        self.finished = True
+        if self.stage_call and self.stage_call.active():
+            self.stage_call.cancel()
+        self.end_stage()
+        if self.output:
+            self.save(self.output)
+        for client in self.clients:
+            client.logout()
+
+    def stop(self):
+        """
+        Stop after the last stage.
+
+        """
+        self.finish()
+        # give the logouts time to reach the server
+        reactor.callLater(1.0, reactor.stop)
+
+
+def summarize(actions):
+    """
+    Summarize the latencies of each action.
+
+    Args:
+        actions (dict): Mapping action labels to dicts with `latencies`
+            (list of seconds) and `timeouts`.
+
+    Returns:
+        summary (dict): Mapping the labels (and 'all', for all actions) to
+            dicts of `replies`, `timeouts`, `mean`, `p50`, `p95`, `p99`
+            and `max` (latencies in ms, None if there were no replies).
+
+    """
+    summary = {}
+    all_latencies, all_timeouts = [], 0
+    items = list(actions.items())
+    for label, stats in items + [("all", None)]:
+        if stats is None:
+            if len(items) < 2:
+                break
+            latencies, timeouts = all_latencies, all_timeouts
+        else:
+            latencies, timeouts = stats["latencies"], stats["timeouts"]
+            all_latencies.extend(latencies)
+            all_timeouts += timeouts
+        latencies = sorted(latency * 1000 for latency in latencies)
+        summary[label] = {
+            "replies": len(latencies),
+            "timeouts": timeouts,
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        }
+    return summary
+
+
+def format_results(results):
+    """
+    Make a text table of stage results.
+
+    Args:
+        results (list): Stage results, as stored by the runner.
+
+    Returns:
+        table (str): The table.
+
+    """
+    lines = []
+    header = "%-16s %8s %8s %9s %9s %9s %9s %9s" % (
+        "action",
+        "replies",
+        "timeouts",
+        "mean ms",
+        "p50 ms",
+        "p95 ms",
+        "p99 ms",
+        "max ms",
+    )
+    for result in results:
+        lines.append(
+            "Stage %i: %i clients, %s"
+            % (result["stage"], result["clients"], time_format(result["duration"] or 0, 2))
+        )
+        lines.append(header)
+        for label, stats in sorted(summarize(result["actions"]).items()):
+            lines.append(
+                "%-16s %8i %8i %s"
+                % (
+                    label,
+                    stats["replies"],
+                    stats["timeouts"],
+                    " ".join(
+                        "%9s" % ("-" if stats[key] is None else "%.1f" % stats[key])
+                        for key in ("mean", "p50", "p95", "p99", "max")
+                    ),
+                )
+            )
+    return "\n".join(lines)
 
 
 # ------------------------------------------------------------
@@ -365,41 +975,42 @@ class DummyFactory(protocol.ClientFactory):
 # ------------------------------------------------------------
 
 
-def start_all_dummy_clients(nclients):
+def start_all_dummy_clients(
+    nclients, stages=None, scenario="default", protocol="telnet", output=None, duration=None
+):
     """
     Initialize all clients, connect them and start to step them
 
     Args:
-        nclients (int): Number of dummy clients to connect.
+        nclients (int): Number of dummy clients to connect, if not
+            using stages.
+        stages (str, optional): Stages on the form `N:seconds,N:seconds,...`.
+        scenario (str, optional): Scenario from the dummyrunner settings.
+        protocol (str, optional): 'telnet' or 'websocket'.
+        output (str, optional): File to save the results in (.json or .csv).
+        duration (float, optional): Seconds to run, if not using stages.
+            Otherwise run until stopped.
 
     """
-    global NCLIENTS
-    NCLIENTS = int(nclients)
-    actions = DUMMYRUNNER_SETTINGS.ACTIONS
-
-    if len(actions) < 2:
-        print(ERROR_FEW_ACTIONS)
+    stages = parse_stages(stages) if stages else [(int(nclients), duration)]
+    try:
+        runner = DummyRunner(
+            DUMMYRUNNER_SETTINGS, stages, scenario=scenario, protocol=protocol, output=output
+        )
+    except ValueError as err:
+        print(err)
         return
-
-    # make sure the probabilities add up to 1
-    pratio = 1.0 / sum(tup[0] for tup in actions[2:])
-    flogin, flogout, probs, cfuncs = (
-        actions[0],
-        actions[1],
-        [tup[0] * pratio for tup in actions[2:]],
-        [tup[1] for tup in actions[2:]],
+    print(
+        INFO_STARTING.format(
+            scenario=scenario,
+            protocol=protocol,
+            stages=", ".join(
+                "%i clients%s" % (nclients, " for %gs" % secs if secs else "")
+                for nclients, secs in stages
+            ),
+        )
     )
-    # create cumulative probabilies for the random actions
-    cprobs = [sum(v for i, v in enumerate(probs) if i <= k) for k in range(len(probs))]
-    # rebuild a new, optimized action structure
-    actions = (flogin, flogout) + tuple(zip(cprobs, cfuncs))
-
-    # setting up all clients (they are automatically started)
-    factory = DummyFactory(actions)
-    for i in range(NCLIENTS):
-        reactor.connectTCP("localhost", TELNET_PORT, factory)
-    # start reactor
-    reactor.run()
+    runner.run()
 
 
 # ------------------------------------------------------------
@@ -418,16 +1029,55 @@ if __name__ == "__main__":
     # parsing command line with default vals
     parser = ArgumentParser(description=HELPTEXT)
     parser.add_argument(
-        "-N", nargs=1, default=1, dest="nclients", help="Number of clients to start"
+        "-N", nargs=1, default=[1], dest="nclients", help="Number of clients to start"
+    )
+    parser.add_argument(
+        "--config", dest="config", default=None, help="Path to a dummyrunner settings file"
+    )
+    parser.add_argument("--scenario", dest="scenario", default="default", help="Scenario to run")
+    parser.add_argument(
+        "--stages",
+        dest="stages",
+        default=None,
+        help="Ramp up clients in stages, like 10:60,50:60,100:60 (clients:seconds)",
+    )
+    parser.add_argument(
+        "--duration",
+        dest="duration",
+        type=float,
+        default=None,
+        help="Seconds to run the -N clients (default is until Ctrl-C)",
+    )
+    parser.add_argument(
+        "--protocol",
+        dest="protocol",
+        choices=("telnet", "websocket"),
+        default="telnet",
+        help="Connect as telnet or websocket (webclient) clients",
+    )
+    parser.add_argument(
+        "--output", dest="output", default=None, help="Save the results to a .json or .csv file"
     )
 
     args = parser.parse_args()
 
-    print(INFO_STARTING.format(N=args.nclients[0]))
+    if args.config:
+        import importlib.util
+
+        spec = importlib.util.spec_from_file_location("dummyrunner_settings", args.config)
+        DUMMYRUNNER_SETTINGS = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(DUMMYRUNNER_SETTINGS)
 
     # run the dummyrunner
     t0 = time.time()
-    start_all_dummy_clients(nclients=args.nclients[0])
+    start_all_dummy_clients(
+        args.nclients[0],
+        stages=args.stages,
+        scenario=args.scenario,
+        protocol=args.protocol,
+        output=args.output,
+        duration=args.duration,
+    )
     ttot = time.time() - t0
 
     # output runtime
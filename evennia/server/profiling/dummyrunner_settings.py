@@ -10,7 +10,11 @@ TIMESTEP - time in seconds between each 'tick'
 CHANCE_OF_ACTION - chance 0-1 of action happening
 CHANCE_OF_LOGIN - chance 0-1 of login happening
 TELNET_PORT - port to use, defaults to settings.TELNET_PORT
+WEBSOCKET_PORT - port to use with --protocol websocket, defaults to
+    settings.WEBSOCKET_CLIENT_PORT
+REPLY_TIMEOUT - seconds to wait for the reply to a command
 ACTIONS - see below
+SCENARIOS - see below
 
 ACTIONS is a tuple
 
@@ -45,12 +49,25 @@ The client object has the following relevant properties and methods:
 - objs - an empty list. Can be used to store object names
 - counter() - returns a unique increasing id, hashed with time stamp
               to make it unique also between dummyrunner instances.
+- expect(cmdstring, reply) - returns the command marked so that its
+              latency is measured until a reply containing `reply`
+              arrives, instead of until any output arrives. Use for
+              commands whose output other clients also get, like `say`.
 
 The return should either be a single command string or a tuple of
 command strings. This list of commands will always be executed every
 TIMESTEP with a chance given by CHANCE_OF_ACTION by in the order given
 (no randomness) and allows for setting up a more complex chain of
-commands (such as creating an account and logging in).
+commands (such as creating an account and logging in). A client waits
+for the reply to a command (up to REPLY_TIMEOUT seconds) before sending
+the next one. The latency of each command is reported under the name
+of the action function that made it (without the `c_` prefix).
+
+SCENARIOS is a dict of named scenarios to pick from with the
+`--scenario` option of the dummyrunner. Each is a dict with the key
+`actions`, an ACTIONS tuple, and optionally `timestep`,
+`chance_of_action` and `chance_of_login` to use instead of the global
+settings. Without the option, the 'default' scenario is used.
 
 ---
 
@@ -74,6 +91,14 @@ CHANCE_OF_LOGIN = 1.0
 # default telnet port of the running server.
 TELNET_PORT = None
 
+# Which websocket port to connect to with --protocol websocket. If set to
+# None, uses the websocket port of the running server.
+WEBSOCKET_PORT = None
+
+# Seconds to wait for a reply to a command before counting it as timed
+# out and moving on.
+REPLY_TIMEOUT = 10
+
 
 # Setup actions tuple
 
@@ -209,6 +234,24 @@ def c_socialize(client):
     return cmds
 
 
+def c_says(client):
+    "says something in the room"
+    token = "say-%s" % client.counter()
+    return client.expect("say Hello %s!" % token, token)
+
+
+def c_emotes(client):
+    "emotes in the room"
+    token = "emote-%s" % client.counter()
+    return client.expect("emote waves (%s)." % token, token)
+
+
+def c_channel_spam(client):
+    "talks on the public channel"
+    token = "pub-%s" % client.counter()
+    return client.expect("pub Testing %s ..." % token, token)
+
+
 def c_moves(client):
     "moves to a previously created room, using the stored exits"
     cmds = client.exits  # try all exits - finally one will work
@@ -290,3 +333,34 @@ ACTIONS = (c_login, c_logout, (0.01, c_digs), (0.39, c_looks), (0.2, c_help), (0
 # ACTIONS = (c_login,
 #           c_logout,
 #           (1.0, c_digs))
+
+# Scenarios (picked with --scenario)
+SCENARIOS = {
+    # the ACTIONS above
+    "default": {"actions": ACTIONS},
+    # everyone creates an account and logs in as fast as they can
+    "login_storm": {
+        "actions": (c_login_nodig, c_logout, (1.0, c_looks)),
+        "timestep": 0.2,
+        "chance_of_action": 1.0,
+    },
+    # everyone talks and emotes in the same room (the start location)
+    "crowded_room": {
+        "actions": (c_login_nodig, c_logout, (0.5, c_says), (0.3, c_emotes), (0.2, c_looks))
+    },
+    # everyone talks on the public channel
+    "channel_spam": {"actions": (c_login_nodig, c_logout, (0.9, c_channel_spam), (0.1, c_looks))},
+    # walking between rooms dug at login
+    "movement": {"actions": (c_login, c_logout, (0.6, c_moves), (0.3, c_digs), (0.1, c_looks))},
+    # digging rooms and creating objects
+    "building": {
+        "actions": (
+            c_login,
+            c_logout,
+            (0.3, c_digs),
+            (0.4, c_creates_obj),
+            (0.2, c_examines),
+            (0.1, c_looks),
+        )
+    },
+}
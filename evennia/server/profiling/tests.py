@@ -1,9 +1,19 @@
+import os
+import csv
+import json
+import shutil
+import tempfile
 from django.test import TestCase
 from mock import Mock, patch, mock_open
+from evennia.utils.test_resources import EvenniaTest
+from evennia.objects.models import ObjectDB
+from . import benchmarks, dummyrunner, dummyrunner_settings
 from .dummyrunner_settings import (
+    c_channel_spam,
     c_creates_button,
     c_creates_obj,
     c_digs,
+    c_emotes,
     c_examines,
     c_help,
     c_idles,
@@ -14,6 +24,7 @@ from .dummyrunner_settings import (
     c_moves,
     c_moves_n,
     c_moves_s,
+    c_says,
     c_socialize,
 )
 
@@ -139,6 +150,109 @@ class TestDummyrunnerSettings(TestCase):
     def test_c_move_s(self):
         self.assertEqual(c_moves_s(self.client), "south")
 
+    def test_expecting_actions(self):
+        self.client.expect = lambda cmdstring, reply: (cmdstring, reply)
+        self.assertEqual(c_says(self.client), ("say Hello say-1!", "say-1"))
+        self.assertEqual(c_emotes(self.client), ("emote waves (emote-1).", "emote-1"))
+        self.assertEqual(c_channel_spam(self.client), ("pub Testing pub-1 ...", "pub-1"))
+
+
+class TestDummyrunner(TestCase):
+    def setUp(self):
+        # the runner reports its progress with print
+        patcher = patch.object(dummyrunner, "print", create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.runner = dummyrunner.DummyRunner(
+            dummyrunner_settings, [(1, 10), (2, None)], scenario="crowded_room"
+        )
+        self.runner.chance_of_login = self.runner.chance_of_action = 1.0
+        with patch.object(self.runner, "connect"):
+            self.runner.next_stage()
+        self.client = dummyrunner.DummyClient()
+        self.client.factory = Mock(runner=self.runner)
+        self.client.setup_dummy()
+        self.client._connected = True
+        self.client.send = Mock()
+
+    def tearDown(self):
+        # don't start the next stage in a later test
+        self.runner.stage_call.cancel()
+
+    def test_helpers(self):
+        self.assertEqual(
+            dummyrunner.parse_stages("10:60, 50:30.5,100"), [(10, 60), (50, 30.5), (100, None)]
+        )
+        with self.assertRaises(ValueError):
+            dummyrunner.parse_stages("10,50:60")
+        self.assertEqual(dummyrunner.percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(dummyrunner.percentile([1, 2, 3, 4], 99), 4)
+        self.assertIsNone(dummyrunner.percentile([], 50))
+        actions = dummyrunner.build_actions((c_login, c_logout, (2, c_looks), (6, c_says)))
+        self.assertEqual(actions[2:], ((0.25, c_looks), (1.0, c_says)))
+        with self.assertRaises(ValueError):
+            dummyrunner.DummyRunner(dummyrunner_settings, [(1, None)], scenario="foo")
+
+    def test_latency(self):
+        client = self.client
+        client._actions = ((1.0, c_looks),)
+        # login
+        client.step()
+        self.assertTrue(client.send.call_args[0][0].startswith("create Dummy-"))
+        client.text_received("Account created.")
+        client.step()
+        self.assertTrue(client.send.call_args[0][0].startswith("connect Dummy-"))
+        # waiting for the reply
+        client.step()
+        self.assertEqual(client.send.call_count, 2)
+        # the reply times out
+        label, sent, reply = client._pending
+        client._pending = (label, sent - 11, reply)
+        client.step()
+        # the login commands are done, so a random action was picked
+        self.assertEqual(client.send.call_args[0][0], "look")
+        client.text_received("Something else.")
+        # a reply is only counted when it contains the expected text
+        client._cmdlist = [("says", client.expect("say Hello x-1!", "x-1"))]
+        client.step()
+        self.assertEqual(client.send.call_args[0][0], "say Hello x-1!")
+        client.text_received('Dummy-2 says, "Hi!"\nYou say, "Hello')
+        self.assertIsNotNone(client._pending)
+        client.text_received(' x-1!"')
+        self.assertIsNone(client._pending)
+
+        latencies = [
+            latency
+            for stats in self.runner.results[0]["actions"].values()
+            for latency in stats["latencies"]
+        ]
+        self.assertTrue(all(latency >= 0 for latency in latencies))
+        actions = dummyrunner.summarize(self.runner.results[0]["actions"])
+        self.assertEqual(set(actions), {"login", "looks", "says", "all"})
+        self.assertEqual((actions["login"]["replies"], actions["login"]["timeouts"]), (1, 1))
+        self.assertEqual(actions["says"]["replies"], 1)
+        self.assertEqual(actions["all"]["replies"], 3)
+        self.assertIn("login", dummyrunner.format_results(self.runner.results))
+
+    def test_save(self):
+        self.client.step()
+        self.client.text_received("Account created.")
+        tmpdir = tempfile.mkdtemp()
+        try:
+            jsonpath, csvpath = os.path.join(tmpdir, "res.json"), os.path.join(tmpdir, "res.csv")
+            self.runner.save(jsonpath)
+            self.runner.save(csvpath)
+            with open(jsonpath) as fil:
+                report = json.load(fil)
+            self.assertEqual(report["scenario"], "crowded_room")
+            self.assertEqual(report["stages"][0]["actions"]["login"]["replies"], 1)
+            with open(csvpath) as fil:
+                rows = list(csv.DictReader(fil))
+            self.assertEqual([row["action"] for row in rows], ["login"])
+            self.assertEqual(rows[0]["stage"], "1")
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 class TestMemPlot(TestCase):
     @patch.object(memplot, "_idmapper")
@@ -160,3 +274,65 @@ class TestMemPlot(TestCase):
         handle = mocked_open()
         handle.write.assert_called_with("100.0, 0.001, 0.001, 9\n")
         script.stop()
+
+
+class TestBenchmarks(EvenniaTest):
+    def test_bench_emote(self):
+        result = benchmarks.bench_emote(observers=(3,), number=1, report=False)
+        self.assertEqual(list(result), [3])
+
+    def test_bench_websocket_output(self):
+        result = benchmarks.bench_websocket_output(
+            messages_per_tick=(2,), number=1, encodings=("json",), report=False
+        )
+        self.assertEqual(len(result), 4)
+
+    def test_bench_telnet_output(self):
+        result = benchmarks.bench_telnet_output(messages_per_tick=(2,), number=1, report=False)
+        self.assertEqual(len(result), 4)
+        # the compressed output must be smaller
+        self.assertLess(result[(2, "coalesced+mccp")][1], result[(2, "coalesced")][1])
+
+    def test_bench_help_topics(self):
+        result = benchmarks.bench_help_topics(entries=(5,), number=1, report=False)
+        self.assertEqual(set(result), {(5, "locks"), (5, "index")})
+
+    def test_bench_string_suggestions(self):
+        result = benchmarks.bench_string_suggestions(vocabulary_sizes=(10,), number=1, report=False)
+        self.assertEqual(set(result), {(10, "plain"), (10, "suggester")})
+
+    def test_bench_attribute_reads(self):
+        result = benchmarks.bench_attribute_reads(number=1, report=False)
+        self.assertEqual(len(result), 8)
+
+    def test_bench_object_preload(self):
+        result = benchmarks.bench_object_preload(nobjects=(3,), report=False)
+        self.assertEqual(set(result), {(3, "lazy"), (3, "preload")})
+
+    def test_bench_queryset_handlers(self):
+        result = benchmarks.bench_queryset_handlers(nobjects=(3,), report=False)
+        self.assertEqual(set(result), {(3, "lazy"), (3, "with_handlers"), (3, "cached")})
+
+    def test_bench_attribute_bulk(self):
+        result = benchmarks.bench_attribute_bulk(nobjects=(3,), report=False)
+        self.assertEqual(len(result), 8)
+        self.assertIn((3, "tag", "bulk"), result)
+
+    def test_bench_tag_search(self):
+        result = benchmarks.bench_tag_search(nobjects=(30,), number=1, report=False)
+        self.assertEqual(len(result), 10)
+        self.assertFalse(ObjectDB.objects.filter(db_key__startswith="tag_bench_").exists())
+
+    def test_bench_lock_checks(self):
+        result = benchmarks.bench_lock_checks(nobjects=(2, 4), number=1, report=False)
+        self.assertEqual(len(result), 4)
+        self.assertFalse(ObjectDB.objects.filter(db_key__startswith="lock_bench_").exists())
+
+    def test_bench_attribute_storage(self):
+        result = benchmarks.bench_attribute_storage(number=1, report=False)
+        self.assertEqual(len(result), 6)
+        self.assertLess(result[("text", "binary")][0], result[("text", "legacy")][0])
+
+    def test_bench_script_timers(self):
+        result = benchmarks.bench_script_timers(nscripts=(10,), seconds=2, report=False)
+        self.assertEqual(set(result), {(10, "loopingcall"), (10, "wheel")})
@@ -36,6 +36,11 @@ from evennia.server import initial_setup
 from evennia.utils.utils import get_evennia_version, mod_import, make_iter
 from evennia.utils import logger
 from evennia.comms import channelhandler
+from evennia.help.helpindex import HELP_INDEX
+from evennia.commands.cmdstats import CMD_STATS
+from evennia.server.watchdog import REACTOR_WATCHDOG
+from evennia.server.startup import STARTUP_TIMER, preload_objects
+from evennia.server.snapshot import load_snapshot, write_snapshot
 from evennia.server.sessionhandler import SESSIONS
 
 from django.utils.translation import gettext as _
@@ -366,33 +371,60 @@ class Evennia(object):
 
         """
         from evennia.objects.models import ObjectDB
+        from evennia.utils import gametime
 
         # start server time and maintenance task
         self.maintenance_task = LoopingCall(_server_maintenance)
         self.maintenance_task.start(60, now=True)  # call every minute
 
+        # restore the caches from before the reload
+        if mode == "reload" and settings.RELOAD_SNAPSHOT:
+            with STARTUP_TIMER.phase("snapshot"):
+                nrestored = load_snapshot()
+            if nrestored:
+                logger.log_info("Restored %i objects from the reload snapshot." % nrestored)
+
         # update eventual changed defaults
-        self.update_defaults()
+        with STARTUP_TIMER.phase("defaults"):
+            self.update_defaults()
+
+        with STARTUP_TIMER.phase("at_init"):
+            [o.at_init() for o in ObjectDB.get_all_cached_instances()]
+            [p.at_init() for p in AccountDB.get_all_cached_instances()]
+
+        # index the help entries so the first help command isn't slow
+        with STARTUP_TIMER.phase("help index"):
+            HELP_INDEX.build()
 
-        [o.at_init() for o in ObjectDB.get_all_cached_instances()]
-        [p.at_init() for p in AccountDB.get_all_cached_instances()]
+        # start the timer for the next in-game calendar event
+        with STARTUP_TIMER.phase("calendar"):
+            gametime.CALENDAR.load()
+
+        # start passing the command statistics to settings.COMMAND_STATS_EXPORT_HOOK
+        CMD_STATS.start_export()
+
+        # measure the reactor lag and catch what stalls it
+        if settings.REACTOR_WATCHDOG:
+            REACTOR_WATCHDOG.start()
+            reactor.addSystemEventTrigger("before", "shutdown", REACTOR_WATCHDOG.stop)
 
         # call correct server hook based on start file value
-        if mode == "reload":
-            logger.log_msg("Server successfully reloaded.")
-            self.at_server_reload_start()
-        elif mode == "reset":
-            # only run hook, don't purge sessions
-            self.at_server_cold_start()
-            logger.log_msg("Evennia Server successfully restarted in 'reset' mode.")
-        elif mode == "shutdown":
-            self.at_server_cold_start()
-            # clear eventual lingering session storages
-            ObjectDB.objects.clear_all_sessids()
-            logger.log_msg("Evennia Server successfully started.")
-
-        # always call this regardless of start type
-        self.at_server_start()
+        with STARTUP_TIMER.phase("start hooks"):
+            if mode == "reload":
+                logger.log_msg("Server successfully reloaded.")
+                self.at_server_reload_start()
+            elif mode == "reset":
+                # only run hook, don't purge sessions
+                self.at_server_cold_start()
+                logger.log_msg("Evennia Server successfully restarted in 'reset' mode.")
+            elif mode == "shutdown":
+                self.at_server_cold_start()
+                # clear eventual lingering session storages
+                ObjectDB.objects.clear_all_sessids()
+                logger.log_msg("Evennia Server successfully started.")
+
+            # always call this regardless of start type
+            self.at_server_start()
 
     @defer.inlineCallbacks
     def shutdown(self, mode="reload", _reactor_stopping=False):
@@ -470,6 +502,19 @@ class Evennia(object):
         # always called, also for a reload
         self.at_server_stop()
 
+        if mode == "reload" and settings.RELOAD_SNAPSHOT:
+            # let the new server process restore its caches from this
+            started = time.time()
+            try:
+                nwritten = write_snapshot()
+            except Exception:
+                logger.log_trace("Could not write the reload snapshot.")
+            else:
+                logger.log_info(
+                    "Wrote %i objects to the reload snapshot in %.2fs."
+                    % (nwritten, time.time() - started)
+                )
+
         if hasattr(self, "web_root"):  # not set very first start
             yield self.web_root.empty_threadpool()
 
@@ -522,21 +567,25 @@ class Evennia(object):
 
         from evennia.scripts.monitorhandler import MONITOR_HANDLER
 
-        MONITOR_HANDLER.restore(mode == "reload")
+        with STARTUP_TIMER.phase("monitors"):
+            MONITOR_HANDLER.restore(mode == "reload")
 
         from evennia.scripts.tickerhandler import TICKER_HANDLER
 
-        TICKER_HANDLER.restore(mode == "reload")
+        with STARTUP_TIMER.phase("tickers"):
+            TICKER_HANDLER.restore(mode == "reload")
 
         # after sync is complete we force-validate all scripts
         # (this also starts any that didn't yet start)
-        ScriptDB.objects.validate(init_mode=mode)
+        with STARTUP_TIMER.phase("scripts"):
+            ScriptDB.objects.validate(init_mode=mode)
 
         # start the task handler
         from evennia.scripts.taskhandler import TASK_HANDLER
 
-        TASK_HANDLER.load()
-        TASK_HANDLER.create_delays()
+        with STARTUP_TIMER.phase("tasks"):
+            TASK_HANDLER.load()
+            TASK_HANDLER.create_delays()
 
         # check so default channels exist
         from evennia.comms.models import ChannelDB
@@ -565,6 +614,17 @@ class Evennia(object):
         # delete the temporary setting
         ServerConfig.objects.conf("server_restart_mode", delete=True)
 
+        STARTUP_TIMER.report("Server ready")
+
+        if settings.STARTUP_PRELOAD_OBJECTS != 0:
+            # warm the object cache in the background
+            started = time.time()
+            preload_objects().addCallback(
+                lambda nloaded: logger.log_info(
+                    "Preloaded %i objects in %.2fs." % (nloaded, time.time() - started)
+                )
+            ).addErrback(logger.log_trace)
+
     def at_server_reload_stop(self):
         """
         This is called only time the server stops before a reload.
@@ -0,0 +1,390 @@
+"""
+Reload snapshots
+
+A reload restarts the Server process, so everything in the idmapper cache
+and in the Attribute and Tag handler caches has to be loaded from the
+database again. With `settings.RELOAD_SNAPSHOT` on, the server instead
+writes the database rows of the objects in its cache, together with their
+Attributes and Tags, to a local file as it shuts down for a reload. The new
+process maps the file into memory and restores the objects and their
+handler caches from it before the first command runs.
+
+A snapshot is only used once, and only if nothing in it can have changed
+since it was written:
+
+- Any process saving or deleting an object, Attribute or Tag, or adding or
+  removing the Attributes and Tags of an object, deletes the snapshot file.
+- The row count and highest id of each table in the snapshot are stored
+  with it and must still be the same when it's loaded. This catches changes
+  that don't send signals, like bulk updates or changes made outside
+  Evennia.
+
+Otherwise the server starts as usual and loads objects from the database
+when they are needed.
+
+Settings:
+
+- `RELOAD_SNAPSHOT` - write and use snapshots on reload.
+- `RELOAD_SNAPSHOT_FILE` - where to write the snapshot.
+
+"""
+
+import gc
+import mmap
+import os
+import pickle
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import router
+from django.db.models import Count, DateTimeField, Max
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.utils import timezone
+from evennia.utils import logger
+
+_SNAPSHOT_ENABLED = settings.RELOAD_SNAPSHOT
+_SNAPSHOT_FILE = settings.RELOAD_SNAPSHOT_FILE
+# bump the version when changing what is stored in the snapshot
+_SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = b"EVSNAP" + bytes((_SNAPSHOT_VERSION,))
+# a snapshot older than this (in seconds) is left over from an aborted reload
+_SNAPSHOT_MAX_AGE = 600
+_SNAPSHOT_CHUNK_SIZE = 500
+# the Attribute and Tag handlers of objects
+_SNAPSHOT_HANDLERS = {
+    "attributes": ("attributes", "nicks"),
+    "tags": ("tags", "aliases", "permissions"),
+}
+# changes to these models make a snapshot outdated
+_SNAPSHOT_MODELS = ("objects.ObjectDB", "typeclasses.Attribute", "typeclasses.Tag")
+
+
+def _get_models():
+    """
+    Get the models held in a snapshot. They are imported on demand, since
+    this module is imported together with the models.
+
+    Returns:
+        models (tuple): The `ObjectDB`, `Attribute` and `Tag` models.
+
+    """
+    from evennia.objects.models import ObjectDB
+    from evennia.typeclasses.attributes import Attribute
+    from evennia.typeclasses.tags import Tag
+
+    return ObjectDB, Attribute, Tag
+
+
+def _get_fields(model):
+    """
+    Get the names of the database columns of a model, in the order
+    `Model.from_db` expects them.
+
+    """
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _set_timezones(model, rows, tzinfo):
+    """
+    Set the timezone of the datetimes in database rows. Datetimes are
+    stored without their timezone (which is UTC), since they load many
+    times faster that way.
+
+    Args:
+        model (Model): The model the rows are of.
+        rows (list): Rows of values, in the order of `_get_fields(model)`.
+        tzinfo (tzinfo or None): The timezone to set. None removes it.
+
+    Returns:
+        rows (list): The changed rows.
+
+    """
+    positions = [
+        ipos
+        for ipos, field in enumerate(model._meta.concrete_fields)
+        if isinstance(field, DateTimeField)
+    ]
+    if not (positions and settings.USE_TZ):
+        return rows
+    changed = []
+    for row in rows:
+        row = list(row)
+        for ipos in positions:
+            if row[ipos] is not None:
+                row[ipos] = row[ipos].replace(tzinfo=tzinfo)
+        changed.append(row)
+    return changed
+
+
+def _get_all_fields():
+    """
+    Get the database columns stored in a snapshot.
+
+    Returns:
+        fields (dict): Lists of column names keyed by what they are for.
+
+    """
+    ObjectDB, Attribute, Tag = _get_models()
+    return {
+        "objects": _get_fields(ObjectDB),
+        "attributes": _get_fields(Attribute),
+        "tags": _get_fields(Tag),
+    }
+
+
+def _get_fingerprint():
+    """
+    Get the row count and highest id of each table held in a snapshot.
+
+    Returns:
+        fingerprint (dict): `(count, highest id)` keyed by table name.
+
+    """
+    ObjectDB, Attribute, Tag = _get_models()
+    fingerprint = {}
+    for model in (
+        ObjectDB,
+        Attribute,
+        Tag,
+        ObjectDB.db_attributes.through,
+        ObjectDB.db_tags.through,
+    ):
+        result = model.objects.aggregate(count=Count("id"), last=Max("id"))
+        fingerprint[model._meta.db_table] = (result["count"], result["last"])
+    return fingerprint
+
+
+def _get_cached_rows(objs, fields, rows):
+    """
+    Get the rows of objects, their Attributes and their Tags from memory,
+    for objects with all their Attributes and Tags cached.
+
+    Args:
+        objs (list): The objects.
+        fields (dict): The columns to get, from `_get_all_fields`.
+        rows (dict): Where to add the rows.
+
+    Returns:
+        uncached (list): Ids of the objects not fully cached.
+
+    """
+    uncached = []
+    for obj in objs:
+        handlers = {
+            name: [getattr(obj, handlername) for handlername in handlernames]
+            for name, handlernames in _SNAPSHOT_HANDLERS.items()
+        }
+        if not all(handler._cache_complete for name in handlers for handler in handlers[name]):
+            uncached.append(obj.id)
+            continue
+        rows["objects"].append([getattr(obj, fieldname) for fieldname in fields["objects"]])
+        for name, handlers in handlers.items():
+            for handler in handlers:
+                for entity in handler._cache.values():
+                    if entity:
+                        rows["object_%s" % name].append((obj.id, entity.id))
+                        rows[name][entity.id] = [
+                            getattr(entity, fieldname) for fieldname in fields[name]
+                        ]
+    return uncached
+
+
+def _get_database_rows(ids, fields, rows):
+    """
+    Get the rows of objects, their Attributes and their Tags from the
+    database.
+
+    Args:
+        ids (list): Ids of the objects.
+        fields (dict): The columns to get, from `_get_all_fields`.
+        rows (dict): Where to add the rows.
+
+    """
+    ObjectDB, Attribute, Tag = _get_models()
+    for ichunk in range(0, len(ids), _SNAPSHOT_CHUNK_SIZE):
+        chunk = ids[ichunk : ichunk + _SNAPSHOT_CHUNK_SIZE]
+        rows["objects"].extend(
+            ObjectDB.objects.filter(id__in=chunk).values_list(*fields["objects"])
+        )
+
+        for name, model, through in (
+            ("attributes", Attribute, ObjectDB.db_attributes.through),
+            ("tags", Tag, ObjectDB.db_tags.through),
+        ):
+            related = model.__name__.lower()
+            idpos = fields[name].index("id")
+            for row in through.objects.filter(
+                **{"objectdb_id__in": chunk, "%s__db_model__iexact" % related: "objectdb"}
+            ).values_list(
+                "objectdb_id", *("%s__%s" % (related, fieldname) for fieldname in fields[name])
+            ):
+                entityid = row[idpos + 1]
+                rows["object_%s" % name].append((row[0], entityid))
+                rows[name][entityid] = row[1:]
+
+
+def write_snapshot(path=_SNAPSHOT_FILE, objs=None):
+    """
+    Write objects, with their Attributes and Tags, to a snapshot file.
+
+    Args:
+        path (str, optional): The file to write.
+        objs (list, optional): The objects to write. Defaults to all objects
+            in the idmapper cache.
+
+    Returns:
+        nobjs (int): The number of objects written.
+
+    Notes:
+        Objects with all their Attributes and Tags cached are written from
+        memory, which is much faster. The rest are read from the database.
+
+    """
+    ObjectDB, Attribute, Tag = _get_models()
+    if objs is None:
+        objs = ObjectDB.get_all_cached_instances()
+    objs = [obj for obj in objs if obj.id]
+
+    fields = _get_all_fields()
+    rows = {"objects": [], "attributes": {}, "tags": {}, "object_attributes": [], "object_tags": []}
+    uncached = _get_cached_rows(objs, fields, rows)
+    _get_database_rows(uncached, fields, rows)
+
+    data = {
+        "created": time.time(),
+        "fingerprint": _get_fingerprint(),
+        "fields": fields,
+        "objects": _set_timezones(ObjectDB, rows["objects"], None),
+        "attributes": _set_timezones(Attribute, list(rows["attributes"].values()), None),
+        "tags": _set_timezones(Tag, list(rows["tags"].values()), None),
+        "object_attributes": rows["object_attributes"],
+        "object_tags": rows["object_tags"],
+    }
+    # write to a temporary file first, so a reader never sees half a snapshot
+    tmppath = path + ".tmp"
+    with open(tmppath, "wb") as fil:
+        fil.write(_SNAPSHOT_HEADER)
+        pickle.dump(data, fil, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmppath, path)
+    return len(rows["objects"])
+
+
+def _read_snapshot(path):
+    """
+    Read a snapshot file through a memory map.
+
+    Returns:
+        data (dict or None): The snapshot data, or None if the file is
+            not a snapshot of this version.
+
+    """
+    with open(path, "rb") as fil:
+        with mmap.mmap(fil.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[: len(_SNAPSHOT_HEADER)] != _SNAPSHOT_HEADER:
+                return None
+            with memoryview(mapped)[len(_SNAPSHOT_HEADER) :] as payload:
+                return pickle.loads(payload)
+
+
+def _check_snapshot(data):
+    """
+    Check if a snapshot can be used.
+
+    Returns:
+        problem (str or None): Why the snapshot can't be used, or None.
+
+    """
+    if data is None:
+        return "it was written by another Evennia version"
+    if time.time() - data["created"] > _SNAPSHOT_MAX_AGE:
+        return "it is too old"
+    if data["fields"] != _get_all_fields():
+        return "the database schema has changed"
+    if data["fingerprint"] != _get_fingerprint():
+        return "the database has changed since it was written"
+    return None
+
+
+def load_snapshot(path=_SNAPSHOT_FILE):
+    """
+    Restore the objects in a snapshot file to the idmapper cache, together
+    with their Attribute and Tag handler caches. The file is deleted, no
+    matter if it could be used or not.
+
+    Args:
+        path (str, optional): The snapshot file.
+
+    Returns:
+        nobjs (int): The number of objects restored. This is 0 if there
+            was no snapshot or it could not be used.
+
+    """
+    if not os.path.exists(path):
+        return 0
+    try:
+        data = _read_snapshot(path)
+        problem = _check_snapshot(data)
+    except Exception as err:
+        problem = "it could not be read (%s)" % err
+    finally:
+        os.remove(path)
+    if problem:
+        logger.log_info("Not using the reload snapshot %s: %s." % (path, problem))
+        return 0
+
+    ObjectDB, Attribute, Tag = _get_models()
+    db = router.db_for_read(ObjectDB)
+    # creating this many instances makes the garbage collector run over and
+    # over, but none of them are garbage
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        entities = {}
+        for name, model, typefield in (
+            ("attributes", Attribute, "db_attrtype"),
+            ("tags", Tag, "db_tagtype"),
+        ):
+            fields = data["fields"][name]
+            instances = {}
+            for row in _set_timezones(model, data[name], timezone.utc):
+                instance = model.from_db(db, fields, row)
+                instances[instance.id] = instance
+            grouped = entities[name] = defaultdict(list)
+            for objid, entityid in data["object_%s" % name]:
+                instance = instances[entityid]
+                grouped[(objid, getattr(instance, typefield))].append(instance)
+
+        fields = data["fields"]["objects"]
+        objs = [
+            ObjectDB.from_db(db, fields, row)
+            for row in _set_timezones(ObjectDB, data["objects"], timezone.utc)
+        ]
+        ObjectDB.objects.cache_handlers(objs, entities["attributes"], entities["tags"])
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return len(objs)
+
+
+def _delete_snapshot(sender, instance=None, action=None, **kwargs):
+    """
+    Delete the snapshot file when a row it may hold has changed. This is
+    connected to the `post_save`, `post_delete` and `m2m_changed` signals
+    of all models.
+
+    """
+    if (
+        _SNAPSHOT_ENABLED
+        and action in (None, "post_add", "post_remove", "post_clear")
+        and instance is not None
+        and instance._meta.concrete_model._meta.label in _SNAPSHOT_MODELS
+    ):
+        try:
+            os.remove(_SNAPSHOT_FILE)
+        except FileNotFoundError:
+            pass
+
+
+post_save.connect(_delete_snapshot, dispatch_uid="reload_snapshot_save")
+post_delete.connect(_delete_snapshot, dispatch_uid="reload_snapshot_delete")
+m2m_changed.connect(_delete_snapshot, dispatch_uid="reload_snapshot_m2m")
@@ -0,0 +1,138 @@
+"""
+Server startup timing and cache preloading
+
+The server records how long each phase of starting up takes and logs
+them once it is ready to play, so slow starts and reloads can be tracked
+down.
+
+Once ready, it loads objects into the idmapper cache in the background,
+together with their Attributes and Tags, so the first commands using them
+don't have to query the database for each object. Each chunk is loaded
+in a separate reactor turn, so the server keeps serving players meanwhile.
+
+Settings:
+
+- `STARTUP_PRELOAD_OBJECTS` - how many objects to preload (None for all).
+- `STARTUP_PRELOAD_CHUNK_SIZE` - how many objects to load per chunk.
+
+"""
+
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from twisted.internet import defer, task
+from evennia.utils import logger
+
+_PRELOAD_OBJECTS = settings.STARTUP_PRELOAD_OBJECTS
+_PRELOAD_CHUNK_SIZE = settings.STARTUP_PRELOAD_CHUNK_SIZE
+
+
+class StartupTimer(object):
+    """
+    Records how long each phase of the server startup takes.
+
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.timings = []
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a startup phase.
+
+        Args:
+            name (str): Name of the phase.
+
+        Example:
+            ```python
+            with STARTUP_TIMER.phase("scripts"):
+                ScriptDB.objects.validate(init_mode=mode)
+            ```
+
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append((name, time.perf_counter() - started))
+
+    def report(self, message):
+        """
+        Log the time since the server process started and the time of each
+        phase recorded since the last report.
+
+        Args:
+            message (str): What the server has finished doing.
+
+        """
+        logger.log_info(
+            "%s %.2fs after start (%s)."
+            % (
+                message,
+                time.time() - self.started,
+                ", ".join("%s %.2fs" % (name, secs) for name, secs in self.timings),
+            )
+        )
+        self.timings = []
+
+
+def preload_chunks(model, number=_PRELOAD_OBJECTS, chunk_size=_PRELOAD_CHUNK_SIZE):
+    """
+    Load entities into the idmapper cache in chunks, together with their
+    Attributes and Tags. Entities already in the cache are skipped.
+
+    Args:
+        model (SharedMemoryModel): The database model, like `ObjectDB`.
+        number (int or None, optional): How many entities to load, in id
+            order. None loads all of them.
+        chunk_size (int, optional): Entities to load per chunk.
+
+    Yields:
+        nloaded (int): The number of entities loaded so far, after each chunk.
+
+    """
+    ids = model.objects.order_by("id").values_list("id", flat=True)
+    if number is not None:
+        ids = ids[:number]
+    ids = [dbid for dbid in ids if model.get_cached_instance(dbid) is None]
+    nloaded = 0
+    for ichunk in range(0, len(ids), chunk_size):
+        objs = list(model.objects.filter(id__in=ids[ichunk : ichunk + chunk_size]))
+        model.objects.prefetch_handlers(objs)
+        nloaded += len(objs)
+        yield nloaded
+
+
+def preload_objects(number=_PRELOAD_OBJECTS, chunk_size=_PRELOAD_CHUNK_SIZE):
+    """
+    Start preloading objects in the background. Like any object loaded
+    into the idmapper cache, each preloaded object has its `at_init()`
+    called as it's loaded.
+
+    Args:
+        number (int or None, optional): How many objects to load. None
+            loads all of them.
+        chunk_size (int, optional): Objects to load per reactor turn.
+
+    Returns:
+        deferred (Deferred): Fires with the number of objects loaded.
+
+    """
+    from evennia.objects.models import ObjectDB
+
+    if number == 0:
+        return defer.succeed(0)
+
+    progress = {"nloaded": 0}
+
+    def _load():
+        for nloaded in preload_chunks(ObjectDB, number=number, chunk_size=chunk_size):
+            progress["nloaded"] = nloaded
+            yield
+
+    return task.cooperate(_load()).whenDone().addCallback(lambda _: progress["nloaded"])
+
+
+STARTUP_TIMER = StartupTimer()
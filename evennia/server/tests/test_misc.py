@@ -124,3 +124,165 @@ class ThrottleTest(EvenniaTest):
 
         # There should only be (cache_size * num_ips) total in the Throttle cache
         self.assertEqual(sum([len(cache[x]) for x in cache.keys()]), throttle.cache_size * len(ips))
+
+
+import mock
+import threading
+from twisted.internet.task import Clock
+from evennia.server import watchdog
+
+
+class TestReactorWatchdog(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.watchdog = watchdog.ReactorWatchdog(interval=0.05, threshold=0.5, clock=Clock())
+        self.watchdog.timer = lambda: self.now
+        self.watchdog.last_beat = 0.0
+        self.watchdog.ident = threading.get_ident()
+
+    def test_lag(self):
+        self.now = 0.05
+        self.watchdog._beat()
+        self.now = 0.15
+        self.watchdog._beat()
+        stats = self.watchdog.get_stats()
+        self.assertEqual(stats["stalls"], 0)
+        self.assertAlmostEqual(stats["lag_max"], 0.05)
+        self.assertEqual(self.watchdog.lag.count, 2)
+
+    def _stalling_command(self, cmd):
+        # the sampling thread catches the stack while this runs
+        self.now = 1.0
+        self.watchdog.check()
+
+    def test_stall(self):
+        with mock.patch.dict(
+            watchdog._CONTEXTS,
+            {("test_misc.py", "_stalling_command"): watchdog._describe_command},
+        ), mock.patch.object(watchdog.logger, "log_file") as log_file:
+            self._stalling_command(mock.Mock(key="look"))
+            self.now = 1.05
+            self.watchdog._beat()
+        msg = log_file.call_args[0][0]
+        self.assertTrue(msg.startswith("Reactor stalled for 1.000s in command 'look':\n"))
+        self.assertIn("in _stalling_command", msg)
+        self.assertEqual(log_file.call_args[1], {"filename": "reactor_stalls.log"})
+        stats = self.watchdog.get_stats()
+        self.assertEqual(stats["stalls"], 1)
+        self.assertEqual(stats["last_stalls"][0][1:], (1.0, "command 'look'"))
+
+    def test_start_stop(self):
+        self.watchdog.timer = watchdog.time.monotonic
+        self.watchdog.start()
+        thread = self.watchdog.thread
+        self.assertTrue(self.watchdog.running and thread.is_alive())
+        self.watchdog.clock.advance(0.05)
+        self.assertEqual(self.watchdog.lag.count, 1)
+        self.watchdog.stop()
+        thread.join(1)
+        self.assertFalse(self.watchdog.running or thread.is_alive())
+
+
+from evennia.server import startup
+
+
+class TestStartup(EvenniaTest):
+    def test_timer(self):
+        timer = startup.StartupTimer()
+        with timer.phase("scripts"):
+            pass
+        self.assertEqual([name for name, secs in timer.timings], ["scripts"])
+        with mock.patch("evennia.server.startup.logger.log_info") as log_info:
+            timer.report("Server ready")
+        self.assertRegex(log_info.call_args[0][0], r"^Server ready [\d.]+s after start \(scripts ")
+        self.assertEqual(timer.timings, [])
+
+    def test_preload_chunks(self):
+        from evennia.objects.models import ObjectDB
+
+        self.obj1.db.strength = 10
+        self.obj2.tags.add("red")
+        for obj in (self.obj1, self.obj2):
+            obj.flush_from_cache(force=True)
+        self.assertIsNone(ObjectDB.get_cached_instance(self.obj1.id))
+
+        self.assertEqual(list(startup.preload_chunks(ObjectDB, number=None, chunk_size=1)), [1, 2])
+        obj1 = ObjectDB.get_cached_instance(self.obj1.id)
+        obj2 = ObjectDB.get_cached_instance(self.obj2.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(obj1.db.strength, 10)
+            self.assertEqual(obj2.tags.all(), ["red"])
+        # everything is cached now
+        self.assertEqual(list(startup.preload_chunks(ObjectDB, number=None)), [])
+
+    def test_preload_objects(self):
+        self.assertEqual(startup.preload_objects(number=0).result, 0)
+
+
+import os
+import shutil
+import tempfile
+from evennia.server import snapshot
+
+
+class TestSnapshot(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "reload.snapshot")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super().tearDown()
+
+    def test_snapshot(self):
+        from evennia.objects.models import ObjectDB
+
+        self.obj1.db.strength = 10
+        self.obj2.tags.add("red")
+        self.obj2.aliases.add("ball")
+        # obj1 is written from its caches, obj2 from the database
+        ObjectDB.objects.prefetch_handlers([self.obj1])
+        self.assertEqual(snapshot.write_snapshot(self.path, objs=[self.obj1, self.obj2]), 2)
+        for obj in (self.obj1, self.obj2):
+            obj.flush_from_cache(force=True)
+
+        with self.assertNumQueries(5):
+            # only checking that the database did not change
+            self.assertEqual(snapshot.load_snapshot(self.path), 2)
+        self.assertFalse(os.path.exists(self.path))
+        obj1 = ObjectDB.get_cached_instance(self.obj1.id)
+        obj2 = ObjectDB.get_cached_instance(self.obj2.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(obj1.key, self.obj1.key)
+            self.assertEqual(obj1.db.strength, 10)
+            self.assertEqual(obj2.tags.all(), ["red"])
+            self.assertEqual(obj2.aliases.get("ball"), "ball")
+            self.assertEqual(obj2.attributes.all(), [])
+        # the snapshot was used up
+        self.assertEqual(snapshot.load_snapshot(self.path), 0)
+
+    def test_outdated(self):
+        snapshot.write_snapshot(self.path, objs=[self.obj1])
+        # changed without signals deleting the snapshot
+        self.obj2.db.strength = 10
+        with mock.patch("evennia.server.snapshot.logger.log_info") as log_info:
+            self.assertEqual(snapshot.load_snapshot(self.path), 0)
+        self.assertIn("the database has changed", log_info.call_args[0][0])
+        self.assertFalse(os.path.exists(self.path))
+
+        with open(self.path, "wb") as fil:
+            fil.write(b"EVSNAP\x00")
+        with mock.patch("evennia.server.snapshot.logger.log_info") as log_info:
+            self.assertEqual(snapshot.load_snapshot(self.path), 0)
+        self.assertIn("another Evennia version", log_info.call_args[0][0])
+
+    @mock.patch("evennia.server.snapshot._SNAPSHOT_ENABLED", True)
+    def test_deleted_on_change(self):
+        with mock.patch("evennia.server.snapshot._SNAPSHOT_FILE", self.path):
+            snapshot.write_snapshot(self.path, objs=[self.obj1])
+            self.room1.db.desc = "A room."
+            self.assertFalse(os.path.exists(self.path))
+            snapshot.write_snapshot(self.path, objs=[self.obj1])
+            self.obj1.location = self.room2
+            self.assertFalse(os.path.exists(self.path))
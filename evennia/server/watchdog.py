@@ -0,0 +1,244 @@
+"""
+Reactor watchdog
+
+The whole game runs in the single thread of the Twisted reactor, so any
+slow hook, command or script stalls every player. The `ReactorWatchdog`
+measures this in two ways:
+
+- A `LoopingCall` runs every `settings.REACTOR_WATCHDOG_INTERVAL` seconds
+  and measures how late it was called (the reactor lag). The lags are
+  kept in a streaming histogram; `server` shows its percentiles.
+- A sampling thread checks at the same interval when the reactor thread
+  last ran the `LoopingCall`. If that's more than
+  `settings.REACTOR_STALL_THRESHOLD` seconds ago, the reactor is stalled
+  and the thread grabs the current Python stack of the reactor thread (the
+  code causing the stall). The stall is attributed to the command, script,
+  ticker, inputfunc or AMP message being handled, found from the stack.
+
+When the reactor has caught up again, the stall, with its stack, is logged
+to `settings.REACTOR_STALL_LOG`.
+
+"""
+
+import os
+import sys
+import time
+import threading
+import traceback
+from collections import deque
+from django.conf import settings
+from twisted.internet import reactor, task
+from evennia.commands.cmdstats import StreamingHistogram
+from evennia.utils import logger
+
+_INTERVAL = settings.REACTOR_WATCHDOG_INTERVAL
+_THRESHOLD = settings.REACTOR_STALL_THRESHOLD
+_STALL_LOG = settings.REACTOR_STALL_LOG
+# how many stalls to remember for display
+_MAX_STALLS = 20
+
+
+def _describe_command(frame):
+    return "command '%s'" % getattr(frame.f_locals.get("cmd"), "key", "?")
+
+
+def _describe_script(frame):
+    script = frame.f_locals.get("self")
+    return "script '%s' (#%s)" % (getattr(script, "db_key", "?"), getattr(script, "id", "?"))
+
+
+def _describe_ticker(frame):
+    callback = frame.f_locals.get("callback")
+    if not isinstance(callback, str):
+        callback = getattr(callback, "__name__", callback)
+    return "ticker '%s' (every %ss)" % (
+        callback,
+        getattr(frame.f_locals.get("self"), "interval", "?"),
+    )
+
+
+def _describe_inputfunc(frame):
+    return "inputfunc '%s'" % frame.f_locals.get("cname")
+
+
+# (filename, function name): describer(frame) for the code a stall is attributed to
+_CONTEXTS = {
+    ("cmdhandler.py", "get_and_merge_cmdsets"): lambda frame: "cmdset merge",
+    ("cmdhandler.py", "_run_command"): _describe_command,
+    ("scripts.py", "_step_callback"): _describe_script,
+    ("tickerhandler.py", "_callback"): _describe_ticker,
+    ("sessionhandler.py", "call_inputfuncs"): _describe_inputfunc,
+    ("amp_client.py", "server_receive_msgportal2server"): lambda frame: "AMP message from Portal",
+    ("gametime.py", "_fire"): lambda frame: "gametime calendar event",
+}
+
+
+def get_stack_contexts(frame):
+    """
+    Find what Evennia was doing, from a stack.
+
+    Args:
+        frame (frame): The innermost frame of the stack.
+
+    Returns:
+        contexts (list): Descriptions of the commands, scripts etc found
+            in the stack, outermost first.
+
+    """
+    contexts = []
+    while frame:
+        code = frame.f_code
+        describer = _CONTEXTS.get((os.path.basename(code.co_filename), code.co_name))
+        if describer:
+            try:
+                contexts.append(describer(frame))
+            except Exception:
+                contexts.append(code.co_name)
+        frame = frame.f_back
+    return contexts[::-1]
+
+
+class ReactorWatchdog(object):
+    """
+    Measures the reactor lag and catches the stack of stalls.
+
+    """
+
+    def __init__(self, interval=_INTERVAL, threshold=_THRESHOLD, clock=reactor):
+        """
+        Args:
+            interval (float, optional): Seconds between checks.
+            threshold (float, optional): Seconds without the reactor running
+                that count as a stall.
+            clock (IReactorTime, optional): The reactor. Mainly here for testing.
+
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.clock = clock
+        # time of the last beat in the reactor thread (time.monotonic)
+        self.timer = time.monotonic
+        self.last_beat = None
+        self.ident = None
+        self.loop = None
+        self.thread = None
+        self.stopped = threading.Event()
+        # (beat, stack, contexts) caught by the sampling thread
+        self.sample = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Reset the lag statistics.
+
+        """
+        self.lag = StreamingHistogram()
+        self.stalls = deque(maxlen=_MAX_STALLS)
+        self.nstalls = 0
+
+    @property
+    def running(self):
+        return bool(self.loop and self.loop.running)
+
+    def start(self):
+        """
+        Start the watchdog. Must be called from the reactor thread.
+
+        """
+        if self.running:
+            return
+        self.ident = threading.get_ident()
+        self.last_beat = self.timer()
+        self.loop = task.LoopingCall(self._beat)
+        self.loop.clock = self.clock
+        self.loop.start(self.interval, now=False)
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name="reactor-watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop the watchdog.
+
+        """
+        if self.running:
+            self.loop.stop()
+        self.stopped.set()
+        self.thread = None
+
+    def _beat(self):
+        """
+        Called by the reactor every interval.
+
+        """
+        now, beat = self.timer(), self.last_beat
+        lag = max(0.0, now - beat - self.interval)
+        self.last_beat = now
+        self.lag.add(lag)
+        if lag >= self.threshold:
+            self._report(lag, beat)
+
+    def _run(self):
+        """
+        The sampling thread.
+
+        """
+        while not self.stopped.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """
+        Catch the stack of the reactor thread if it's stalled. This is
+        called by the sampling thread.
+
+        """
+        beat = self.last_beat
+        if self.timer() - beat <= self.threshold:
+            return
+        if self.sample and self.sample[0] == beat:
+            # already caught this stall
+            return
+        frame = sys._current_frames().get(self.ident)
+        if frame is None:
+            return
+        self.sample = (beat, traceback.format_stack(frame), get_stack_contexts(frame))
+
+    def _report(self, lag, beat):
+        """
+        Log a stall, once the reactor runs again.
+
+        """
+        stack, contexts = [], []
+        sample = self.sample
+        if sample and sample[0] == beat:
+            _, stack, contexts = sample
+        self.nstalls += 1
+        context = " > ".join(contexts) or "unknown code"
+        self.stalls.append((time.time(), lag, context))
+        logger.log_file(
+            "Reactor stalled for %.3fs in %s:\n%s" % (lag, context, "".join(stack).rstrip()),
+            filename=_STALL_LOG,
+        )
+
+    def get_stats(self):
+        """
+        Get the lag statistics.
+
+        Returns:
+            stats (dict): With keys `lag_p50`, `lag_p95`, `lag_p99` and
+                `lag_max` (in seconds), `stalls` (number of stalls) and
+                `last_stalls` (a list of `(timestamp, seconds, context)`,
+                latest last).
+
+        """
+        return {
+            "lag_p50": self.lag.percentile(50),
+            "lag_p95": self.lag.percentile(95),
+            "lag_p99": self.lag.percentile(99),
+            "lag_max": self.lag.max,
+            "stalls": self.nstalls,
+            "last_stalls": list(self.stalls),
+        }
+
+
+REACTOR_WATCHDOG = ReactorWatchdog()
@@ -102,6 +102,17 @@ WEBSOCKET_CLIENT_INTERFACE = "0.0.0.0"
 # the client will itself figure out this url based on the server's hostname.
 # e.g. ws://external.example.com or wss://external.example.com:443
 WEBSOCKET_CLIENT_URL = None
+# Allow websocket clients to ask for batched output. All output to such a
+# client within the same server tick is then sent as one websocket message
+# rather than one message per output. The default webclient asks for this.
+WEBSOCKET_CLIENT_BATCHING = True
+# Accept permessage-deflate compression of websocket messages if the browser
+# offers it (most do). This saves bandwidth at the cost of some CPU and memory
+# per connection.
+WEBSOCKET_CLIENT_COMPRESSION = False
+# Max number of outputs to buffer for each AJAX/COMET webclient between its
+# polls. When exceeded, the oldest outputs are dropped.
+WEBCLIENT_AJAX_BUFFER_SIZE = 1000
 # This determine's whether Evennia's custom admin page is used, or if the
 # standard Django admin is used.
 EVENNIA_ADMIN = True
@@ -209,6 +220,26 @@ SCREENREADER_REGEX_STRIP = r"\+-+|\+$|\+~|--+|~~+|==+"
 # be necessary (use @server to see how many objects are in the idmapper
 # cache at any time). Setting this to None disables the cache cap.
 IDMAPPER_CACHE_MAXSIZE = 200  # (MB)
+# After the server has started or reloaded, this many objects are loaded into
+# the idmapper cache in the background, together with their Attributes and
+# Tags, so the first commands using them don't have to query the database for
+# each object. They are loaded in id order, STARTUP_PRELOAD_CHUNK_SIZE at a
+# time between handling other work. Keep it well within what fits in
+# IDMAPPER_CACHE_MAXSIZE (see the table above). Note that loading an object
+# into the cache calls its typeclass' at_init(), so with preloading, at_init
+# runs for these objects shortly after every start/reload rather than the
+# first time each object is used. Set to None to load all objects. The
+# default of 0 preloads nothing.
+STARTUP_PRELOAD_OBJECTS = 0
+STARTUP_PRELOAD_CHUNK_SIZE = 500
+# When reloading, the server can write the objects in its cache, together with
+# their Attributes and Tags, to RELOAD_SNAPSHOT_FILE. The new server process
+# then restores its caches from that file instead of loading them from the
+# database. The snapshot is not used if anything in it changed after it was
+# written. This makes the game playable sooner after reloading a server with
+# many objects in its cache.
+RELOAD_SNAPSHOT = False
+RELOAD_SNAPSHOT_FILE = os.path.join(GAME_DIR, "server", "reload.snapshot")
 # This determines how many connections per second the Portal should
 # accept, as a DoS countermeasure. If the rate exceeds this number, incoming
 # connections will be queued to this rate, so none will be lost.
@@ -236,6 +267,16 @@ MAX_CHAR_LIMIT_WARNING = (
 # debugging. OBS: Showing full tracebacks to regular users could be a
 # security problem -turn this off in a production game!
 IN_GAME_ERRORS = True
+# The whole game runs in one thread, so any slow code stalls everyone. The
+# reactor watchdog checks every REACTOR_WATCHDOG_INTERVAL seconds how late the
+# server is in running its timers (the lag, shown by `server`). If the server is
+# stalled for more than REACTOR_STALL_THRESHOLD seconds, the Python stack of the
+# stalled code (and the command, script or ticker running) is logged to the log
+# file REACTOR_STALL_LOG (in LOG_DIR).
+REACTOR_WATCHDOG = True
+REACTOR_WATCHDOG_INTERVAL = 0.05
+REACTOR_STALL_THRESHOLD = 0.5
+REACTOR_STALL_LOG = "reactor_stalls.log"
 
 ######################################################################
 # Evennia Database config
@@ -359,6 +400,12 @@ WEB_PLUGINS_MODULE = "server.conf.web_plugins"
 # Tuple of modules implementing lock functions. All callable functions
 # inside these modules will be available as lock functions.
 LOCK_FUNC_MODULES = ("evennia.locks.lockfuncs", "server.conf.lockfuncs")
+# Remember the results of lock checks while a command runs (until it first
+# waits for something), since the same locks are often checked many times.
+# Each command has its own cache; any database change empties it.
+# Lock functions depending on other things (like sessions) must set
+# `lock_cache = False` on themselves to not be cached.
+LOCK_CACHE = True
 # Module holding handlers for managing incoming data from the client. These
 # will be loaded in order, meaning functions in later modules may overload
 # previous ones if having the same name.
@@ -460,6 +507,19 @@ COMMAND_DEFAULT_MSG_ALL_SESSIONS = False
 COMMAND_DEFAULT_HELP_CATEGORY = "general"
 # The default lockstring of a command.
 COMMAND_DEFAULT_LOCKS = ""
+# Record the time spent by each command (split into cmdset merging, parsing,
+# at_pre_cmd, func and at_post_cmd) as well as its database queries. The
+# statistics are viewed with `server/cmdstats`.
+COMMAND_STATS = True
+# Commands taking longer than this many seconds are logged to the log file
+# COMMAND_STATS_SLOW_LOG (in LOG_DIR). Set to None to not log slow commands.
+COMMAND_STATS_SLOW_THRESHOLD = 0.5
+COMMAND_STATS_SLOW_LOG = "slow_commands.log"
+# Path to a callable that is called with a dict of all command statistics every
+# COMMAND_STATS_EXPORT_INTERVAL seconds, such as for passing them on to an external
+# monitoring service. See `evennia.commands.cmdstats` for the format.
+COMMAND_STATS_EXPORT_HOOK = None
+COMMAND_STATS_EXPORT_INTERVAL = 60
 # The Channel Handler is responsible for managing all available channels. By
 # default it builds the current channels into a channel-cmdset that it feeds
 # to the cmdhandler. Overloading this can completely change how Channels
@@ -517,6 +577,18 @@ START_LOCATION = "#2"
 # out of sync between the processes. Keep on unless you face such
 # issues.
 TYPECLASS_AGGRESSIVE_CACHE = True
+# Keep an in-memory index of which entities have which Tags, used by
+# get_by_tag (and so search_tag) instead of having the database join and
+# count the Tags of every entity. The index of a model is loaded when first
+# searched and kept up to date as Tags are added and removed. Only turn this
+# on if no other process (like a separately run website) changes Tags.
+TAG_INDEX = False
+# Attribute values are stored as pickles. Pickles of at least this many
+# bytes are zlib-compressed before storing, if that makes them smaller. Set
+# to None to never compress. Searching Attributes by value only finds values
+# stored with the same setting, so run `evennia convert_attributes --all`
+# after changing it.
+ATTRIBUTE_COMPRESS_THRESHOLD = 1024
 
 ######################################################################
 # Options and validators
@@ -621,6 +693,11 @@ GLOBAL_SCRIPTS = {
     # 'key': {'typeclass': 'typeclass.path.here',
     #         'repeats': -1, 'interval': 50, 'desc': 'Example script'},
 }
+# Scripts with an interval are stepped by a shared timer wheel, which checks
+# for due Scripts this often (in seconds). A Script may repeat up to this much
+# later than its interval says. Set to 0 to instead give every Script its own
+# reactor timer (this scales badly to many thousands of Scripts).
+SCRIPT_TIMER_RESOLUTION = 0.1
 
 ######################################################################
 # Default Account setup and access
@@ -670,6 +747,15 @@ CREATION_THROTTLE_LIMIT = 2
 CREATION_THROTTLE_TIMEOUT = 10 * 60
 LOGIN_THROTTLE_LIMIT = 5
 LOGIN_THROTTLE_TIMEOUT = 5 * 60
+# Password hashing (on login and password change) is slow by design and
+# is done in a pool of worker threads so as to not block the server. This
+# is the max number of such threads. More allows for more logins at the same
+# time, at the cost of more CPU use during login storms.
+PASSWORD_HASHING_THREADS = 2
+# Max number of password hashings queued or running at the same time.
+# Logins beyond this are refused with a 'server busy' message, so a flood
+# of login attempts can't queue up unlimited work. 0 means no limit.
+PASSWORD_HASHING_QUEUE_SIZE = 50
 
 
 ######################################################################
@@ -11,18 +11,67 @@ which is a non-db version of Attributes.
 import re
 import fnmatch
 import weakref
+import datetime
+from collections.abc import Mapping
 
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models.signals import m2m_changed, post_save, pre_delete
 from django.conf import settings
 from django.utils.encoding import smart_str
 
 from evennia.locks.lockhandler import LockHandler
 from evennia.utils.idmapper.models import SharedMemoryModel
-from evennia.utils.dbserialize import to_pickle, from_pickle
+from evennia.utils.dbserialize import to_pickle, from_pickle, _SaverMutable
 from evennia.utils.picklefield import PickledObjectField
 from evennia.utils.utils import lazy_property, to_str, make_iter, is_iter
 
 _TYPECLASS_AGGRESSIVE_CACHE = settings.TYPECLASS_AGGRESSIVE_CACHE
+_MONITOR_HANDLER = None
+# entities to query or update per database query in get_many/set_many
+_BULK_CHUNK_SIZE = 500
+
+# (dbclass, id) of a database object -> set of ids of the Attributes with a
+# cached value containing that object
+_REFERRERS = {}
+_IMMUTABLE_TYPES = (
+    str,
+    int,
+    float,
+    bool,
+    bytes,
+    type(None),
+    datetime.date,
+    datetime.time,
+    datetime.timedelta,
+)
+
+
+def _is_cacheable(value):
+    """
+    Check if a decoded Attribute value can be cached and returned to every
+    reader. Mutable parts must be _Saver* structures, since changing those
+    saves the Attribute (which drops the cache). A plain list inside a tuple,
+    or a dict inside a _SaverDeque (whose items are not converted), could be
+    changed by one reader and would then differ from the database.
+
+    Args:
+        value (any): A value returned by `from_pickle`.
+
+    Returns:
+        cacheable (bool): If the value can be cached.
+
+    """
+    if isinstance(value, _IMMUTABLE_TYPES) or hasattr(value, "__dbclass__"):
+        return True
+    if isinstance(value, _SaverMutable):
+        data = value._data
+        if isinstance(data, Mapping):
+            return all(_is_cacheable(key) and _is_cacheable(val) for key, val in data.items())
+        return all(_is_cacheable(item) for item in data)
+    if type(value) in (tuple, frozenset):
+        return all(_is_cacheable(item) for item in value)
+    return False
+
 
 # -------------------------------------------------------------
 #
@@ -64,6 +113,7 @@ class Attribute(SharedMemoryModel):
     db_value = PickledObjectField(
         "value",
         null=True,
+        binary=True,
         help_text="The data returned when the attribute is accessed. Must be "
         "written as a Python literal if editing through the admin "
         "interface. Attribute values which are not Python literals "
@@ -151,18 +201,51 @@ class Attribute(SharedMemoryModel):
     def __value_get(self):
         """
         Getter. Allows for `value = self.value`.
-        We cannot cache here since it makes certain cases (such
-        as storing a dbobj which is then deleted elsewhere) out-of-sync.
-        The overhead of unpickling seems hard to avoid.
+
+        Decoding the stored value rebuilds its whole structure and looks up
+        every database object in it, so the decoded value is cached. The
+        cache is dropped when `db_value` changes and when a database object
+        stored in the value is deleted. It's also not used once such an
+        object was flushed from the idmapper cache, since the object is then
+        loaded again as a new instance, which the value must hold instead.
+        Values containing Sessions are not cached, since those go away
+        without being deleted, nor are values with plain mutable containers
+        (see `_is_cacheable`).
+
+        Note that a cached value is the same object for every reader. This
+        is like reading a normal Python attribute: iterating over
+        `obj.db.mydict` while deleting from `obj.db.mydict` raises an error.
+
         """
-        return from_pickle(self.db_value, db_obj=self)
+        db_value = self.db_value
+        cached = self._cached_value
+        if (
+            cached
+            and cached[0] is db_value
+            and all(ref.__dbclass__.get_cached_instance(ref.id) is ref for ref in cached[3])
+        ):
+            return cached[1]
+        references = []
+        value = from_pickle(db_value, db_obj=self, references=references)
+        self._uncache_value()
+        if (
+            self.pk
+            and all(hasattr(ref, "__dbclass__") for ref in references)
+            and _is_cacheable(value)
+        ):
+            refs = {(ref.__dbclass__, ref.id): ref for ref in references}
+            for refkey in refs:
+                _REFERRERS.setdefault(refkey, set()).add(self.pk)
+            self._cached_value = (db_value, value, set(refs), tuple(refs.values()))
+        return value
 
     # @value.setter
     def __value_set(self, new_value):
         """
-        Setter. Allows for self.value = value. We cannot cache here,
+        Setter. Allows for self.value = value. This drops the cached value,
         see self.__value_get.
         """
+        self._uncache_value()
         self.db_value = to_pickle(new_value)
         # print("value_set, self.db_value:", repr(self.db_value))  # DEBUG
         self.save(update_fields=["db_value"])
@@ -174,6 +257,36 @@ class Attribute(SharedMemoryModel):
 
     value = property(__value_get, __value_set, __value_del)
 
+    # (db_value, decoded value, keys of referenced objects, referenced
+    # objects), see __value_get
+    _cached_value = None
+
+    def _uncache_value(self):
+        """
+        Drop the cached decoded value.
+
+        """
+        cached = self._cached_value
+        if cached:
+            self._cached_value = None
+            for refkey in cached[2]:
+                referrers = _REFERRERS.get(refkey)
+                if referrers is not None:
+                    referrers.discard(self.pk)
+                    if not referrers:
+                        del _REFERRERS[refkey]
+
+    def at_idmapper_flush(self):
+        """
+        Drop the cached value when the Attribute is flushed from the
+        idmapper cache, so it's not kept in `_REFERRERS`.
+
+        """
+        flush = super().at_idmapper_flush()
+        if flush:
+            self._uncache_value()
+        return flush
+
     #
     #
     # Attribute methods
@@ -208,6 +321,27 @@ class Attribute(SharedMemoryModel):
         return result
 
 
+def _uncache_referring_values(sender, instance, **kwargs):
+    """
+    Drop the cached values of Attributes containing a database object that
+    is about to be deleted, so they don't keep returning it.
+
+    """
+    dbclass = getattr(instance, "__dbclass__", None)
+    if dbclass is None:
+        return
+    if dbclass is Attribute:
+        # don't leave the deleted Attribute in the index
+        instance._uncache_value()
+    for attr_id in _REFERRERS.pop((dbclass, instance.id), ()):
+        attr = Attribute.get_cached_instance(attr_id)
+        if attr:
+            attr._uncache_value()
+
+
+pre_delete.connect(_uncache_referring_values)
+
+
 #
 # Handlers making use of the Attribute model
 #
@@ -223,6 +357,8 @@ class AttributeHandler(object):
     _attredit = "attredit"
     _attrread = "attrread"
     _attrtype = None
+    # the property of the typeclassed entity holding this handler
+    _handlername = "attributes"
 
     def __init__(self, obj):
         """Initialize handler."""
@@ -247,11 +383,20 @@ class AttributeHandler(object):
             for conn in getattr(self.obj, self._m2m_fieldname).through.objects.filter(**query)
         ]
 
-    def _fullcache(self):
-        """Cache all attributes of this object"""
+    def _fullcache(self, attrs=None):
+        """
+        Cache all attributes of this object
+
+        Args:
+            attrs (list, optional): All the Attributes of this object, if
+                already fetched (see `TypedObjectManager.prefetch_handlers`).
+                If not given, they are queried for.
+
+        """
         if not _TYPECLASS_AGGRESSIVE_CACHE:
             return
-        attrs = self._query_all()
+        if attrs is None:
+            attrs = self._query_all()
         self._cache = dict(
             (
                 "%s-%s"
@@ -298,6 +443,8 @@ class AttributeHandler(object):
                 cachefound = True
             except KeyError:
                 attr = None
+                # a complete cache holds all Attributes, so there is no such Attribute
+                cachefound = self._cache_complete
 
             if attr and (not hasattr(attr, "pk") and attr.pk is None):
                 # clear out Attributes deleted from elsewhere. We must search this anew.
@@ -337,7 +484,7 @@ class AttributeHandler(object):
             # assume the cache to be complete unless we have queried
             # for this category before
             catkey = "-%s" % category
-            if _TYPECLASS_AGGRESSIVE_CACHE and catkey in self._catcache:
+            if _TYPECLASS_AGGRESSIVE_CACHE and (self._cache_complete or catkey in self._catcache):
                 return [attr for key, attr in self._cache.items() if key.endswith(catkey) and attr]
             else:
                 # we have to query to make this category up-date in the cache
@@ -665,6 +812,201 @@ class AttributeHandler(object):
             # Add new objects to m2m field all at once
             getattr(self.obj, self._m2m_fieldname).add(*new_attrobjs)
 
+    @classmethod
+    def _get_many(cls, objs, key, category=None):
+        """
+        Find the same Attribute on many entities, from their caches where
+        possible and otherwise in one query per `_BULK_CHUNK_SIZE` entities.
+        The result is cached on the handlers of the queried entities.
+
+        Args:
+            objs (list): Typeclassed entities, all of the same model.
+            key (str): The Attribute key.
+            category (str, optional): The Attribute category.
+
+        Returns:
+            attrs (list): The Attribute of each entity in `objs` or `None`
+                if it has no such Attribute.
+
+        """
+        keystr = key.strip().lower()
+        category = category.strip().lower() if category else None
+        cachekey = "%s-%s" % (keystr, category)
+        found = {}
+        uncached = []
+        for obj in objs:
+            if not obj.pk:
+                continue
+            handler = getattr(obj, cls._handlername)
+            if _TYPECLASS_AGGRESSIVE_CACHE:
+                attr = handler._cache.get(cachekey)
+                if attr and attr.pk:
+                    found[obj.pk] = attr
+                    continue
+                if attr is None and (cachekey in handler._cache or handler._cache_complete):
+                    # there is no such Attribute
+                    found[obj.pk] = None
+                    continue
+            uncached.append(handler)
+
+        if uncached:
+            modelname = uncached[0]._model
+            through = getattr(uncached[0].obj.__dbclass__, cls._m2m_fieldname).through
+            fieldname = "%s_id" % modelname
+            ids = list(set(handler._objid for handler in uncached))
+            for ichunk in range(0, len(ids), _BULK_CHUNK_SIZE):
+                query = {
+                    "%s__in" % fieldname: ids[ichunk : ichunk + _BULK_CHUNK_SIZE],
+                    "attribute__db_model__iexact": modelname,
+                    "attribute__db_attrtype": cls._attrtype,
+                    "attribute__db_key__iexact": keystr,
+                    "attribute__db_category__iexact": category,
+                }
+                for conn in through.objects.filter(**query).select_related("attribute"):
+                    found[getattr(conn, fieldname)] = conn.attribute
+            for handler in uncached:
+                attr = found.setdefault(handler._objid, None)
+                if _TYPECLASS_AGGRESSIVE_CACHE:
+                    # a missing Attribute is cached as None, like in _getcache
+                    handler._cache[cachekey] = attr
+
+        return [found.get(obj.pk) for obj in objs]
+
+    @classmethod
+    def get_many(cls, objs, key, category=None, default=None, return_obj=False):
+        """
+        Get the same Attribute from many entities at once, such as the
+        `weight` of everything in an inventory.
+
+        Args:
+            objs (list): Typeclassed entities, all of the same model.
+            key (str): The Attribute key.
+            category (str, optional): The Attribute category.
+            default (any, optional): Returned for entities without the Attribute.
+            return_obj (bool, optional): Return the Attribute objects
+                instead of their values.
+
+        Returns:
+            result (list): The value (or Attribute) for each entity in
+                `objs`, in the same order.
+
+        Notes:
+            Entities with the Attribute in their handler cache are not
+            queried. The rest are queried together and the result is cached,
+            so this makes at most one query per 500 entities instead of one
+            per entity. Use as `AttributeHandler.get_many(objs, "weight")`,
+            or `NickHandler.get_many` for nicks.
+
+        """
+        attrs = cls._get_many(objs, key, category=category)
+        if return_obj:
+            return [attr if attr else default for attr in attrs]
+        return [attr.value if attr else default for attr in attrs]
+
+    @classmethod
+    def set_many(cls, values, key, category=None):
+        """
+        Set the same Attribute on many entities at once.
+
+        Args:
+            values (dict): The new value for each entity, keyed by
+                typeclassed entities all of the same model. Use
+                `dict.fromkeys(objs, value)` to give them all the same value.
+            key (str): The Attribute key.
+            category (str, optional): The Attribute category.
+
+        Notes:
+            Existing Attributes are updated with one `bulk_update` and new
+            ones are created in one transaction, with one `bulk_create` for
+            attaching them to the entities. Saving the Attributes sends the
+            same signals and notifies the same monitors as setting them one
+            by one. Unlike `add`, no locks are checked. The Attributes are
+            cached on the handlers of the entities.
+
+        """
+        global _MONITOR_HANDLER
+        if not _MONITOR_HANDLER:
+            from evennia.scripts.monitorhandler import MONITOR_HANDLER as _MONITOR_HANDLER
+
+        items = [(obj, value) for obj, value in values.items() if obj.pk]
+        if not items:
+            return
+        keystr = key.strip().lower()
+        category = category.strip().lower() if category else None
+        attrs = cls._get_many([obj for obj, _ in items], keystr, category=category)
+        changed, created = [], []
+        for (obj, value), attr in zip(items, attrs):
+            if attr:
+                attr._uncache_value()
+                attr.db_value = to_pickle(value)
+                changed.append(attr)
+            else:
+                new_attr = Attribute(
+                    db_key=keystr,
+                    db_category=category,
+                    db_model=getattr(obj, cls._handlername)._model,
+                    db_attrtype=cls._attrtype,
+                    db_value=to_pickle(value),
+                )
+                created.append((obj, new_attr))
+
+        with transaction.atomic():
+            if changed:
+                Attribute.objects.bulk_update(changed, ["db_value"], batch_size=_BULK_CHUNK_SIZE)
+            if created:
+                new_attrs = [new_attr for _, new_attr in created]
+                if connection.features.can_return_ids_from_bulk_insert:
+                    Attribute.objects.bulk_create(new_attrs, batch_size=_BULK_CHUNK_SIZE)
+                    for new_attr in new_attrs:
+                        post_save.send(
+                            sender=Attribute,
+                            instance=new_attr,
+                            created=True,
+                            update_fields=None,
+                            raw=False,
+                            using=new_attr._state.db,
+                        )
+                else:
+                    # the ids of bulk-created rows are not returned, so save
+                    # them one by one; in one transaction this is still fast
+                    for new_attr in new_attrs:
+                        new_attr.save()
+                through = getattr(created[0][0].__dbclass__, cls._m2m_fieldname).through
+                fieldname = "%s_id" % created[0][1].db_model
+                through.objects.bulk_create(
+                    [
+                        through(**{fieldname: obj.pk, "attribute_id": attr.pk})
+                        for obj, attr in created
+                    ],
+                    batch_size=_BULK_CHUNK_SIZE,
+                )
+
+        for attr in changed:
+            post_save.send(
+                sender=Attribute,
+                instance=attr,
+                created=False,
+                update_fields=frozenset(["db_value"]),
+                raw=False,
+                using=attr._state.db,
+            )
+            _MONITOR_HANDLER.at_update(attr, "db_value")
+        for obj, new_attr in created:
+            m2m_changed.send(
+                sender=through,
+                instance=obj,
+                action="post_add",
+                reverse=False,
+                model=Attribute,
+                pk_set={new_attr.pk},
+                using=new_attr._state.db,
+            )
+            handler = getattr(obj, cls._handlername)
+            cache_complete = handler._cache_complete
+            handler._setcache(keystr, category, new_attr)
+            # the cache still holds all Attributes, now with the new one
+            handler._cache_complete = cache_complete
+
     def remove(
         self,
         key=None,
@@ -907,6 +1249,7 @@ class NickHandler(AttributeHandler):
     """
 
     _attrtype = "nick"
+    _handlername = "nicks"
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
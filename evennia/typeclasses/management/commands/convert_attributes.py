@@ -0,0 +1,52 @@
+"""
+Convert Attribute values to the current storage format.
+
+Attribute values stored before the binary storage format was introduced
+are still read fine, but are larger and slower to load. This converts them
+in small batches, so it can be run while the server is up:
+
+    evennia convert_attributes
+
+Use `--all` to also re-encode values already in the binary format, such as
+after changing `settings.ATTRIBUTE_COMPRESS_THRESHOLD`.
+
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from evennia.typeclasses.attributes import Attribute
+from evennia.utils.picklefield import convert_values
+
+
+class Command(BaseCommand):
+    help = "Convert Attribute values to the current storage format, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Attributes to convert per transaction."
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to wait between batches, to limit the load on a running server.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Also re-encode values already in the binary format.",
+        )
+
+    def handle(self, *args, **options):
+        nrows = nconverted = 0
+        started = time.time()
+        for nrows, nconverted in convert_values(
+            Attribute, batch_size=options["batch_size"], legacy_only=not options["all"]
+        ):
+            if options["verbosity"] > 1:
+                self.stdout.write("Checked %i Attributes, converted %i." % (nrows, nconverted))
+            if options["pause"]:
+                time.sleep(options["pause"])
+        self.stdout.write(
+            "Converted %i of %i Attributes in %.1fs." % (nconverted, nrows, time.time() - started)
+        )
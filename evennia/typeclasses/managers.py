@@ -5,16 +5,78 @@ all Attributes and TypedObjects).
 
 """
 import shlex
-from django.db.models import F, Q, Count, ExpressionWrapper, FloatField
+from collections import defaultdict
+from django.conf import settings
+from django.db.models import F, Q, Case, Count, ExpressionWrapper, FloatField, IntegerField
+from django.db.models import Value, When
+from django.db.models.query import ModelIterable, QuerySet
 from django.db.models.functions import Cast
 from evennia.utils import idmapper
 from evennia.utils.utils import make_iter, variable_from_module
 from evennia.typeclasses.attributes import Attribute
 from evennia.typeclasses.tags import Tag
+from evennia.typeclasses.tagindex import TAG_INDEX
 
-__all__ = ("TypedObjectManager",)
+__all__ = ("TypedObjectManager", "TypedObjectQuerySet")
 _GA = object.__getattribute__
 _Tag = None
+_ATTR_VALUE_FIELD = Attribute._meta.get_field("db_value")
+_TYPECLASS_AGGRESSIVE_CACHE = settings.TYPECLASS_AGGRESSIVE_CACHE
+_TAG_INDEX = settings.TAG_INDEX
+# entities per query when prefetching handlers, within SQLite's query parameter limit
+_PREFETCH_CHUNK_SIZE = 500
+
+# handler of each Attribute db_attrtype and Tag db_tagtype
+_ATTRIBUTE_HANDLERS = {None: "attributes", "nick": "nicks"}
+_TAG_HANDLERS = {None: "tags", "alias": "aliases", "permission": "permissions"}
+
+
+# Querysets
+
+
+class TypedObjectQuerySet(QuerySet):
+    """
+    QuerySet returned by the managers of all typed entities.
+
+    """
+
+    _with_handlers = False
+
+    def with_handlers(self):
+        """
+        Fill the Attribute and Tag handler caches of all entities in this
+        queryset when it is evaluated, so reading their Attributes, nicks,
+        Tags, aliases and permissions doesn't query the database per entity.
+
+        Returns:
+            queryset (TypedObjectQuerySet): A copy of this queryset.
+
+        Notes:
+            This makes two more queries per 500 entities not already fully
+            cached. It has no effect with `.iterator()` or on querysets not
+            returning entities, like `.values()`.
+
+        Example:
+            ```python
+            for obj in ObjectDB.objects.filter(db_location=room).with_handlers():
+                obj.db.hp = obj.db.max_hp
+            ```
+
+        """
+        queryset = self._chain()
+        queryset._with_handlers = True
+        return queryset
+
+    def _clone(self):
+        queryset = super()._clone()
+        queryset._with_handlers = self._with_handlers
+        return queryset
+
+    def _fetch_all(self):
+        prefetch = self._result_cache is None and self._with_handlers
+        super()._fetch_all()
+        if prefetch and issubclass(self._iterable_class, ModelIterable):
+            self.model.__dbclass__.objects.prefetch_handlers(self._result_cache)
 
 
 # Managers
@@ -26,6 +88,27 @@ class TypedObjectManager(idmapper.manager.SharedMemoryManager):
 
     """
 
+    def get_queryset(self):
+        """
+        Get the queryset all queries of this manager start from.
+
+        Returns:
+            queryset (TypedObjectQuerySet): All entities of this manager's model.
+
+        """
+        return TypedObjectQuerySet(model=self.model, using=self._db, hints=self._hints)
+
+    def with_handlers(self):
+        """
+        Get all entities with their Attribute and Tag handler caches
+        filled. See `TypedObjectQuerySet.with_handlers`.
+
+        Returns:
+            queryset (TypedObjectQuerySet): All entities of this manager.
+
+        """
+        return self.all().with_handlers()
+
     # common methods for all typed managers. These are used
     # in other methods. Returns querysets.
 
@@ -73,7 +156,7 @@ class TypedObjectManager(idmapper.manager.SharedMemoryManager):
             query.append(("attribute__db_strvalue", strvalue))
         if value:
             # no reason to make strvalue/value mutually exclusive at this level
-            query.append(("attribute__db_value", value))
+            query.append(("attribute__db_value__in", _ATTR_VALUE_FIELD.get_lookup_values(value)))
         return Attribute.objects.filter(
             pk__in=self.model.db_attributes.through.objects.filter(**dict(query)).values_list(
                 "attribute_id", flat=True
@@ -144,7 +227,9 @@ class TypedObjectManager(idmapper.manager.SharedMemoryManager):
             query.append(("db_attributes__db_strvalue", strvalue))
         elif value:
             # strvalue and value are mutually exclusive
-            query.append(("db_attributes__db_value", value))
+            query.append(
+                ("db_attributes__db_value__in", _ATTR_VALUE_FIELD.get_lookup_values(value))
+            )
         return self.filter(**dict(query))
 
     def get_by_nick(self, key=None, nick=None, category="inputline"):
@@ -274,6 +359,11 @@ class TypedObjectManager(idmapper.manager.SharedMemoryManager):
             IndexError: If `key` and `category` are both lists and `category` is shorter
                 than `key`.
 
+        Notes:
+            With `settings.TAG_INDEX` on, the matching objects are found in the
+            in-memory `TAG_INDEX` (see `evennia.typeclasses.tagindex`) and only
+            looked up by id in the database.
+
         """
         if not (key or category):
             return []
@@ -284,19 +374,19 @@ class TypedObjectManager(idmapper.manager.SharedMemoryManager):
 
         anymatch = "any" == kwargs.get("match", "all").lower().strip()
 
-        keys = make_iter(key) if key else []
-        categories = make_iter(category) if category else []
+        # Tags are stored in lowercase (see Tag.save), so exact lookups can use the indexes
+        keys = [key.lower() for key in make_iter(key)] if key else []
+        categories = (
+            [category.lower() if category else None for category in make_iter(category)]
+            if category
+            else []
+        )
         n_keys = len(keys)
         n_categories = len(categories)
         unique_categories = sorted(set(categories))
         n_unique_categories = len(unique_categories)
-
+        tagtype = tagtype.strip().lower() if tagtype else None
         dbmodel = self.model.__dbclass__.__name__.lower()
-        query = (
-            self.filter(db_tags__db_tagtype__iexact=tagtype, db_tags__db_model__iexact=dbmodel)
-            .distinct()
-            .order_by("id")
-        )
 
         if n_keys > 0:
             # keys and/or categories given
@@ -313,25 +403,51 @@ class TypedObjectManager(idmapper.manager.SharedMemoryManager):
             clauses = Q()
             for ikey, key in enumerate(keys):
                 # ANY mode; must match any one of the given tags/categories
-                clauses |= Q(db_key__iexact=key, db_category__iexact=categories[ikey])
+                clauses |= Q(db_key=key, db_category=categories[ikey])
         else:
             # only one or more categories given
             clauses = Q()
             # ANY mode; must match any one of them
             for category in unique_categories:
-                clauses |= Q(db_category__iexact=category)
-
-        tags = _Tag.objects.filter(clauses)
-        query = query.filter(db_tags__in=tags).annotate(
-            matches=Count("db_tags__pk", filter=Q(db_tags__in=tags), distinct=True)
+                clauses |= Q(db_category=category)
+        # ALL: Match all of the tags and optionally more
+        n_req_tags = 1 if anymatch else n_keys if n_keys > 0 else n_unique_categories
+
+        if _TAG_INDEX:
+            matches = TAG_INDEX.get_matches(
+                self.model.__dbclass__,
+                tagtype=tagtype,
+                keys=list(zip(keys, categories)),
+                categories=unique_categories,
+                nrequired=n_req_tags,
+            )
+            if matches is not None:
+                # few enough matches to look them up by id
+                query = self.filter(id__in=list(matches))
+                if anymatch:
+                    byweight = defaultdict(list)
+                    for obj_id, nmatches in matches.items():
+                        byweight[nmatches].append(obj_id)
+                    weights = [
+                        When(id__in=obj_ids, then=Value(nmatches))
+                        for nmatches, obj_ids in byweight.items()
+                    ]
+                    return query.annotate(
+                        matches=Case(*weights, default=Value(0), output_field=IntegerField())
+                    ).order_by("-matches")
+                return query.order_by("id")
+
+        tags = _Tag.objects.filter(clauses, db_tagtype=tagtype, db_model=dbmodel)
+        query = (
+            self.filter(db_tags__in=tags)
+            .annotate(matches=Count("db_tags__pk", filter=Q(db_tags__in=tags), distinct=True))
+            .order_by("id")
         )
 
         if anymatch:
             # ANY: Match any single tag, ordered by weight
             query = query.order_by("-matches")
         else:
-            # Default ALL: Match all of the tags and optionally more
-            n_req_tags = n_keys if n_keys > 0 else n_unique_categories
             query = query.filter(matches__gte=n_req_tags)
 
         return query
@@ -412,6 +528,92 @@ class TypedObjectManager(idmapper.manager.SharedMemoryManager):
             tag.save()
         return make_iter(tag)[0]
 
+    def prefetch_handlers(self, objs):
+        """
+        Fill the Attribute and Tag handler caches of many entities at once,
+        so reading their Attributes, nicks, Tags, aliases and permissions
+        afterwards doesn't query the database per entity.
+
+        Args:
+            objs (list): Entities of this manager's model.
+
+        Notes:
+            This makes two queries per 500 entities not already fully
+            cached. It does nothing if `settings.TYPECLASS_AGGRESSIVE_CACHE`
+            is off.
+
+        """
+        if not _TYPECLASS_AGGRESSIVE_CACHE:
+            return
+        # entities with all handlers cached already are skipped
+        objs = [
+            obj
+            for obj in objs
+            if obj.pk
+            and not all(
+                getattr(obj, handlername)._cache_complete
+                for handlers in (_ATTRIBUTE_HANDLERS, _TAG_HANDLERS)
+                for handlername in handlers.values()
+                if hasattr(obj, handlername)
+            )
+        ]
+        if len(objs) > _PREFETCH_CHUNK_SIZE:
+            for ichunk in range(0, len(objs), _PREFETCH_CHUNK_SIZE):
+                self.prefetch_handlers(objs[ichunk : ichunk + _PREFETCH_CHUNK_SIZE])
+            return
+        if not objs:
+            return
+        dbmodel = self.model.__dbclass__
+        modelname = dbmodel.__name__.lower()
+        ids = [obj.pk for obj in objs]
+        fieldname = "%s_id" % modelname
+
+        entities = {}
+        for m2m_fieldname, related, typefield in (
+            ("db_attributes", "attribute", "db_attrtype"),
+            ("db_tags", "tag", "db_tagtype"),
+        ):
+            grouped = entities[related] = defaultdict(list)
+            for conn in (
+                getattr(dbmodel, m2m_fieldname)
+                .through.objects.filter(**{"%s__in" % fieldname: ids})
+                .select_related(related)
+            ):
+                entity = getattr(conn, related)
+                if (entity.db_model or "").lower() == modelname:
+                    grouped[(getattr(conn, fieldname), getattr(entity, typefield))].append(entity)
+
+        self.cache_handlers(objs, entities["attribute"], entities["tag"])
+
+    def cache_handlers(self, objs, attributes, tags):
+        """
+        Fill the Attribute and Tag handler caches of entities with Attributes
+        and Tags that were already loaded.
+
+        Args:
+            objs (list): Entities of this manager's model.
+            attributes (dict): Lists of all Attributes of the entities, keyed
+                by `(entity id, attrtype)`.
+            tags (dict): Lists of all Tags of the entities, keyed by
+                `(entity id, tagtype)`.
+
+        Notes:
+            The handlers take what they are given to be all there is, so
+            an entity missing from `attributes` and `tags` has none.
+
+        """
+        if not _TYPECLASS_AGGRESSIVE_CACHE:
+            return
+        for obj in objs:
+            for entities, handlers in (
+                (attributes, _ATTRIBUTE_HANDLERS),
+                (tags, _TAG_HANDLERS),
+            ):
+                for entitytype, handlername in handlers.items():
+                    handler = getattr(obj, handlername, None)
+                    if handler is not None:
+                        handler._fullcache(entities.get((obj.pk, entitytype), []))
+
     def dbref(self, dbref, reqhash=True):
         """
         Determing if input is a valid dbref.
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 23:42
+
+from django.db import migrations
+import evennia.utils.picklefield
+
+
+def forwards(apps, schema_editor):
+    # Existing values keep their legacy (base64) format and are converted with
+    # `evennia convert_attributes`. SQLite keeps them as text in the new binary
+    # column though, so make them binary to have by-value searches match them.
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(
+            "UPDATE typeclasses_attribute SET db_value = CAST(db_value AS BLOB) "
+            "WHERE typeof(db_value) = 'text'"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("typeclasses", "0013_auto_20191015_1922")]
+
+    operations = [
+        migrations.AlterField(
+            model_name="attribute",
+            name="db_value",
+            field=evennia.utils.picklefield.PickledObjectField(
+                binary=True,
+                help_text="The data returned when the attribute is accessed. Must be written as a Python literal if editing through the admin interface. Attribute values which are not Python literals cannot be edited through the admin interface.",
+                null=True,
+                verbose_name="value",
+            ),
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
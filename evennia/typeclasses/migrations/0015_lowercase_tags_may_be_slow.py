@@ -0,0 +1,68 @@
+# Generated by Django 2.2.28 on 2026-10-19 09:12
+
+from django.db import migrations
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+_TAG_FIELDS = ("db_key", "db_category", "db_tagtype", "db_model")
+# rows to delete per query, within SQLite's query parameter limit
+_CHUNK_SIZE = 500
+
+
+def lowercase_tags(apps, schema_editor):
+    # Tags are searched for with exact lookups of lowercase terms, so store
+    # all of them in lowercase. Tags only differing in case are merged.
+    Tag = apps.get_model("typeclasses", "Tag")
+    throughs = [
+        field.remote_field.through
+        for model in apps.get_models()
+        for field in model._meta.many_to_many
+        if field.related_model is Tag
+    ]
+    lowercase = Q()
+    for fieldname in _TAG_FIELDS:
+        lowercase &= Q(**{fieldname: Lower(fieldname)}) | Q(**{"%s__isnull" % fieldname: True})
+
+    for tag in Tag.objects.exclude(lowercase).order_by("id"):
+        normalized = {
+            fieldname: getattr(tag, fieldname).lower() if getattr(tag, fieldname) else None
+            for fieldname in _TAG_FIELDS
+        }
+        existing = Tag.objects.filter(**normalized).exclude(id=tag.id).first()
+        if not existing:
+            for fieldname, value in normalized.items():
+                setattr(tag, fieldname, value)
+            tag.save()
+            continue
+        for through in throughs:
+            entity_field = next(
+                field.attname
+                for field in through._meta.fields
+                if field.is_relation and field.related_model is not Tag
+            )
+            # entities with both Tags; found with a subquery, since there may be
+            # more of them than query parameters allowed
+            tagged = through.objects.filter(tag_id=existing.id).values(entity_field)
+            duplicates = list(
+                through.objects.filter(
+                    tag_id=tag.id, **{"%s__in" % entity_field: tagged}
+                ).values_list("id", flat=True)
+            )
+            for ichunk in range(0, len(duplicates), _CHUNK_SIZE):
+                through.objects.filter(id__in=duplicates[ichunk : ichunk + _CHUNK_SIZE]).delete()
+            through.objects.filter(tag_id=tag.id).update(tag_id=existing.id)
+        tag.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("typeclasses", "0014_attribute_binary_value"),
+        ("accounts", "0009_auto_20191025_0831"),
+        ("comms", "0018_auto_20191025_0831"),
+        ("help", "0003_auto_20190128_1820"),
+        ("objects", "0011_auto_20191025_0831"),
+        ("scripts", "0013_auto_20191025_0831"),
+    ]
+
+    operations = [migrations.RunPython(lowercase_tags, migrations.RunPython.noop)]
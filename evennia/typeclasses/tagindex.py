@@ -0,0 +1,246 @@
+"""
+Tag index
+
+`get_by_tag` (and so `search_tag`) finds entities by joining them with
+their Tags and counting the matches of each entity in the database. With
+`settings.TAG_INDEX` on, the `TagIndex` keeps which entities have which
+Tags in memory instead, so the database only has to look up the matching
+entities by id:
+
+- Each Tag is mapped to the set of ids of the entities having it.
+- The Tags of a model are found by (tagtype, key, category) and by
+  (tagtype, category).
+
+The index of a model is loaded from the database when it's first searched
+and kept up to date by the `m2m_changed` signals sent when Tags are added
+to or removed from entities (such as by the `TagHandler`) and by the
+`post_save` and `post_delete` signals of Tags and entities. Changes made
+by other processes, or by bulk operations not sending signals, are not
+seen, so call `TAG_INDEX.clear()` after those. Searches matching more than
+`_MAX_RESULTS` entities are left to the database.
+
+"""
+
+from collections import Counter, defaultdict
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from evennia.typeclasses.tags import Tag
+
+# the final query lists the ids of all matches (twice when sorting "any"
+# matches), so many matches are better found by the database. This keeps
+# within the 999 query parameters allowed by older SQLite versions.
+_MAX_RESULTS = 400
+
+
+class _ModelIndex(object):
+    """
+    The Tags of all entities of one model.
+
+    """
+
+    def __init__(self, dbclass):
+        self.modelname = dbclass.__name__.lower()
+        self.through = dbclass.db_tags.through
+        # tag id -> set of entity ids
+        self.tagged = defaultdict(set)
+        # tag id -> (tagtype, key, category)
+        self.tags = {}
+        # (tagtype, key, category) -> tag id
+        self.keys = {}
+        # (tagtype, category) -> set of tag ids
+        self.categories = defaultdict(set)
+
+    def load(self):
+        """
+        Load all Tags of the model and the entities having them.
+
+        """
+        for tag_id, tagtype, key, category in Tag.objects.filter(
+            db_model=self.modelname
+        ).values_list("id", "db_tagtype", "db_key", "db_category"):
+            self.add_tag(tag_id, tagtype, key, category)
+        for tag_id, obj_id in self.through.objects.values_list(
+            "tag_id", "%s_id" % self.modelname
+        ).iterator():
+            if tag_id in self.tags:
+                self.tagged[tag_id].add(obj_id)
+
+    def add_tag(self, tag_id, tagtype, key, category):
+        """
+        Add or update a Tag.
+
+        """
+        self.remove_tag(tag_id, keep_tagged=True)
+        self.tags[tag_id] = (tagtype, key, category)
+        self.keys[(tagtype, key, category)] = tag_id
+        self.categories[(tagtype, category)].add(tag_id)
+
+    def remove_tag(self, tag_id, keep_tagged=False):
+        """
+        Remove a Tag, if it's in the index.
+
+        """
+        tagspec = self.tags.pop(tag_id, None)
+        if tagspec:
+            tagtype, key, category = tagspec
+            self.keys.pop(tagspec, None)
+            self.categories[(tagtype, category)].discard(tag_id)
+        if not keep_tagged:
+            self.tagged.pop(tag_id, None)
+
+    def remove_entity(self, obj_id):
+        """
+        Remove an entity from the sets of all Tags.
+
+        """
+        for obj_ids in self.tagged.values():
+            obj_ids.discard(obj_id)
+
+
+class TagIndex(object):
+    """
+    In-memory index of the Tags of typeclassed entities.
+
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """
+        Empty the index. The index of each model is loaded again when it's
+        next searched.
+
+        """
+        # model name -> _ModelIndex
+        self.models = {}
+        # through model of db_tags -> _ModelIndex
+        self.throughs = {}
+
+    def get_index(self, dbclass):
+        """
+        Get the index of a model, loading it if needed.
+
+        Args:
+            dbclass (Model): The database model, like `ObjectDB`.
+
+        Returns:
+            index (_ModelIndex): The index of the model.
+
+        """
+        modelname = dbclass.__name__.lower()
+        index = self.models.get(modelname)
+        if index is None:
+            index = _ModelIndex(dbclass)
+            index.load()
+            self.models[modelname] = self.throughs[index.through] = index
+        return index
+
+    def get_matches(self, dbclass, tagtype=None, keys=None, categories=None, nrequired=1):
+        """
+        Find the entities having some of the given Tags.
+
+        Args:
+            dbclass (Model): The database model of the entities.
+            tagtype (str, optional): The tagtype of all the Tags.
+            keys (list, optional): `(key, category)` pairs of the Tags to match.
+            categories (list, optional): Categories of Tags to match, if
+                `keys` is not given.
+            nrequired (int, optional): How many of the Tags an entity must
+                have to match.
+
+        Returns:
+            matches (dict or None): The number of the Tags each matching
+                entity has, keyed by entity id. This is `None` if there are
+                more than `_MAX_RESULTS` matches.
+
+        """
+        index = self.get_index(dbclass)
+        if keys:
+            tag_ids = set(index.keys.get((tagtype,) + keypair) for keypair in keys)
+            tag_ids.discard(None)
+        else:
+            tag_ids = set()
+            for category in categories:
+                tag_ids.update(index.categories.get((tagtype, category), ()))
+        sets = sorted((index.tagged.get(tag_id, set()) for tag_id in tag_ids), key=len)
+        if not sets or len(sets) < nrequired:
+            return {}
+        if len(sets) == nrequired:
+            # all the Tags are required
+            obj_ids = set.intersection(*sets)
+            if len(obj_ids) > _MAX_RESULTS:
+                return None
+            return dict.fromkeys(obj_ids, nrequired)
+        if nrequired == 1 and len(set().union(*sets)) > _MAX_RESULTS:
+            return None
+        counts = Counter()
+        for obj_ids in sets:
+            counts.update(obj_ids)
+        matches = {obj_id: count for obj_id, count in counts.items() if count >= nrequired}
+        return None if len(matches) > _MAX_RESULTS else matches
+
+
+TAG_INDEX = TagIndex()
+
+
+def _update_tagged(sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs):
+    """
+    Keep the index up to date when Tags are added to or removed from
+    entities. This is connected to the `m2m_changed` signal.
+
+    """
+    index = TAG_INDEX.throughs.get(sender)
+    if index is None or action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        # changing the entities of a Tag
+        obj_ids = index.tagged[instance.pk]
+        if action == "post_add":
+            obj_ids.update(pk_set)
+        elif action == "post_remove":
+            obj_ids.difference_update(pk_set)
+        else:
+            obj_ids.clear()
+    elif action == "pre_clear":
+        index.remove_entity(instance.pk)
+    else:
+        for tag_id in pk_set:
+            if action == "post_add":
+                index.tagged[tag_id].add(instance.pk)
+            elif tag_id in index.tagged:
+                index.tagged[tag_id].discard(instance.pk)
+
+
+def _update_tag(sender, instance=None, **kwargs):
+    """
+    Keep the index up to date when Tags are created, changed or deleted.
+    This is connected to the `post_save` and `post_delete` signals of Tags.
+
+    """
+    index = TAG_INDEX.models.get(instance.db_model)
+    if index is None:
+        return
+    if kwargs["signal"] is post_save:
+        index.add_tag(instance.pk, instance.db_tagtype, instance.db_key, instance.db_category)
+    else:
+        index.remove_tag(instance.pk)
+
+
+def _remove_entity(sender, instance=None, **kwargs):
+    """
+    Remove deleted entities from the index. Their Tags are removed by the
+    database without sending `m2m_changed`. This is connected to the
+    `post_delete` signal of all models.
+
+    """
+    dbclass = getattr(instance, "__dbclass__", None)
+    if dbclass is not None and TAG_INDEX.models:
+        index = TAG_INDEX.models.get(dbclass.__name__.lower())
+        if index is not None:
+            index.remove_entity(instance.pk)
+
+
+m2m_changed.connect(_update_tagged, dispatch_uid="tag_index_m2m")
+post_save.connect(_update_tag, sender=Tag, dispatch_uid="tag_index_save")
+post_delete.connect(_update_tag, sender=Tag, dispatch_uid="tag_index_delete")
+post_delete.connect(_remove_entity, dispatch_uid="tag_index_entity_delete")
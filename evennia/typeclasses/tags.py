@@ -13,10 +13,13 @@ from collections import defaultdict
 
 from django.conf import settings
 from django.db import models
+from django.db.models.signals import m2m_changed
 from evennia.utils.utils import to_str, make_iter
 
 
 _TYPECLASS_AGGRESSIVE_CACHE = settings.TYPECLASS_AGGRESSIVE_CACHE
+# entities to query for per database query in add_many
+_BULK_CHUNK_SIZE = 500
 
 # ------------------------------------------------------------
 #
@@ -81,6 +84,19 @@ class Tag(models.Model):
         unique_together = (("db_key", "db_category", "db_tagtype", "db_model"),)
         index_together = (("db_key", "db_category", "db_tagtype", "db_model"),)
 
+    def save(self, *args, **kwargs):
+        """
+        Save the Tag with its key, category, tagtype and model in lowercase,
+        so they can be searched for with exact (indexed) lookups of the
+        lowercased search terms.
+
+        """
+        for fieldname in ("db_key", "db_category", "db_tagtype", "db_model"):
+            value = getattr(self, fieldname)
+            if value:
+                setattr(self, fieldname, value.lower())
+        super().save(*args, **kwargs)
+
     def __lt__(self, other):
         return str(self) < str(other)
 
@@ -104,6 +120,8 @@ class TagHandler(object):
 
     _m2m_fieldname = "db_tags"
     _tagtype = None
+    # the property of the typeclassed entity holding this handler
+    _handlername = "tags"
 
     def __init__(self, obj):
         """
@@ -136,11 +154,20 @@ class TagHandler(object):
             for conn in getattr(self.obj, self._m2m_fieldname).through.objects.filter(**query)
         ]
 
-    def _fullcache(self):
-        "Cache all tags of this object"
+    def _fullcache(self, tags=None):
+        """
+        Cache all tags of this object
+
+        Args:
+            tags (list, optional): All the Tags of this object, if already
+                fetched (see `TypedObjectManager.prefetch_handlers`). If not
+                given, they are queried for.
+
+        """
         if not _TYPECLASS_AGGRESSIVE_CACHE:
             return
-        tags = self._query_all()
+        if tags is None:
+            tags = self._query_all()
         self._cache = dict(
             (
                 "%s-%s"
@@ -188,13 +215,15 @@ class TagHandler(object):
                 del self._cache[cachekey]
             if tag:
                 return [tag]  # return cached entity
+            elif _TYPECLASS_AGGRESSIVE_CACHE and self._cache_complete:
+                return []  # a complete cache holds all Tags, so there is no such Tag
             else:
                 query = {
                     "%s__id" % self._model: self._objid,
                     "tag__db_model": self._model,
                     "tag__db_tagtype": self._tagtype,
-                    "tag__db_key__iexact": key.lower(),
-                    "tag__db_category__iexact": category.lower() if category else None,
+                    "tag__db_key": key,
+                    "tag__db_category": category,
                 }
                 conn = getattr(self.obj, self._m2m_fieldname).through.objects.filter(**query)
                 if conn:
@@ -207,7 +236,7 @@ class TagHandler(object):
             # assume the cache to be complete unless we have queried
             # for this category before
             catkey = "-%s" % category
-            if _TYPECLASS_AGGRESSIVE_CACHE and catkey in self._catcache:
+            if _TYPECLASS_AGGRESSIVE_CACHE and (self._cache_complete or catkey in self._catcache):
                 return [tag for key, tag in self._cache.items() if key.endswith(catkey)]
             else:
                 # we have to query to make this category up-date in the cache
@@ -215,7 +244,7 @@ class TagHandler(object):
                     "%s__id" % self._model: self._objid,
                     "tag__db_model": self._model,
                     "tag__db_tagtype": self._tagtype,
-                    "tag__db_category__iexact": category.lower() if category else None,
+                    "tag__db_category": category,
                 }
                 tags = [
                     conn.tag
@@ -319,6 +348,68 @@ class TagHandler(object):
             getattr(self.obj, self._m2m_fieldname).add(tagobj)
             self._setcache(tagstr, category, tagobj)
 
+    @classmethod
+    def add_many(cls, objs, tag, category=None, data=None):
+        """
+        Add the same Tag to many entities at once.
+
+        Args:
+            objs (list): Typeclassed entities, all of the same model.
+            tag (str): The name of the Tag to add.
+            category (str, optional): Category of the Tag. `None` is the default category.
+            data (str, optional): Info text about the Tag.
+
+        Notes:
+            Where `add` makes a few queries per entity, this makes one query
+            per 500 entities to find those already having the Tag and one
+            `bulk_create` to add it to the rest. The Tag is cached on the
+            handlers of the entities. Use as `TagHandler.add_many(objs, "red")`,
+            or `AliasHandler.add_many` and `PermissionHandler.add_many` for
+            aliases and permissions.
+
+        """
+        objs = [obj for obj in objs if obj.pk]
+        if not tag or not objs:
+            return
+        tagstr = str(tag).strip().lower()
+        category = str(category).strip().lower() if category else None
+        data = str(data) if data is not None else None
+        tagobj = objs[0].__class__.objects.create_tag(
+            key=tagstr, category=category, data=data, tagtype=cls._tagtype
+        )
+        dbmodel = objs[0].__dbclass__
+        through = getattr(dbmodel, cls._m2m_fieldname).through
+        fieldname = "%s_id" % dbmodel.__name__.lower()
+
+        ids = list(set(obj.pk for obj in objs))
+        tagged = set()
+        for ichunk in range(0, len(ids), _BULK_CHUNK_SIZE):
+            query = {"%s__in" % fieldname: ids[ichunk : ichunk + _BULK_CHUNK_SIZE], "tag": tagobj}
+            tagged.update(through.objects.filter(**query).values_list(fieldname, flat=True))
+        new_ids = set(ids) - tagged
+        through.objects.bulk_create(
+            [through(**{fieldname: pk, "tag_id": tagobj.pk}) for pk in new_ids],
+            batch_size=_BULK_CHUNK_SIZE,
+        )
+
+        for obj in objs:
+            if obj.pk in new_ids:
+                new_ids.discard(obj.pk)
+                m2m_changed.send(
+                    sender=through,
+                    instance=obj,
+                    action="post_add",
+                    reverse=False,
+                    model=Tag,
+                    pk_set={tagobj.pk},
+                    using=tagobj._state.db,
+                )
+            handler = getattr(obj, cls._handlername)
+            cache_complete = handler._cache_complete
+            handler._setcache(tagstr, category, tagobj)
+            # the cache still holds all Tags, now with the new one
+            handler._cache_complete = cache_complete
+
     def get(self, key=None, default=None, category=None, return_tagobj=False, return_list=False):
         """
         Get the tag for the given key, category or combination of the two.
@@ -409,7 +500,10 @@ class TagHandler(object):
         }
         if category:
             query["tag__db_category"] = category.strip().lower()
-        getattr(self.obj, self._m2m_fieldname).through.objects.filter(**query).delete()
+        m2m = getattr(self.obj, self._m2m_fieldname)
+        tag_ids = list(m2m.through.objects.filter(**query).values_list("tag_id", flat=True))
+        # removing them through the relation sends the m2m_changed signal
+        m2m.remove(*tag_ids)
         self._cache = {}
         self._catcache = {}
         self._cache_complete = False
@@ -485,6 +579,7 @@ class AliasHandler(TagHandler):
     """
 
     _tagtype = "alias"
+    _handlername = "aliases"
 
 
 class PermissionHandler(TagHandler):
@@ -494,3 +589,4 @@ class PermissionHandler(TagHandler):
     """
 
     _tagtype = "permission"
+    _handlername = "permissions"
@@ -2,8 +2,16 @@
 Unit tests for typeclass base system
 
 """
+from collections import deque
+from datetime import datetime
 from django.test import override_settings
 from evennia.utils.test_resources import EvenniaTest
+from evennia.objects.models import ObjectDB
+from evennia.utils.dbserialize import from_pickle
+from evennia.typeclasses import attributes
+from evennia.typeclasses.tagindex import TAG_INDEX
+from evennia.typeclasses.tags import Tag
+from evennia.utils import create
 from mock import patch
 
 # ------------------------------------------------------------
@@ -55,6 +63,100 @@ class TestAttributes(EvenniaTest):
         self.assertEqual(attrobj.category, "category4")
         self.assertEqual(attrobj.locks.all(), ["attrread:id(1)"])
 
+    def test_get_many(self):
+        self.obj1.db.weight = 5
+        self.obj2.db.weight = 3
+        self.char1.attributes.add("weight", 4, category="other")
+        objs = [self.obj1, self.obj2, self.char1]
+        for obj in objs:
+            obj.attributes.reset_cache()
+        with self.assertNumQueries(1):
+            self.assertEqual(attributes.AttributeHandler.get_many(objs, "weight"), [5, 3, None])
+        # the result is cached, including the missing Attribute
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                attributes.AttributeHandler.get_many(objs, "Weight", default=0), [5, 3, 0]
+            )
+            self.assertIsNone(self.char1.db.weight)
+        attrs = attributes.AttributeHandler.get_many(
+            objs, "weight", category="other", return_obj=True
+        )
+        self.assertEqual([attr and attr.value for attr in attrs], [None, None, 4])
+        self.assertEqual(attributes.NickHandler.get_many(objs, "weight"), [None] * 3)
+
+    def test_set_many(self):
+        self.obj1.db.hp = 5
+        self.obj2.attributes.reset_cache()
+        objs = [self.obj1, self.obj2, self.char1]
+        attributes.AttributeHandler.set_many(dict(zip(objs, (10, [1, 2], {"a": 1}))), "hp")
+        with self.assertNumQueries(0):
+            self.assertEqual([obj.db.hp for obj in objs], [10, [1, 2], {"a": 1}])
+        for obj in objs:
+            obj.attributes.reset_cache()
+        self.assertEqual([obj.db.hp for obj in objs], [10, [1, 2], {"a": 1}])
+        attributes.AttributeHandler.set_many(dict.fromkeys(objs, 1), "hp", category="Stats")
+        self.assertEqual(attributes.AttributeHandler.get_many(objs, "hp", "stats"), [1, 1, 1])
+        self.assertEqual(self.obj2.attributes.get("hp", category="stats"), 1)
+        self.assertEqual(self.obj2.db.hp, [1, 2])
+
+    def test_value_cache(self):
+        self.obj1.db.stats = {"hp": 10, "skills": [1, 2]}
+        attr = self.obj1.attributes.get("stats", return_obj=True)
+        with patch("evennia.typeclasses.attributes.from_pickle", wraps=from_pickle) as decode:
+            stats = self.obj1.db.stats
+            self.assertIs(self.obj1.db.stats, stats)
+            self.assertEqual(decode.call_count, 1)
+            # changing the value drops the cache
+            stats["skills"].append(3)
+            self.assertEqual(self.obj1.db.stats, {"hp": 10, "skills": [1, 2, 3]})
+            self.assertEqual(decode.call_count, 2)
+            # as does changing db_value directly
+            attr.db_value = 5
+            self.assertEqual(self.obj1.db.stats, 5)
+            self.assertEqual(decode.call_count, 3)
+
+    def test_value_cache_unconverted_items(self):
+        # the items of a deque are not _Saver* structures, so changing them
+        # doesn't save the Attribute
+        self.obj1.db.log = {"log": deque([{"a": 1}, [2]])}
+        self.obj1.db.log["log"][0]["a"] = 2
+        self.obj1.db.log["log"][1].append(3)
+        self.assertEqual(self.obj1.db.log["log"][0]["a"], 1)
+        self.assertEqual(self.obj1.db.log["log"][1], [2])
+        # fully converted values are still cached
+        self.obj1.db.stats = {"hp": [1, {"a": (2, 3)}], "born": datetime(2000, 1, 1)}
+        self.assertIs(self.obj1.db.stats, self.obj1.db.stats)
+
+    def test_value_cache_deleted_object(self):
+        refkey = (self.obj2.__dbclass__, self.obj2.id)
+        self.obj1.db.things = [self.obj2, "sword"]
+        self.obj1.db.target = self.obj2
+        self.assertEqual(self.obj1.db.things, [self.obj2, "sword"])
+        self.assertEqual(self.obj1.db.target, self.obj2)
+        attr_ids = set(
+            self.obj1.attributes.get(key, return_obj=True).id for key in ("things", "target")
+        )
+        self.assertTrue(attr_ids <= attributes._REFERRERS[refkey])
+        self.obj2.delete()
+        self.assertEqual(self.obj1.db.things, [None, "sword"])
+        self.assertIsNone(self.obj1.db.target)
+        self.assertNotIn(refkey, attributes._REFERRERS)
+
+    def test_value_cache_flushed_object(self):
+        self.obj1.db.target = self.obj2
+        attr = self.obj1.attributes.get("target", return_obj=True)
+        self.assertIs(self.obj1.db.target, self.obj2)
+        # a flushed object is loaded again as a new instance
+        self.obj2.flush_from_cache()
+        target = self.obj1.db.target
+        self.assertIsNot(target, self.obj2)
+        self.assertIs(target, self.obj2.__dbclass__.objects.get(id=self.obj2.id))
+        # a flushed Attribute is no longer a referrer
+        refkey = (self.obj2.__dbclass__, self.obj2.id)
+        self.assertIn(attr.id, attributes._REFERRERS[refkey])
+        attr.flush_from_cache()
+        self.assertNotIn(refkey, attributes._REFERRERS)
+
 
 class TestTypedObjectManager(EvenniaTest):
     def _manager(self, methodname, *args, **kwargs):
@@ -137,6 +239,59 @@ class TestTypedObjectManager(EvenniaTest):
             [],
         )
 
+    def test_prefetch_handlers(self):
+        self.obj1.db.strength = 10
+        self.obj1.attributes.add("spell", "fireball", category="magic")
+        self.obj1.nicks.add("greet", "say hello")
+        self.obj1.tags.add("red", category="color")
+        self.obj1.aliases.add("thing")
+        self.obj1.permissions.add("Builder")
+        self.obj2.db.strength = 5
+        for obj in (self.obj1, self.obj2):
+            for handler in (obj.attributes, obj.nicks, obj.tags, obj.aliases, obj.permissions):
+                handler.reset_cache()
+
+        with self.assertNumQueries(2):
+            self.obj1.__class__.objects.prefetch_handlers([self.obj1, self.obj2])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.obj1.db.strength, 10)
+            self.assertEqual(self.obj2.db.strength, 5)
+            self.assertEqual(self.obj1.attributes.get("spell", category="magic"), "fireball")
+            self.assertEqual(self.obj1.attributes.get(category="magic"), "fireball")
+            self.assertIsNone(self.obj1.db.missing)
+            self.assertEqual(self.obj1.nicks.get("greet"), "say hello")
+            self.assertEqual(self.obj1.tags.get("red", category="color"), "red")
+            self.assertIsNone(self.obj2.tags.get("red", category="color"))
+            self.assertEqual(self.obj1.aliases.get("thing"), "thing")
+            self.assertTrue(self.obj1.permissions.get("builder"))
+            self.assertIsNone(self.obj2.aliases.get("thing"))
+        # fully cached entities are skipped
+        with self.assertNumQueries(0):
+            self.obj1.__class__.objects.prefetch_handlers([self.obj1, self.obj2])
+
+    def test_with_handlers(self):
+        self.obj1.db.strength = 10
+        self.obj2.tags.add("red")
+        for obj in (self.obj1, self.obj2):
+            obj.flush_from_cache(force=True)
+
+        queryset = ObjectDB.objects.filter(id__in=[self.obj1.id, self.obj2.id]).with_handlers()
+        with self.assertNumQueries(3):
+            objs = list(queryset.order_by("id"))
+        with self.assertNumQueries(0):
+            self.assertEqual(objs[0].db.strength, 10)
+            self.assertEqual(objs[1].tags.all(), ["red"])
+            self.assertEqual(objs[1].attributes.all(), [])
+        # the objects come from the cache now, so their handlers aren't filled again
+        with self.assertNumQueries(1):
+            self.assertEqual(len(queryset.all()), 2)
+        # typeclass managers filter on the typeclass first
+        self.assertEqual(
+            set(self.char1.__class__.objects.with_handlers()), {self.char1, self.char2}
+        )
+        # other querysets are not affected
+        self.assertEqual(len(ObjectDB.objects.filter(id=self.obj1.id).values("db_key")), 1)
+
     def test_batch_add(self):
         tags = ["tag1", ("tag2", "category2"), "tag3", ("tag4", "category4", "data4")]
         self.obj1.tags.batch_add(*tags)
@@ -145,3 +300,83 @@ class TestTypedObjectManager(EvenniaTest):
         self.assertEqual(tagobj.db_key, "tag4")
         self.assertEqual(tagobj.db_category, "category4")
         self.assertEqual(tagobj.db_data, "data4")
+
+    def test_add_many(self):
+        self.obj1.tags.add("red")
+        self.obj2.tags.all()
+        objs = [self.obj1, self.obj2, self.char1]
+        with self.assertNumQueries(3):
+            self.obj1.tags.add_many(objs, "Red")
+        with self.assertNumQueries(0):
+            self.assertEqual([obj.tags.get("red") for obj in objs], ["red"] * 3)
+            # a complete cache stays complete
+            self.assertEqual(self.obj2.tags.all(), ["red"])
+        for obj in objs:
+            obj.tags.reset_cache()
+        self.assertEqual([obj.tags.get("red") for obj in objs], ["red"] * 3)
+        self.assertEqual(ObjectDB.objects.get_by_tag("red").count(), 3)
+        # other handlers keep their Tags apart
+        self.obj1.aliases.add_many(objs[1:], "thing")
+        self.assertIn("thing", self.char1.aliases.all())
+        self.assertIsNone(self.char1.tags.get("thing"))
+
+    def test_lowercase(self):
+        tag = Tag(db_key="Blue", db_category="Colors", db_model="ObjectDB")
+        tag.save()
+        self.assertEqual(
+            (tag.db_key, tag.db_category, tag.db_model), ("blue", "colors", "objectdb")
+        )
+        self.obj1.db_tags.add(tag)
+        self.assertEqual(self._manager("get_by_tag", "BLUE", "colors"), [self.obj1])
+
+
+@patch("evennia.typeclasses.managers._TAG_INDEX", True)
+class TestTagIndex(TestTypedObjectManager):
+    """
+    The manager tests again, searching the Tag index.
+
+    """
+
+    def setUp(self):
+        super().setUp()
+        TAG_INDEX.clear()
+
+    def tearDown(self):
+        TAG_INDEX.clear()
+        super().tearDown()
+
+    def _search(self, key):
+        return list(ObjectDB.objects.get_by_tag(key, "zone"))
+
+    def test_index_updates(self):
+        self.obj1.tags.add("red", "zone")
+        self.assertEqual(self._search("Red"), [self.obj1])
+        self.obj2.tags.add("Red", "Zone")
+        self.obj1.tags.add_many([self.char1], "red", "zone")
+        with self.assertNumQueries(1):
+            self.assertEqual(self._search("red"), [self.obj1, self.obj2, self.char1])
+        self.obj1.tags.remove("red", "zone")
+        self.obj2.tags.clear()
+        self.assertEqual(self._search("red"), [self.char1])
+        self.obj1.db_tags.add(*self.char1.db_tags.all())
+        self.char1.db_tags.clear()
+        self.assertEqual(self._search("red"), [self.obj1])
+        # deleting entities and Tags
+        obj = create.create_object(key="Thing", nohome=True, tags=[("red", "zone")])
+        self.assertEqual(self._search("red"), [self.obj1, obj])
+        obj.delete()
+        self.assertEqual(self._search("red"), [self.obj1])
+        ObjectDB.objects.get_tag("red", "zone", global_search=True).delete()
+        self.assertEqual(self._search("red"), [])
+        self.assertNotIn(("red", "zone"), [key[1:] for key in TAG_INDEX.models["objectdb"].keys])
+
+    def test_too_many_matches(self):
+        self.obj1.tags.add("blue")
+        self.obj2.tags.add("blue")
+        self.assertEqual(
+            TAG_INDEX.get_matches(ObjectDB, keys=[("blue", None)]),
+            {self.obj1.id: 1, self.obj2.id: 1},
+        )
+        with patch("evennia.typeclasses.tagindex._MAX_RESULTS", 1):
+            self.assertIsNone(TAG_INDEX.get_matches(ObjectDB, keys=[("blue", None)]))
+            self.assertEqual(self._manager("get_by_tag", "blue"), [self.obj1, self.obj2])
@@ -601,7 +601,7 @@ def to_pickle(data):
 
 
 # @transaction.autocommit
-def from_pickle(data, db_obj=None):
+def from_pickle(data, db_obj=None, references=None):
     """
     This should be fed a just de-pickled data object. It will be converted back
     to a form that may contain database objects again. Note that if a database
@@ -617,12 +617,22 @@ def from_pickle(data, db_obj=None):
             serializing onto a given object.  If db_obj is given, this
             function will convert lists, dicts and sets to their
             `_SaverList`, `_SaverDict` and `_SaverSet` counterparts.
+        references (list, optional): If given, every database object and
+            Session found in the data is appended to this list. This is used
+            to know when a cached result goes out of date.
 
     Returns:
         data (any): Unpickled data.
 
     """
 
+    def unpack(item, unpacker):
+        """Unpack a database object or Session, remembering it if requested"""
+        unpacked = unpacker(item)
+        if references is not None and unpacked is not None:
+            references.append(unpacked)
+        return unpacked
+
     def process_item(item):
         """Recursive processor and identification of data"""
         dtype = type(item)
@@ -630,9 +640,9 @@ def from_pickle(data, db_obj=None):
             return item
         elif _IS_PACKED_DBOBJ(item):
             # this must be checked before tuple
-            return unpack_dbobj(item)
+            return unpack(item, unpack_dbobj)
         elif _IS_PACKED_SESSION(item):
-            return unpack_session(item)
+            return unpack(item, unpack_session)
         elif dtype == tuple:
             return tuple(process_item(val) for val in item)
         elif dtype == dict:
@@ -659,7 +669,7 @@ def from_pickle(data, db_obj=None):
             return item
         elif _IS_PACKED_DBOBJ(item):
             # this must be checked before tuple
-            return unpack_dbobj(item)
+            return unpack(item, unpack_dbobj)
         elif dtype == tuple:
             return tuple(process_tree(val, item) for val in item)
         elif dtype == list:
@@ -6,14 +6,18 @@ in-mud time and real-world time as well allows to get the
 total runtime of the server and the current uptime.
 """
 
+import heapq
 import time
 from calendar import monthrange
 from datetime import datetime, timedelta
 
 from django.conf import settings
+from twisted.internet import reactor
 from evennia import DefaultScript
 from evennia.server.models import ServerConfig
+from evennia.utils import logger
 from evennia.utils.create import create_script
+from evennia.utils.utils import object_from_module
 
 # Speed-up factor of the in-game time compared
 # to real time.
@@ -181,6 +185,25 @@ def real_seconds_until(sec=None, min=None, hour=None, day=None, month=None, year
 
     """
     current = datetime.fromtimestamp(gametime(absolute=True))
+    projected = _next_game_datetime(current, sec, min, hour, day, month, year)
+
+    # Get the number of gametime seconds between these two dates
+    seconds = (projected - current).total_seconds()
+    return seconds / TIMEFACTOR
+
+
+def _next_game_datetime(current, sec=None, min=None, hour=None, day=None, month=None, year=None):
+    """
+    Get the next in-game date after `current` matching the given time units.
+    Arguments are the same as for `real_seconds_until`.
+
+    Args:
+        current (datetime): The in-game date to start from.
+
+    Returns:
+        projected (datetime): The next matching in-game date.
+
+    """
     s_sec = sec if sec is not None else current.second
     s_min = min if min is not None else current.minute
     s_hour = hour if hour is not None else current.hour
@@ -204,10 +227,7 @@ def real_seconds_until(sec=None, min=None, hour=None, day=None, month=None, year
             projected += timedelta(seconds=3600)
         else:
             projected += timedelta(seconds=60)
-
-    # Get the number of gametime seconds between these two dates
-    seconds = (projected - current).total_seconds()
-    return seconds / TIMEFACTOR
+    return projected
 
 
 def schedule(
@@ -257,6 +277,312 @@ def schedule(
     return script
 
 
+class GameTimeCalendar(object):
+    """
+    Calls functions at given in-game times, without a Script per event.
+
+    All events are kept in a single priority queue ordered by their next
+    in-game time, and one reactor timer is set for the earliest of them.
+    Since the queue is ordered by game time, a change of `TIME_FACTOR`
+    only means re-setting that one timer. If the in-game clock itself is
+    changed (a new game epoch or `reset_gametime`), the next game times of
+    all events are recalculated.
+
+    The events are stored in a single `ServerConfig` value as tuples of
+    `(python-path of callable, args, kwargs, time units, repeat)`, so they
+    survive reloads and restarts. Use the `schedule_event` and
+    `cancel_event` functions to access the global calendar.
+
+    """
+
+    def __init__(self, clock=reactor):
+        """
+        Args:
+            clock (IReactorTime, optional): Provides `callLater`. Mainly
+                here for testing.
+
+        """
+        self.clock = clock
+        self.loaded = False
+        # {event_id: (path, args, kwargs, units, repeat)}
+        self.events = {}
+        # {event_id: next gametime}, and a heap of (gametime, event_id)
+        self.deadlines = {}
+        self.queue = []
+        self.next_id = 1
+        self.epoch = None
+        self.call = None
+
+    def load(self):
+        """
+        Load the stored events and set the timer. Called at server start.
+
+        """
+        stored = ServerConfig.objects.conf("gametime_calendar", default=None) or {}
+        self.events = stored.get("events", {})
+        self.next_id = stored.get("next_id", 1)
+        self.epoch = stored.get("epoch")
+        self.loaded = True
+        deadlines = stored.get("deadlines", {})
+        if self.epoch != game_epoch():
+            # the game calendar changed while we were offline
+            deadlines = {}
+        now = gametime(absolute=True)
+        self.deadlines, self.queue = {}, []
+        for event_id, (_, _, _, units, repeat) in self.events.items():
+            if not repeat and event_id in deadlines:
+                # one-time events overdue after downtime are run right away
+                self._push(event_id, deadlines[event_id])
+            else:
+                self._push(event_id, self._next_gametime(units, now))
+        self._arm()
+
+    def save(self):
+        """
+        Store the events. Repeating events are stored without their next
+        time, since it is recalculated on load anyway.
+
+        """
+        self.epoch = game_epoch()
+        ServerConfig.objects.conf(
+            "gametime_calendar",
+            {
+                "events": self.events,
+                "next_id": self.next_id,
+                "epoch": self.epoch,
+                "deadlines": {
+                    event_id: self.deadlines[event_id]
+                    for event_id, event in self.events.items()
+                    if not event[4]
+                },
+            },
+        )
+
+    def add(self, callback, repeat=False, args=None, kwargs=None, **units):
+        """
+        Schedule a callable to be called at an in-game time.
+
+        Args:
+            callback (callable or str): A module-level function or the
+                python-path to one.
+            repeat (bool, optional): Call it every time the in-game time
+                matches, instead of only once.
+            args (tuple, optional): Positional arguments for `callback`.
+            kwargs (dict, optional): Keyword arguments for `callback`.
+            **units: One or more of the absolute time units `sec`, `min`,
+                `hour`, `day`, `month`, `year`, as for `real_seconds_until`.
+
+        Returns:
+            event_id (int): Id of the event, for use with `remove`.
+
+        Raises:
+            ValueError: If `callback` is not a module-level callable.
+
+        """
+        if not self.loaded:
+            self.load()
+        if callable(callback):
+            path = "%s.%s" % (callback.__module__, callback.__qualname__)
+            try:
+                found = object_from_module(path)
+            except Exception:
+                found = None
+            if found is not callback:
+                raise ValueError("%r is not a module-level callable." % callback)
+        else:
+            path = callback
+        units = {key: value for key, value in units.items() if value is not None}
+        event_id = self.next_id
+        self.next_id += 1
+        self.events[event_id] = (path, tuple(args or ()), dict(kwargs or {}), units, bool(repeat))
+        self._push(event_id, self._next_gametime(units, gametime(absolute=True)))
+        self.save()
+        self._arm()
+        return event_id
+
+    def remove(self, event_id):
+        """
+        Cancel a scheduled event.
+
+        Args:
+            event_id (int): The event to cancel.
+
+        Returns:
+            removed (bool): If the event existed.
+
+        """
+        if not self.loaded:
+            self.load()
+        if self.events.pop(event_id, None) is None:
+            return False
+        del self.deadlines[event_id]
+        self.save()
+        self._arm()
+        return True
+
+    def get_events(self):
+        """
+        Get all events.
+
+        Returns:
+            events (list): Tuples `(event_id, path, args, kwargs, units,
+                repeat, real_seconds_until_next)`, soonest first.
+
+        """
+        if not self.loaded:
+            self.load()
+        now = gametime(absolute=True)
+        return [
+            (event_id,)
+            + self.events[event_id]
+            + (max(0, (self.deadlines[event_id] - now) / TIMEFACTOR),)
+            for event_id in sorted(self.events, key=self.deadlines.get)
+        ]
+
+    def recalculate(self):
+        """
+        Recalculate the next in-game time of all events, after the in-game
+        clock was changed.
+
+        """
+        if not self.loaded:
+            return
+        now = gametime(absolute=True)
+        self.deadlines, self.queue = {}, []
+        for event_id, event in self.events.items():
+            self._push(event_id, self._next_gametime(event[3], now))
+        self.save()
+        self._arm()
+
+    def _next_gametime(self, units, after):
+        """
+        Get the next absolute gametime matching units, after a given gametime.
+
+        """
+        current = datetime.fromtimestamp(after)
+        return after + (_next_game_datetime(current, **units) - current).total_seconds()
+
+    def _push(self, event_id, deadline):
+        self.deadlines[event_id] = deadline
+        heapq.heappush(self.queue, (deadline, event_id))
+
+    def _arm(self):
+        """
+        Set the reactor timer for the earliest event.
+
+        """
+        queue = self.queue
+        # drop queue entries of removed or rescheduled events
+        while queue and self.deadlines.get(queue[0][1]) != queue[0][0]:
+            heapq.heappop(queue)
+        if self.call and self.call.active():
+            self.call.cancel()
+        self.call = None
+        if not queue or (self.clock is reactor and not reactor.running):
+            return
+        delay = max(0, (queue[0][0] - gametime(absolute=True)) / TIMEFACTOR)
+        self.call = self.clock.callLater(delay, self._fire)
+
+    def _fire(self):
+        """
+        Call all events that are due.
+
+        """
+        self.call = None
+        now = gametime(absolute=True)
+        changed = False
+        queue = self.queue
+        # allow for float rounding in the timer delay
+        while queue and queue[0][0] <= now + 0.001 * TIMEFACTOR:
+            deadline, event_id = heapq.heappop(queue)
+            if self.deadlines.get(event_id) != deadline:
+                continue
+            path, args, kwargs, units, repeat = self.events[event_id]
+            if repeat:
+                # step past the deadline, so float rounding can't match it again
+                self._push(event_id, self._next_gametime(units, max(deadline, now) + 0.5))
+            else:
+                del self.events[event_id]
+                del self.deadlines[event_id]
+                changed = True
+            try:
+                object_from_module(path)(*args, **kwargs)
+            except Exception:
+                logger.log_trace("Error in gametime event %s (%s)." % (event_id, path))
+        if changed:
+            self.save()
+        self._arm()
+
+
+CALENDAR = GameTimeCalendar()
+
+
+def schedule_event(
+    callback,
+    repeat=False,
+    sec=None,
+    min=None,
+    hour=None,
+    day=None,
+    month=None,
+    year=None,
+    args=None,
+    kwargs=None,
+):
+    """
+    Call a function at a given in-game time. Unlike `schedule`, this does
+    not create a Script, but adds the event to the global `CALENDAR`.
+
+    Args:
+        callback (callable or str): A module-level function, or the
+            python-path to one.
+        repeat (bool, optional): Call it every time the in-game time matches.
+        sec (int or None): Number of absolute game seconds at which to run repeat.
+        min (int or None): Number of absolute minutes.
+        hour (int or None): Number of absolute hours.
+        day (int or None): Number of absolute days.
+        month (int or None): Number of absolute months.
+        year (int or None): Number of absolute years.
+        args (tuple, optional): Positional arguments for `callback`. These
+            must be possible to pickle.
+        kwargs (dict, optional): Keyword arguments for `callback`.
+
+    Returns:
+        event_id (int): Use with `cancel_event`.
+
+    Examples:
+        schedule_event("world.weather.change", repeat=True, min=0, sec=0)  # every hour
+        schedule_event(open_shop, repeat=True, hour=8, min=0, sec=0, args=("bakery",))
+
+    """
+    return CALENDAR.add(
+        callback,
+        repeat=repeat,
+        args=args,
+        kwargs=kwargs,
+        sec=sec,
+        min=min,
+        hour=hour,
+        day=day,
+        month=month,
+        year=year,
+    )
+
+
+def cancel_event(event_id):
+    """
+    Cancel an event added with `schedule_event`.
+
+    Args:
+        event_id (int): The id returned by `schedule_event`.
+
+    Returns:
+        cancelled (bool): If the event was found.
+
+    """
+    return CALENDAR.remove(event_id)
+
+
 def reset_gametime():
     """
     Resets the game time to make it start from the current time. Note that
@@ -266,3 +592,4 @@ def reset_gametime():
     global GAME_TIME_OFFSET
     GAME_TIME_OFFSET = runtime()
     ServerConfig.objects.conf("gametime_offset", GAME_TIME_OFFSET)
+    CALENDAR.recalculate()
@@ -85,6 +85,13 @@ class SharedMemoryModelBase(ModelBase):
             # we store __instance_cache__ only on the dbmodel base
             dbmodel.__instance_cache__ = {}
         super()._prepare()
+        # the pk and its index in the class fields, for _get_cache_key to use for every instance
+        # (composite keys are not supported; use the first one)
+        if hasattr(cls._meta, "pks"):
+            pk = cls._meta.pks[0]
+        else:
+            pk = cls._meta.pk
+        cls._cache_key_pk = (pk, cls._meta.fields.index(pk))
 
     def __new__(cls, name, bases, attrs):
         """
@@ -261,13 +268,7 @@ class SharedMemoryModel(Model, metaclass=SharedMemoryModelBase):
 
         """
         result = None
-        # Quick hack for my composites work for now.
-        if hasattr(cls._meta, "pks"):
-            pk = cls._meta.pks[0]
-        else:
-            pk = cls._meta.pk
-        # get the index of the pk in the class fields. this should be calculated *once*, but isn't atm
-        pk_position = cls._meta.fields.index(pk)
+        pk, pk_position = cls._cache_key_pk
         if len(args) > pk_position:
             # if it's in the args, we can get it easily by index
             result = args[pk_position]
@@ -5,7 +5,7 @@ These are thin wrappers on top of Twisted's logging facilities; logs
 are all directed either to stdout (if Evennia is running in
 interactive mode) or to $GAME_DIR/server/logs.
 
-The log_file() function uses its own threading system to log to
+The log_file() function uses its own writer thread to log to
 arbitrary files in $GAME_DIR/server/logs.
 
 Note: All logging functions have two aliases, log_type() and
@@ -15,8 +15,14 @@ log_typemsg(). This is for historical, back-compatible reasons.
 
 
 import os
+import re
 import time
 import glob
+import atexit
+import bisect
+import struct
+import threading
+from collections import deque
 from datetime import datetime
 from traceback import format_exc
 from twisted.python import log, logfile
@@ -369,7 +375,7 @@ class EvenniaLogFile(logfile.LogFile):
         lines = tail_log_file(self.path, 0, self.num_lines_to_append)
         logfile.LogFile.rotate(self)
         for line in lines:
-            self.write(line)
+            self.write(line.encode("utf-8"))
 
     def seek(self, *args, **kwargs):
         """
@@ -395,55 +401,436 @@ class EvenniaLogFile(logfile.LogFile):
         return [line.decode("utf-8") for line in self._file.readlines(*args, **kwargs)]
 
 
-_LOG_FILE_HANDLES = {}  # holds open log handles
-_LOG_FILE_HANDLE_COUNTS = {}
+# the writer reopens a log file after writing to it this many times
 _LOG_FILE_HANDLE_RESET = 500
+# max lines waiting to be written, per file; more are dropped
+_LOG_FILE_QUEUE_SIZE = 10000
+# the writer writes when this many lines are waiting, or after this many seconds
+_LOG_FILE_BATCH_SIZE = 200
+_LOG_FILE_BATCH_INTERVAL = 0.5
 
 
-def _open_log_file(filename):
+def _get_log_path(filename):
     """
-    Helper to open the log file (always in the log dir) and cache its
-    handle.  Will create a new file in the log dir if one didn't
-    exist.
-
-    To avoid keeping the filehandle open indefinitely we reset it every
-    _LOG_FILE_HANDLE_RESET accesses. This may help resolve issues for very
-    long uptimes and heavy log use.
+    Get the full path to a file in the log dir.
 
     """
     # we delay import of settings to keep logger module as free
     # from django as possible.
-    global _LOG_FILE_HANDLES, _LOG_FILE_HANDLE_COUNTS, _LOGDIR, _LOG_ROTATE_SIZE
+    global _LOGDIR, _LOG_ROTATE_SIZE
     if not _LOGDIR:
         from django.conf import settings
 
         _LOGDIR = settings.LOG_DIR
         _LOG_ROTATE_SIZE = settings.CHANNEL_LOG_ROTATE_SIZE
+    return os.path.abspath(os.path.join(_LOGDIR, filename))
 
-    filename = os.path.join(_LOGDIR, filename)
-    if filename in _LOG_FILE_HANDLES:
-        _LOG_FILE_HANDLE_COUNTS[filename] += 1
-        if _LOG_FILE_HANDLE_COUNTS[filename] > _LOG_FILE_HANDLE_RESET:
-            # close/refresh handle
-            _LOG_FILE_HANDLES[filename].close()
-            del _LOG_FILE_HANDLES[filename]
-        else:
-            # return cached handle
-            return _LOG_FILE_HANDLES[filename]
-    try:
-        filehandle = EvenniaLogFile.fromFullPath(filename, rotateLength=_LOG_ROTATE_SIZE)
-        # filehandle = open(filename, "a+")  # append mode + reading
-        _LOG_FILE_HANDLES[filename] = filehandle
-        _LOG_FILE_HANDLE_COUNTS[filename] = 0
-        return filehandle
-    except IOError:
-        log_trace()
-    return None
+
+# start of an entry written by log_file: a line break followed by the timestamp
+_RE_LOG_ENTRY_START = re.compile(rb"(?:^|\n)(?=\d\d-\d\d-\d\d \d\d:\d\d:\d\d\S* \[-\] )")
+
+
+class LogFileIndex(object):
+    """
+    A sidecar index (`<logfile>.idx`) holding the timestamp and byte offset
+    of every entry in a log file written by `log_file`. This allows any
+    window of entries to be read with one seek and one read, and entries
+    to be looked up by time.
+
+    The index is rebuilt from the log file if it's missing or doesn't
+    match the file, such as for logs written by older Evennia versions.
+
+    """
+
+    record = struct.Struct("<dQ")
+
+    def __init__(self, logpath):
+        """
+        Args:
+            logpath (str): Full path to the log file.
+
+        """
+        self.logpath = logpath
+        self.path = logpath + ".idx"
+        self._file = open(self.path, "a+b")
+        self._file.seek(0, os.SEEK_END)
+        self.count = self._file.tell() // self.record.size
+        if not self.is_valid():
+            self.rebuild()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, inum):
+        """
+        Get the timestamp of an entry; this allows bisecting the index by time.
+
+        """
+        return self.read(inum, inum + 1)[0][0]
+
+    def close(self):
+        self._file.close()
+
+    def read(self, start, end):
+        """
+        Read a range of index records.
+
+        Args:
+            start (int): First entry number.
+            end (int): Entry number after the last one to read.
+
+        Returns:
+            records (list): Tuples `(timestamp, offset)`.
+
+        """
+        size = self.record.size
+        self._file.seek(start * size)
+        data = self._file.read((end - start) * size)
+        return [self.record.unpack_from(data, ipos) for ipos in range(0, len(data), size)]
+
+    def append(self, records):
+        """
+        Add new entries to the index.
+
+        Args:
+            records (list): Tuples `(timestamp, offset)`.
+
+        """
+        self._file.write(b"".join(self.record.pack(*record) for record in records))
+        self._file.flush()
+        self.count += len(records)
+
+    def is_valid(self):
+        """
+        Check that the index covers all entries of the log file.
+
+        Returns:
+            valid (bool): If the index can be used.
+
+        """
+        try:
+            logsize = os.path.getsize(self.logpath)
+        except OSError:
+            logsize = 0
+        if not self.count:
+            return not logsize
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell() % self.record.size:
+            # partially written record
+            return False
+        offset = self.read(self.count - 1, self.count)[0][1]
+        if offset >= logsize:
+            return False
+        with open(self.logpath, "rb") as fil:
+            fil.seek(offset)
+            data = fil.read()
+        # the last indexed entry must start there and be the last in the file
+        return bool(_RE_LOG_ENTRY_START.match(data)) and not _RE_LOG_ENTRY_START.search(data, 1)
+
+    def rebuild(self):
+        """
+        Recreate the index by scanning the log file.
+
+        """
+        try:
+            with open(self.logpath, "rb") as fil:
+                data = fil.read()
+        except OSError:
+            data = b""
+        records = []
+        for match in _RE_LOG_ENTRY_START.finditer(data):
+            offset = match.start()
+            stamp = data[offset : offset + 18].strip()[:17]
+            try:
+                timestamp = time.mktime(time.strptime(stamp.decode(), "%y-%m-%d %H:%M:%S"))
+            except ValueError:
+                timestamp = 0.0
+            records.append((timestamp, offset))
+        if data and not records or records and records[0][1] > 0:
+            # text before the first entry; index it as an entry of its own
+            records.insert(0, (records[0][0] if records else 0.0, 0))
+        self._file.truncate(0)
+        self.count = 0
+        self.append(records)
+
+
+class LogFileWriter(object):
+    """
+    Writes lines to log files from a dedicated thread. Lines are queued in
+    memory, per file, and written in batches with one flush per file and
+    batch. The writer keeps its own file handles, so rotation happens in
+    the writer thread too. An index of all entries is kept alongside each
+    file, see `LogFileIndex`.
+
+    """
+
+    def __init__(
+        self,
+        queue_size=_LOG_FILE_QUEUE_SIZE,
+        batch_size=_LOG_FILE_BATCH_SIZE,
+        batch_interval=_LOG_FILE_BATCH_INTERVAL,
+    ):
+        """
+        Args:
+            queue_size (int, optional): Max lines waiting per file. Lines
+                logged to a full queue are dropped.
+            batch_size (int, optional): Write as soon as this many lines
+                are waiting in total.
+            batch_interval (float, optional): Otherwise, write after this
+                many seconds.
+
+        """
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.queues = {}
+        self.handles = {}
+        self.indexes = {}
+        self.handle_counts = {}
+        self.nqueued = 0
+        self.ndropped = 0
+        self.nwritten = 0
+        self.running = False
+        self.writing = False
+        self.thread = None
+        self.condition = threading.Condition()
+        # held while writing to files
+        self.write_lock = threading.RLock()
+
+    def start(self):
+        """
+        Start the writer thread. This is done automatically when the first
+        line is queued.
+
+        """
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name="LogFileWriter", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """
+        Stop the writer thread after writing everything queued.
+
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+        self.flush()
+
+    def queue(self, filename, line, timestamp=None):
+        """
+        Queue a line for writing.
+
+        Args:
+            filename (str): Full path to the log file.
+            line (str): The line to write, starting with a line break.
+            timestamp (float, optional): Time of the entry, for the index.
+                Defaults to now.
+
+        """
+        with self.condition:
+            queue = self.queues.get(filename)
+            if queue is None:
+                queue = self.queues[filename] = deque()
+            if len(queue) >= self.queue_size:
+                self.ndropped += 1
+                return
+            queue.append((timestamp or time.time(), line))
+            self.nqueued += 1
+            if self.nqueued >= self.batch_size:
+                self.condition.notify()
+        if not self.running:
+            self.start()
+
+    def get_stats(self):
+        """
+        Get writer statistics.
+
+        Returns:
+            stats (dict): With keys `queued` (lines waiting to be written),
+                `dropped` (lines lost to full queues) and `written`.
+
+        """
+        return {"queued": self.nqueued, "dropped": self.ndropped, "written": self.nwritten}
+
+    def _get_handle(self, filename):
+        """
+        Get the writer's own handle to a file, and its index, reopening
+        them now and then.
+
+        """
+        count = self.handle_counts.get(filename, 0) + 1
+        if count > _LOG_FILE_HANDLE_RESET and filename in self.handles:
+            self.handles.pop(filename).close()
+            self.indexes.pop(filename).close()
+        if filename not in self.handles:
+            self.handles[filename] = EvenniaLogFile.fromFullPath(
+                filename, rotateLength=_LOG_ROTATE_SIZE
+            )
+            self.indexes[filename] = LogFileIndex(filename)
+            count = 0
+        self.handle_counts[filename] = count
+        return self.handles[filename], self.indexes[filename]
+
+    def _take(self, filename=None):
+        """
+        Remove and return the queued lines, for one or all files.
+
+        """
+        with self.condition:
+            if filename:
+                queue = self.queues.pop(filename, None)
+                batches = {filename: queue} if queue else {}
+            else:
+                batches, self.queues = self.queues, {}
+            self.nqueued -= sum(len(queue) for queue in batches.values())
+        return batches
+
+    def flush(self, filename=None):
+        """
+        Write queued lines right away, in the calling thread.
+
+        Args:
+            filename (str, optional): Full path to the only file to flush.
+
+        """
+        with self.write_lock:
+            if self.writing:
+                # called while writing (such as when rotating); we are already flushing
+                return
+            self._write(self._take(filename))
+
+    def _write(self, batches):
+        """
+        Write batches of lines, one flush per file. Must be called with
+        the write_lock held.
+
+        """
+        self.writing = True
+        try:
+            self._write_batches(batches)
+        finally:
+            self.writing = False
+
+    def _write_batches(self, batches):
+        for filename, entries in batches.items():
+            try:
+                filehandle, index = self._get_handle(filename)
+                if filehandle.shouldRotate():
+                    filehandle.flush()
+                    filehandle.rotate()
+                    index.rebuild()
+                offset, records, lines = filehandle.size, [], []
+                for timestamp, line in entries:
+                    line = line.encode("utf-8")
+                    records.append((timestamp, offset))
+                    lines.append(line)
+                    offset += len(line)
+                filehandle.write(b"".join(lines))
+                filehandle.flush()
+                # the index is only updated after the entries are on disk
+                index.append(records)
+                self.nwritten += len(entries)
+            except Exception:
+                log_trace()
+
+    def read_entries(self, filename, offset=0, nlines=None, start_time=None, end_time=None):
+        """
+        Read entries from a log file, using its index. Anything queued for
+        the file is written first.
+
+        Args:
+            filename (str): Full path to the log file.
+            offset (int, optional): Skip this many of the latest entries.
+            nlines (int, optional): Max number of entries to get, counting
+                backwards from `offset`. Default is to get all.
+            start_time (float, optional): Only get entries logged at or after
+                this time.
+            end_time (float, optional): Only get entries logged at or before
+                this time.
+
+        Returns:
+            entries (list): Tuples `(timestamp, text)`, oldest first. The text
+                has no leading line break.
+
+        """
+        with self.write_lock:
+            self.flush(filename)
+            if not os.path.exists(filename):
+                return []
+            index = self.indexes.get(filename) or self._get_handle(filename)[1]
+            start, end = 0, len(index)
+            if start_time is not None:
+                start = bisect.bisect_left(index, start_time)
+            if end_time is not None:
+                end = bisect.bisect_right(index, end_time)
+            end = max(start, end - offset)
+            if nlines is not None:
+                start = max(start, end - nlines)
+            if start >= end:
+                return []
+            # include the record after the window, to know where it ends
+            records = index.read(start, end + 1)
+            with open(filename, "rb") as fil:
+                fil.seek(records[0][1])
+                if len(records) > end - start:
+                    data = fil.read(records[-1][1] - records[0][1])
+                else:
+                    data = fil.read()
+        base = records[0][1]
+        bounds = [rec[1] - base for rec in records[: end - start]] + [len(data)]
+        return [
+            (
+                records[inum][0],
+                data[bounds[inum] : bounds[inum + 1]].decode("utf-8", "replace").lstrip("\n"),
+            )
+            for inum in range(end - start)
+        ]
+
+    def _run(self):
+        """
+        The writer thread's main loop.
+
+        """
+        while True:
+            with self.condition:
+                if self.running and self.nqueued < self.batch_size:
+                    self.condition.wait(self.batch_interval)
+                running = self.running
+            with self.write_lock:
+                self._write(self._take())
+            if not running:
+                break
+
+
+_LOG_FILE_WRITER = LogFileWriter()
+# write out everything still queued when the process exits
+atexit.register(_LOG_FILE_WRITER.stop)
+
+
+def get_log_file_stats():
+    """
+    Get statistics from the writer thread used by `log_file`.
+
+    Returns:
+        stats (dict): With keys `queued` (lines waiting to be written),
+            `dropped` (lines lost because a file's queue was full) and
+            `written`.
+
+    """
+    return _LOG_FILE_WRITER.get_stats()
 
 
 def log_file(msg, filename="game.log"):
     """
-    Arbitrary file logger using threads.
+    Arbitrary file logger. The line is queued and written to file by
+    a separate writer thread shortly after.
 
     Args:
         msg (str): String to append to logfile.
@@ -452,24 +839,10 @@ def log_file(msg, filename="game.log"):
             on new lines following datetime info.
 
     """
-
-    def callback(filehandle, msg):
-        """Writing to file and flushing result"""
-        msg = "\n%s [-] %s" % (timeformat(), msg.strip())
-        filehandle.write(msg)
-        # since we don't close the handle, we need to flush
-        # manually or log file won't be written to until the
-        # write buffer is full.
-        filehandle.flush()
-
-    def errback(failure):
-        """Catching errors to normal log"""
-        log_trace()
-
     # save to server/logs/ directory
-    filehandle = _open_log_file(filename)
-    if filehandle:
-        deferToThread(callback, filehandle, msg).addErrback(errback)
+    now = time.time()
+    msg = "\n%s [-] %s" % (timeformat(now), msg.strip())
+    _LOG_FILE_WRITER.queue(_get_log_path(filename), msg, timestamp=now)
 
 
 def tail_log_file(filename, offset, nlines, callback=None):
@@ -492,43 +865,66 @@ def tail_log_file(filename, offset, nlines, callback=None):
             otherwise it will be a list with The nline entries from the end of the file, or
             all if the file is shorter than nlines.
 
+    Notes:
+        A 'line' here is one entry logged with `log_file`, which may itself
+        span several lines. All but the last line of the file end with a
+        line break.
+
     """
 
-    def seek_file(filehandle, offset, nlines, callback):
-        """step backwards in chunks and stop only when we have enough lines"""
-        lines_found = []
-        buffer_size = 4098
-        block_count = -1
-        while len(lines_found) < (offset + nlines):
-            try:
-                # scan backwards in file, starting from the end
-                filehandle.seek(block_count * buffer_size, os.SEEK_END)
-            except IOError:
-                # file too small for this seek, take what we've got
-                filehandle.seek(0)
-                lines_found = filehandle.readlines()
-                break
-            lines_found = filehandle.readlines()
-            block_count -= 1
-        # return the right number of lines
-        lines_found = lines_found[-nlines - offset : -offset if offset else None]
-        if callback:
-            callback(lines_found)
-            return None
-        else:
-            return lines_found
+    def read_tail(path, offset, nlines):
+        lines = [text + "\n" for _, text in _LOG_FILE_WRITER.read_entries(path, offset, nlines)]
+        if lines and not offset:
+            # the latest entry has no line break yet
+            lines[-1] = lines[-1][:-1]
+        return lines
 
     def errback(failure):
         """Catching errors to normal log"""
         log_trace()
 
-    filehandle = _open_log_file(filename)
-    if filehandle:
-        if callback:
-            return deferToThread(seek_file, filehandle, offset, nlines, callback).addErrback(
-                errback
-            )
-        else:
-            return seek_file(filehandle, offset, nlines, callback)
+    path = _get_log_path(filename)
+    if callback:
+        return (
+            deferToThread(read_tail, path, offset, nlines).addCallback(callback).addErrback(errback)
+        )
+    else:
+        return read_tail(path, offset, nlines)
+
+
+def get_log_file_entries(filename, start_time=None, end_time=None, callback=None):
+    """
+    Get the entries logged to a log file within a time range.
+
+    Args:
+        filename (str): The name of the log file, presumed to be in
+            the Evennia log dir.
+        start_time (float, optional): Only get entries logged at or after this
+            time (in seconds since the epoch, like `time.time()`).
+        end_time (float, optional): Only get entries logged at or before this time.
+        callback (callable, optional): If given, the file is read in a thread
+            and this is called with the result. Otherwise the file is read directly.
+
+    Returns:
+        entries (deferred or list): A list of tuples `(timestamp, text)`, oldest
+            first, or a deferred if `callback` is given.
+
+    Notes:
+        Only the current log file is searched, not earlier, rotated ones.
+
+    """
+
+    def errback(failure):
+        """Catching errors to normal log"""
+        log_trace()
+
+    path = _get_log_path(filename)
+    kwargs = {"start_time": start_time, "end_time": end_time}
+    if callback:
+        return (
+            deferToThread(_LOG_FILE_WRITER.read_entries, path, **kwargs)
+            .addCallback(callback)
+            .addErrback(errback)
+        )
     else:
-        return None
+        return _LOG_FILE_WRITER.read_entries(path, **kwargs)
@@ -27,6 +27,14 @@ Pickle field implementation for Django.
 
 Modified for Evennia by Griatch and the Evennia community.
 
+A field created with `binary=True` stores its values in a binary column,
+as a version byte followed by the pickle, which is zlib-compressed if it's
+at least `settings.ATTRIBUTE_COMPRESS_THRESHOLD` bytes. Other fields store
+the pickle base64-encoded in a text column (the legacy format). A binary
+field can still read values in the legacy format, so existing values can be
+converted bit by bit with `convert_values` (this is what the
+`evennia convert_attributes` command does).
+
 """
 from ast import literal_eval
 from datetime import datetime
@@ -36,8 +44,9 @@ from base64 import b64encode, b64decode
 from zlib import compress, decompress
 
 # import six # this is actually a pypy component, not in default syslib
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, connection, transaction
 
 from django.forms.fields import CharField
 from django.forms.widgets import Textarea
@@ -49,6 +58,13 @@ from evennia.utils.dbserialize import pack_dbobj
 
 DEFAULT_PROTOCOL = 4
 
+_COMPRESS_THRESHOLD = settings.ATTRIBUTE_COMPRESS_THRESHOLD
+
+# first byte of values in the binary format. Values in the legacy format are
+# base64, which never contains these bytes.
+_FORMAT_PICKLE = b"\x01"
+_FORMAT_ZLIB = b"\x02"
+
 
 class PickledObject(str):
     """
@@ -64,6 +80,14 @@ class PickledObject(str):
     """
 
 
+class PickledBytes(bytes):
+    """
+    The binary counterpart of `PickledObject`: an already encoded value
+    for a binary field.
+
+    """
+
+
 class _ObjectWrapper(object):
     """
     A class used to wrap object that have properties that may clash with the
@@ -86,7 +110,7 @@ def wrap_conflictual_object(obj):
     return obj
 
 
-def dbsafe_encode(value, compress_object=False, pickle_protocol=DEFAULT_PROTOCOL):
+def _copy_for_pickling(value):
     # We use deepcopy() here to avoid a problem with cPickle, where dumps
     # can generate different character streams for same lookup value if
     # they are referenced differently.
@@ -94,13 +118,15 @@ def dbsafe_encode(value, compress_object=False, pickle_protocol=DEFAULT_PROTOCOL
     # simple string matches, thus the character streams must be the same
     # for the lookups to work properly. See tests.py for more information.
     try:
-        value = deepcopy(value)
+        return deepcopy(value)
     except CopyError:
         # this can happen on a manager query where the search query string is a
         # database model.
-        value = pack_dbobj(value)
+        return pack_dbobj(value)
 
-    value = dumps(value, protocol=pickle_protocol)
+
+def dbsafe_encode(value, compress_object=False, pickle_protocol=DEFAULT_PROTOCOL):
+    value = dumps(_copy_for_pickling(value), protocol=pickle_protocol)
 
     if compress_object:
         value = compress(value)
@@ -116,6 +142,132 @@ def dbsafe_decode(value, compress_object=False):
     return loads(value)
 
 
+def dbsafe_encode_binary(
+    value, pickle_protocol=DEFAULT_PROTOCOL, compress_threshold=_COMPRESS_THRESHOLD
+):
+    """
+    Encode a value in the binary format.
+
+    Args:
+        value (any): The value to store.
+        pickle_protocol (int, optional): The pickle protocol to use.
+        compress_threshold (int, optional): Compress pickles of at least
+            this many bytes, if that makes them smaller. `None` to never
+            compress.
+
+    Returns:
+        encoded (PickledBytes): The encoded value.
+
+    """
+    value = dumps(_copy_for_pickling(value), protocol=pickle_protocol)
+    if compress_threshold is not None and len(value) >= compress_threshold:
+        compressed = compress(value)
+        if len(compressed) < len(value):
+            return PickledBytes(_FORMAT_ZLIB + compressed)
+    return PickledBytes(_FORMAT_PICKLE + value)
+
+
+def dbsafe_decode_binary(value, compress_object=False):
+    """
+    Decode a value stored in a binary field, in either format.
+
+    Args:
+        value (bytes, memoryview or str): The stored value. Values in the
+            legacy format may be returned as str by some databases.
+        compress_object (bool, optional): If legacy values are compressed.
+
+    Returns:
+        value (any): The decoded value.
+
+    """
+    if isinstance(value, str):
+        return dbsafe_decode(value, compress_object)
+    value = memoryview(value)
+    header = value[:1]
+    if header == _FORMAT_PICKLE:
+        return loads(value[1:])
+    if header == _FORMAT_ZLIB:
+        return loads(decompress(value[1:]))
+    return dbsafe_decode(value.tobytes().decode(), compress_object)
+
+
+def is_legacy_value(value):
+    """
+    Check if a value stored in a binary field is in the legacy format.
+
+    Args:
+        value (bytes, memoryview, str or None): The stored value.
+
+    Returns:
+        legacy (bool): If the value is in the legacy format.
+
+    """
+    if value is None:
+        return False
+    if isinstance(value, str):
+        return True
+    return memoryview(value)[:1] not in (_FORMAT_PICKLE, _FORMAT_ZLIB)
+
+
+def convert_values(model, fieldname="db_value", batch_size=1000, legacy_only=True):
+    """
+    Re-encode the values stored in a binary `PickledObjectField`, converting
+    values in the legacy format to the binary format. Rows are handled in
+    batches of one transaction each, and a row is only updated if it was not
+    changed since it was read, so this can run while the server is up.
+
+    Args:
+        model (Model): The model to convert.
+        fieldname (str, optional): Name of a `PickledObjectField` with
+            `binary=True` on the model.
+        batch_size (int, optional): Number of rows to handle per batch.
+        legacy_only (bool, optional): Only convert values in the legacy
+            format. If False, also re-encode binary values whose encoding
+            has changed (such as after changing the compression threshold).
+
+    Yields:
+        progress (tuple): `(nrows, nconverted)`, the number of rows checked
+            and converted so far, after every batch.
+
+    """
+    field = model._meta.get_field(fieldname)
+    qname = connection.ops.quote_name
+    table, column, pk = (
+        qname(model._meta.db_table),
+        qname(field.column),
+        qname(model._meta.pk.column),
+    )
+    select = "SELECT %s, %s FROM %s WHERE %s > %%s ORDER BY %s LIMIT %%s" % (
+        pk,
+        column,
+        table,
+        pk,
+        pk,
+    )
+    update = "UPDATE %s SET %s = %%s WHERE %s = %%s AND %s = %%s" % (table, column, pk, column)
+    last_id, nrows, nconverted = 0, 0, 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(select, [last_id, batch_size])
+            rows = cursor.fetchall()
+            for row_id, stored in rows:
+                if stored is None or (legacy_only and not is_legacy_value(stored)):
+                    continue
+                if not isinstance(stored, str):
+                    stored = memoryview(stored).tobytes()
+                value = dbsafe_decode_binary(stored, field.compress)
+                encoded = dbsafe_encode_binary(value, field.protocol)
+                if encoded == stored:
+                    continue
+                cursor.execute(update, [connection.Database.Binary(encoded), row_id, stored])
+                nconverted += cursor.rowcount
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        nrows += len(rows)
+        yield nrows, nconverted
+
+
 class PickledWidget(Textarea):
     """
     This is responsible for outputting HTML representing a given field.
@@ -203,7 +355,9 @@ class PickledObjectField(models.Field):
     """
     A field that will accept *any* python object and store it in the
     database. PickledObjectField will optionally compress its values if
-    declared with the keyword argument ``compress=True``.
+    declared with the keyword argument ``compress=True``. With
+    ``binary=True``, values are stored in a binary column instead, and
+    compressed if they are large (see the module docstring).
 
     Does not actually encode and compress ``None`` objects (although you
     can still do lookups using None). This way, it is still possible to
@@ -213,8 +367,15 @@ class PickledObjectField(models.Field):
     def __init__(self, *args, **kwargs):
         self.compress = kwargs.pop("compress", False)
         self.protocol = kwargs.pop("protocol", DEFAULT_PROTOCOL)
+        self.binary = kwargs.pop("binary", False)
         super().__init__(*args, **kwargs)
 
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.binary:
+            kwargs["binary"] = True
+        return name, path, args, kwargs
+
     def get_default(self):
         """
         Returns the default value for this field.
@@ -246,7 +407,10 @@ class PickledObjectField(models.Field):
         """
         if value is not None:
             try:
-                value = dbsafe_decode(value, self.compress)
+                if self.binary:
+                    value = dbsafe_decode_binary(value, self.compress)
+                else:
+                    value = dbsafe_decode(value, self.compress)
             except Exception:
                 # If the value is a definite pickle; and an error is raised in
                 # de-pickling it should be allowed to propogate.
@@ -266,7 +430,8 @@ class PickledObjectField(models.Field):
 
     def get_db_prep_value(self, value, connection=None, prepared=False):
         """
-        Pickle and b64encode the object, optionally compressing it.
+        Pickle and b64encode the object, optionally compressing it. For a
+        binary field, encode it in the binary format instead.
 
         The pickling protocol is specified explicitly (by default 2),
         rather than as -1 or HIGHEST_PROTOCOL, because we don't want the
@@ -275,6 +440,13 @@ class PickledObjectField(models.Field):
         a different string.
 
         """
+        if self.binary:
+            if value is not None:
+                if not isinstance(value, PickledBytes):
+                    value = dbsafe_encode_binary(value, self.protocol)
+                if connection is not None:
+                    value = connection.Database.Binary(value)
+            return value
         if value is not None and not isinstance(value, PickledObject):
             # We call force_str here explicitly, so that the encoded string
             # isn't rejected by the postgresql backend. Alternatively,
@@ -285,12 +457,30 @@ class PickledObjectField(models.Field):
             value = force_str(dbsafe_encode(value, self.compress, self.protocol))
         return value
 
+    def get_lookup_values(self, value):
+        """
+        Encode a value for finding it with an ``in`` lookup. A binary
+        field may still hold values in the legacy format, so the value is
+        encoded in both formats (see `convert_values`).
+
+        Args:
+            value (any): The value to look for.
+
+        Returns:
+            values (list): The encoded values.
+
+        """
+        legacy = dbsafe_encode(value, self.compress, self.protocol)
+        if not self.binary:
+            return [legacy]
+        return [dbsafe_encode_binary(value, self.protocol), PickledBytes(legacy.encode())]
+
     def value_to_string(self, obj):
         value = self._get_val_from_obj(obj)
         return self.get_db_prep_value(value)
 
     def get_internal_type(self):
-        return "TextField"
+        return "BinaryField" if self.binary else "TextField"
 
     def get_db_prep_lookup(self, lookup_type, value, connection=None, prepared=False):
         if lookup_type not in ["exact", "in", "isnull"]:
@@ -8,6 +8,7 @@ from unittest.mock import Mock
 
 from django.conf import settings
 from django.test import TestCase
+from twisted.internet.task import Clock
 
 from evennia.utils import gametime
 
@@ -96,3 +97,86 @@ class TestGametime(TestCase):
         self.assertIsInstance(script, gametime.TimeScript)
         self.assertAlmostEqual(script.interval, 12)
         self.assertEqual(script.repeats, 0)
+
+
+_CALLS = []
+
+
+def _calendar_callback(*args, **kwargs):
+    _CALLS.append((args, kwargs))
+
+
+class TestGameTimeCalendar(TestCase):
+    def setUp(self):
+        self.time = time.time
+        self._SERVER_EPOCH = gametime._SERVER_EPOCH
+        time.time = Mock(return_value=1555595378.0)
+        gametime._SERVER_EPOCH = None
+        gametime.SERVER_RUNTIME = 600.0
+        gametime.SERVER_RUNTIME_LAST_UPDATED = time.time() - 30
+        gametime.TIMEFACTOR = 5.0
+        self.clock = Clock()
+        self.calendar = gametime.GameTimeCalendar(clock=self.clock)
+        del _CALLS[:]
+
+    def tearDown(self):
+        time.time = self.time
+        gametime._SERVER_EPOCH = self._SERVER_EPOCH
+        gametime.SERVER_RUNTIME_LAST_UPDATED = 0.0
+        gametime.SERVER_RUNTIME = 0.0
+        gametime.TIMEFACTOR = settings.TIME_FACTOR
+
+    def _advance(self, seconds):
+        time.time.return_value += seconds
+        self.clock.advance(seconds)
+
+    def test_repeating_event(self):
+        # the game time is 14:31:38
+        self.calendar.add(_calendar_callback, repeat=True, args=(1,), min=32, sec=0)
+        self.assertAlmostEqual(self.calendar.get_events()[0][-1], 22 / 5.0)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        self._advance(4.4)
+        self.assertEqual(_CALLS, [((1,), {})])
+        # next in-game hour
+        self.assertAlmostEqual(self.calendar.get_events()[0][-1], 720)
+        self._advance(720)
+        self.assertEqual(len(_CALLS), 2)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+
+    def test_one_time_events(self):
+        path = "evennia.utils.tests.test_gametime._calendar_callback"
+        first = self.calendar.add(path, kwargs={"key": "first"}, hour=15, min=0, sec=0)
+        second = self.calendar.add(path, kwargs={"key": "second"}, day=19)
+        self.assertEqual([event[0] for event in self.calendar.get_events()], [first, second])
+        self.assertTrue(self.calendar.remove(first))
+        self.assertFalse(self.calendar.remove(first))
+        self._advance(17280)
+        self.assertEqual(_CALLS, [((), {"key": "second"})])
+        self.assertEqual(self.calendar.get_events(), [])
+        self.assertFalse(self.clock.getDelayedCalls())
+
+    def test_load(self):
+        self.calendar.add(_calendar_callback, repeat=True, min=32, sec=0)
+        self.calendar.add(_calendar_callback, args=("once",), hour=15, min=0, sec=0)
+        # a reload with a changed time factor, after the one-time event was due
+        time.time.return_value += 3600
+        gametime.TIMEFACTOR = 10.0
+        calendar = gametime.GameTimeCalendar(clock=self.clock)
+        calendar.load()
+        events = calendar.get_events()
+        self.assertEqual(events[0][1:4], (__name__ + "._calendar_callback", ("once",), {}))
+        self.assertEqual(events[0][-1], 0)
+        self.clock.advance(0)
+        self.assertEqual(_CALLS, [(("once",), {})])
+        self.assertEqual(len(calendar.get_events()), 1)
+
+    def test_recalculate(self):
+        self.calendar.add(_calendar_callback, repeat=True, min=32, sec=0)
+        # the game clock is moved back 2 game-minutes
+        gametime.SERVER_RUNTIME -= 120 / 5.0
+        self.calendar.recalculate()
+        self.assertAlmostEqual(self.calendar.get_events()[0][-1], 142 / 5.0)
+
+    def test_bad_callback(self):
+        with self.assertRaises(ValueError):
+            self.calendar.add(lambda: None, min=5)
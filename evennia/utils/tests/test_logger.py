@@ -0,0 +1,121 @@
+"""Tests for the log file writer """
+
+import os
+import shutil
+import tempfile
+import mock
+from django.test import TestCase
+from evennia.utils import logger
+
+_T0 = 1600000000
+
+
+class TestLogFileWriter(TestCase):
+    def setUp(self):
+        self.logdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.logdir, "test.log")
+        self.writer = logger.LogFileWriter(queue_size=3, batch_size=100, batch_interval=60)
+
+    def tearDown(self):
+        self.writer.stop()
+        for handle in list(self.writer.handles.values()) + list(self.writer.indexes.values()):
+            handle.close()
+        shutil.rmtree(self.logdir)
+
+    def _read(self):
+        with open(self.path) as fil:
+            return fil.read()
+
+    def test_batched_write(self):
+        self.writer.queue(self.path, "\nline 1")
+        self.writer.queue(self.path, "\nline 2")
+        self.assertTrue(self.writer.running)
+        self.assertEqual(self.writer.get_stats(), {"queued": 2, "dropped": 0, "written": 0})
+        self.writer.flush(self.path)
+        self.assertEqual(self._read(), "\nline 1\nline 2")
+        self.assertEqual(self.writer.get_stats(), {"queued": 0, "dropped": 0, "written": 2})
+
+    def test_full_queue(self):
+        for iline in range(5):
+            self.writer.queue(self.path, "\nline %i" % iline)
+        self.assertEqual(self.writer.get_stats(), {"queued": 3, "dropped": 2, "written": 0})
+        # stopping drains the queue
+        self.writer.stop()
+        self.assertEqual(self._read(), "\nline 0\nline 1\nline 2")
+        self.assertIsNone(self.writer.thread)
+
+    def test_write_by_thread(self):
+        self.writer.batch_size = 2
+        self.writer.queue(self.path, "\nline 1")
+        self.writer.queue(self.path, "\nline 2")
+        # the second line reached the batch size and woke up the writer thread
+        for _ in range(100):
+            if self.writer.get_stats()["written"] == 2:
+                break
+            self.writer.thread.join(0.01)
+        self.assertEqual(self._read(), "\nline 1\nline 2")
+
+
+class TestLogFileIndex(TestCase):
+    def setUp(self):
+        self.logdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.logdir, "channel_test.log")
+        self.writer = logger.LogFileWriter(batch_interval=60)
+        for iline in range(10):
+            self.writer.queue(
+                self.path, "\n%s [-] msg %i" % (logger.timeformat(_T0 + iline), iline), _T0 + iline
+            )
+        self.writer.flush()
+
+    def tearDown(self):
+        self.writer.stop()
+        for handle in list(self.writer.handles.values()) + list(self.writer.indexes.values()):
+            handle.close()
+        shutil.rmtree(self.logdir)
+
+    def test_read_window(self):
+        entries = self.writer.read_entries(self.path, offset=2, nlines=3)
+        self.assertEqual([text[-5:] for _, text in entries], ["msg 5", "msg 6", "msg 7"])
+        self.assertEqual(entries[0][0], _T0 + 5)
+        self.assertEqual(len(self.writer.read_entries(self.path, offset=8, nlines=5)), 2)
+        self.assertEqual(self.writer.read_entries(self.path, offset=10, nlines=5), [])
+
+    def test_read_time_range(self):
+        entries = self.writer.read_entries(self.path, start_time=_T0 + 3, end_time=_T0 + 4.5)
+        self.assertEqual([timestamp for timestamp, _ in entries], [_T0 + 3, _T0 + 4])
+        entries = self.writer.read_entries(self.path, start_time=_T0 + 8)
+        self.assertEqual([text[-5:] for _, text in entries], ["msg 8", "msg 9"])
+
+    def test_rebuild(self):
+        self.writer.indexes.pop(self.path).close()
+        self.writer.handles.pop(self.path).close()
+        os.remove(self.path + ".idx")
+        entries = self.writer.read_entries(self.path, offset=0, nlines=2)
+        self.assertEqual([text[-5:] for _, text in entries], ["msg 8", "msg 9"])
+        self.assertEqual(len(self.writer.indexes[self.path]), 10)
+        # an entry written without updating the index is found
+        self.writer.indexes.pop(self.path).close()
+        self.writer.handles.pop(self.path).close()
+        with open(self.path, "a") as fil:
+            fil.write("\n%s [-] msg 10\nwith two lines" % logger.timeformat(_T0 + 10))
+        entries = self.writer.read_entries(self.path, offset=0, nlines=1)
+        self.assertEqual(entries[0][1][-21:], "msg 10\nwith two lines")
+
+    def test_tail_log_file(self):
+        with mock.patch.object(logger, "_LOG_FILE_WRITER", self.writer):
+            lines = logger.tail_log_file(self.path, 0, 2)
+            self.assertEqual([line[-6:] for line in lines], ["msg 8\n", " msg 9"])
+            entries = logger.get_log_file_entries(self.path, start_time=_T0 + 9)
+            self.assertEqual(len(entries), 1)
+
+    def test_rotate(self):
+        with mock.patch.object(logger, "_LOG_FILE_WRITER", self.writer), mock.patch.object(
+            logger, "_LOG_ROTATE_SIZE", 200
+        ), mock.patch.object(logger.EvenniaLogFile, "num_lines_to_append", 2):
+            self.writer.handles.pop(self.path).close()
+            self.writer.indexes.pop(self.path).close()
+            self.writer.queue(self.path, "\n%s [-] msg 10" % logger.timeformat(_T0 + 10), _T0 + 10)
+            self.writer.flush()
+        self.assertTrue(os.path.exists(self.path + ".1"))
+        entries = self.writer.read_entries(self.path)
+        self.assertEqual([text[-6:] for _, text in entries], [" msg 8", " msg 9", "msg 10"])
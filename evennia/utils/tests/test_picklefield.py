@@ -0,0 +1,78 @@
+"""
+Tests for the picklefield storage formats.
+"""
+
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from evennia.objects.models import ObjectDB
+from evennia.typeclasses.attributes import Attribute
+from evennia.utils import create, picklefield
+
+
+class TestPickleField(TestCase):
+    def setUp(self):
+        self.obj = create.create_object(key="Tester", nohome=True)
+
+    def _set_legacy(self, attr):
+        """Store an Attribute's value in the legacy format."""
+        legacy = picklefield.dbsafe_encode(attr.db_value)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE typeclasses_attribute SET db_value = %s WHERE id = %s",
+                [connection.Database.Binary(legacy.encode()), attr.id],
+            )
+
+    def _get_stored(self, attr):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT db_value FROM typeclasses_attribute WHERE id = %s", [attr.id])
+            return cursor.fetchone()[0]
+
+    def test_binary_format(self):
+        value = {"key": [1, 2.5, "three"], "nested": {"a": None}}
+        encoded = picklefield.dbsafe_encode_binary(value)
+        self.assertEqual(encoded[:1], b"\x01")
+        self.assertEqual(picklefield.dbsafe_decode_binary(encoded), value)
+        self.assertEqual(picklefield.dbsafe_decode_binary(memoryview(encoded)), value)
+        # large values are compressed
+        value = "The quick brown fox jumps over the lazy dog. " * 100
+        encoded = picklefield.dbsafe_encode_binary(value, compress_threshold=1024)
+        self.assertEqual(encoded[:1], b"\x02")
+        self.assertLess(len(encoded), 500)
+        self.assertEqual(picklefield.dbsafe_decode_binary(encoded), value)
+        # legacy values are read as text or bytes
+        legacy = picklefield.dbsafe_encode(value)
+        self.assertTrue(picklefield.is_legacy_value(legacy))
+        self.assertFalse(picklefield.is_legacy_value(encoded))
+        self.assertEqual(picklefield.dbsafe_decode_binary(legacy), value)
+        self.assertEqual(picklefield.dbsafe_decode_binary(legacy.encode()), value)
+
+    def test_legacy_values(self):
+        self.obj.db.stats = {"hp": 10}
+        self.obj.db.name = "Bob"
+        stats = self.obj.attributes.get("stats", return_obj=True)
+        name = self.obj.attributes.get("name", return_obj=True)
+        self.assertFalse(picklefield.is_legacy_value(self._get_stored(stats)))
+        self._set_legacy(stats)
+        self._set_legacy(name)
+        self.assertTrue(picklefield.is_legacy_value(self._get_stored(stats)))
+
+        self.assertEqual(
+            Attribute.objects.filter(id=stats.id).values_list("db_value")[0][0], {"hp": 10}
+        )
+        # searching by value finds both formats
+        self.obj.db.other_name = "Bob"
+        self.assertEqual(list(ObjectDB.objects.get_objs_with_attr_value("name", "Bob")), [self.obj])
+        self.assertEqual(list(ObjectDB.objects.get_by_attribute(value="Bob")), [self.obj] * 2)
+
+        out = StringIO()
+        call_command("convert_attributes", batch_size=1, stdout=out)
+        self.assertIn("Converted 2 of", out.getvalue())
+        self.assertFalse(picklefield.is_legacy_value(self._get_stored(stats)))
+        self.assertEqual(
+            Attribute.objects.filter(id=stats.id).values_list("db_value")[0][0], {"hp": 10}
+        )
+        self.assertEqual(list(ObjectDB.objects.get_by_attribute(value="Bob")), [self.obj] * 2)
+        # nothing left to convert
+        self.assertEqual(list(picklefield.convert_values(Attribute))[-1][1], 0)
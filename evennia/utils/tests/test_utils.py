@@ -292,3 +292,27 @@ class LatinifyTest(TestCase):
         byte_str = utils.to_bytes(self.example_str)
         result = utils.latinify(byte_str)
         self.assertEqual(result, self.expected_output)
+
+
+class TestStringSuggestions(TestCase):
+    def setUp(self):
+        self.vocabulary = ["look", "lock", "get", "give", "inventory", "", "look around"]
+
+    def test_string_similarity(self):
+        self.assertAlmostEqual(utils.string_similarity("look", "look"), 1.0)
+        self.assertAlmostEqual(utils.string_similarity("look", "lock"), 0.8165, places=4)
+        self.assertEqual(utils.string_similarity("look", ""), 0)
+        self.assertEqual(utils.string_similarity("abc", "xyz"), 0)
+
+    def test_suggester_matches_string_suggestions(self):
+        suggester = utils.StringSuggester(self.vocabulary)
+        for string in ("lok", "giv", "inv", "look", "zzz", ""):
+            for cutoff in (0.0, 0.6, 0.9):
+                self.assertEqual(
+                    utils.string_suggestions(string, suggester, cutoff=cutoff, maxnum=10),
+                    utils.string_suggestions(string, self.vocabulary, cutoff=cutoff, maxnum=10),
+                )
+        self.assertEqual(suggester.suggest("lok", maxnum=2), ["look", "lock"])
+        self.assertEqual(
+            suggester.rank("giv", cutoff=0.8), [(utils.string_similarity("giv", "give"), "give")]
+        )
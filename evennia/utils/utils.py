@@ -25,7 +25,8 @@ from twisted.internet.task import deferLater
 from twisted.internet.defer import returnValue  # noqa - used as import target
 from os.path import join as osjoin
 from inspect import ismodule, trace, getmembers, getmodule, getmro
-from collections import defaultdict, OrderedDict
+from array import array
+from collections import defaultdict, OrderedDict, Counter
 from twisted.internet import threads, reactor
 from django.conf import settings
 from django.utils import timezone
@@ -1492,6 +1493,22 @@ def init_new_account(account):
     logger.log_dep("evennia.utils.utils.init_new_account is DEPRECATED and should not be used.")
 
 
+def _string_vector(string):
+    """
+    Get the character-histogram of a string, and its length as a vector.
+
+    Args:
+        string (str): The string to get the histogram of.
+
+    Returns:
+        vector (tuple): `(counts, norm)` where `counts` is a `Counter`
+            mapping each character to the number of times it's in `string`.
+
+    """
+    counts = Counter(string)
+    return counts, math.sqrt(sum(num ** 2 for num in counts.values()))
+
+
 def string_similarity(string1, string2):
     """
     This implements a "cosine-similarity" algorithm as described for example in
@@ -1509,17 +1526,101 @@ def string_similarity(string1, string2):
             strings are.
 
     """
-    vocabulary = set(list(string1 + string2))
-    vec1 = [string1.count(v) for v in vocabulary]
-    vec2 = [string2.count(v) for v in vocabulary]
-    try:
-        return float(sum(vec1[i] * vec2[i] for i in range(len(vocabulary)))) / (
-            math.sqrt(sum(v1 ** 2 for v1 in vec1)) * math.sqrt(sum(v2 ** 2 for v2 in vec2))
-        )
-    except ZeroDivisionError:
+    counts1, norm1 = _string_vector(string1)
+    counts2, norm2 = _string_vector(string2)
+    if not (norm1 and norm2):
         # can happen if empty-string cmdnames appear for some reason.
         # This is a no-match.
         return 0
+    if len(counts1) > len(counts2):
+        counts1, counts2 = counts2, counts1
+    return float(sum(num * counts2[char] for char, num in counts1.items())) / (norm1 * norm2)
+
+
+class StringSuggester(object):
+    """
+    Suggests strings from a fixed vocabulary, using the same similarity
+    measure as `string_similarity`. The character-histograms of the
+    vocabulary are precomputed into an inverted index (for each character,
+    which strings contain it and how many times), so scoring a string
+    against the whole vocabulary only touches the strings sharing
+    characters with it. Build one for a vocabulary that is searched many
+    times and pass it to `string_suggestions` in place of the vocabulary.
+
+    """
+
+    def __init__(self, vocabulary):
+        """
+        Args:
+            vocabulary (iterable): The strings to suggest from. Duplicates
+                are removed.
+
+        """
+        self.vocabulary = tuple(OrderedDict.fromkeys(vocabulary))
+        self.norms = array("d")
+        postings = defaultdict(lambda: (array("L"), array("L")))
+        for index, string in enumerate(self.vocabulary):
+            counts, norm = _string_vector(string)
+            self.norms.append(norm)
+            for char, num in counts.items():
+                indices, nums = postings[char]
+                indices.append(index)
+                nums.append(num)
+        self.postings = dict(postings)
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def rank(self, string, cutoff=0.6):
+        """
+        Rate all strings in the vocabulary by their similarity to `string`.
+
+        Args:
+            string (str): The string to compare with.
+            cutoff (float, optional): Leave out strings less similar than this.
+
+        Returns:
+            ranked (list): Tuples `(similarity, suggestion)`, most similar
+                first. Equally similar strings keep their vocabulary order.
+
+        """
+        counts, norm = _string_vector(string)
+        dots = defaultdict(int)
+        for char, num in counts.items():
+            try:
+                indices, nums = self.postings[char]
+            except KeyError:
+                continue
+            for index, vocabnum in zip(indices, nums):
+                dots[index] += num * vocabnum
+        if cutoff <= 0:
+            # strings without common characters (similarity 0) pass too
+            dots = [(index, dots.get(index, 0)) for index in range(len(self.vocabulary))]
+        else:
+            dots = dots.items()
+        norms = self.norms
+        ranked = []
+        for index, dot in dots:
+            similarity = dot / (norm * norms[index]) if dot else 0
+            if similarity >= cutoff:
+                ranked.append((-similarity, index))
+        ranked.sort()
+        return [(-similarity, self.vocabulary[index]) for similarity, index in ranked]
+
+    def suggest(self, string, cutoff=0.6, maxnum=3):
+        """
+        Get the strings in the vocabulary most similar to `string`.
+
+        Args:
+            string (str): The string to compare with.
+            cutoff (float, optional): Leave out strings less similar than this.
+            maxnum (int, optional): Max number of suggestions.
+
+        Returns:
+            suggestions (list): The most similar strings, best first.
+
+        """
+        return [suggestion for _, suggestion in self.rank(string, cutoff=cutoff)[:maxnum]]
 
 
 def string_suggestions(string, vocabulary, cutoff=0.6, maxnum=3):
@@ -1529,7 +1630,9 @@ def string_suggestions(string, vocabulary, cutoff=0.6, maxnum=3):
 
     Args:
         string (str): A string to search for.
-        vocabulary (iterable): A list of available strings.
+        vocabulary (iterable or StringSuggester): A list of available strings.
+            If the same vocabulary is searched often, pass a
+            `StringSuggester` built from it instead.
         cutoff (int, 0-1): Limit the similarity matches (the higher
             the value, the more exact a match is required).
         maxnum (int): Maximum number of suggestions to return.
@@ -1540,6 +1643,8 @@ def string_suggestions(string, vocabulary, cutoff=0.6, maxnum=3):
             Could be empty if there are no matches.
 
     """
+    if isinstance(vocabulary, StringSuggester):
+        return vocabulary.suggest(string, cutoff=cutoff, maxnum=maxnum)
     return [
         tup[1]
         for tup in sorted(
@@ -17,6 +17,11 @@ All messages are valid JSON arrays on this single form:
 where args is an JSON array and kwargs is a JSON object. These will be both
 used as arguments emitted to a callback named "cmdname" as cmdname(args, kwargs).
 
+The websocket connection asks the server to batch its output, so a single
+websocket message may also be an array of such arrays. If a msgpack library
+is loaded on the page (exposing `msgpack.decode`, like msgpack-lite does),
+the client also asks for output to be sent as binary msgpack instead of JSON.
+
 This library makes the "Evennia" object available. It has the
 following official functions:
 
@@ -228,11 +233,16 @@ An "emitter" object must have a function
             }
             // Important - we pass csessid tacked on the url
             websocket = new WebSocket(wsurl + '?' + csessid);
+            websocket.binaryType = "arraybuffer";
 
             // Handle Websocket open event
             websocket.onopen = function (event) {
                 open = true;
                 ever_open = true;
+                // ask for batched (and if possible, binary) output
+                websocket.send(JSON.stringify(
+                    ["websocket_options", [],
+                     {batch: true, encoding: window.msgpack ? "msgpack" : "json"}]));
                 Evennia.emit('connection_open', ["websocket"], event);
             };
             // Handle Websocket close event
@@ -260,16 +270,28 @@ An "emitter" object must have a function
                 }
             };
             // Handle incoming websocket data [cmdname, args, kwargs]
+            // or a batch [[cmdname, args, kwargs], ...]
             websocket.onmessage = function (event) {
                 var data = event.data;
-                if (typeof data !== 'string' && data.length < 0) {
-                    return;
+                if (typeof data === 'string') {
+                    if (data.length === 0) {
+                        return;
+                    }
+                    data = JSON.parse(data);
+                }
+                else {
+                    // binary msgpack data
+                    data = window.msgpack.decode(new Uint8Array(data));
                 }
-                // Parse the incoming data, send to emitter
-                // Incoming data is on the form [cmdname, args, kwargs]
-                data = JSON.parse(data);
                 // console.log(" server->client:", data)
-                Evennia.emit(data[0], data[1], data[2]);
+                if (Array.isArray(data[0])) {
+                    for (var i = 0; i < data.length; i++) {
+                        Evennia.emit(data[i][0], data[i][1], data[i][2]);
+                    }
+                }
+                else {
+                    Evennia.emit(data[0], data[1], data[2]);
+                }
             };
         }
 
@@ -356,15 +378,19 @@ An "emitter" object must have a function
             $.ajax({type: "POST", url: "/webclientdata",
                     async: true, cache: false, timeout: 60000,
                     dataType: "json",
-                    data: {mode: 'receive', 'csessid': csessid},
+                    data: {mode: 'receive', 'csessid': csessid, batch: 1},
                     success: function(data) {
                         // log("ajax data received:", data);
-                        if (data[0] === "ajax_keepalive") {
-                            // special ajax keepalive check - return immediately
-                            msg("", "keepalive");
-                        } else {
-                            // not a keepalive
-                            Evennia.emit(data[0], data[1], data[2]);
+                        // we may get one [cmdname, args, kwargs] or a list of them
+                        var batch = Array.isArray(data[0]) ? data : [data];
+                        for (var i = 0; i < batch.length; i++) {
+                            if (batch[i][0] === "ajax_keepalive") {
+                                // special ajax keepalive check - return immediately
+                                msg("", "keepalive");
+                            } else {
+                                // not a keepalive
+                                Evennia.emit(batch[i][0], batch[i][1], batch[i][2]);
+                            }
                         }
                         stop_polling = false;
                         poll(); // immiately start a new request